@@ -4,30 +4,103 @@
 # The application displays a random remembrance prompt and an image to enhance the user experience.
 # The user can pause, resume, or stop the session at any time.
 # The application also includes a presence check to pause the session if the user is inactive for a set period.
-# The application uses a sound file to play a bell sound at the start and end of each session.
-# The application includes a list of 100 remembrance prompts from various spiritual and philosophical traditions.
+# The application plays configurable sound cues when a session starts, pauses, resumes and ends.
+# Remembrance prompts from various spiritual and philosophical traditions are read from quotes.json and the user's own quote files.
+# Only one instance runs at a time; srctl.py and later launches talk to it over a local control channel.
+# With --tray the app runs from a system tray icon; its window is only built when opened and releases its images when closed.
+# Hot paths are instrumented with in-process metrics that are exported to a local file and shown in a diagnostics panel (Ctrl+Shift+D).
+# Focus statistics (daily and weekly minutes, streaks, completion rate, top aims) are shown in a statistics panel (Ctrl+Shift+S).
+# The active session is checkpointed on every transition and resumed, or closed out at its real end time, on the next launch.
+# Session plans run several sessions back to back; their calendar events are created and corrected in batches.
+# Busy times in the user's calendar are cached and checked when a session starts, to offer a session that ends before them.
 # The application icon and image are included in the bundle for a complete user experience.
 
 import sys
 import time
+
+_PROCESS_START = time.perf_counter()
+
+import math
 import threading
 import os
-import pickle
-import random
 
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout,
-    QLineEdit, QMessageBox, QComboBox, QFormLayout
+    QLineEdit, QMessageBox, QComboBox, QFormLayout, QSystemTrayIcon
+)
+from PyQt6.QtCore import Qt, QTimer, QSize, QObject, QEvent, QLockFile, pyqtSignal
+from PyQt6.QtGui import QFont, QIcon, QKeySequence, QShortcut
+
+# The Google client libraries are imported lazily on a startup worker thread, and pygame
+# on the first sound cue, so the window can be painted before they are loaded.
+
+from app_settings import load_settings
+from audio import AudioEngine
+from calendar_journal import CalendarJournal
+from calendar_mirror import CalendarMirror
+from calendar_sync import (
+    CalendarOperation, CalendarSyncEngine, session_end_patch, session_event_body, session_times_patch,
 )
-from PyQt6.QtCore import Qt, QTimer, QSize
-from PyQt6.QtGui import QFont, QIcon, QPixmap
+from checkpoint import ALIVE_INTERVAL, PLAN_CHECKPOINT_PATH, SessionCheckpoint
+from control_server import ControlServer
+from countdown_widget import CountdownWidget
+from credentials import FREEBUSY_SCOPE, SCOPES, CredentialManager, build_calendar_service
+from diagnostics_panel import DiagnosticsPanel
+from freebusy import FreeBusyCache
+from idle_backends import detect_idle_backend
+from image_gallery import ImageGallery
+from metrics import (
+    DRIFT_BUCKETS, JITTER_BUCKETS, LOOKUP_BUCKETS, MetricsExporter, MetricsRegistry, StallWatchdog, resident_memory, wakeup_count
+)
+from notifications import ERROR, INFO, WARNING, DesktopSink, LogSink, Notification, NotificationDispatcher, SoundSink
+from presence import PresenceMonitor
+from prompts import PromptLibrary, quote_sources
+from resources import BUNDLE_DIR, resource_path
+from session_engine import DURATION_CHOICES, SessionEngine, SessionError
+from session_plan import PlanRunner, load_plans, plan_deviations
+from session_store import SessionRecord, SessionStore
+from srctl import ControlError, send_command
+from startup_profile import StartupProfiler
+from stats_view import StatsPanel
+from toast import Toast
+from tray import SessionTray
+
+
+class CalendarSyncSignals(QObject):
+    """
+    Carries calendar sync results from the worker thread back to the GUI thread.
+    """
+
+    operation_succeeded = pyqtSignal(object, object)
+    operation_failed = pyqtSignal(object, object)
+    freebusy_updated = pyqtSignal(object)
+
+
+class NotificationSignals(QObject):
+    """
+    Carries notifications from the dispatcher thread to the toast on the GUI thread.
+    """
+
+    toast = pyqtSignal(object)
+
+
+class HistorySignals(QObject):
+    """
+    Tells the GUI thread that the session store committed new sessions.
+    """
+
+    written = pyqtSignal(int)
+
+
+class StartupSignals(QObject):
+    """
+    Carries the result of deferred calendar initialisation and worker warnings to the GUI thread.
+    """
+
+    calendar_ready = pyqtSignal(object)
+    warning = pyqtSignal(str, str)
+    critical = pyqtSignal(str, str)
 
-import pygame
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from datetime import datetime, timedelta, timezone
 
 class FocusSessionApp(QWidget):
     """
@@ -38,15 +111,25 @@ class FocusSessionApp(QWidget):
     and provides sound notifications.
     """
 
-    def __init__(self, app_icon_path):
+    def __init__(self, app_icon_path, profiler=None):
         """
         Initializes the FocusSessionApp.
 
+        Only the session services are created here; the window's widgets are built by
+        show_window(). Audio and Google Calendar are initialised on background threads
+        once the window has been painted, or the tray icon shown, for the first time.
+
         Args:
             app_icon_path (str): The file path to the application icon.
+            profiler (StartupProfiler): Collects startup phase timings, if given.
         """
         super().__init__()
 
+        self.profiler = profiler or StartupProfiler()
+        self.quit_after_first_paint = False
+        self.settings = load_settings()
+        self.setup_metrics()
+
         self.setWindowTitle("Self Remembering App")
         self.setGeometry(100, 100, 400, 400)
 
@@ -56,179 +139,408 @@ class FocusSessionApp(QWidget):
         else:
             QMessageBox.warning(self, "Icon Missing", f"Icon not found at {app_icon_path}. Taskbar icon may not display correctly.")
 
-        self.aim = None
-        self.start_time = None
-        self.last_active_time = None
-        self.is_running = False
-        self.is_paused = False
-        self.total_pause_time = 0
-        self.remaining_seconds = 0
-        self.total_seconds = 0
-        self.elapsed_seconds = 0
-        self.event_id = None
-
-        pygame.mixer.init()
-
-        if getattr(sys, 'frozen', False):
-            base_path = sys._MEIPASS
-        else:
-            base_path = os.path.dirname(os.path.abspath(__file__))
+        self.engine = SessionEngine()
+        # The plan runner listens first, so on_session_event already sees a plan's next step.
+        self.plan_runner = PlanRunner(self.engine, start_session=self.begin_plan_session)
+        self.plan_runner.add_listener(self.on_plan_event)
+        self.engine.add_listener(self.on_session_event)
+        self.plans = load_plans(self.settings['session_plans'])
+        self.current_prompt = None
+        self.history_signals = HistorySignals()
+        self.session_store = SessionStore(on_write=self.history_signals.written.emit)
+        self.checkpoint = SessionCheckpoint()
+        self.plan_checkpoint = SessionCheckpoint(PLAN_CHECKPOINT_PATH)
+        # Tells a launch after a crash when a running session was last alive.
+        self.alive_timer = QTimer(self)
+        self.alive_timer.setInterval(ALIVE_INTERVAL * 1000)
+        self.alive_timer.setTimerType(Qt.TimerType.VeryCoarseTimer)
+        self.alive_timer.timeout.connect(self.checkpoint.touch)
+        self.restoring = False
+        self.ui_built = False
+        self.tray = None
+        self.quitting = False
+        self.shut_down = False
+        self.control_server = None
+
+        self.calendar_service = None
+        self.credentials = None
+        self.deferred_init_started = False
+        self.deferred_init_pending = {'calendar'}
+
+        self.prompts = PromptLibrary(
+            quote_sources(resource_path('quotes.json')),
+            authors=self.settings['prompt_authors'],
+            traditions=self.settings['prompt_traditions'],
+            tags=self.settings['prompt_tags'],
+            author_weights=self.settings['prompt_author_weights'],
+        )
+        self.calendar_signals = CalendarSyncSignals()
+        self.calendar_signals.operation_succeeded.connect(self.on_calendar_operation_succeeded)
+        self.calendar_signals.operation_failed.connect(self.on_calendar_operation_failed)
+        self.calendar_signals.freebusy_updated.connect(self.update_free_busy_hint)
+        self.calendar_journal = CalendarJournal()
+        self.calendar_mirror = CalendarMirror()
+        self.freebusy = None
+        if self.settings['google_calendar'] and self.settings['free_busy'] != 'off':
+            self.freebusy = FreeBusyCache(
+                ttl=self.settings['free_busy_refresh_seconds'],
+                on_update=self.calendar_signals.freebusy_updated.emit,
+            )
+        self.calendar_sync = CalendarSyncEngine(
+            on_result=self.calendar_signals.operation_succeeded.emit,
+            on_error=self.calendar_signals.operation_failed.emit,
+            journal=self.calendar_journal,
+            mirror=self.calendar_mirror,
+            freebusy=self.freebusy,
+        )
+        self.startup_signals = StartupSignals()
+        self.startup_signals.calendar_ready.connect(self.on_calendar_ready)
+        self.startup_signals.warning.connect(lambda title, text: self.notify(title, text, WARNING))
+        self.startup_signals.critical.connect(lambda title, text: self.notify(title, text, ERROR))
+        gallery_path = os.path.expanduser(self.settings['gallery_path'] or resource_path('icons', 'picture.jpg'))
+        self.gallery = ImageGallery(
+            [gallery_path],
+            size=QSize(300, 150),
+            memory_budget=int(self.settings['gallery_memory_budget_mb'] * 1024 * 1024),
+            parent=self,
+        )
+        self.gallery.image_changed.connect(self.on_gallery_image)
+        self.gallery.unavailable.connect(self.on_gallery_unavailable)
+        self.qtimer = QTimer()
+        self.qtimer.setSingleShot(True)
+        self.qtimer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.qtimer.timeout.connect(self.on_timer_wakeup)
+        self.timer_wakeup_due = None
+        self.stall_heartbeat = QTimer(self)
+        self.stall_heartbeat.setTimerType(Qt.TimerType.CoarseTimer)
+        if self.watchdog is not None:
+            self.stall_heartbeat.setInterval(int(self.watchdog.beat_interval * 1000))
+            self.stall_heartbeat.timeout.connect(self.watchdog.beat)
+            self.watchdog.start()
+            self.watchdog.beat()
+            self.stall_heartbeat.start()
+        self.diagnostics_panel = None
+        self.stats_panel = None
+        self.history_signals.written.connect(self.on_history_written)
+        self.watching_exposure = False
+        self.window_exposed = None
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self).activated.connect(self.show_diagnostics)
+        QShortcut(QKeySequence("Ctrl+Shift+S"), self).activated.connect(self.show_stats)
+        idle_backend = detect_idle_backend() if self.settings['system_idle_detection'] else None
+        self.presence = PresenceMonitor(self.settings['inactivity_threshold_seconds'], idle_backend, parent=self)
+        self.presence.inactive.connect(self.pause_session_for_inactivity)
+        self.audio = AudioEngine(
+            cues=self.settings['audio_cues'],
+            base_path=BUNDLE_DIR,
+            memory_budget=int(self.settings['audio_memory_budget_mb'] * 1024 * 1024),
+            on_error=self.startup_signals.critical.emit,
+            on_load=lambda seconds, cached: self.audio_load_seconds.observe(
+                seconds, source='cache' if cached else 'decode'),
+        )
+        self.setup_notifications(app_icon_path)
+        self.interval_chime = QTimer(self)
+        self.interval_chime.setTimerType(Qt.TimerType.VeryCoarseTimer)
+        self.interval_chime.setInterval(int(self.settings['interval_chime_minutes'] * 60 * 1000))
+        self.interval_chime.timeout.connect(lambda: self.audio.play('interval'))
+        self.plan_timer = QTimer(self)
+        self.plan_timer.setSingleShot(True)
+        self.plan_timer.setTimerType(Qt.TimerType.VeryCoarseTimer)
+        self.plan_timer.timeout.connect(self.on_plan_timer)
+        # Recurring plans whose start time passed before launch are not started late.
+        self.plan_check_from = time.time()
+        self.profiler.mark('create services')
+        self.restore_session()
+        self.schedule_plan_recurrence()
+        self.profiler.mark('restore session')
+
+    def restore_session(self):
+        """
+        Continues the session that was active when the app last exited, if any.
 
-        sound_path = os.path.join(base_path, 'sounds', 'tibetanbowl.mp3')
+        A running session whose deadline passed while the app was not running is ended
+        at once, with the deadline as its end time, or, if the app crashed, with the time
+        it was last alive. Its calendar event is patched and it is recorded in the history
+        like any other session, but without the end cue and the "Time's Up" message.
 
+        A session plan that was running continues too, unless its next step is long overdue.
+        """
+        plan_snapshot = self.plan_checkpoint.load()
+        if plan_snapshot is not None:
+            try:
+                self.plan_runner.restore(plan_snapshot)
+            except (KeyError, TypeError, ValueError, IndexError) as e:
+                print(f"Session plan restore error: {str(e)}")
+                self.plan_checkpoint.clear()
+
+        snapshot = self.checkpoint.load()
+        if snapshot is not None:
+            self.restoring = True
+            try:
+                self.engine.restore(snapshot)
+                self.engine.tick()
+            except (KeyError, TypeError, ValueError, SessionError) as e:
+                print(f"Session restore error: {str(e)}")
+                self.checkpoint.clear()
+            finally:
+                self.restoring = False
+        self.plan_runner.settle()
+
+    def setup_metrics(self):
+        """
+        Creates the metrics registry, its file exporter and the GUI stall watchdog.
+
+        Export and the watchdog are off unless turned on with the metrics_export and
+        stall_threshold_ms settings; the metrics themselves are always recorded.
+        """
+        self.metrics = MetricsRegistry()
+        metrics = self.metrics
+        self.timer_wakeup_lateness = metrics.histogram(
+            'timer_wakeup_lateness_seconds', "How late the countdown timer fired after its scheduled time.",
+            buckets=JITTER_BUCKETS)
+        self.session_end_lateness = metrics.histogram(
+            'session_end_lateness_seconds', "Time between a session's deadline and the wakeup that ended it.",
+            buckets=JITTER_BUCKETS)
+        self.session_clock_drift = metrics.histogram(
+            'session_clock_drift_seconds', "Wall-clock minus monotonic time elapsed over a session "
+            "(suspend, clock changes).", buckets=DRIFT_BUCKETS)
+        self.calendar_operation_seconds = metrics.histogram(
+            'calendar_operation_seconds', "Calendar operation latency from submit to completion.", ('kind',))
+        self.calendar_operations = metrics.counter(
+            'calendar_operations', "Calendar operations by outcome (ok, skipped, deferred, error).",
+            ('kind', 'outcome'))
+        self.startup_phase_seconds = metrics.gauge(
+            'startup_phase_seconds', "Duration of each startup phase of this launch.", ('phase',))
+        self.audio_load_seconds = metrics.histogram(
+            'audio_load_seconds', "Time to load a sound cue, from the PCM cache or by decoding.", ('source',))
+        self.freebusy_lookup_seconds = metrics.histogram(
+            'freebusy_lookup_seconds', "Time to look up the free time before a session starts.",
+            buckets=LOOKUP_BUCKETS)
+        self.freebusy_index_age = metrics.gauge(
+            'freebusy_index_age_seconds', "Age of the cached free/busy times.")
+        self.stats_load_seconds = metrics.histogram(
+            'stats_load_seconds', "Time to read the focus statistics from the rollups.")
+        self.notification_count = metrics.gauge(
+            'notifications', "Notifications since launch by outcome (delivered, duplicate, rate_limited, dropped).",
+            ('outcome',))
+        self.gui_stall_seconds = metrics.histogram(
+            'gui_stall_seconds', "Stretches in which the GUI thread did not run its event loop.")
+        self.calendar_queue_depth = metrics.gauge(
+            'calendar_queue_depth', "Calendar operations queued or in flight.")
+        self.audio_mixer_init_seconds = metrics.gauge(
+            'audio_mixer_init_seconds', "Time taken to start the audio mixer.")
+        self.countdown_paints = metrics.gauge(
+            'countdown_paints', "Times the countdown has been painted since launch.")
+        self.process_resident_bytes = metrics.gauge(
+            'process_resident_bytes', "Resident memory of the app.")
+        self.process_context_switches = metrics.gauge(
+            'process_context_switches', "Context switches of all the app's threads since launch; "
+            "its growth while idle is the wakeup rate.")
+        self.window_built = metrics.gauge(
+            'window_built', "1 once the window's widgets exist, 0 while only the tray icon does.")
+        metrics.add_collector(self.collect_component_metrics)
+
+        self.metrics_exporter = None
+        export_format = self.settings['metrics_export']
+        if export_format:
+            self.metrics_exporter = MetricsExporter(
+                metrics,
+                path=os.path.expanduser(self.settings['metrics_export_path']) or None,
+                export_format=export_format,
+                interval=self.settings['metrics_export_interval_seconds'],
+            )
+            self.metrics_exporter.start()
+
+        threshold = self.settings['stall_threshold_ms']
+        self.watchdog = StallWatchdog(threshold / 1000, on_stall=self.on_gui_stall) if threshold > 0 else None
+
+    def setup_notifications(self, app_icon_path):
+        """
+        Creates the notification dispatcher with the sinks named in the notification_sinks setting.
+
+        Args:
+            app_icon_path (str): The icon shown with desktop notifications.
+        """
+        self.window_on_screen = False
+        self.toast = None
+        self.notification_signals = NotificationSignals()
+        self.notification_signals.toast.connect(self.show_toast)
+        names = self.settings['notification_sinks']
+        sinks = []
+        if 'log' in names:
+            sinks.append(LogSink())
+        if 'toast' in names:
+            sinks.append(self.notification_signals.toast.emit)
+        if 'sound' in names:
+            sinks.append(SoundSink(self.audio))
+        self.desktop_notifications = None
+        if 'desktop' in names:
+            # The toast covers the time the window is on screen.
+            self.desktop_notifications = DesktopSink(icon=app_icon_path, enabled=lambda: not self.window_on_screen)
+            sinks.append(self.desktop_notifications)
+        self.notifications = NotificationDispatcher(
+            sinks,
+            dedup_seconds=self.settings['notification_dedup_seconds'],
+            max_per_minute=self.settings['notifications_per_minute'],
+        )
+
+    def collect_component_metrics(self):
+        """
+        Copies values the components keep in their own stats into gauges. Runs before every export.
+        """
+        self.calendar_queue_depth.set(self.calendar_sync.depth())
+        self.audio_mixer_init_seconds.set(self.audio.stats()['mixer_init_latency'])
+        if self.ui_built:
+            self.countdown_paints.set(self.timer_display.stats()['paints'])
+        self.process_resident_bytes.set(resident_memory())
+        self.process_context_switches.set(wakeup_count())
+        self.window_built.set(1 if self.ui_built else 0)
+        notifications = self.notifications.stats()
+        for outcome, key in (('delivered', 'delivered'), ('duplicate', 'duplicates'),
+                             ('rate_limited', 'rate_limited'), ('dropped', 'dropped')):
+            self.notification_count.set(notifications[key], outcome=outcome)
+        if self.freebusy is not None and self.freebusy.stats()['age'] is not None:
+            self.freebusy_index_age.set(self.freebusy.stats()['age'])
+
+    def on_gui_stall(self, seconds, stack):
+        """
+        Records a GUI stall reported by the watchdog once the event loop is running again.
+        """
+        self.gui_stall_seconds.observe(seconds)
+
+    def show_diagnostics(self):
+        """
+        Opens the diagnostics panel, creating it on first use.
+        """
+        if self.diagnostics_panel is None:
+            self.diagnostics_panel = DiagnosticsPanel(self.metrics, self.watchdog, self.metrics_exporter, parent=self)
+        self.diagnostics_panel.show()
+        self.diagnostics_panel.raise_()
+        self.diagnostics_panel.activateWindow()
+
+    def show_stats(self):
+        """
+        Opens the statistics panel, creating it on first use.
+        """
+        if self.stats_panel is None:
+            self.stats_panel = StatsPanel(self.session_store, self.stats_load_seconds, parent=self)
+        self.stats_panel.show()
+        self.stats_panel.raise_()
+        self.stats_panel.activateWindow()
+
+    def on_history_written(self, count):
+        """
+        Reloads the statistics panel, if it is open, once new sessions are in the store.
+        """
+        if self.stats_panel is not None:
+            self.stats_panel.refresh()
+
+    def paintEvent(self, event):
+        """
+        Starts the deferred initialisation once the window has been painted.
+        """
+        super().paintEvent(event)
+        if not self.deferred_init_started:
+            self.profiler.mark('first paint')
+            if self.quit_after_first_paint:
+                # Read by benchmarks/bench_startup.py: the wall-clock time of the first paint
+                # and the seconds since the app's first line ran.
+                print(f"first paint: {time.time():.6f} {self.profiler.elapsed():.6f}", flush=True)
+                QTimer.singleShot(0, QApplication.quit)
+            self.schedule_deferred_initialisation()
+
+    def schedule_deferred_initialisation(self):
+        """
+        Starts the deferred initialisation once control returns to the event loop.
+        """
+        if not self.deferred_init_started:
+            self.deferred_init_started = True
+            QTimer.singleShot(0, self.start_deferred_initialisation)
+
+    def start_deferred_initialisation(self):
+        """
+        Connects to Google Calendar on a background thread.
+
+        Sessions can be started meanwhile; their calendar operations are journaled and
+        sent as soon as the calendar service is ready.
+        """
+        if not self.settings['google_calendar']:
+            self.finish_deferred_phase('calendar')
+            return
+        threading.Thread(target=self._init_calendar, name='startup-calendar', daemon=True).start()
+
+    def _init_calendar(self):
+        service = None
         try:
-            if not os.path.exists(sound_path):
-                raise FileNotFoundError(f"Sound file not found at {sound_path}")
-            self.bell_sound = pygame.mixer.Sound(sound_path)
-        except pygame.error as e:
-            QMessageBox.critical(self, "Sound Error", f"Failed to load sound file: {e}")
-            self.bell_sound = None
-        except FileNotFoundError as fnf_error:
-            QMessageBox.critical(self, "Sound File Missing", str(fnf_error))
-            self.bell_sound = None
-
-        self.remembrance_prompts = [
-            "Know thyself, for in that knowledge lies the universe. - G.I. Gurdjieff",
-            "Be present in the now, the only moment you truly have. - G.I. Gurdjieff",
-            "Confront your inner world to understand the outer world. - G.I. Gurdjieff",
-            "Seek the truth within, for only then can you see it without. - G.I. Gurdjieff",
-            "Awaken to your own sleep, and begin the journey to consciousness. - G.I. Gurdjieff",
-            "Every action, every thought, requires your full presence. - G.I. Gurdjieff",
-            "Remember your aim, for without it, you are but a leaf in the wind. - G.I. Gurdjieff",
-            "Self-observation is the mirror to your soul's awakening. - G.I. Gurdjieff",
-            "Let your intentions guide your actions, not your habits. - G.I. Gurdjieff",
-            "The struggle within is the path to true freedom. - G.I. Gurdjieff",
-            "Do not merely exist; strive to live consciously. - G.I. Gurdjieff",
-            "Embrace the unknown, for it is the cradle of growth. - G.I. Gurdjieff",
-            "The present moment is the doorway to eternity. - G.I. Gurdjieff",
-            "Conscious work is the key to unlock your potential. - G.I. Gurdjieff",
-            "Resist the comfort of sleep; embrace the challenge of awakening. - G.I. Gurdjieff",
-            "The soul of the true poet is a little unclouded. - William Blake",
-            "To see a world in a grain of sand, and a heaven in a wild flower. - William Blake",
-            "What is now proved was once only imagined. - William Blake",
-            "No bird soars too high if he soars with his own wings. - William Blake",
-            "The man who never in his mind and heart waked, can never feel the dreamer's passion stirred. - William Blake",
-            "A truth that's told with bad intent beats all the lies you can invent. - William Blake",
-            "Great things are done when men and mountains meet. - William Blake",
-            "If the doors of perception were cleansed everything would appear to man as it is, infinite. - William Blake",
-            "The tree which moves some to tears of joy is in the eyes of others only a green thing that stands in the way. - William Blake",
-            "He who binds to himself a joy does the winged life destroy; but he who kisses the joy as it flies lives in eternity’s sunrise. - William Blake",
-            "The wound is the place where the Light enters you. - Rumi",
-            "What you seek is seeking you. - Rumi",
-            "Don’t be satisfied with stories, how things have gone with others. - Rumi",
-            "Let yourself be silently drawn by the strange pull of what you really love. - Rumi",
-            "Stop acting so small. You are the universe in ecstatic motion. - Rumi",
-            "Yesterday I was clever, so I wanted to change the world. Today I am wise, so I am changing myself. - Rumi",
-            "Raise your words, not voice. It is rain that grows flowers, not thunder. - Rumi",
-            "The universe is not outside of you. Look inside yourself; everything that you want, you already are. - Rumi",
-            "You were born with wings, why prefer to crawl through life? - Rumi",
-            "When you do things from your soul, you feel a river moving in you, a joy. - Rumi",
-            "The river that flows in you also flows in me. - Kabir",
-            "Wherever you are is the entry point. - Kabir",
-            "The moon stays bright when it doesn't avoid the night. - Kabir",
-            "Your own self-realization is the greatest service you can render the world. - Kabir",
-            "Even after all this time, the sun never says to the earth, 'You owe me.' - Kabir",
-            "Life is a balance between holding on and letting go. - Kabir",
-            "The bird of time has but a little way to fly, but it wings to see the world go by. - Kabir",
-            "Love is the bridge between you and everything. - Kabir",
-            "Where are you? Declare the purpose and set your heart free. - Kabir",
-            "In the midst of movement and chaos, keep stillness inside of you. - Kabir",
-            "Love is the bond of all life. - Meher Baba",
-            "Your heart is the door to the soul, but you must turn the key. - Meher Baba",
-            "In the end, there is no saving anyone but yourself. - Meher Baba",
-            "Your journey has just begun. - Meher Baba",
-            "The love you give comes back to you as love you receive. - Meher Baba",
-            "To realize the truth, you must eliminate all that is not truth. - Meher Baba",
-            "Happiness is not outside; it is inside. - Meher Baba",
-            "Be still, for the One is near. - Meher Baba",
-            "The seeker must become the sought. - Meher Baba",
-            "Live your life as if you were to die tomorrow. - Meher Baba",
-            "Man is not a human being having a spiritual experience. He is a spiritual being having a human experience. - P.D. Ouspensky",
-            "Nothing in this world can be done without pure consciousness. - P.D. Ouspensky",
-            "The only thing that is real is the present moment. - P.D. Ouspensky",
-            "Man is the most powerful and the most ignorant of all beings. - P.D. Ouspensky",
-            "Self-remembering is the core of all progress in life. - P.D. Ouspensky",
-            "A true focus is in the development of self-awareness. - P.D. Ouspensky",
-            "The rational mind is a device for seeking truth. - P.D. Ouspensky",
-            "To think is to believe something that is not true. - P.D. Ouspensky",
-            "Understanding arises from deep inquiry. - P.D. Ouspensky",
-            "Only through direct experience can we truly know. - P.D. Ouspensky",
-            "Justice, justice shall you pursue. - Moses",
-            "Grief is the price we pay for love. - Queen Elizabeth I",
-            "The earth shall give back what it owes to life. - Yunus Emre",
-            "To know others is intelligence; to know yourself is true wisdom. - Lao-Tzu",
-            "Meditate on love, compassion, and enlightenment. - Milarepa",
-            "The road to hell is paved with good intentions. - Bernard of Clairvaux",
-            "Keep your mind in the depths of hell, and despair not. - Silouan the Athonite",
-            "Where words fail, music speaks. - Hans Christian Andersen",
-            "Find the truth in your heart, and let it light your path. - Bahauddin Naqshband",
-            "Seek wisdom with humility and you will find it in abundance. - Al Ghazali"
-        ]
-
-        self.remembrance_prompts = list(set(self.remembrance_prompts))
-        self.calendar_service = self.setup_google_calendar()
-        self.build_ui()
-        self.qtimer = QTimer()
-        self.qtimer.timeout.connect(self.update_timer)
-        self.presence_thread = threading.Thread(target=self.check_presence, daemon=True)
-        self.presence_thread.start()
+            service = self.setup_google_calendar()
+        except Exception as e:
+            print(f"Calendar setup error: {str(e)}")
+        self.startup_signals.calendar_ready.emit(service)
+
+    def on_calendar_ready(self, service):
+        """
+        Installs the calendar service created by the startup worker.
+        """
+        self.calendar_service = service
+        if service:
+            # Also replays sessions journaled while offline or started before this point.
+            self.calendar_sync.set_service(service)
+        self.finish_deferred_phase('calendar')
+
+    def finish_deferred_phase(self, name):
+        """
+        Records the end of a deferred startup phase and reports once all are done.
+        """
+        self.deferred_init_pending.discard(name)
+        if not self.deferred_init_pending:
+            self.profiler.mark('deferred init complete')
+            self.profiler.report()
+            for phase, seconds in self.profiler.durations():
+                self.startup_phase_seconds.set(seconds, phase=phase)
 
     def setup_google_calendar(self):
         """
-        Sets up the Google Calendar API connection.
+        Sets up the Google Calendar API connection. Runs on a startup worker thread.
+
+        Credentials come from the credential manager, which keeps the token fresh in the
+        background and shares one keep-alive transport across all calendar calls. The
+        service is built from the static discovery document shipped with googleapiclient
+        (or a bundled discovery/calendar.v3.json), never fetched. With calendar_api_endpoint
+        set, the service talks to that root instead, without credentials.
 
         Returns:
             googleapiclient.discovery.Resource: The Google Calendar service object.
         """
-        SCOPES = ['https://www.googleapis.com/auth/calendar.events']
-        creds = None
+        credentials_path = resource_path('client_secret.json')
+        discovery_path = resource_path('discovery', 'calendar.v3.json')
+        endpoint = self.settings['calendar_api_endpoint']
+        if endpoint:
+            import httplib2
+            with self.profiler.phase('calendar: build service'):
+                return build_calendar_service(httplib2.Http(timeout=30), discovery_path, endpoint)
 
-        if getattr(sys, 'frozen', False):
-            base_path = sys._MEIPASS
-        else:
-            base_path = os.path.dirname(os.path.abspath(__file__))
+        scopes = SCOPES + [FREEBUSY_SCOPE] if self.freebusy is not None else SCOPES
+        self.credentials = CredentialManager(credentials_path, scopes=scopes)
 
-        token_path = os.path.join(os.path.expanduser('~'), '.mindapp', 'token.pickle')
-        credentials_path = os.path.join(base_path, 'client_secret.json')
-
-        os.makedirs(os.path.dirname(token_path), exist_ok=True)
-
-        if os.path.exists(token_path):
-            try:
-                with open(token_path, 'rb') as token:
-                    creds = pickle.load(token)
-            except Exception:
-                creds = None
-
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                try:
-                    creds.refresh(Request())
-                except Exception:
-                    creds = None
-
-            if not creds:
-                try:
-                    flow = InstalledAppFlow.from_client_secrets_file(
-                        credentials_path, SCOPES)
-                    creds = flow.run_local_server(port=0)
-                    with open(token_path, 'wb') as token:
-                        pickle.dump(creds, token)
-                except Exception as e:
-                    print(f"Calendar setup error: {str(e)}")
-                    QMessageBox.warning(
-                        self,
-                        "Calendar Setup",
-                        f"Google Calendar integration failed: {str(e)}\nPlease ensure client_secret.json is present."
-                    )
-                    return None
+        try:
+            with self.profiler.phase('calendar: load token'):
+                self.credentials.load()
+            with self.profiler.phase('calendar: authorize'):
+                self.credentials.authorize(interactive=True)
+        except Exception as e:
+            print(f"Calendar setup error: {str(e)}")
+            self.startup_signals.warning.emit(
+                "Calendar Setup",
+                f"Google Calendar integration failed: {str(e)}\nPlease ensure client_secret.json is present."
+            )
+            return None
+        self.credentials.start()
 
         try:
-            return build('calendar', 'v3', credentials=creds)
+            with self.profiler.phase('calendar: build service'):
+                return self.credentials.build_service(discovery_path)
         except Exception as e:
             print(f"API build error: {str(e)}")
-            QMessageBox.warning(
-                self,
+            self.startup_signals.warning.emit(
                 "Calendar Setup",
                 f"Failed to connect to Google Calendar: {str(e)}"
             )
@@ -256,35 +568,35 @@ class FocusSessionApp(QWidget):
         timer_label = QLabel("Duration:")
         timer_label.setFont(QFont("Arial", 12, QFont.Weight.Bold))
         self.timer_combo = QComboBox()
-        self.timer_combo.addItems([
-            "5 min",
-            "15 min",
-            "25 min",
-            "30 min",
-            "45 min",
-            "1 hour"
-        ])
+        self.timer_combo.addItems(list(DURATION_CHOICES))
+        for name in self.plans:
+            self.timer_combo.addItem(f"Plan: {name}", name)
         self.timer_combo.setCurrentIndex(1)
         self.timer_combo.setFont(QFont("Arial", 10))
         self.timer_combo.setMaximumHeight(30)
+        self.timer_combo.currentIndexChanged.connect(self.update_free_busy_hint)
         form_layout.addRow(timer_label, self.timer_combo)
 
+        self.free_busy_label = QLabel()
+        self.free_busy_label.setFont(QFont("Arial", 9))
+        self.free_busy_label.hide()
+        form_layout.addRow("", self.free_busy_label)
+
         layout.addLayout(form_layout)
 
-        self.timer_display = QLabel("0:00 remaining")
-        self.timer_display.setFont(QFont("Arial", 14, QFont.Weight.Bold))
-        self.timer_display.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.timer_display = CountdownWidget(show_ring=self.settings['countdown_ring'])
         layout.addWidget(self.timer_display)
 
         self.prompt_label = QLabel()
         self.prompt_label.setFont(QFont("Arial", 10))
         self.prompt_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.prompt_label.setWordWrap(True)
-        self.display_random_remembrance()
         layout.addWidget(self.prompt_label)
 
         self.image_label = QLabel(self)
-        self.load_image()
+        # Reserve the image's space, so the layout does not jump when it arrives.
+        self.image_label.setMinimumSize(QSize(300, 150))
+        self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(self.image_label, alignment=Qt.AlignmentFlag.AlignCenter)
 
         button_layout = QHBoxLayout()
@@ -320,285 +632,808 @@ class FocusSessionApp(QWidget):
         layout.addLayout(button_layout)
         self.setLayout(layout)
 
+    def show_window(self):
+        """
+        Shows the window, building its widgets the first time and bringing them up to date.
+        """
+        if not self.ui_built:
+            self.build_ui()
+            self.ui_built = True
+            self.profiler.mark('build window')
+        if self.engine.is_active:
+            self.aim_input.setText(self.engine.aim)
+        if self.current_prompt is None:
+            self.display_random_remembrance()
+        else:
+            self.show_remembrance(self.current_prompt)
+        self.refresh_controls()
+        if self.isMinimized():
+            self.showNormal()
+        else:
+            self.show()
+        self.raise_()
+        self.activateWindow()
+        self.gallery.set_device_pixel_ratio(self.devicePixelRatioF())
+        self.gallery.show_current()
+
+    def dismiss_window(self):
+        """
+        Hides the window to the tray and releases its image and prompt text.
+
+        The widgets themselves are small and are kept for the next show_window().
+        """
+        self.hide()
+        if self.diagnostics_panel is not None:
+            self.diagnostics_panel.hide()
+        if self.stats_panel is not None:
+            self.stats_panel.hide()
+        if self.ui_built:
+            self.image_label.clear()
+            self.prompt_label.clear()
+        self.gallery.release()
+
+    def enable_tray(self, icon):
+        """
+        Shows the tray icon and makes closing the window hide it instead of quitting.
+        """
+        self.tray = SessionTray(self, icon, parent=self)
+        self.tray.show()
+        self.profiler.mark('show tray icon')
+        self.schedule_deferred_initialisation()
+
+    def start_control_server(self):
+        """
+        Starts answering srctl commands and the show requests of later launches.
+        """
+        self.control_server = ControlServer(self, parent=self)
+        self.control_server.listen()
+
+    def notify(self, title, message, level=INFO, key=None):
+        """
+        Tells the user something without waiting for them to read it.
+
+        The notification is delivered to the configured sinks on the dispatcher's thread;
+        repeats and bursts are dropped there.
+
+        Args:
+            title (str): The summary line.
+            message (str): The body text.
+            level (str): notifications.INFO, WARNING or ERROR.
+            key (str): Identifies repeats of the same notification; defaults to title and message.
+        """
+        self.notifications.notify(title, message, level, key)
+
+    def show_toast(self, notification):
+        """
+        Shows a notification in the window while it is on screen. Otherwise a tray balloon
+        stands in when there is no desktop notification service.
+        """
+        if self.window_on_screen and self.ui_built:
+            if self.toast is None:
+                self.toast = Toast(self)
+            self.toast.show_notification(notification)
+        elif self.tray is not None and not (self.desktop_notifications and self.desktop_notifications.available):
+            self.tray.notify(notification.title, notification.message)
+
     def start_session(self):
         """
         Begins a new focus session based on user input.
         """
-        if self.is_running:
-            QMessageBox.information(self, "Session Running", "A session is already running.")
+        if self.engine.is_active or self.plan_runner.is_active:
+            self.notify("Session Running", "A session is already running.")
             return
 
-        aim = self.aim_input.text().strip()
-        if not aim:
-            aim = "Engaged in activity"
-        self.aim_input.setText(aim)
-        self.aim = aim
-        self.start_time = time.time()
-        self.last_active_time = self.start_time
-        self.is_running = True
-        self.is_paused = False
-        self.total_pause_time = 0
-        self.elapsed_seconds = 0
-
+        plan_name = self.timer_combo.currentData()
+        if plan_name is not None:
+            self.begin_plan(plan_name, self.aim_input.text())
+            return
         timer_selection = self.timer_combo.currentText().strip().lower()
+        self.begin_session(self.aim_input.text(), DURATION_CHOICES.get(timer_selection, 60 * 60), ask=True)
+
+    def begin_session(self, aim, duration_seconds, ask=False):
+        """
+        Starts a session with a fresh remembrance prompt; used by the Start button and the tray menu.
 
-        duration_map = {
-            "5 min": 5 * 60,
-            "15 min": 15 * 60,
-            "25 min": 25 * 60,
-            "30 min": 30 * 60,
-            "45 min": 45 * 60,
-            "1 hour": 60 * 60
-        }
+        Args:
+            aim (str): The session's aim; blank for the default aim.
+            duration_seconds (int): The planned length of the session.
+            ask (bool): Whether the user may be asked to shorten a session that runs into a
+                busy time in their calendar.
+        """
+        if self.engine.is_active or self.plan_runner.is_active:
+            return
+        duration_seconds = self.fit_free_time(aim, duration_seconds, ask)
+        if duration_seconds is None:
+            return
+        self.launch_session(aim, duration_seconds)
+
+    def launch_session(self, aim, duration_seconds):
+        """
+        Starts a session whose length has been checked against the calendar, unless another
+        session began in the meantime.
+        """
+        if self.engine.is_active or self.plan_runner.is_active:
+            return
+        self.display_random_remembrance()
+        self.engine.start(aim, duration_seconds, prompt=self.current_prompt)
 
-        self.total_seconds = duration_map.get(timer_selection, 60 * 60)
-        self.remaining_seconds = self.total_seconds
+    def fit_free_time(self, aim, duration_seconds, ask=False):
+        """
+        Checks a session about to start against the cached free/busy times, without any network call.
 
-        if self.bell_sound:
-            self.bell_sound.play()
+        Depending on the free_busy setting, a session that would run into a busy time is
+        shortened to end before it, the user is asked whether to shorten it, or only warned.
+        The question is a toast with the choices as links, so nothing waits for the answer;
+        the chosen session is started from the link, and dismissing the toast cancels it.
 
-        self.create_or_update_calendar_event()
+        Args:
+            aim (str): The aim of the session, for starting it from the toast.
+            duration_seconds (int): The chosen length.
+            ask (bool): Whether the user may be asked; otherwise 'ask' warns like 'warn'.
+
+        Returns:
+            int: The length to start the session with, or None if it is not to start now.
+        """
+        if self.freebusy is None:
+            return duration_seconds
+        began = time.perf_counter()
+        free, busy = self.freebusy.free_seconds()
+        self.freebusy_lookup_seconds.observe(time.perf_counter() - began)
+        if free is None or busy is None or free >= duration_seconds:
+            return duration_seconds
+
+        start, end = (time.strftime('%H:%M', time.localtime(ts)) for ts in busy)
+        when = f"until {end}" if free <= 0 else f"from {start} to {end}"
+        shortened = int(free // 60) * 60
+        fits = shortened >= min(DURATION_CHOICES.values())
+        mode = self.settings['free_busy']
+        if mode == 'clamp' and fits:
+            print(f"Session shortened to {shortened // 60} min: calendar busy {when}")
+            return shortened
+        if mode == 'ask' and ask:
+            actions = []
+            if fits:
+                question = "Shorten the session to end before it?"
+                actions.append((f"Shorten to {shortened // 60} min", lambda: self.launch_session(aim, shortened)))
+            else:
+                question = "Start the session anyway?"
+            actions.append((f"Start {duration_seconds // 60} min anyway",
+                            lambda: self.launch_session(aim, duration_seconds)))
+            if self.toast is None:
+                self.toast = Toast(self)
+            self.toast.show_notification(
+                Notification("Calendar Busy", f"Your calendar is busy {when}.\n{question}", WARNING, actions=actions))
+            return None
+        self.notify("Calendar Busy", f"This session runs into a busy time in your calendar, {when}.", WARNING)
+        return duration_seconds
+
+    def update_free_busy_hint(self, *_):
+        """
+        Shows under the Duration list how long the calendar is free from now, from the cached
+        free/busy times, and highlights it when the chosen duration does not fit.
+        """
+        if not self.ui_built or self.freebusy is None:
+            return
+        free, busy = self.freebusy.free_seconds()
+        if free is None or self.engine.is_active or self.plan_runner.is_active:
+            self.free_busy_label.hide()
+            return
+        if busy is None:
+            text = f"Calendar free for the next {int(free // 3600)} hours"
+        elif free <= 0:
+            text = f"Calendar busy until {time.strftime('%H:%M', time.localtime(busy[1]))}"
+        else:
+            text = f"Calendar free for {int(free // 60)} min, until {time.strftime('%H:%M', time.localtime(busy[0]))}"
+        chosen = DURATION_CHOICES.get(self.timer_combo.currentText().strip().lower())
+        too_long = busy is not None and chosen is not None and chosen > free
+        self.free_busy_label.setStyleSheet("color: #c05000;" if too_long else "color: gray;")
+        self.free_busy_label.setText(text)
+        self.free_busy_label.show()
+
+    def begin_plan(self, name, aim=''):
+        """
+        Starts a session plan; used by the Duration list, the tray menu, srctl and recurring plans.
+
+        Args:
+            name (str): The plan's name in the session_plans setting.
+            aim (str): The aim of the plan's sessions that have none of their own.
+
+        Returns:
+            bool: False if there is no such plan or a session is already running.
+        """
+        plan = self.plans.get(name)
+        if plan is None or self.engine.is_active or self.plan_runner.is_active:
+            return False
+        self.plan_runner.start(plan, aim)
+        return True
+
+    def begin_plan_session(self, aim, duration_seconds, key):
+        """
+        Starts one of a plan's sessions with a fresh remembrance prompt.
+
+        Args:
+            aim (str): The session's aim.
+            duration_seconds (int): The planned length of the session.
+            key (str): The session key the plan chose, which is also its event id.
+        """
         self.display_random_remembrance()
-        self.qtimer.start(1000)
+        self.engine.start(aim, duration_seconds, prompt=self.current_prompt, key=key)
+
+    def on_plan_event(self, event, runner):
+        """
+        Creates a plan's calendar events when it starts and corrects them when it ends.
+
+        All planned events are inserted in one batched request up front. At the end, only
+        the events of sessions that ran off their planned times are patched, and those of
+        sessions that never ran are cancelled, again in one batch.
+
+        Args:
+            event (str): The PlanRunner event that occurred.
+            runner (PlanRunner): The runner that changed state.
+        """
+        if event == PlanRunner.STARTED:
+            self.calendar_sync.submit_batch([
+                CalendarOperation(CalendarOperation.INSERT, entry['key'],
+                                  session_event_body(entry['key'], entry['aim'], entry['planned_start'],
+                                                     entry['seconds']))
+                for entry in runner.focus_entries()
+            ])
+        elif event == PlanRunner.ENDED:
+            operations = []
+            for entry in plan_deviations(runner.last_entries, self.settings['plan_deviation_tolerance_seconds']):
+                if entry['actual_start'] is None:
+                    body = {'status': 'cancelled'}
+                else:
+                    body = session_times_patch(entry['actual_start'], entry['actual_end'])
+                operations.append(CalendarOperation(CalendarOperation.PATCH, entry['key'], body, event_id=entry['key']))
+            print(f"Session plan {runner.last_plan.name} {runner.end_reason}; "
+                  f"{len(operations)} calendar event(s) to correct")
+            if operations:
+                self.calendar_sync.request_sync()
+                self.calendar_sync.submit_batch(operations)
+
+        snapshot = runner.snapshot()
+        if snapshot is None:
+            self.plan_checkpoint.clear()
+        else:
+            self.plan_checkpoint.save(snapshot)
+        if not self.engine.is_active:
+            self.update_timer_display()
+            self.schedule_timer_wakeup()
+            self.refresh_controls()
+            if self.tray is not None:
+                self.tray.refresh()
+
+    def schedule_plan_recurrence(self):
+        """
+        Arms the timer for the next start of a recurring plan.
+        """
+        upcoming = [plan.next_occurrence(self.plan_check_from) for plan in self.plans.values() if plan.recurring]
+        upcoming = [start for start in upcoming if start is not None]
+        if not upcoming:
+            self.plan_timer.stop()
+            return
+        # Checked again at least every 15 minutes, so a suspend delays a start only a little.
+        delay = min(max(0.0, min(upcoming) - time.time()), 15 * 60)
+        self.plan_timer.start(int(delay * 1000) + 1)
+
+    def on_plan_timer(self):
+        """
+        Starts a recurring plan whose start time has come, unless a session is running.
+        """
+        now = time.time()
+        due = []
+        for plan in self.plans.values():
+            start = plan.next_occurrence(self.plan_check_from)
+            if start is not None and start <= now and now - start <= self.plan_runner.max_gap:
+                due.append((start, plan.name))
+        self.plan_check_from = now
+        if due:
+            name = min(due)[1]
+            if self.begin_plan(name):
+                print("Recurring session plan started:", name)
+            else:
+                print("Recurring session plan skipped, a session is running:", name)
+        self.schedule_plan_recurrence()
+
+    def on_session_event(self, event, engine):
+        """
+        Reacts to session engine transitions with sound, calendar, presence, history and UI updates.
+
+        Args:
+            event (str): The SessionEngine event that occurred.
+            engine (SessionEngine): The engine that changed state.
+        """
+        record = None
+        if event == SessionEngine.STARTED:
+            self.session_clocks = (time.time(), time.monotonic())
+            if self.ui_built:
+                self.aim_input.setText(engine.aim)
+            self.audio.play('start')
+            if self.settings['gallery_rotation'] == 'session':
+                self.load_image()
+            if not self.plan_runner.owns(engine.key):
+                # A plan's events were all created when the plan started.
+                self.create_or_update_calendar_event()
+            self.presence.start()
+            self.start_interval_chime()
+        elif event == SessionEngine.PAUSED:
+            self.presence.stop()
+            self.interval_chime.stop()
+            self.audio.play('pause')
+        elif event == SessionEngine.RESUMED:
+            self.audio.play('resume')
+            self.presence.start()
+            self.start_interval_chime()
+        elif event == SessionEngine.RESTORED:
+            self.session_clocks = (time.time(), time.monotonic())
+            if self.ui_built:
+                self.aim_input.setText(engine.aim)
+            if engine.prompt:
+                self.show_remembrance(engine.prompt)
+            if engine.is_running:
+                self.presence.start()
+                self.start_interval_chime()
+        elif event == SessionEngine.ENDED:
+            record = engine.last_record
+            self.presence.stop()
+            self.interval_chime.stop()
+            if self.restoring:
+                if record.end_reason == SessionRecord.STOPPED:
+                    message = f"\"{record.aim}\" stopped when the app quit unexpectedly. It is in your history until then."
+                else:
+                    message = f"\"{record.aim}\" ended while the app was not running. It is in your history."
+                self.notify("Session Ended", message)
+            else:
+                self.audio.play('end')
+                self.record_session_timing(record)
+            if not self.plan_runner.owns(record.uid):
+                # A plan's events are corrected together when the plan ends.
+                self.update_calendar_event_on_stop(record)
+            self.session_store.record(record)
+            if self.ui_built:
+                self.aim_input.clear()
+            self.display_random_remembrance()
+
+        self.checkpoint_session()
         self.update_timer_display()
+        self.schedule_timer_wakeup()
+        self.refresh_controls()
+        if self.tray is not None:
+            self.tray.refresh()
+
+        if record is not None and record.end_reason == SessionRecord.COMPLETED and not self.restoring:
+            self.send_remembrance_notification()
+
+    def checkpoint_session(self):
+        """
+        Saves the active session's state, or removes the checkpoint once no session is active.
 
-        self.start_button.setEnabled(False)
-        self.pause_button.setEnabled(True)
-        self.stop_button.setEnabled(True)
-        self.aim_input.setEnabled(False)
-        self.timer_combo.setEnabled(False)
+        Called once per transition; the write itself happens on the checkpoint's thread.
+        While the session runs, the checkpoint is also touched every ALIVE_INTERVAL seconds.
+        """
+        snapshot = self.engine.snapshot()
+        if snapshot is None:
+            self.checkpoint.clear()
+        else:
+            self.checkpoint.save(snapshot)
+        if self.engine.is_running:
+            if not self.alive_timer.isActive():
+                self.alive_timer.start()
+        else:
+            self.alive_timer.stop()
+
+    def refresh_controls(self):
+        """
+        Enables the buttons and inputs that apply to the current session state.
+        """
+        if not self.ui_built:
+            return
+        active = self.engine.is_active or self.plan_runner.is_active
+        self.start_button.setEnabled(not active)
+        self.pause_button.setEnabled(self.engine.is_running)
+        self.resume_button.setEnabled(self.engine.is_paused)
+        self.stop_button.setEnabled(active)
+        self.aim_input.setEnabled(not active)
+        self.timer_combo.setEnabled(not active)
+        self.update_free_busy_hint()
+
+    def record_session_timing(self, record):
+        """
+        Records how late a completed session was ended and how far the wall clock drifted.
+
+        Args:
+            record (SessionRecord): The session that just ended.
+        """
+        wall_start, monotonic_start = self.session_clocks
+        self.session_clock_drift.observe((time.time() - wall_start) - (time.monotonic() - monotonic_start))
+        if record.end_reason == SessionRecord.COMPLETED:
+            # end_ts was set back to the deadline, so this is how late the final wakeup came.
+            self.session_end_lateness.observe(max(0.0, time.time() - record.end_ts))
+
+    def start_interval_chime(self):
+        """
+        Starts the interval chime for the running session, if one is configured.
+        """
+        if self.interval_chime.interval() > 0:
+            self.interval_chime.start()
 
     def create_or_update_calendar_event(self, update=False):
         """
-        Creates or updates a Google Calendar event for the current session.
+        Queues the creation or update of a Google Calendar event for the current session.
+
+        The request itself is sent by the calendar sync worker, so this never blocks the UI.
+        The operation is journaled first, so it survives being offline or a failed request.
+        The session key doubles as the event id, which makes a replayed insert idempotent.
 
         Args:
             update (bool): Indicates whether to update an existing event.
         """
-        if not self.calendar_service:
-            return
+        engine = self.engine
+        event = session_event_body(engine.key, engine.aim, engine.start_time, engine.total_seconds)
 
-        start_time = datetime.now(timezone.utc).isoformat()
-        end_time = (datetime.now(timezone.utc) + timedelta(seconds=self.total_seconds)).isoformat()
-
-        event = {
-            'summary': self.aim,
-            'description': self.aim,
-            'start': {
-                'dateTime': start_time,
-                'timeZone': 'Asia/Kolkata',
-            },
-            'end': {
-                'dateTime': end_time,
-                'timeZone': 'Asia/Kolkata',
-            },
-            'reminders': {
-                'useDefault': False,
-                'overrides': [
-                    {'method': 'popup', 'minutes': 5},
-                ],
-            },
-        }
+        if update:
+            operation = CalendarOperation(CalendarOperation.UPDATE, engine.key, event, event_id=engine.key)
+        else:
+            operation = CalendarOperation(CalendarOperation.INSERT, engine.key, event)
+        self.calendar_sync.submit(operation)
 
-        try:
-            if not update:
-                created_event = self.calendar_service.events().insert(calendarId='primary', body=event).execute()
-                self.event_id = created_event.get('id')
-                print("Event created:", created_event.get('htmlLink'))
-            else:
-                if self.event_id:
-                    updated_event = self.calendar_service.events().update(calendarId='primary', eventId=self.event_id, body=event).execute()
-                    print("Event updated:", updated_event.get('htmlLink'))
-        except Exception as e:
-            QMessageBox.critical(self, "Calendar Error", f"Failed to create/update calendar event: {e}")
+    def on_calendar_operation_succeeded(self, operation, response):
+        """
+        Handles a calendar operation completed by the sync worker.
+
+        Args:
+            operation (CalendarOperation): The operation that was sent.
+            response (dict): The event returned by the Calendar API, or the mirrored event
+                if nothing had to be sent.
+        """
+        if operation.skipped == 'unchanged':
+            print("Calendar event already up to date:", operation.session_key)
+        elif operation.skipped == 'deleted':
+            print("Calendar event was deleted in Google Calendar, not recreated:", operation.session_key)
+        elif operation.kind == CalendarOperation.INSERT:
+            print("Event created:", response.get('htmlLink'))
+        elif operation.kind == CalendarOperation.UPDATE:
+            print("Event updated:", response.get('htmlLink'))
+        else:
+            print("Calendar event updated with actual end time:", response.get('htmlLink'))
+
+        self.record_calendar_operation(operation, 'skipped' if operation.skipped else 'ok')
+        if operation.session_key != self.engine.key:
+            self.calendar_sync.forget(operation.session_key)
+
+    def record_calendar_operation(self, operation, outcome):
+        """
+        Counts a finished calendar operation and records its latency.
+
+        Args:
+            operation (CalendarOperation): The operation.
+            outcome (str): 'ok', 'skipped', 'deferred' or 'error'.
+        """
+        self.calendar_operations.inc(kind=operation.kind, outcome=outcome)
+        if operation.latency is not None:
+            self.calendar_operation_seconds.observe(operation.latency, kind=operation.kind)
+
+    def on_calendar_operation_failed(self, operation, error):
+        """
+        Reports a calendar operation that the sync worker could not complete.
+
+        Args:
+            operation (CalendarOperation): The operation that failed.
+            error (Exception): The reason it failed.
+        """
+        self.record_calendar_operation(operation, 'deferred' if operation.deferred else 'error')
+        if isinstance(error, LookupError):
+            # The session's insert failed earlier and has already been reported.
+            return
+        if operation.deferred:
+            print(f"Calendar unreachable, {operation.kind} kept for replay: {error}")
+            return
+        if operation.kind == CalendarOperation.PATCH:
+            self.notify("Calendar Update Error", f"Failed to update calendar event: {error}", ERROR,
+                        key='calendar-error')
+        else:
+            self.notify("Calendar Error", f"Failed to create/update calendar event: {error}", ERROR,
+                        key='calendar-error')
 
     def display_random_remembrance(self):
         """
-        Displays a randomly selected remembrance prompt with bold and italic styling.
+        Displays the next remembrance prompt with bold and italic styling.
         """
-        if self.remembrance_prompts:
-            remembrance = self.get_random_remembrance()
+        remembrance = self.get_random_remembrance()
+        if remembrance:
+            self.show_remembrance(remembrance)
+            if self.settings['gallery_rotation'] == 'prompt':
+                self.load_image()
+
+    def show_remembrance(self, remembrance):
+        """
+        Displays the given remembrance prompt with bold and italic styling.
+        """
+        self.current_prompt = remembrance
+        if self.ui_built:
             formatted_remembrance = f"<span style='font-weight: bold; font-style: italic;'>{remembrance}</span>"
             self.prompt_label.setText(formatted_remembrance)
-        else:
-            self.prompt_label.repaint()
 
     def get_random_remembrance(self):
         """
-        Retrieves a random remembrance prompt.
+        Retrieves the next remembrance prompt from the shuffle bag.
+
+        No prompt repeats until all prompts in the configured pool have been shown.
 
         Returns:
-            str: A randomly selected quote.
+            str: The quote and its author, or None if there are no prompts.
         """
-        return random.choice(self.remembrance_prompts)
+        try:
+            prompt = self.prompts.next_prompt()
+        except (OSError, ValueError) as e:
+            print(f"Prompt library error: {str(e)}")
+            return None
+        return str(prompt) if prompt else None
 
-    def check_presence(self):
-        """
-        Continuously checks for user activity and pauses the session if inactive for too long.
+    def pause_session_for_inactivity(self, idle_seconds):
         """
-        while True:
-            if self.is_running and not self.is_paused:
-                current_time = time.time()
-                time_since_active = current_time - self.last_active_time
+        Pauses the session after the presence monitor reported inactivity and notifies the user.
 
-                if time_since_active > 300:
-                    QTimer.singleShot(0, self.pause_session_from_thread)
-            time.sleep(1)
-
-    def pause_session_from_thread(self):
-        """
-        Safely pauses the session from a separate thread and notifies the user.
+        Args:
+            idle_seconds (float): How long the user has been inactive.
         """
-        if self.is_running and not self.is_paused:
-            self.pause_session()
-            QMessageBox.warning(self, "Session Paused", "You have been inactive for too long. Session paused.")
+        if self.engine.pause(automatic=True):
+            self.notify("Session Paused", "You have been inactive for too long. Session paused.", WARNING)
 
     def record_activity(self):
         """
         Records user activity to reset the inactivity timer.
         """
-        self.last_active_time = time.time()
+        self.presence.record_activity()
 
     def update_timer_display(self):
         """
         Updates the countdown timer display.
+
+        Does nothing while the countdown is not on screen; on_countdown_visibility_changed
+        brings it up to date when it is shown again.
         """
-        minutes = self.remaining_seconds // 60
-        seconds = self.remaining_seconds % 60
-        time_str = f"{int(minutes)}:{int(seconds):02d} remaining"
-        self.timer_display.setText(time_str)
+        if not self.is_countdown_visible():
+            return
+        remaining = self.plan_runner.break_remaining()
+        if remaining is not None and not self.engine.is_active:
+            total = self.plan_runner.current['seconds']
+            progress = 1.0 - remaining / total if total else 0.0
+            self.timer_display.set_remaining(int(math.ceil(remaining)), progress)
+            return
+        total = self.engine.total_seconds
+        progress = self.engine.elapsed() / total if total else 0.0
+        self.timer_display.set_remaining(self.engine.remaining_whole_seconds(), progress)
+
+    def is_countdown_visible(self):
+        """
+        Tells whether the countdown is on screen: the window is shown, not minimised, and
+        not entirely covered, where the platform reports that.
+        """
+        if not self.isVisible() or self.isMinimized():
+            return False
+        handle = self.windowHandle()
+        return handle is None or handle.isExposed()
+
+    def on_countdown_visibility_changed(self):
+        """
+        Brings the countdown up to date and picks the wakeup schedule for the new visibility.
+
+        While the window is hidden, minimised or covered, nothing is painted and the only
+        wakeup left is the one at the session deadline.
+        """
+        self.window_on_screen = self.is_countdown_visible()
+        if not self.engine.tick():
+            self.update_timer_display()
+            self.schedule_timer_wakeup()
+
+    def schedule_timer_wakeup(self):
+        """
+        Arms the single-shot timer for the next moment anything needs to happen.
+
+        While the window is visible that is the next change of the displayed second;
+        while it is hidden or minimised it is only the session deadline. Between the
+        sessions of a plan it is the plan's next step instead.
+        """
+        visible = self.is_countdown_visible()
+        delay = self.engine.next_wakeup(visible)
+        if delay is None and not self.engine.is_active:
+            delay = self.plan_runner.next_wakeup(visible)
+        if delay is None:
+            self.qtimer.stop()
+            self.timer_wakeup_due = None
+            return
+        interval = max(0, int(delay * 1000) + 1)
+        self.timer_wakeup_due = time.monotonic() + interval / 1000
+        self.qtimer.start(interval)
+
+    def on_timer_wakeup(self):
+        """
+        Slot connected to the countdown QTimer; records how late it fired, then updates.
+        """
+        if self.timer_wakeup_due is not None:
+            self.timer_wakeup_lateness.observe(time.monotonic() - self.timer_wakeup_due)
+            self.timer_wakeup_due = None
+        self.update_timer()
 
     def update_timer(self):
         """
-        Slot connected to QTimer to update the countdown every second.
+        Slot connected to QTimer to update the countdown when it wakes up.
         """
-        if self.is_running and not self.is_paused:
+        if self.engine.is_running:
             self._timer_countdown()
+        elif not self.engine.is_active and not self.plan_runner.tick():
+            # Still in a plan's break; the plan's events reschedule everything else.
+            self.update_timer_display()
+            self.schedule_timer_wakeup()
 
     def _timer_countdown(self):
         """
         Handles the countdown logic for the timer.
+
+        Remaining time is recomputed from the deadline on every wakeup, so a late or
+        skipped wakeup only delays the display, never the end of the session. When the
+        deadline has passed, the engine completes the session and on_session_event
+        takes care of the rest.
         """
-        if self.remaining_seconds > 0:
-            self.remaining_seconds -= 1
-            self.elapsed_seconds += 1
+        if not self.engine.tick():
             self.update_timer_display()
-        else:
-            self.qtimer.stop()
-            if self.bell_sound:
-                self.bell_sound.play()
-            self.send_remembrance_notification()
-            self.stop_session()
+            self.schedule_timer_wakeup()
+
+    def showEvent(self, event):
+        """
+        Brings the countdown up to date and returns to per-second wakeups when shown.
+
+        Also starts watching the native window for being covered or uncovered.
+        """
+        super().showEvent(event)
+        handle = self.windowHandle()
+        if handle is not None and not self.watching_exposure:
+            handle.installEventFilter(self)
+            self.watching_exposure = True
+        self.on_countdown_visibility_changed()
+
+    def hideEvent(self, event):
+        """
+        Drops to a single wakeup at the deadline while the window is hidden.
+        """
+        super().hideEvent(event)
+        self.on_countdown_visibility_changed()
+
+    def changeEvent(self, event):
+        """
+        Reschedules wakeups when the window is minimised or restored.
+        """
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.WindowStateChange:
+            self.on_countdown_visibility_changed()
+
+    def eventFilter(self, watched, event):
+        """
+        Reschedules wakeups when the native window is covered or uncovered.
+        """
+        if event.type() == QEvent.Type.Expose and watched is self.windowHandle():
+            exposed = watched.isExposed()
+            if exposed != self.window_exposed:
+                self.window_exposed = exposed
+                self.on_countdown_visibility_changed()
+        return super().eventFilter(watched, event)
 
     def send_remembrance_notification(self):
         """
         Sends a notification with a remembrance prompt when the session ends.
         """
-        if self.remembrance_prompts:
-            remembrance = self.get_random_remembrance()
-            QMessageBox.information(self, "Time's Up", f"Your session has ended.\n\n{remembrance}")
+        remembrance = self.get_random_remembrance()
+        if remembrance:
+            self.notify("Time's Up", f"Your session has ended.\n\n{remembrance}")
         else:
-            QMessageBox.information(self, "Time's Up", "Your session has ended.")
+            self.notify("Time's Up", "Your session has ended.")
 
     def pause_session(self):
         """
         Pauses the current session.
         """
-        if self.is_running and not self.is_paused:
-            self.is_paused = True
-            self.is_running = False
-            self.pause_button.setEnabled(False)
-            self.resume_button.setEnabled(True)
-            self.qtimer.stop()
+        self.engine.pause()
 
     def resume_session(self):
         """
         Resumes a paused session.
         """
-        if not self.is_running and self.is_paused:
-            self.is_running = True
-            self.is_paused = False
-            self.last_active_time = time.time()
-            if self.bell_sound:
-                self.bell_sound.play()
-            self.qtimer.start(1000)
-            self.pause_button.setEnabled(True)
-            self.resume_button.setEnabled(False)
+        self.engine.resume()
 
     def stop_session(self):
         """
-        Ends the current focus session and resets the UI.
+        Ends the current focus session by hand, and the session plan it belongs to.
         """
-        if not self.is_running and not self.is_paused and not self.aim:
-            return
-
-        self.qtimer.stop()
-
-        self.is_running = False
-        self.is_paused = False
-
-        if self.bell_sound:
-            self.bell_sound.play()
+        if self.plan_runner.is_active:
+            self.plan_runner.stop()
+        else:
+            self.engine.stop(SessionRecord.STOPPED)
 
-        self.update_calendar_event_on_stop()
+    def update_calendar_event_on_stop(self, record):
+        """
+        Queues an update of the Google Calendar event's end time to the actual session end.
 
-        self.aim = None
-        self.start_time = None
-        self.last_active_time = None
-        self.total_pause_time = 0
-        self.remaining_seconds = 0
-        self.elapsed_seconds = 0
-        self.event_id = None
+        If the session's insert is still waiting in the sync queue, the two are coalesced
+        into a single insert carrying the actual end time. A delta sync of the calendar
+        mirror runs first, so a patch that would change nothing, or that targets an event
+        deleted in Google Calendar, is not sent.
 
-        self.start_button.setEnabled(True)
-        self.pause_button.setEnabled(False)
-        self.resume_button.setEnabled(False)
-        self.stop_button.setEnabled(False)
-        self.aim_input.setEnabled(True)
-        self.aim_input.clear()
-        self.display_random_remembrance()
-        self.timer_display.setText("0:00 remaining")
-        self.timer_combo.setEnabled(True)
+        Args:
+            record (SessionRecord): The session that just ended.
+        """
+        event = session_end_patch(record.end_ts)
+        self.calendar_sync.request_sync()
+        self.calendar_sync.submit(CalendarOperation(CalendarOperation.PATCH, record.uid, event, event_id=record.uid))
 
-    def update_calendar_event_on_stop(self):
+    def closeEvent(self, event):
         """
-        Updates the Google Calendar event's end time based on the actual session duration.
+        Hides the window to the tray in tray mode; otherwise shuts the app down.
         """
-        if not self.calendar_service or not self.event_id:
+        if self.tray is not None and not self.quitting:
+            event.ignore()
+            self.dismiss_window()
             return
+        self.shutdown()
+        super().closeEvent(event)
 
-        actual_end_time = datetime.now(timezone.utc).isoformat()
-
-        event = {
-            'end': {
-                'dateTime': actual_end_time,
-                'timeZone': 'UTC',
-            },
-        }
-
-        try:
-            updated_event = self.calendar_service.events().patch(
-                calendarId='primary',
-                eventId=self.event_id,
-                body=event
-            ).execute()
-            print("Calendar event updated with actual end time:", updated_event.get('htmlLink'))
-        except Exception as e:
-            QMessageBox.critical(self, "Calendar Update Error", f"Failed to update calendar event: {e}")
-
-    def mousePressEvent(self, event):
+    def quit_app(self):
         """
-        Overrides the mouse press event to record user activity.
+        Quits from the tray menu. An active session is kept in its checkpoint and resumed on the next launch.
         """
-        if self.is_running:
-            self.record_activity()
+        self.quitting = True
+        self.shutdown()
+        if self.tray is not None:
+            self.tray.hide()
+        QApplication.instance().quit()
 
-    def keyPressEvent(self, event):
+    def shutdown(self):
+        """
+        Gives queued calendar writes a moment to finish and closes all stores. Runs only once.
+
+        Anything not sent by then stays in the journal and is replayed on the next launch.
+        """
+        if self.shut_down:
+            return
+        self.shut_down = True
+        if self.control_server is not None:
+            self.control_server.close()
+        self.calendar_sync.shutdown(timeout=2.0)
+        self.stall_heartbeat.stop()
+        if self.watchdog is not None:
+            self.watchdog.close()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.close()
+        if self.credentials is not None:
+            self.credentials.close()
+            if self.profiler.enabled:
+                self.report_calendar_latency()
+        self.calendar_journal.close()
+        self.calendar_mirror.close()
+        self.notifications.close()
+        self.audio.close()
+        self.prompts.close()
+        self.plan_timer.stop()
+        self.alive_timer.stop()
+        self.checkpoint.close()
+        self.plan_checkpoint.close()
+        self.session_store.close()
+
+    def report_calendar_latency(self):
         """
-        Overrides the key press event to record user activity.
+        Prints token refresh, TLS handshake and calendar request latencies to stderr.
         """
-        if self.is_running:
-            self.record_activity()
+        ms = lambda seconds: f"{seconds * 1000:.1f} ms" if seconds is not None else "n/a"
+        credentials = self.credentials.stats()
+        calendar = self.calendar_sync.stats()
+        print(f"Token refreshes: {credentials['refreshes']} (p50 {ms(credentials['p50_refresh_latency'])}, "
+              f"max {ms(credentials['max_refresh_latency'])}), failures: {credentials['refresh_failures']}",
+              file=sys.stderr)
+        print(f"TLS handshakes: {credentials['handshakes']} (p50 {ms(credentials['p50_handshake_latency'])}, "
+              f"max {ms(credentials['max_handshake_latency'])})", file=sys.stderr)
+        print(f"Calendar requests: {calendar['completed']} (p50 {ms(calendar['p50_latency'])}, "
+              f"p95 {ms(calendar['p95_latency'])})", file=sys.stderr)
 
     def refresh_quote(self):
         """
@@ -608,35 +1443,100 @@ class FocusSessionApp(QWidget):
 
     def load_image(self):
         """
-        Loads and displays an image in the UI.
+        Switches to the next gallery image.
+
+        The image is decoded on a worker thread and shown by on_gallery_image when ready.
+        Nothing is decoded while the window is not shown.
         """
-        base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
-        image_path = os.path.join(base_path, 'icons', 'picture.jpg')
+        if not self.ui_built or not self.isVisible():
+            return
+        self.gallery.set_device_pixel_ratio(self.devicePixelRatioF())
+        self.gallery.show_next()
+
+    def on_gallery_image(self, pixmap):
+        """
+        Displays an image delivered by the gallery.
+        """
+        if self.ui_built and self.isVisible():
+            self.image_label.setPixmap(pixmap)
+
+    def on_gallery_unavailable(self, message):
+        """
+        Shows why no image could be displayed.
+        """
+        if self.ui_built:
+            self.image_label.setText(message)
+
+LOCK_PATH = os.path.join(os.path.expanduser('~'), '.mindapp', 'app.lock')
+
+
+def forward_to_running_instance(command, timeout=1.0):
+    """
+    Sends a command to an instance that is already running.
+
+    Returns:
+        bool: True if an instance answered.
+    """
+    try:
+        send_command({'command': command}, timeout)
+    except ControlError:
+        return False
+    return True
 
-        if os.path.exists(image_path):
-            pixmap = QPixmap(image_path)
-            scaled_pixmap = pixmap.scaled(QSize(300, 150), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-            self.image_label.setPixmap(scaled_pixmap)
-        else:
-            self.image_label.setText("Image not found.")
-            self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
 def main():
     """
     The main function to run the FocusSessionApp.
-    """
-    app = QApplication(sys.argv)
 
-    base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
-    app_icon_path = os.path.join(base_path, 'icons', 'selfremembering.ico')
+    Pass --profile-startup to print a per-phase breakdown of the startup time, and --tray
+    to start in the system tray without opening the window. --quit-after-first-paint
+    prints when the window was first painted and quits; startup benchmarks use it.
+    """
+    profile_startup = '--profile-startup' in sys.argv
+    qt_argv = [arg for arg in sys.argv if arg not in ('--profile-startup', '--tray', '--quit-after-first-paint')]
+    profiler = StartupProfiler(enabled=profile_startup, origin=_PROCESS_START)
+    profiler.mark('import modules')
+
+    # A second launch only brings the running instance's window forward.
+    forward_command = 'status' if '--tray' in sys.argv else 'show'
+    if forward_to_running_instance(forward_command):
+        return
+    os.makedirs(os.path.dirname(LOCK_PATH), exist_ok=True)
+    instance_lock = QLockFile(LOCK_PATH)
+    # A lock left by a crashed instance is taken over as soon as its process is gone.
+    instance_lock.setStaleLockTime(0)
+    if not instance_lock.tryLock(0):
+        # The other instance is still starting up; its control channel opens shortly.
+        for _ in range(50):
+            time.sleep(0.1)
+            if forward_to_running_instance(forward_command):
+                return
+        print("Another instance of the Self Remembering App is running but not responding.")
+        sys.exit(1)
+    profiler.mark('single-instance check')
+
+    app = QApplication(qt_argv)
+    profiler.mark('create QApplication')
+
+    app_icon_path = resource_path('icons', 'selfremembering.ico')
     if not os.path.exists(app_icon_path):
         QMessageBox.warning(None, "Icon Missing", f"Application icon not found at {app_icon_path}. Taskbar icon may not display correctly.")
     else:
         app_icon = QIcon(app_icon_path)
         app.setWindowIcon(app_icon)
 
-    window = FocusSessionApp(app_icon_path)
-    window.show()
+    window = FocusSessionApp(app_icon_path, profiler=profiler)
+    window.quit_after_first_paint = '--quit-after-first-paint' in sys.argv
+    window.start_control_server()
+    app.aboutToQuit.connect(window.shutdown)
+    tray_mode = '--tray' in sys.argv or window.settings['tray_mode']
+    if tray_mode and QSystemTrayIcon.isSystemTrayAvailable():
+        app.setQuitOnLastWindowClosed(False)
+        window.enable_tray(window.windowIcon())
+    else:
+        if tray_mode:
+            print("System tray not available, opening the window instead.")
+        window.show_window()
     sys.exit(app.exec())
 
 if __name__ == "__main__":
@@ -1,46 +1,132 @@
 # -*- mode: python ; coding: utf-8 -*-
+# PyInstaller build of the Self Remembering App.
+#     pyinstaller SelfRemembering.spec                              fast-start one-folder build
+#     SELFREMEMBERING_ONEFILE=1 pyinstaller SelfRemembering.spec    one-file build
+# The one-folder build (dist/SelfRemembering/) starts fastest: its libraries are loaded straight
+# from the install folder, which stays in the OS page cache between launches. The one-file build
+# unpacks everything into a new temporary folder on every launch, so only use it where a
+# single file matters more than startup time. Neither is UPX-compressed, since decompressing
+# every library at each launch costs more than the disk it saves.
+# benchmarks/bench_startup.py measures both against the source tree.
+
+import os
+
+import googleapiclient
+
+ONEFILE = os.environ.get('SELFREMEMBERING_ONEFILE') == '1'
 
 block_cipher = None
 
+# Qt modules the app never imports; it only uses QtCore, QtGui, QtWidgets and QtNetwork.
+QT_EXCLUDES = ['PyQt6.' + name for name in (
+    'Qt3DAnimation', 'Qt3DCore', 'Qt3DExtras', 'Qt3DInput', 'Qt3DLogic', 'Qt3DRender', 'QtBluetooth',
+    'QtDBus', 'QtDesigner', 'QtHelp', 'QtMultimedia', 'QtMultimediaWidgets', 'QtNfc', 'QtOpenGL',
+    'QtOpenGLWidgets', 'QtPdf', 'QtPdfWidgets', 'QtPositioning', 'QtPrintSupport', 'QtQml', 'QtQuick',
+    'QtQuick3D', 'QtQuickWidgets', 'QtRemoteObjects', 'QtSensors', 'QtSerialPort', 'QtSpatialAudio',
+    'QtSql', 'QtSvg', 'QtSvgWidgets', 'QtTest', 'QtTextToSpeech', 'QtWebChannel', 'QtWebEngineCore',
+    'QtWebEngineQuick', 'QtWebEngineWidgets', 'QtWebSockets', 'QtXml',
+)]
+
+# pygame is only used for its mixer; these parts (and numpy, which only they pull in) are left out.
+PYGAME_EXCLUDES = ['pygame.' + name for name in (
+    'camera', 'docs', 'examples', 'freetype', 'ftfont', 'midi', 'pypm', 'sndarray', 'surfarray', 'tests',
+)] + ['numpy']
+
+# Qt image format plugins the app needs: the .ico icons and the .jpg picture.
+IMAGE_FORMATS = ('qico', 'qjpeg')
+
+datas = [
+    ('icons/selfremembering.ico', 'icons'),
+    ('icons/picture.jpg', 'icons'),
+    ('quotes.json', '.'),
+    ('sounds/tibetanbowl.mp3', 'sounds'),
+    # The only discovery document the app uses; the others are dropped below.
+    (os.path.join(os.path.dirname(googleapiclient.__file__), 'discovery_cache', 'documents', 'calendar.v3.json'),
+     'discovery'),
+]
+if os.path.exists('client_secret.json'):
+    datas.append(('client_secret.json', '.'))
+
+
+def keep(entry):
+    """
+    Tells whether a collected file is needed at run time.
+    """
+    name = entry[0].replace(os.sep, '/')
+    if 'googleapiclient/discovery_cache/documents/' in name:
+        return False
+    if '/Qt6/translations/' in name or '/Qt6/qml/' in name:
+        return False
+    if '/Qt6/plugins/imageformats/' in name:
+        return any(plugin in os.path.basename(name) for plugin in IMAGE_FORMATS)
+    return True
+
+
 a = Analysis(
     ['SelfRemembering.py'],
     pathex=[],
     binaries=[],
-    datas=[
-        ('icons/selfremembering.ico', 'icons'),
-        ('quotes.json', '.'),
-        ('sounds/tibetanbowl.mp3', 'sounds'),
-        ('icons/picture.jpg', 'icons')
-    ],
+    datas=datas,
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=QT_EXCLUDES + PYGAME_EXCLUDES + ['tkinter'],
     noarchive=False,
     cipher=block_cipher,
 )
+a.binaries = [entry for entry in a.binaries if keep(entry)]
+a.datas = [entry for entry in a.datas if keep(entry)]
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
-    name='SelfRemembering',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+if ONEFILE:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        [],
+        name='SelfRemembering',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='SelfRemembering',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='SelfRemembering',
+    )
@@ -0,0 +1,95 @@
+#@brief: User settings for the Self Remembering App.
+# Settings are read from ~/.mindapp/settings.json, a flat JSON object. Missing keys fall
+# back to the defaults below, so the file only needs to hold what the user changed.
+
+import json
+import os
+
+SETTINGS_PATH = os.path.join(os.path.expanduser('~'), '.mindapp', 'settings.json')
+
+DEFAULT_SETTINGS = {
+    # Seconds without any input before a running session is paused automatically.
+    'inactivity_threshold_seconds': 300,
+    # Also count activity in other applications (X11 only) as presence.
+    'system_idle_detection': True,
+    # Sound file per cue (start, end, pause, resume, interval, and alert for warnings and
+    # errors); null silences a cue.
+    # Only the cues listed here are changed; see audio.DEFAULT_CUES.
+    'audio_cues': {},
+    # Where notifications go: 'toast' (inside the window), 'desktop' (the desktop's notification
+    # service, while the window is not on screen), 'sound' (the alert cue) and 'log'.
+    'notification_sinks': ['toast', 'desktop', 'sound', 'log'],
+    # Notifications delivered in any minute at most; later ones are dropped.
+    'notifications_per_minute': 6,
+    # Seconds in which a repeat of the same notification is dropped.
+    'notification_dedup_seconds': 60,
+    # Minutes between interval chimes while a session runs; 0 turns them off.
+    'interval_chime_minutes': 0,
+    # Megabytes of decoded audio kept in memory.
+    'audio_memory_budget_mb': 16,
+    # An image file or a directory of images to show; empty for the bundled picture.
+    'gallery_path': '',
+    # When to switch to the next image: 'session', 'prompt' or 'never'.
+    'gallery_rotation': 'session',
+    # Megabytes of ready-to-paint images kept in memory.
+    'gallery_memory_budget_mb': 32,
+    # Restrict prompts to these authors, traditions or tags; empty lists allow all.
+    'prompt_authors': [],
+    'prompt_traditions': [],
+    'prompt_tags': [],
+    # Author -> relative weight of their prompts, e.g. {"Rumi": 2}; unlisted authors weigh 1.
+    'prompt_author_weights': {},
+    # Start in the system tray instead of opening the window (same as --tray).
+    'tray_mode': False,
+    # Named sequences of sessions, started from the Duration list, the tray or srctl.
+    # A plan repeats one session ("focus_minutes", "break_minutes", "count", and a
+    # "long_break_minutes" after every fourth session) or lists its "steps", e.g.
+    # [{"aim": "Write", "minutes": 50}, {"break_minutes": 10}, ...]. With "at": "07:30"
+    # (and optionally "days": ["mon", "wed"]) it also starts on its own.
+    'session_plans': {
+        'Pomodoro': {'focus_minutes': 25, 'break_minutes': 5, 'long_break_minutes': 15, 'count': 4},
+    },
+    # Seconds a plan's session may start or end off its planned time before its
+    # calendar event is corrected when the plan ends.
+    'plan_deviation_tolerance_seconds': 60,
+    # Create Google Calendar events for sessions.
+    'google_calendar': True,
+    # Send calendar requests to another API root instead of Google's, without signing in,
+    # e.g. "http://127.0.0.1:8090/" for a local fake_calendar_server.py.
+    'calendar_api_endpoint': '',
+    # What to do when the chosen duration runs into a busy time in Google Calendar: 'ask' to
+    # offer a shorter session, 'clamp' to shorten it, 'warn' to only say so, 'off' not to check.
+    'free_busy': 'ask',
+    # Seconds after which the cached free/busy times are fetched again.
+    'free_busy_refresh_seconds': 300,
+    # Draw a ring around the countdown that fills as the session elapses.
+    'countdown_ring': True,
+    # Export metrics to a local file: 'prometheus', 'jsonl', or '' to turn export off.
+    'metrics_export': '',
+    # The export file; empty for ~/.mindapp/metrics.prom or ~/.mindapp/metrics.jsonl.
+    'metrics_export_path': '',
+    'metrics_export_interval_seconds': 60,
+    # Log GUI-thread stalls longer than this many milliseconds; 0 turns it off. While on, the GUI
+    # thread wakes every half threshold and a watchdog thread every threshold, even when idle.
+    'stall_threshold_ms': 0,
+}
+
+
+def load_settings(path=SETTINGS_PATH):
+    """
+    Loads the user settings merged over the defaults.
+
+    Args:
+        path (str): Location of the settings file.
+
+    Returns:
+        dict: The effective settings.
+    """
+    settings = dict(DEFAULT_SETTINGS)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as settings_file:
+                settings.update(json.load(settings_file))
+        except (OSError, ValueError) as e:
+            print(f"Settings error, using defaults: {str(e)}")
+    return settings
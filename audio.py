@@ -0,0 +1,300 @@
+#@brief: Audio cues for focus sessions.
+# Cues (start, end, pause, resume, interval chime) are played by a dedicated thread that takes
+# commands from a queue, so the UI never waits on the mixer or a decoder. pygame and its mixer
+# are loaded on the first cue that is played. Decoded PCM is cached in ~/.mindapp/cache/audio,
+# keyed by a hash of the source file and the mixer format, so an MP3 is decoded only once.
+# Decoded cues are kept in memory up to a byte budget, least recently used first out.
+
+import collections
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.mindapp', 'cache', 'audio')
+
+# Cue name -> sound file, relative to the application directory. None means silent.
+DEFAULT_CUES = {
+    'start': 'sounds/tibetanbowl.mp3',
+    'end': 'sounds/tibetanbowl.mp3',
+    'pause': None,
+    'resume': 'sounds/tibetanbowl.mp3',
+    'interval': None,
+    'alert': None,
+}
+
+
+class PcmCache:
+    """
+    Decoded audio on disk, one raw PCM file per source file and mixer format.
+
+    Source hashes are remembered by size and modification time in index.json, so an
+    unchanged file is not read again just to find its cache entry.
+    """
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        self._index_path = os.path.join(directory, 'index.json')
+        self._index = None
+
+    def source_hash(self, path):
+        """
+        Returns the SHA-1 of a source file's contents.
+        """
+        if self._index is None:
+            try:
+                with open(self._index_path, 'r', encoding='utf-8') as index:
+                    self._index = json.load(index)
+            except (OSError, ValueError):
+                self._index = {}
+
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        known = self._index.get(path)
+        if known and known[:2] == signature:
+            return known[2]
+
+        digest = hashlib.sha1()
+        with open(path, 'rb') as source:
+            for block in iter(lambda: source.read(1 << 16), b''):
+                digest.update(block)
+        self._index[path] = signature + [digest.hexdigest()]
+        self._write(self._index_path, json.dumps(self._index).encode('utf-8'))
+        return digest.hexdigest()
+
+    def entry_path(self, digest, mixer_format):
+        frequency, size, channels = mixer_format
+        return os.path.join(self.directory, f"{digest}-{frequency}-{size}-{channels}.pcm")
+
+    def read(self, entry_path):
+        try:
+            with open(entry_path, 'rb') as entry:
+                return entry.read()
+        except OSError:
+            return None
+
+    def write(self, entry_path, raw):
+        try:
+            self._write(entry_path, raw)
+        except OSError as e:
+            print(f"Audio cache error: {str(e)}")
+
+    def _write(self, path, data):
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as output:
+            output.write(data)
+        os.replace(temporary, path)
+
+
+class AudioEngine:
+    """
+    Plays named cues on a background thread.
+
+    play() only queues a command and returns at once. The playback thread, the pygame
+    import and the mixer are all started on first use. A cue whose file is missing or
+    cannot be decoded is reported once through on_error and then stays silent.
+    """
+
+    def __init__(self, cues=None, base_path=None, cache_dir=CACHE_DIR, memory_budget=16 * 1024 * 1024,
+                 on_error=None, on_load=None, max_commands=32):
+        """
+        Initializes the engine. Nothing is loaded until a cue is played.
+
+        Args:
+            cues (dict): Cue name -> sound file, overriding DEFAULT_CUES.
+            base_path (str): Directory that relative sound paths are resolved against.
+            cache_dir (str): Where decoded PCM is cached.
+            memory_budget (int): Maximum bytes of decoded audio kept in memory.
+            on_error (callable): Called as on_error(title, message) when a cue cannot be played.
+            on_load (callable): Called as on_load(seconds, cached) on the playback thread after
+                a cue has been loaded, from the PCM cache if cached is True.
+            max_commands (int): Commands that may wait in the queue before new ones are dropped.
+        """
+        self.cues = dict(DEFAULT_CUES)
+        self.cues.update(cues or {})
+        self.base_path = base_path or os.path.dirname(os.path.abspath(__file__))
+        self.cache = PcmCache(cache_dir)
+        self.memory_budget = memory_budget
+        self.on_error = on_error
+        self.on_load = on_load
+
+        self._commands = queue.Queue(maxsize=max_commands)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pygame = None
+        self._mixer_format = None
+        self._mixer_failed = False
+        self._sounds = collections.OrderedDict()
+        self._memory = 0
+        self._reported = set()
+
+        self._plays = 0
+        self._dropped = 0
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._evictions = 0
+        self._mixer_init_latency = None
+        self._load_latencies = collections.deque(maxlen=64)
+
+    def play(self, cue):
+        """
+        Queues a cue for playback. Never blocks.
+
+        Returns:
+            bool: False if the cue is silent or the queue is full.
+        """
+        if not self.cues.get(cue):
+            return False
+        return self._submit(('play', cue))
+
+    def preload(self, *cues):
+        """
+        Queues cues to be decoded ahead of their first play.
+        """
+        for cue in cues:
+            if self.cues.get(cue):
+                self._submit(('load', cue))
+
+    def close(self, timeout=1.0):
+        """
+        Stops the playback thread and releases the mixer.
+        """
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._commands.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def stats(self):
+        """
+        Returns playback counters, cache and memory use, and load latencies in seconds.
+        """
+        latencies = sorted(self._load_latencies)
+        return {
+            'plays': self._plays,
+            'dropped': self._dropped,
+            'cache_hits': self._cache_hits,
+            'cache_misses': self._cache_misses,
+            'evictions': self._evictions,
+            'cues_in_memory': len(self._sounds),
+            'memory_bytes': self._memory,
+            'mixer_init_latency': self._mixer_init_latency,
+            'p50_load_latency': latencies[len(latencies) // 2] if latencies else None,
+            'max_load_latency': latencies[-1] if latencies else None,
+        }
+
+    def _submit(self, command):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audio', daemon=True)
+                self._thread.start()
+        try:
+            self._commands.put_nowait(command)
+            return True
+        except queue.Full:
+            self._dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            command = self._commands.get()
+            if command is None:
+                if self._pygame is not None and self._mixer_format is not None:
+                    self._sounds.clear()
+                    self._memory = 0
+                    self._pygame.mixer.quit()
+                return
+            action, cue = command
+            try:
+                sound = self._sound(self.cues.get(cue))
+                if sound is not None and action == 'play':
+                    sound.play()
+                    self._plays += 1
+            except Exception as e:
+                print(f"Audio error ({cue}): {str(e)}")
+
+    def _init_mixer(self):
+        if self._mixer_format is not None or self._mixer_failed:
+            return self._mixer_format is not None
+        begin = time.perf_counter()
+        try:
+            import pygame
+            pygame.mixer.init()
+        except Exception as e:
+            self._mixer_failed = True
+            self._report('mixer', "Sound Error", f"Failed to initialise audio: {e}")
+            return False
+        self._pygame = pygame
+        self._mixer_format = pygame.mixer.get_init()
+        self._mixer_init_latency = time.perf_counter() - begin
+        return True
+
+    def _resolve(self, path):
+        path = os.path.expanduser(path)
+        return path if os.path.isabs(path) else os.path.join(self.base_path, path)
+
+    def _sound(self, path):
+        if not path or not self._init_mixer():
+            return None
+        path = self._resolve(path)
+        sound = self._sounds.get(path)
+        if sound is not None:
+            self._sounds.move_to_end(path)
+            return sound[0]
+        if path in self._reported:
+            return None
+        if not os.path.exists(path):
+            self._report(path, "Sound File Missing", f"Sound file not found at {path}")
+            return None
+
+        begin = time.perf_counter()
+        try:
+            entry = self.cache.entry_path(self.cache.source_hash(path), self._mixer_format)
+            raw = self.cache.read(entry)
+            cached = raw is not None
+            if cached:
+                self._cache_hits += 1
+                sound = self._pygame.mixer.Sound(buffer=raw)
+            else:
+                self._cache_misses += 1
+                sound = self._pygame.mixer.Sound(path)
+                raw = sound.get_raw()
+                self.cache.write(entry, raw)
+        except self._pygame.error as e:
+            self._report(path, "Sound Error", f"Failed to load sound file: {e}")
+            return None
+        latency = time.perf_counter() - begin
+        self._load_latencies.append(latency)
+        if self.on_load:
+            self.on_load(latency, cached)
+
+        self._sounds[path] = (sound, len(raw))
+        self._memory += len(raw)
+        self._evict()
+        return sound
+
+    def _evict(self):
+        # The newest cue always stays, even if it alone exceeds the budget.
+        for path in list(self._sounds)[:-1]:
+            if self._memory <= self.memory_budget:
+                break
+            sound, size = self._sounds[path]
+            if sound.get_num_channels():
+                # Freeing a sound stops it; let it finish first.
+                continue
+            del self._sounds[path]
+            self._memory -= size
+            self._evictions += 1
+
+    def _report(self, key, title, message):
+        self._reported.add(key)
+        print(f"{title}: {message}")
+        if self.on_error:
+            self.on_error(title, message)
@@ -0,0 +1,214 @@
+#@brief: End-to-end throughput and latency of the calendar path under injected faults.
+# Starts fake_calendar_server.py in-process and drives the real calendar stack against it:
+# the Calendar service built by credentials.build_calendar_service() on httplib2, and a
+# CalendarSyncEngine with a journal and a mirror in a throwaway directory. The main thread
+# plays the GUI thread: it submits a session's insert and, a few sessions later, its end
+# patch at a fixed rate, timing every submit() and how late each of its ticks runs while the
+# worker is busy. Operations deferred by failures are replayed as the app would, by
+# re-attaching the service, until the journal is empty. Each scenario reports end-to-end
+# latency (submit to response), GUI-thread blocking, and throughput:
+#     python benchmarks/bench_calendar.py --sessions 200 --rate 50
+#     python benchmarks/bench_calendar.py --scenario rate-limited --scenario outages --json
+# Needs the app's requirements (googleapiclient, httplib2), but no network or Google account.
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from calendar_journal import CalendarJournal
+from calendar_mirror import CalendarMirror
+from calendar_sync import CalendarOperation, CalendarSyncEngine, session_end_patch, session_event_body
+from fake_calendar_server import FakeCalendarServer, FaultProfile
+
+SCENARIOS = {
+    'clean': {},
+    'typical': {'latency': 'lognormal:120:0.5'},
+    'rate-limited': {'latency': 'lognormal:120:0.5', 'error_429': 0.1},
+    'flaky': {'latency': 'lognormal:120:0.5', 'error_5xx': 0.05, 'drop': 0.02, 'drop_after': 0.02},
+    'outages': {'latency': 'lognormal:120:0.5', 'burst_period': 3.0, 'burst_length': 1.0},
+}
+
+# Sessions between a session's insert and its end patch, so most patches find their event.
+PATCH_LAG = 5
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def wait_idle(engine, server, timeout, quiet=0.2):
+    """
+    Waits until nothing is queued and the server has answered everything for `quiet` seconds.
+
+    Returns:
+        bool: False if the engine was still busy after timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    idle_since = None
+    while time.monotonic() < deadline:
+        if engine.depth() == 0 and server.in_flight == 0:
+            idle_since = idle_since or time.monotonic()
+            if time.monotonic() - idle_since >= quiet:
+                return True
+        else:
+            idle_since = None
+        time.sleep(0.01)
+    return False
+
+
+def run_scenario(name, faults, sessions, rate, max_replays, timeout):
+    import httplib2
+    from credentials import build_calendar_service
+
+    server = FakeCalendarServer(faults=FaultProfile(seed=1, **faults)).start()
+    results = []
+    errors = []
+    lock = threading.Lock()
+
+    def on_result(operation, response):
+        with lock:
+            results.append(operation.latency)
+
+    def on_error(operation, error):
+        with lock:
+            errors.append(operation)
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = CalendarJournal(os.path.join(directory, 'journal.jsonl'))
+        mirror = CalendarMirror(os.path.join(directory, 'mirror.db'))
+        service = build_calendar_service(httplib2.Http(timeout=10), root_url=server.url)
+        engine = CalendarSyncEngine(service, on_result=on_result, on_error=on_error, journal=journal, mirror=mirror)
+        wait_idle(engine, server, timeout)
+
+        # Operations are created when submitted: their latency is measured from creation.
+        schedule = []
+        for index in range(sessions + PATCH_LAG):
+            if index < sessions:
+                schedule.append((CalendarOperation.INSERT, index))
+            if index >= PATCH_LAG:
+                schedule.append((CalendarOperation.PATCH, index - PATCH_LAG))
+
+        # The "GUI thread": one submit per tick, timing the submit and the tick's lateness.
+        interval = 1.0 / rate if rate else 0.0
+        submit_times = []
+        tick_lateness = []
+        begin = time.perf_counter()
+        next_tick = begin
+        for kind, index in schedule:
+            now = time.perf_counter()
+            if now < next_tick:
+                time.sleep(next_tick - now)
+                now = time.perf_counter()
+            tick_lateness.append(max(0.0, now - next_tick))
+            next_tick = max(next_tick + interval, now) if interval else now
+            key = f"bench{index:06d}"
+            if kind == CalendarOperation.INSERT:
+                body = session_event_body(key, f"Benchmark session {index}", time.time(), 25 * 60)
+                engine.submit(CalendarOperation(kind, key, body))
+            else:
+                engine.submit(CalendarOperation(kind, key, session_end_patch(time.time()), event_id=key))
+            submit_times.append(time.perf_counter() - now)
+        submitted = time.perf_counter() - begin
+
+        drained = wait_idle(engine, server, timeout)
+        live_done = time.perf_counter() - begin
+        replays = 0
+        while drained and journal.pending() and replays < max_replays:
+            replays += 1
+            engine.set_service(service)
+            drained = wait_idle(engine, server, timeout)
+        elapsed = time.perf_counter() - begin
+
+        pending = len(journal.pending())
+        stats = engine.stats()
+        engine.shutdown()
+        journal.close()
+        mirror.close()
+    server_stats = server.stats()
+    server.close()
+
+    return {
+        'scenario': name,
+        'faults': server_stats['faults'],
+        'operations': len(schedule),
+        'succeeded': len(results),
+        'failed_attempts': len(errors),
+        'deferred_attempts': sum(1 for operation in errors if operation.deferred),
+        'coalesced': stats['coalesced'],
+        'rejected': stats['rejected'],
+        'replays': replays,
+        'still_pending': pending,
+        'events_on_server': server_stats['events'],
+        'server_requests': server_stats['requests'],
+        'p50_latency': percentile(results, 0.5),
+        'p99_latency': percentile(results, 0.99),
+        'submit_p50': percentile(submit_times, 0.5),
+        'submit_p99': percentile(submit_times, 0.99),
+        'submit_max': max(submit_times, default=None),
+        'submit_total': sum(submit_times),
+        'tick_lateness_p99': percentile(tick_lateness, 0.99),
+        'submit_seconds': submitted,
+        'live_seconds': live_done,
+        'total_seconds': elapsed,
+        'ops_per_second': len(schedule) / elapsed if elapsed else None,
+        'drained': drained and not pending,
+    }
+
+
+def report(result):
+    ms = lambda seconds: f"{seconds * 1000:.2f} ms" if seconds is not None else "n/a"
+    print(f"== {result['scenario']}: {result['faults']}")
+    print(f"   {result['operations']} operations, {result['succeeded']} succeeded, "
+          f"{result['failed_attempts']} failed attempts ({result['deferred_attempts']} deferred), "
+          f"{result['coalesced']} coalesced, {result['rejected']} rejected by the full queue, "
+          f"{result['replays']} replays, {result['still_pending']} still pending")
+    print(f"   latency p50 {ms(result['p50_latency'])}, p99 {ms(result['p99_latency'])}")
+    print(f"   GUI thread: submit p50 {ms(result['submit_p50'])}, p99 {ms(result['submit_p99'])}, "
+          f"max {ms(result['submit_max'])}, total {ms(result['submit_total'])}; "
+          f"tick lateness p99 {ms(result['tick_lateness_p99'])}")
+    print(f"   {result['ops_per_second']:.1f} ops/s ({result['total_seconds']:.2f} s to drain, "
+          f"{result['live_seconds']:.2f} s before replays)")
+    if not result['drained']:
+        print("   WARNING: the journal was not drained.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the calendar path against a fake Calendar server.")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="scenario to run, repeatable (default: all)")
+    parser.add_argument('--sessions', type=int, default=200, help="sessions per scenario (two operations each)")
+    parser.add_argument('--rate', type=float, default=50.0, help="operations submitted per second; 0 for no pacing")
+    parser.add_argument('--max-replays', type=int, default=20, help="replay rounds before giving up")
+    parser.add_argument('--timeout', type=float, default=120.0, help="seconds to wait for the engine to drain")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        import googleapiclient  # noqa: F401
+        import httplib2  # noqa: F401
+    except ImportError as e:
+        print(f"This benchmark needs the app's requirements: {e}", file=sys.stderr)
+        return 1
+
+    results = [run_scenario(name, SCENARIOS[name], args.sessions, args.rate, args.max_replays, args.timeout)
+               for name in args.scenario or SCENARIOS]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            report(result)
+    return 0 if all(result['drained'] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
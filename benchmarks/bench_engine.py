@@ -0,0 +1,206 @@
+#@brief: Simulation benchmark for the Qt-free session engine.
+# Drives thousands of simulated focus sessions through SessionEngine against a fake clock:
+# random durations, manual pauses, inactivity auto-pauses, early stops and a calendar
+# backend that fails a configurable share of requests. Reports the cost of every
+# transition and overall throughput, and can fail when a per-transition budget is exceeded:
+#     python benchmarks/bench_engine.py --sessions 5000 --budget-us 200
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calendar_sync import CalendarOperation, CalendarSyncEngine, session_end_patch, session_event_body
+from session_engine import DURATION_CHOICES, SessionEngine
+from session_store import SessionRecord
+
+
+class FakeClock:
+    """
+    A manually advanced clock providing both monotonic and wall time.
+    """
+
+    def __init__(self, start=1_700_000_000.0):
+        self.now = start
+
+    def monotonic(self):
+        return self.now
+
+    def wall(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FlakyCalendarService:
+    """
+    An in-process stand-in for the Calendar service that fails a share of requests.
+    """
+
+    def __init__(self, failure_rate, seed):
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.sent = 0
+        self.failed = 0
+
+    def events(self):
+        return self
+
+    def _request(self, body):
+        service = self
+
+        class Request:
+            def execute(self):
+                service.sent += 1
+                if service.random.random() < service.failure_rate:
+                    service.failed += 1
+                    raise ConnectionError("injected calendar failure")
+                return {'id': body.get('id', 'patched')}
+
+        return Request()
+
+    def insert(self, calendarId, body):
+        return self._request(body)
+
+    def update(self, calendarId, eventId, body):
+        return self._request(body)
+
+    def patch(self, calendarId, eventId, body):
+        return self._request(body)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def simulate(sessions, pause_rate, inactivity_rate, stop_rate, failure_rate, seed):
+    """
+    Runs the simulation and returns the collected timings.
+    """
+    rng = random.Random(seed)
+    clock = FakeClock()
+    counter = iter(range(10 ** 12))
+    engine = SessionEngine(clock=clock.monotonic, wall_clock=clock.wall,
+                           key_factory=lambda: f"{next(counter):032x}")
+
+    service = FlakyCalendarService(failure_rate, seed)
+    calendar = CalendarSyncEngine(service, max_queue=sessions * 2 + 16)
+
+    def on_event(event, engine):
+        if event == SessionEngine.STARTED:
+            body = session_event_body(engine.key, engine.aim, engine.start_time, engine.total_seconds)
+            calendar.submit(CalendarOperation(CalendarOperation.INSERT, engine.key, body))
+        elif event == SessionEngine.ENDED:
+            record = engine.last_record
+            calendar.submit(CalendarOperation(CalendarOperation.PATCH, record.uid,
+                                              session_end_patch(record.end_ts), event_id=record.uid))
+
+    engine.add_listener(on_event)
+
+    timings = {'start': [], 'pause': [], 'resume': [], 'tick': [], 'stop': []}
+    outcomes = {'completed': 0, 'stopped': 0, 'pauses': 0, 'auto_pauses': 0}
+    durations = list(DURATION_CHOICES.values())
+
+    def timed(name, call, *args):
+        begin = time.perf_counter()
+        result = call(*args)
+        timings[name].append(time.perf_counter() - begin)
+        return result
+
+    wall_begin = time.perf_counter()
+    for index in range(sessions):
+        duration = rng.choice(durations)
+        timed('start', engine.start, f"aim {index % 50}", duration)
+        stop_at = rng.uniform(0.1, 0.9) * duration if rng.random() < stop_rate else None
+
+        while engine.is_active:
+            # The UI wakes up once per displayed second; each wakeup is a tick.
+            step = engine.next_wakeup(True) or 1.0
+            clock.advance(step)
+            if timed('tick', engine.tick):
+                break
+
+            if stop_at is not None and engine.elapsed() >= stop_at:
+                timed('stop', engine.stop, SessionRecord.STOPPED)
+                break
+
+            roll = rng.random()
+            if roll < pause_rate / duration:
+                timed('pause', engine.pause)
+                outcomes['pauses'] += 1
+                clock.advance(rng.uniform(5, 120))
+                timed('resume', engine.resume)
+            elif roll < (pause_rate + inactivity_rate) / duration:
+                timed('pause', engine.pause, True)
+                outcomes['auto_pauses'] += 1
+                clock.advance(rng.uniform(300, 900))
+                timed('resume', engine.resume)
+
+        outcomes[engine.last_record.end_reason] += 1
+    wall_total = time.perf_counter() - wall_begin
+
+    calendar.shutdown(timeout=30)
+    return {
+        'sessions': sessions,
+        'wall_seconds': wall_total,
+        'sessions_per_second': sessions / wall_total,
+        'transitions': sum(len(values) for values in timings.values()),
+        'transitions_per_second': sum(len(values) for values in timings.values()) / wall_total,
+        'outcomes': outcomes,
+        'calendar': {'requests': service.sent, 'failed': service.failed,
+                     'coalesced': calendar.stats()['coalesced']},
+        'transition_us': {
+            name: {
+                'count': len(values),
+                'mean': sum(values) / len(values) * 1e6 if values else 0.0,
+                'p50': percentile(values, 0.50) * 1e6,
+                'p99': percentile(values, 0.99) * 1e6,
+            }
+            for name, values in timings.items()
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the session engine against a fake clock.")
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--pause-rate', type=float, default=2.0, help="expected manual pauses per session")
+    parser.add_argument('--inactivity-rate', type=float, default=0.5, help="expected auto-pauses per session")
+    parser.add_argument('--stop-rate', type=float, default=0.3, help="share of sessions stopped early")
+    parser.add_argument('--failure-rate', type=float, default=0.1, help="share of calendar requests that fail")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--budget-us', type=float, default=None,
+                        help="fail if any transition's p50 cost exceeds this many microseconds")
+    parser.add_argument('--json', action='store_true', help="print the raw results as JSON")
+    args = parser.parse_args(argv)
+
+    results = simulate(args.sessions, args.pause_rate, args.inactivity_rate, args.stop_rate,
+                       args.failure_rate, args.seed)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{results['sessions']} sessions, {results['transitions']} transitions in {results['wall_seconds']:.2f} s "
+              f"({results['sessions_per_second']:.0f} sessions/s, {results['transitions_per_second']:.0f} transitions/s)")
+        print(f"outcomes: {results['outcomes']}")
+        print(f"calendar: {results['calendar']}")
+        print(f"{'transition':<10} {'count':>9} {'mean us':>9} {'p50 us':>9} {'p99 us':>9}")
+        for name, row in results['transition_us'].items():
+            print(f"{name:<10} {row['count']:>9} {row['mean']:>9.2f} {row['p50']:>9.2f} {row['p99']:>9.2f}")
+
+    if args.budget_us is not None:
+        over = [name for name, row in results['transition_us'].items() if row['p50'] > args.budget_us]
+        if over:
+            print(f"Over budget ({args.budget_us} us p50): {', '.join(over)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
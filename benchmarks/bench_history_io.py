@@ -0,0 +1,142 @@
+#@brief: Throughput and memory of the streaming history export and import.
+# Writes a CSV of --sessions synthetic sessions, imports it into an empty history, exports that
+# history to ICS and CSV, imports the ICS into another history, and imports it again, when every
+# session is a duplicate. Each step reports its time, sessions per second and how much the peak
+# resident memory grew, which stays flat when everything streams. With --calendar the first
+# import also adds every session to a local fake_calendar_server.py in batched requests (that
+# step's memory includes loading the Google API client):
+#     python benchmarks/bench_history_io.py --sessions 100000
+#     python benchmarks/bench_history_io.py --sessions 20000 --calendar
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from history_io import import_sessions, read_sessions, wait_for_calendar, write_sessions
+from session_store import SessionRecord, SessionStore
+
+
+def synthetic_sessions(count, seed=1):
+    """
+    Yields count sessions, several a day going back from today, with pauses and prompts.
+    """
+    rng = random.Random(seed)
+    start = (datetime.now() - timedelta(hours=count * 3)).timestamp()
+    for index in range(count):
+        start += rng.uniform(1800, 5 * 3600)
+        planned = rng.choice((900, 1500, 3000))
+        pauses = [(start + 300, start + 420, rng.random() < 0.5)] if rng.random() < 0.3 else []
+        completed = rng.random() < 0.7
+        actual = planned if completed else planned * rng.random()
+        yield SessionRecord(f"{index:032x}", f"Aim {rng.randrange(50)}", start, start + actual + 120, planned,
+                            actual, pauses, SessionRecord.COMPLETED if completed else SessionRecord.STOPPED,
+                            "Remember yourself, here, now", None)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def step(name, count, function):
+    before = peak_rss_mb()
+    began = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function()
+    seconds = time.perf_counter() - began
+    return result, {'step': name, 'sessions': count, 'seconds': seconds, 'per_second': count / seconds,
+                    'peak_rss_growth_mb': peak_rss_mb() - before}
+
+
+def run(sessions, calendar):
+    steps = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = lambda name: os.path.join(directory, name)
+
+        def write(name, fmt, records):
+            with open(path(name), 'w', encoding='utf-8', newline='') as stream:
+                return write_sessions(records, stream, fmt)
+
+        def load(name, fmt, store, engine=None):
+            with open(path(name), encoding='utf-8', newline='') as stream:
+                counts = import_sessions(read_sessions(stream, fmt), store, engine)
+            if engine is not None:
+                wait_for_calendar(engine, 0)
+            return counts
+
+        _, result = step('write synthetic csv', sessions, lambda: write('input.csv', 'csv', synthetic_sessions(sessions)))
+        steps.append(result)
+
+        server = engine = None
+        if calendar:
+            import httplib2
+            from calendar_sync import CalendarSyncEngine
+            from credentials import build_calendar_service
+            from fake_calendar_server import FakeCalendarServer
+            server = FakeCalendarServer().start()
+            service = build_calendar_service(httplib2.Http(timeout=30), root_url=server.url)
+            engine = CalendarSyncEngine(service, on_result=lambda operation, response: engine.forget(operation.session_key))
+
+        first = SessionStore(path('first.db'))
+        counts, result = step('import csv' + (' + calendar' if calendar else ''), sessions,
+                              lambda: load('input.csv', 'csv', first, engine))
+        result['imported'] = counts['imported']
+        if server is not None:
+            engine.shutdown()
+            stats = server.stats()
+            result['calendar_events'] = stats['events']
+            # The fake server counts every part of a batch as well as the batch itself.
+            result['calendar_batches'] = stats['requests'].get('batch', 0)
+            server.close()
+        steps.append(result)
+
+        for fmt in ('ics', 'csv'):
+            _, result = step(f'export {fmt}', sessions, lambda: write(f'export.{fmt}', fmt, first.iter_sessions()))
+            result['file_mb'] = os.path.getsize(path(f'export.{fmt}')) / (1024 * 1024)
+            steps.append(result)
+        first.close()
+
+        second = SessionStore(path('second.db'))
+        for name in ('import ics', 'import ics again'):
+            counts, result = step(name, sessions, lambda: load('export.ics', 'ics', second))
+            result['imported'] = counts['imported']
+            result['duplicates'] = counts['duplicates']
+            steps.append(result)
+        second.close()
+    return steps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the history export and import.")
+    parser.add_argument('--sessions', type=int, default=100000, help="synthetic sessions")
+    parser.add_argument('--calendar', action='store_true', help="push the first import to a local fake calendar")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    steps = run(args.sessions, args.calendar)
+    if args.json:
+        print(json.dumps(steps, indent=2))
+        return 0
+    for result in steps:
+        extra = ', '.join(f"{key} {value:.1f}" if isinstance(value, float) else f"{key} {value}"
+                          for key, value in result.items()
+                          if key not in ('step', 'sessions', 'seconds', 'per_second', 'peak_rss_growth_mb'))
+        print(f"{result['step']:<26} {result['seconds']:7.2f} s {result['per_second']:9.0f}/s "
+              f"peak RSS +{result['peak_rss_growth_mb']:5.1f} MB  {extra}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
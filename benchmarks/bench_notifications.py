@@ -0,0 +1,99 @@
+#@brief: Cost of notifications to the thread that raises them, with a slow desktop notifier.
+# Drives a NotificationDispatcher with the app's sinks (log output discarded) and a desktop
+# sink whose D-Bus calls go to a LocalNotificationService that takes --latency ms per call.
+# The main thread plays the GUI thread: it raises bursts of notifications, some repeating,
+# while a 100 ms "countdown" tick runs, and reports how long each notify() blocked it, how late
+# its ticks ran, and how many notifications were delivered, deduplicated or rate limited:
+#     python benchmarks/bench_notifications.py --bursts 20 --burst-size 10 --latency 200
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from notifications import ERROR, DesktopSink, LocalNotificationService, LogSink, NotificationDispatcher
+
+TICK = 0.1
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(bursts, burst_size, latency, max_per_minute, dedup_seconds):
+    service = LocalNotificationService(latency=latency / 1000)
+    dispatcher = NotificationDispatcher(
+        [LogSink(), DesktopSink(transport=service)],
+        dedup_seconds=dedup_seconds, max_per_minute=max_per_minute)
+
+    notify_times = []
+    tick_lateness = []
+    next_tick = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for burst in range(bursts):
+            now = time.perf_counter()
+            if now < next_tick:
+                time.sleep(next_tick - now)
+                now = time.perf_counter()
+            tick_lateness.append(now - next_tick)
+            next_tick += TICK
+            for index in range(burst_size):
+                # Every other notification repeats one already raised, like a failing calendar.
+                key = 'calendar-error' if index % 2 else None
+                began = time.perf_counter()
+                dispatcher.notify(f"Burst {burst}", f"Notification {index}", ERROR, key=key)
+                notify_times.append(time.perf_counter() - began)
+        dispatcher.close(timeout=bursts * burst_size * latency / 1000 + 1)
+
+    stats = dispatcher.stats()
+    return {
+        'raised': bursts * burst_size,
+        'delivered': stats['delivered'],
+        'shown_on_desktop': len(service.notifications),
+        'duplicates': stats['duplicates'],
+        'rate_limited': stats['rate_limited'],
+        'dropped_queue_full': stats['dropped'],
+        'notify_p50': percentile(notify_times, 0.5),
+        'notify_p99': percentile(notify_times, 0.99),
+        'notify_max': max(notify_times, default=None),
+        'tick_lateness_p99': percentile(tick_lateness, 0.99),
+        'delivery_p50': stats['p50_latency'],
+        'delivery_max': stats['max_latency'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the notification dispatcher.")
+    parser.add_argument('--bursts', type=int, default=20, help="bursts raised, one per 100 ms tick")
+    parser.add_argument('--burst-size', type=int, default=10, help="notifications per burst")
+    parser.add_argument('--latency', type=float, default=200.0, help="ms each desktop notification takes")
+    parser.add_argument('--per-minute', type=int, default=6, help="rate limit of the dispatcher")
+    parser.add_argument('--dedup', type=float, default=60.0, help="deduplication window in seconds")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    result = run(args.bursts, args.burst_size, args.latency, args.per_minute, args.dedup)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+    ms = lambda seconds: f"{seconds * 1000:.3f} ms" if seconds is not None else "n/a"
+    print(f"{result['raised']} raised: {result['delivered']} delivered ({result['shown_on_desktop']} desktop calls), "
+          f"{result['duplicates']} duplicates, {result['rate_limited']} rate limited, "
+          f"{result['dropped_queue_full']} dropped by the full queue")
+    print(f"GUI thread: notify p50 {ms(result['notify_p50'])}, p99 {ms(result['notify_p99'])}, "
+          f"max {ms(result['notify_max'])}; tick lateness p99 {ms(result['tick_lateness_p99'])}")
+    print(f"delivery latency p50 {ms(result['delivery_p50'])}, max {ms(result['delivery_max'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+#@brief: Benchmark for the prompt library.
+# Generates a synthetic corpus of many quotes across authors and traditions, then measures
+# compiling the index, reopening it (the cost paid at every startup) and drawing prompts.
+# Also checks that a full round of draws never repeats a quote:
+#     python benchmarks/bench_prompts.py --quotes 50000 --authors 500
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompts import PromptLibrary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the prompt library.")
+    parser.add_argument('--quotes', type=int, default=50000)
+    parser.add_argument('--authors', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        corpus_path = os.path.join(directory, 'quotes.json')
+        with open(corpus_path, 'w', encoding='utf-8') as corpus:
+            json.dump([{'text': f"Remember yourself, moment {index}, in the midst of everything.",
+                        'author': f"Author {index % args.authors}",
+                        'tradition': f"Tradition {index % 12}",
+                        'tags': [f"tag{index % 20}"]} for index in range(args.quotes)], corpus)
+
+        paths = {'index_path': os.path.join(directory, 'prompts.idx'), 'bag_path': os.path.join(directory, 'bag.bin')}
+
+        begin = time.perf_counter()
+        library = PromptLibrary([corpus_path], **paths)
+        library.next_prompt()
+        library.close()
+        compile_time = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        library = PromptLibrary([corpus_path], **paths)
+        library.next_prompt()
+        open_time = time.perf_counter() - begin
+
+        remaining = len(library) - 2
+        seen = set()
+        begin = time.perf_counter()
+        for _ in range(remaining):
+            seen.add(library.next_prompt().text)
+        draw_time = time.perf_counter() - begin
+        library.close()
+
+        begin = time.perf_counter()
+        library = PromptLibrary([corpus_path], author_weights={'Author 1': 3}, traditions=['Tradition 1'], **paths)
+        library.next_prompt()
+        filtered_time = time.perf_counter() - begin
+        filtered = len(library)
+        library.close()
+
+    print(f"{args.quotes} quotes by {args.authors} authors")
+    print(f"  compile index and start bag:  {compile_time * 1000:8.1f} ms (once per corpus change)")
+    print(f"  open at startup, first draw:  {open_time * 1000:8.1f} ms")
+    print(f"  draw:                         {draw_time / remaining * 1e6:8.2f} us per prompt, "
+          f"{'no repeats' if len(seen) == remaining else 'REPEATS'} in {remaining} draws")
+    print(f"  new filtered pool ({filtered} quotes): {filtered_time * 1000:6.1f} ms")
+    return 0 if len(seen) == remaining else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
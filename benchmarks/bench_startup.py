@@ -0,0 +1,155 @@
+#@brief: Cold and warm time to first paint of the app, from source and from frozen builds.
+# Launches the app with --quit-after-first-paint in a throwaway home directory and measures the
+# wall-clock time from spawning the process to the first paint of its window. That includes
+# starting the interpreter and, for a one-file build, unpacking the bundle, which the app's own
+# --profile-startup cannot see. The first launch of each build is the cold one: a fresh home
+# directory (no prompt index, audio or thumbnail caches) and, from source, an empty bytecode
+# cache. The launches after it are warm. With --drop-caches (Linux, root only) the OS page
+# cache is dropped before each cold launch as well. Frozen builds are also weighed, and
+# --budget-ms and --max-bundle-mb fail the run when a warm start or a bundle gets too big:
+#     python benchmarks/bench_startup.py --runs 5
+#     python benchmarks/bench_startup.py --frozen dist/SelfRemembering/SelfRemembering --budget-ms 1500
+# Needs the app's requirements and a display; QT_QPA_PLATFORM=offscreen works without one.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def prepare_home(directory):
+    """
+    Writes settings that keep the app from signing in, exporting metrics or starting in the tray.
+    """
+    mindapp = os.path.join(directory, '.mindapp')
+    os.makedirs(mindapp, exist_ok=True)
+    with open(os.path.join(mindapp, 'settings.json'), 'w', encoding='utf-8') as settings:
+        json.dump({'google_calendar': False, 'metrics_export': '', 'tray_mode': False}, settings)
+
+
+def drop_page_cache():
+    """
+    Drops the OS page cache. Returns False where that is not allowed.
+    """
+    try:
+        subprocess.run(['sync'], check=False)
+        with open('/proc/sys/vm/drop_caches', 'w') as drop_caches:
+            drop_caches.write('3\n')
+        return True
+    except OSError:
+        return False
+
+
+def bundle_size(executable):
+    """
+    Returns the bytes a frozen build occupies: its folder for a one-folder build, else the file.
+    """
+    folder = os.path.dirname(os.path.abspath(executable))
+    if not os.path.isdir(os.path.join(folder, '_internal')):
+        return os.path.getsize(executable)
+    total = 0
+    for directory, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(directory, name)
+            if not os.path.islink(path):
+                total += os.path.getsize(path)
+    return total
+
+
+def launch(command, home, env, timeout):
+    """
+    Runs the app until its first paint.
+
+    Returns:
+        dict: 'first_paint', the seconds from spawn to first paint, and 'before_main', the
+        part of it spent before the app's first line ran.
+    """
+    env = dict(os.environ, HOME=home, USERPROFILE=home, **env)
+    began = time.time()
+    result = subprocess.run(command + ['--quit-after-first-paint'], env=env, capture_output=True, text=True,
+                            timeout=timeout)
+    for line in result.stdout.splitlines():
+        if line.startswith('first paint: '):
+            painted_at, in_process = (float(value) for value in line.split()[2:4])
+            first_paint = painted_at - began
+            return {'first_paint': first_paint, 'before_main': first_paint - in_process}
+    raise RuntimeError(f"{' '.join(command)} never painted (exit {result.returncode}):\n"
+                       f"{result.stdout[-2000:]}{result.stderr[-2000:]}")
+
+
+def measure(name, command, runs, drop_caches, timeout, source):
+    with tempfile.TemporaryDirectory() as home, tempfile.TemporaryDirectory() as pycache:
+        prepare_home(home)
+        # From source, an empty bytecode cache makes the cold launch compile every module.
+        env = {'PYTHONPYCACHEPREFIX': pycache} if source else {}
+        dropped = drop_page_cache() if drop_caches else False
+        cold = launch(command, home, env, timeout)
+        warm = [launch(command, home, env, timeout) for _ in range(runs)]
+    return {
+        'build': name,
+        'cold_ms': cold['first_paint'] * 1000,
+        'cold_before_main_ms': cold['before_main'] * 1000,
+        'warm_median_ms': statistics.median(run['first_paint'] for run in warm) * 1000,
+        'warm_min_ms': min(run['first_paint'] for run in warm) * 1000,
+        'warm_before_main_ms': statistics.median(run['before_main'] for run in warm) * 1000,
+        'page_cache_dropped': dropped,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold and warm time to first paint.")
+    parser.add_argument('--frozen', action='append', default=[], metavar='EXECUTABLE',
+                        help="a frozen build to measure too, repeatable")
+    parser.add_argument('--no-source', action='store_true', help="skip the source tree")
+    parser.add_argument('--runs', type=int, default=5, help="warm launches per build")
+    parser.add_argument('--drop-caches', action='store_true', help="drop the OS page cache before cold launches")
+    parser.add_argument('--timeout', type=float, default=60.0, help="seconds to wait for a launch")
+    parser.add_argument('--budget-ms', type=float, help="fail if a frozen build's warm median exceeds this")
+    parser.add_argument('--max-bundle-mb', type=float, help="fail if a frozen build is larger than this")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    builds = []
+    if not args.no_source:
+        builds.append(('source', [sys.executable, os.path.join(ROOT, 'SelfRemembering.py')], True))
+    for executable in args.frozen:
+        builds.append((executable, [os.path.abspath(executable)], False))
+
+    results = []
+    for name, command, source in builds:
+        result = measure(name, command, args.runs, args.drop_caches, args.timeout, source)
+        result['bundle_mb'] = None if source else bundle_size(command[0]) / (1024 * 1024)
+        results.append(result)
+
+    failures = []
+    for result in results:
+        if result['bundle_mb'] is None:
+            continue
+        if args.budget_ms is not None and result['warm_median_ms'] > args.budget_ms:
+            failures.append(f"{result['build']}: warm start {result['warm_median_ms']:.0f} ms > {args.budget_ms:.0f} ms")
+        if args.max_bundle_mb is not None and result['bundle_mb'] > args.max_bundle_mb:
+            failures.append(f"{result['build']}: {result['bundle_mb']:.1f} MB > {args.max_bundle_mb:.1f} MB")
+
+    if args.json:
+        print(json.dumps({'results': results, 'failures': failures}, indent=2))
+    else:
+        print(f"{'build':<40} {'cold':>9} {'warm':>9} {'warm min':>9} {'pre-main':>9} {'size':>9}")
+        for result in results:
+            size = f"{result['bundle_mb']:.1f} MB" if result['bundle_mb'] is not None else '-'
+            print(f"{result['build'][-40:]:<40} {result['cold_ms']:7.0f}ms {result['warm_median_ms']:7.0f}ms "
+                  f"{result['warm_min_ms']:7.0f}ms {result['warm_before_main_ms']:7.0f}ms {size:>9}")
+        if args.drop_caches and not all(result['page_cache_dropped'] for result in results):
+            print("The page cache could not be dropped (needs root on Linux); cold launches read from it.")
+        for failure in failures:
+            print(f"OVER BUDGET: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#@brief: Cost of the focus statistics on a large synthetic history.
+# Records --years of sessions (--per-day a day, with pauses, stopped sessions and a few dozen
+# aims) into a throwaway SessionStore, then reports the write throughput with the rollups kept
+# up to date, how long the statistics panel's read (focus_stats) takes, how long the same
+# numbers take when aggregated from the raw sessions, and how long a one-time rollup rebuild of
+# an older database takes:
+#     python benchmarks/bench_stats.py --years 10 --per-day 8
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from session_store import SessionRecord, SessionStore
+
+
+def synthetic_sessions(years, per_day, seed=1):
+    """
+    Yields sessions for every day of the last years, skipping about one day in ten.
+    """
+    rng = random.Random(seed)
+    aims = [f"Aim {index}" for index in range(40)]
+    first = date.today() - timedelta(days=int(years * 365))
+    for offset in range(int(years * 365) + 1):
+        if rng.random() < 0.1:
+            continue
+        morning = datetime.combine(first + timedelta(days=offset), datetime.min.time()).timestamp() + 8 * 3600
+        for index in range(per_day):
+            start = morning + index * 3600
+            planned = rng.choice((900, 1500, 3000))
+            pauses = [(start + 300, start + 360, True)] if rng.random() < 0.2 else []
+            completed = rng.random() < 0.7
+            actual = planned if completed else planned * rng.random()
+            yield SessionRecord(f"bench-{offset}-{index}", rng.choice(aims), start, start + actual + 60, planned,
+                                actual, pauses, SessionRecord.COMPLETED if completed else SessionRecord.STOPPED)
+
+
+def timed(function, runs):
+    samples = []
+    for _ in range(runs):
+        began = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - began)
+    return statistics.median(samples)
+
+
+def scan_stats(connection, today):
+    """
+    The panel's numbers aggregated from the sessions table, as they would be without rollups.
+    """
+    last_day = today.toordinal()
+    connection.execute("SELECT day, SUM(actual_seconds), COUNT(*) FROM sessions WHERE day > ? GROUP BY day",
+                       (last_day - 30,)).fetchall()
+    connection.execute("SELECT day - (day - 1) % 7 AS week, SUM(actual_seconds), COUNT(*) FROM sessions "
+                       "WHERE day > ? GROUP BY week", (last_day - 84,)).fetchall()
+    connection.execute("SELECT aim, SUM(actual_seconds) AS total, COUNT(*) FROM sessions GROUP BY aim "
+                       "ORDER BY total DESC LIMIT 5").fetchall()
+    connection.execute("SELECT COUNT(*), SUM(end_reason = 'completed'), SUM(auto_pause_count) FROM sessions").fetchone()
+    connection.execute("SELECT DISTINCT day FROM sessions ORDER BY day").fetchall()
+
+
+def run(years, per_day, runs):
+    with tempfile.TemporaryDirectory() as directory:
+        store = SessionStore(os.path.join(directory, 'sessions.db'))
+        began = time.perf_counter()
+        count = 0
+        for session in synthetic_sessions(years, per_day):
+            store.record(session)
+            count += 1
+        store.flush()
+        write_seconds = time.perf_counter() - began
+
+        today = date.today()
+        stats = store.focus_stats(today)
+        stats_seconds = timed(lambda: store.focus_stats(today), runs)
+        connection = store._connect()
+        scan_seconds = timed(lambda: scan_stats(connection, today), runs)
+        began = time.perf_counter()
+        with connection:
+            store._build_rollups(connection)
+        rebuild_seconds = time.perf_counter() - began
+        connection.close()
+        store.close()
+
+    return {
+        'sessions': count,
+        'writes_per_second': count / write_seconds,
+        'focus_stats_ms': stats_seconds * 1000,
+        'raw_scan_ms': scan_seconds * 1000,
+        'rebuild_ms': rebuild_seconds * 1000,
+        'longest_streak': stats.longest_streak,
+        'completion_rate': stats.completion_rate,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the focus statistics rollups.")
+    parser.add_argument('--years', type=float, default=10.0, help="years of synthetic history")
+    parser.add_argument('--per-day', type=int, default=8, help="sessions per day")
+    parser.add_argument('--runs', type=int, default=20, help="timed reads of each kind")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    result = run(args.years, args.per_day, args.runs)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+    print(f"{result['sessions']} sessions recorded at {result['writes_per_second']:.0f}/s with rollups")
+    print(f"focus_stats: {result['focus_stats_ms']:.3f} ms; the same from the raw sessions: "
+          f"{result['raw_scan_ms']:.1f} ms; one-time rollup rebuild: {result['rebuild_ms']:.0f} ms")
+    print(f"longest streak {result['longest_streak']} days, completion rate {result['completion_rate']:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#@brief: Resident memory and idle wakeups of the app in windowed and in tray mode.
+# Launches SelfRemembering.py twice, once with its window and once with --tray, each with a
+# throwaway home directory whose session checkpoint holds a running one-hour session, so both
+# runs measure the app while a session counts down in the background. After a settling delay
+# the resident set size and the context switches of all threads are read from /proc over a
+# measuring window; their rate is the app's wakeup rate. Needs Linux and a desktop session
+# with a system tray (without one, --tray falls back to the window and this is reported):
+#     python benchmarks/bench_tray.py --settle 5 --measure 30
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from checkpoint import CHECKPOINT_VERSION
+from session_engine import SessionEngine
+
+
+def prepare_home(directory):
+    """
+    Writes settings without calendar or metrics export, and a checkpoint of a running session.
+    """
+    mindapp = os.path.join(directory, '.mindapp')
+    os.makedirs(mindapp)
+    with open(os.path.join(mindapp, 'settings.json'), 'w', encoding='utf-8') as settings:
+        json.dump({'google_calendar': False, 'metrics_export': ''}, settings)
+    engine = SessionEngine()
+    engine.start("Benchmark", 60 * 60)
+    with open(os.path.join(mindapp, 'session_checkpoint.json'), 'w', encoding='utf-8') as checkpoint:
+        json.dump({'version': CHECKPOINT_VERSION, 'session': engine.snapshot()}, checkpoint)
+
+
+def sample(pid):
+    """
+    Returns (resident bytes, context switches over all threads, thread count) of a process.
+    """
+    with open(f'/proc/{pid}/status', 'r') as status:
+        rss = next(int(line.split()[1]) * 1024 for line in status if line.startswith('VmRSS:'))
+    switches = 0
+    tasks = glob.glob(f'/proc/{pid}/task/*/status')
+    for path in tasks:
+        try:
+            with open(path, 'r') as status:
+                for line in status:
+                    if line.startswith(('voluntary_ctxt_switches:', 'nonvoluntary_ctxt_switches:')):
+                        switches += int(line.split()[1])
+        except OSError:
+            # The thread exited while being read.
+            pass
+    return rss, switches, len(tasks)
+
+
+def measure(mode, settle, duration):
+    with tempfile.TemporaryDirectory() as home:
+        prepare_home(home)
+        env = dict(os.environ, HOME=home)
+        command = [sys.executable, os.path.join(ROOT, 'SelfRemembering.py')] + (['--tray'] if mode == 'tray' else [])
+        process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        try:
+            time.sleep(settle)
+            if process.poll() is not None:
+                raise RuntimeError(f"{mode}: the app exited early:\n{process.stdout.read()}")
+            _, before, _ = sample(process.pid)
+            time.sleep(duration)
+            rss, after, threads = sample(process.pid)
+        finally:
+            process.terminate()
+            output, _ = process.communicate(timeout=10)
+        fell_back = 'System tray not available' in output
+        return {'mode': mode, 'rss': rss, 'wakeups_per_second': (after - before) / duration,
+                'threads': threads, 'fell_back': fell_back}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare memory and wakeups of windowed and tray mode.")
+    parser.add_argument('--settle', type=float, default=5.0, help="seconds to wait after launch")
+    parser.add_argument('--measure', type=float, default=30.0, help="seconds to count wakeups over")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists('/proc/self/status'):
+        print("This benchmark reads /proc and needs Linux.")
+        return 1
+
+    results = [measure(mode, args.settle, args.measure) for mode in ('window', 'tray')]
+    print(f"{'mode':<8} {'RSS':>10} {'wakeups/s':>10} {'threads':>8}")
+    for result in results:
+        print(f"{result['mode']:<8} {result['rss'] / (1024 * 1024):>8.1f} MB "
+              f"{result['wakeups_per_second']:>10.2f} {result['threads']:>8}")
+    window, tray = results
+    if tray['fell_back']:
+        print("No system tray was available: the tray run fell back to the window.")
+    else:
+        print(f"Tray mode: {(window['rss'] - tray['rss']) / (1024 * 1024):+.1f} MB less resident memory, "
+              f"{window['wakeups_per_second'] - tray['wakeups_per_second']:+.2f} fewer wakeups per second.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
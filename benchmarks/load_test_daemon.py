@@ -0,0 +1,161 @@
+#@brief: Load test for the multi-session daemon.
+# Starts session_daemon in a subprocess, then drives it over keep-alive HTTP connections:
+# starts N concurrent sessions, pauses and resumes half of them, stops them all, and runs a
+# burst of short sessions that must complete on their own through the shared deadline heap.
+# Reports client latency percentiles per operation next to the daemon's own handling time
+# (from /stats, so without network and connection queueing), throughput and memory per session:
+#     python benchmarks/load_test_daemon.py --sessions 10000 --connections 16
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Client:
+    """
+    One keep-alive HTTP connection to the daemon.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n"
+                          .encode('latin-1') + data)
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split(' ')[1])
+        length = next(int(line.split(':', 1)[1]) for line in lines if line.lower().startswith('content-length'))
+        payload = json.loads(await self.reader.readexactly(length))
+        return status, payload
+
+    def close(self):
+        self.writer.close()
+
+
+def summarize(name, latencies, wall, handling):
+    latencies = sorted(latencies)
+    pick = lambda fraction: latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+    return (f"{name:<8} {len(latencies):>7} req {len(latencies) / wall:>9.0f} req/s   "
+            f"client p50 {pick(0.50):6.3f} ms  p99 {pick(0.99):6.3f} ms  max {latencies[-1] * 1000:7.3f} ms   "
+            f"server p50 {handling['p50_ms']:6.3f} ms  p99 {handling['p99_ms']:6.3f} ms")
+
+
+async def handling(client, route):
+    """
+    Returns the daemon's handling time percentiles for the route's most recent requests.
+    """
+    _, stats = await client.request('GET', '/stats')
+    return stats['handling'][route]
+
+
+async def run_phase(clients, requests):
+    """
+    Spreads (method, path, body) requests over the clients and times each one.
+    """
+    latencies = []
+    errors = []
+
+    async def worker(client, share):
+        for method, path, body in share:
+            begin = time.perf_counter()
+            status, payload = await client.request(method, path, body)
+            latencies.append(time.perf_counter() - begin)
+            if status != 200:
+                errors.append((path, status, payload))
+
+    begin = time.perf_counter()
+    await asyncio.gather(*(worker(client, requests[index::len(clients)]) for index, client in enumerate(clients)))
+    return latencies, errors, time.perf_counter() - begin
+
+
+async def load_test(args, host, port):
+    clients = [Client(host, port) for _ in range(args.connections)]
+    for client in clients:
+        await client.connect()
+
+    _, baseline = await clients[0].request('GET', '/stats')
+    names = [f"user-{index}" for index in range(args.sessions)]
+    report = []
+
+    latencies, errors, wall = await run_phase(clients, [
+        ('POST', f'/sessions/{name}/start', {'aim': f"aim {index % 40}", 'duration': 60})
+        for index, name in enumerate(names)])
+    _, loaded = await clients[0].request('GET', '/stats')
+    report.append(summarize('start', latencies, wall, loaded['handling']['start']))
+
+    half = names[::2]
+    latencies, more_errors, wall = await run_phase(clients, [('POST', f'/sessions/{name}/pause', None) for name in half])
+    errors += more_errors
+    report.append(summarize('pause', latencies, wall, await handling(clients[0], 'pause')))
+    latencies, more_errors, wall = await run_phase(clients, [('POST', f'/sessions/{name}/resume', None) for name in half])
+    errors += more_errors
+    report.append(summarize('resume', latencies, wall, await handling(clients[0], 'resume')))
+    latencies, more_errors, wall = await run_phase(clients, [('GET', f'/sessions/{name}', None) for name in names])
+    errors += more_errors
+    report.append(summarize('status', latencies, wall, await handling(clients[0], 'status')))
+    latencies, more_errors, wall = await run_phase(clients, [('POST', f'/sessions/{name}/stop', None) for name in names])
+    errors += more_errors
+    report.append(summarize('stop', latencies, wall, await handling(clients[0], 'stop')))
+
+    # A burst of short sessions that the deadline heap has to complete by itself.
+    short = [f"short-{index}" for index in range(args.sessions)]
+    latencies, more_errors, wall = await run_phase(clients, [
+        ('POST', f'/sessions/{name}/start', {'duration_seconds': 1 + (index % 10) / 10.0})
+        for index, name in enumerate(short)])
+    errors += more_errors
+    report.append(summarize('start', latencies, wall, await handling(clients[0], 'start')) + "   (short sessions)")
+    await asyncio.sleep(2.5)
+    _, final = await clients[0].request('GET', '/stats')
+
+    for client in clients:
+        client.close()
+
+    print(f"{args.sessions} sessions over {args.connections} keep-alive connections")
+    for line in report:
+        print("  " + line)
+    if baseline['rss_bytes'] and loaded['rss_bytes']:
+        grown = loaded['rss_bytes'] - baseline['rss_bytes']
+        print(f"  memory: {baseline['rss_bytes'] / 2**20:.1f} MiB idle, {loaded['rss_bytes'] / 2**20:.1f} MiB with "
+              f"{loaded['active']} active sessions ({grown / max(1, loaded['active']):.0f} bytes/session), "
+              f"{final['rss_bytes'] / 2**20:.1f} MiB at the end")
+    print(f"  short sessions completed by the timer heap: {final['completed']}/{args.sessions}, "
+          f"still active: {final['active']}, heap entries: {final['heap_entries']}")
+    if errors:
+        print(f"  {len(errors)} failed requests, first: {errors[0]}")
+    return 0 if not errors and final['completed'] == args.sessions else 1
+
+
+async def main_async(args):
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, '-m', 'session_daemon', '--port', '0', '--max-sessions', str(args.sessions * 2),
+        cwd=ROOT, stdout=asyncio.subprocess.PIPE)
+    try:
+        line = (await process.stdout.readline()).decode().strip()
+        host, port = line.rsplit(' ', 1)[1].rsplit(':', 1)
+        return await load_test(args, host, int(port))
+    finally:
+        process.terminate()
+        await process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the multi-session daemon.")
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--connections', type=int, default=16)
+    args = parser.parse_args(argv)
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
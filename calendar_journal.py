@@ -0,0 +1,207 @@
+#@brief: Durable write-ahead journal for calendar operations.
+# Every calendar mutation is appended to ~/.mindapp/calendar_journal.jsonl before it is sent,
+# and marked done once Google Calendar has accepted it. Operations still pending when the
+# app goes offline or exits are replayed on the next successful calendar setup.
+# Appends are flushed immediately but fsynced in groups, so a burst of writes costs one sync.
+# The desktop app, session_cli.py, session_daemon.py and history_io.py may have the journal open
+# at the same time. Each record is appended in a single write, and the file is only compacted by
+# a process that has it to itself, so no process is left appending to a replaced file.
+
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: replacing a file that another process has open fails, and _compact() then keeps it.
+    fcntl = None
+
+DEFAULT_JOURNAL_PATH = os.path.join(os.path.expanduser('~'), '.mindapp', 'calendar_journal.jsonl')
+
+
+class CalendarJournal:
+    """
+    An append-only, line-delimited JSON log of pending calendar operations.
+
+    Two record types are written: 'put' records carry an operation and its idempotency
+    key, 'done' records mark a key as completed. Pending operations are the puts with
+    no matching done record. The file is compacted when it is opened, unless another process
+    has it open: every open journal holds a shared lock on a '.lock' file next to it, and
+    compaction needs the exclusive lock.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, sync_interval=1.0, sync_every=32):
+        """
+        Opens the journal, creating it if needed.
+
+        Args:
+            path (str): Location of the journal file.
+            sync_interval (float): Maximum seconds an appended record may stay unsynced.
+            sync_every (int): Number of unsynced records that forces an immediate fsync.
+        """
+        self.path = path
+        self.sync_interval = sync_interval
+        self.sync_every = sync_every
+
+        self._lock = threading.Condition()
+        self._pending = {}
+        self._sequence = 0
+        self._unsynced = 0
+        self._oldest_unsynced = 0.0
+        self._closed = False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock_file = open(self.path + '.lock', 'a')
+        alone = self._take_lock(exclusive=True, block=False)
+        if not alone:
+            # Waits out a compaction another process may be doing right now.
+            self._take_lock(exclusive=False, block=True)
+        self._load()
+        if alone:
+            self._compact()
+            self._take_lock(exclusive=False, block=True)
+        # Unbuffered, so each record reaches the file in one write.
+        self._file = open(self.path, 'ab', buffering=0)
+
+        self._syncer = threading.Thread(target=self._sync_loop, name='calendar-journal', daemon=True)
+        self._syncer.start()
+
+    def new_key(self, session_key):
+        """
+        Returns a fresh idempotency key for an operation of the given session.
+        """
+        with self._lock:
+            self._sequence += 1
+            return f"{session_key}:{os.getpid()}:{int(time.time() * 1000)}:{self._sequence}"
+
+    def append(self, key, operation):
+        """
+        Records a pending operation.
+
+        Args:
+            key (str): The operation's idempotency key.
+            operation (dict): The serialised operation (kind, session_key, event_id, calendar_id, body).
+        """
+        record = dict(operation, type='put', key=key)
+        with self._lock:
+            self._pending[key] = record
+            self._write(record)
+
+    def mark_done(self, keys):
+        """
+        Marks operations as completed so they are never replayed.
+
+        Args:
+            keys (list): Idempotency keys of the completed operations.
+        """
+        with self._lock:
+            for key in keys:
+                if self._pending.pop(key, None) is not None:
+                    self._write({'type': 'done', 'key': key})
+
+    def pending(self):
+        """
+        Returns the pending operations in the order they were recorded.
+
+        Returns:
+            list: Serialised operations, each including its 'key'.
+        """
+        with self._lock:
+            return [dict(record) for record in self._pending.values()]
+
+    def sync(self):
+        """
+        Forces all appended records to disk.
+        """
+        with self._lock:
+            self._sync_locked()
+
+    def close(self):
+        """
+        Syncs outstanding records and closes the journal.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._sync_locked()
+            self._file.close()
+            # Closing the lock file releases the shared lock.
+            self._lock_file.close()
+            self._lock.notify_all()
+
+    def _write(self, record):
+        if self._closed:
+            return
+        self._file.write((json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8'))
+        self._unsynced += 1
+        if self._unsynced == 1:
+            self._oldest_unsynced = time.monotonic()
+            self._lock.notify()
+        if self._unsynced >= self.sync_every:
+            self._sync_locked()
+
+    def _sync_locked(self):
+        if self._unsynced and not self._file.closed:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def _sync_loop(self):
+        with self._lock:
+            while not self._closed:
+                if not self._unsynced:
+                    self._lock.wait()
+                    continue
+                # Give further appends a chance to share this fsync.
+                delay = self._oldest_unsynced + self.sync_interval - time.monotonic()
+                if delay > 0:
+                    self._lock.wait(delay)
+                    continue
+                self._sync_locked()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn write from a crash; everything before it is intact.
+                    continue
+                if record.get('type') == 'put':
+                    self._pending[record['key']] = record
+                elif record.get('type') == 'done':
+                    self._pending.pop(record.get('key'), None)
+
+    def _take_lock(self, exclusive, block):
+        """
+        Takes or converts this process's lock on the journal.
+
+        Returns:
+            bool: False if the lock is held incompatibly elsewhere and block is False.
+        """
+        if fcntl is None:
+            return True
+        operation = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(self._lock_file.fileno(), operation if block else operation | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def _compact(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as journal:
+            for record in self._pending.values():
+                journal.write(json.dumps(record, separators=(',', ':')) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        try:
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            # Another process still has the journal open; compact on a later start.
+            print(f"Calendar journal compaction error: {str(e)}")
+            os.remove(temp_path)
@@ -0,0 +1,253 @@
+#@brief: Local mirror of the app's own Google Calendar events.
+# Events written by the app are tagged with a private extended property. The mirror keeps
+# the last known state of those events in ~/.mindapp/calendar_mirror.db and is refreshed with
+# incremental events().list(syncToken=...) calls, so each refresh transfers only what changed
+# since the previous one. The sync engine uses it to drop writes that would change nothing,
+# to turn duplicate inserts into patches, and to notice events removed in Google Calendar.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_MIRROR_PATH = os.path.join(os.path.expanduser('~'), '.mindapp', 'calendar_mirror.db')
+
+# Private extended property carrying the session key of every event the app creates.
+SESSION_PROPERTY = 'selfRememberingSession'
+
+# The event fields the mirror keeps, and the only ones requested when listing.
+MIRRORED_FIELDS = ('id', 'status', 'updated', 'summary', 'description', 'start', 'end',
+                   'reminders', 'transparency', 'extendedProperties', 'htmlLink')
+
+# Fields that may be sent back when an event has to be created again.
+WRITABLE_FIELDS = ('id', 'summary', 'description', 'start', 'end', 'reminders', 'transparency',
+                   'extendedProperties')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    event_id TEXT PRIMARY KEY,
+    calendar_id TEXT NOT NULL,
+    session_key TEXT,
+    status TEXT NOT NULL,
+    updated TEXT,
+    body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at REAL
+);
+"""
+
+
+def session_key_of(event):
+    """
+    Returns the session key an event was tagged with, or None for events the app did not create.
+    """
+    private = (event.get('extendedProperties') or {}).get('private') or {}
+    return private.get(SESSION_PROPERTY)
+
+
+def _instant(value):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def same_value(current, wanted):
+    """
+    Tells whether a stored event value already matches a value about to be written.
+
+    Only the keys present in wanted are compared, and event times are compared as
+    instants, since Google returns them in the event's own time zone.
+    """
+    if isinstance(wanted, dict):
+        if not isinstance(current, dict):
+            return False
+        if 'dateTime' in wanted and 'dateTime' in current:
+            if _instant(current['dateTime']) != _instant(wanted['dateTime']):
+                return False
+            return all(same_value(current.get(key), value)
+                       for key, value in wanted.items() if key not in ('dateTime', 'timeZone'))
+        return all(same_value(current.get(key), value) for key, value in wanted.items())
+    if isinstance(wanted, list):
+        return (isinstance(current, list) and len(current) == len(wanted)
+                and all(same_value(a, b) for a, b in zip(current, wanted)))
+    return current == wanted
+
+
+def event_changes(current, changes):
+    """
+    Returns the top-level fields of changes that differ from the stored event.
+
+    Args:
+        current (dict): The mirrored event.
+        changes (dict): A full or partial event body about to be written.
+
+    Returns:
+        dict: The fields that would actually change; empty if the write is a no-op.
+    """
+    return {key: value for key, value in changes.items()
+            if key != 'id' and not same_value(current.get(key), value)}
+
+
+class CalendarMirror:
+    """
+    A SQLite cache of the app's events in one calendar, kept current with sync tokens.
+
+    The mirror is used from the calendar sync worker; a lock makes it safe to query
+    from other threads as well.
+    """
+
+    def __init__(self, path=DEFAULT_MIRROR_PATH, calendar_id='primary', page_size=2500):
+        """
+        Opens (and if needed creates) the mirror.
+
+        Args:
+            path (str): Location of the SQLite database.
+            calendar_id (str): The calendar being mirrored.
+            page_size (int): maxResults for each events().list page.
+        """
+        self.path = path
+        self.calendar_id = calendar_id
+        self.page_size = page_size
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._connection.commit()
+
+    @property
+    def sync_token(self):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT sync_token FROM sync_state WHERE calendar_id = ?", (self.calendar_id,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, event_id):
+        """
+        Returns the mirrored event, or None if it is not known.
+
+        Events deleted in Google Calendar are returned with status 'cancelled'.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT status, body FROM events WHERE event_id = ?", (event_id,)).fetchone()
+        if row is None:
+            return None
+        event = json.loads(row[1])
+        event['status'] = row[0]
+        return event
+
+    def store(self, event, owned=False):
+        """
+        Records the current state of an event, e.g. the response to a successful write.
+
+        Args:
+            event (dict): The event resource returned by the Calendar API.
+            owned (bool): Keep the event even if it carries no session tag.
+        """
+        with self._lock, self._connection:
+            self._store(event, owned)
+
+    def mark_deleted(self, event_id):
+        """
+        Records that an event no longer exists in Google Calendar.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE events SET status = 'cancelled' WHERE event_id = ?", (event_id,))
+
+    def sync(self, service):
+        """
+        Brings the mirror up to date with Google Calendar.
+
+        With a sync token only the changes since the previous sync are fetched. Without
+        one, or when Google has expired it (HTTP 410), the calendar is listed in full and
+        events that are no longer present are marked deleted. Sync tokens cannot be
+        combined with property filters, so the app's events are picked out locally.
+
+        Args:
+            service (googleapiclient.discovery.Resource): The Calendar service.
+
+        Returns:
+            dict: 'full' (bool), 'pages' and 'changes' counts.
+        """
+        token = self.sync_token
+        if token is not None:
+            try:
+                return self._list(service, token)
+            except Exception as e:
+                if getattr(getattr(e, 'resp', None), 'status', None) not in (410, '410'):
+                    raise
+        return self._list(service, None)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _list(self, service, token):
+        fields = 'nextPageToken,nextSyncToken,items(%s)' % ','.join(MIRRORED_FIELDS)
+        seen = set()
+        pages = changes = 0
+        page_token = None
+
+        while True:
+            params = {'calendarId': self.calendar_id, 'showDeleted': True,
+                      'maxResults': self.page_size, 'fields': fields}
+            if token is not None:
+                params['syncToken'] = token
+            if page_token is not None:
+                params['pageToken'] = page_token
+            response = service.events().list(**params).execute()
+            pages += 1
+
+            items = response.get('items', [])
+            with self._lock, self._connection:
+                for event in items:
+                    if self._store(event, owned=False):
+                        changes += 1
+                        seen.add(event['id'])
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+
+        with self._lock, self._connection:
+            if token is None:
+                # A full listing is authoritative: anything it did not return is gone.
+                known = [row[0] for row in self._connection.execute(
+                    "SELECT event_id FROM events WHERE calendar_id = ? AND status != 'cancelled'", (self.calendar_id,))]
+                self._connection.executemany(
+                    "UPDATE events SET status = 'cancelled' WHERE event_id = ?",
+                    [(event_id,) for event_id in known if event_id not in seen])
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sync_state (calendar_id, sync_token, synced_at) VALUES (?, ?, ?)",
+                (self.calendar_id, response.get('nextSyncToken'), time.time()))
+        return {'full': token is None, 'pages': pages, 'changes': changes}
+
+    def _store(self, event, owned):
+        event_id = event.get('id')
+        if not event_id:
+            return False
+        session_key = session_key_of(event)
+        status = event.get('status') or 'confirmed'
+        if status == 'cancelled':
+            # Deleted events come back without their properties; only known ones matter.
+            cursor = self._connection.execute(
+                "UPDATE events SET status = 'cancelled', updated = ? WHERE event_id = ?", (event.get('updated'), event_id))
+            return cursor.rowcount > 0
+        if session_key is None and not owned:
+            known = self._connection.execute("SELECT 1 FROM events WHERE event_id = ?", (event_id,)).fetchone()
+            if known is None:
+                return False
+        body = {key: event[key] for key in MIRRORED_FIELDS if key in event and key != 'status'}
+        self._connection.execute(
+            "INSERT OR REPLACE INTO events (event_id, calendar_id, session_key, status, updated, body) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (event_id, self.calendar_id, session_key, status, event.get('updated'), json.dumps(body)))
+        return True
@@ -0,0 +1,930 @@
+#@brief: Background calendar sync engine for the Self Remembering App.
+# Calendar writes (insert/update/patch) are queued here and executed on a dedicated
+# worker thread, so the Qt event loop never waits on the network.
+# Operations for the same session that are still queued are coalesced into one request,
+# e.g. an insert followed by a stop-patch becomes a single insert with the final end time.
+# The engine is Qt-free; results are reported through callbacks, which the UI turns into signals.
+# With a CalendarJournal attached, every operation is recorded durably before it is sent, and
+# operations that could not be sent are replayed in batched HTTP requests once the service is back.
+# Several operations can also be submitted together and go out in one batched HTTP request.
+# With a CalendarMirror attached, writes are first checked against the mirrored events: no-op
+# writes are dropped, and events that disappeared from Google Calendar are handled quietly.
+# With a FreeBusyCache attached, the worker also keeps the free/busy index fresh, since the
+# Calendar service may only be used from this one thread.
+
+import collections
+import copy
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from calendar_mirror import SESSION_PROPERTY, WRITABLE_FIELDS, event_changes
+
+RETRYABLE_STATUSES = (408, 429, 500, 502, 503, 504)
+REPLAY_BATCH_SIZE = 50
+# Seconds before the journal is replayed after a retryable failure; doubled after every
+# further one up to the maximum, and reset by a success.
+REPLAY_RETRY_MIN = 5.0
+REPLAY_RETRY_MAX = 300.0
+
+
+def http_status(error):
+    """
+    Returns the HTTP status carried by a googleapiclient HttpError, or None.
+    """
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    return int(status) if status is not None else None
+
+
+def is_retryable(error):
+    """
+    Tells whether a failed operation may succeed if it is sent again later.
+
+    Network errors, timeouts, rate limits and server errors are retryable; other HTTP
+    errors (bad request, permission denied, event gone) are not.
+    """
+    status = http_status(error)
+    if status is None:
+        return not isinstance(error, (LookupError, ValueError, TypeError))
+    return status in RETRYABLE_STATUSES
+
+
+def merge_event_body(base, changes):
+    """
+    Merges a partial event body into a full one, the way a calendar patch would.
+
+    Args:
+        base (dict): The event body to merge into. It is not modified.
+        changes (dict): The fields to overwrite. Nested dicts are merged recursively.
+
+    Returns:
+        dict: The merged event body.
+    """
+    merged = copy.deepcopy(base)
+    for key, value in changes.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_event_body(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def session_event_body(session_key, aim, start_ts, duration_seconds):
+    """
+    Builds the calendar event for a session that starts now.
+
+    The event is tagged with the session key, so the mirror can tell the app's events apart,
+    and marked transparent, so it does not count as busy in the free/busy times.
+
+    Args:
+        session_key (str): The session key, used as the client-chosen event id.
+        aim (str): The session's aim, used as summary and description.
+        start_ts (float): Unix time the session started.
+        duration_seconds (int): Planned length of the session.
+
+    Returns:
+        dict: The event body for an insert or update.
+    """
+    start = datetime.fromtimestamp(start_ts, timezone.utc)
+    return {
+        'id': session_key,
+        'summary': aim,
+        'description': aim,
+        'start': {
+            'dateTime': start.isoformat(),
+            'timeZone': 'Asia/Kolkata',
+        },
+        'end': {
+            'dateTime': (start + timedelta(seconds=duration_seconds)).isoformat(),
+            'timeZone': 'Asia/Kolkata',
+        },
+        'reminders': {
+            'useDefault': False,
+            'overrides': [
+                {'method': 'popup', 'minutes': 5},
+            ],
+        },
+        'transparency': 'transparent',
+        'extendedProperties': {
+            'private': {SESSION_PROPERTY: session_key},
+        },
+    }
+
+
+def session_times_patch(start_ts, end_ts):
+    """
+    Builds the patch that moves a session's event to the times the session actually ran.
+
+    Args:
+        start_ts (float): Unix time the session actually started.
+        end_ts (float): Unix time the session actually ended.
+
+    Returns:
+        dict: The partial event body.
+    """
+    return {
+        'start': {
+            'dateTime': datetime.fromtimestamp(start_ts, timezone.utc).isoformat(),
+            'timeZone': 'UTC',
+        },
+        'end': {
+            'dateTime': datetime.fromtimestamp(end_ts, timezone.utc).isoformat(),
+            'timeZone': 'UTC',
+        },
+    }
+
+
+def session_end_patch(end_ts):
+    """
+    Builds the patch that moves a session's event end to its actual end time.
+
+    Args:
+        end_ts (float): Unix time the session actually ended.
+
+    Returns:
+        dict: The partial event body.
+    """
+    return {
+        'end': {
+            'dateTime': datetime.fromtimestamp(end_ts, timezone.utc).isoformat(),
+            'timeZone': 'UTC',
+        },
+    }
+
+
+class CalendarOperation:
+    """
+    A pending calendar mutation belonging to one focus session.
+
+    When an operation completes without a request, skipped says why: 'unchanged' if the
+    event already looked like that, 'deleted' if the event was removed in Google Calendar.
+    Once finished, latency holds the seconds from the first submit until completion.
+    """
+
+    INSERT = 'insert'
+    UPDATE = 'update'
+    PATCH = 'patch'
+
+    def __init__(self, kind, session_key, body, calendar_id='primary', event_id=None):
+        """
+        Initializes the operation.
+
+        Args:
+            kind (str): One of INSERT, UPDATE or PATCH.
+            session_key (str): Local key of the session the event belongs to.
+            body (dict): The event body (full for insert/update, partial for patch).
+            calendar_id (str): The calendar to write to.
+            event_id (str): The target event id, if known when the operation is created.
+        """
+        self.kind = kind
+        self.session_key = session_key
+        self.body = body
+        self.calendar_id = calendar_id
+        self.event_id = event_id
+        self.enqueued_at = time.monotonic()
+        self.coalesced = 0
+        self.journal_keys = []
+        self.deferred = False
+        self.skipped = None
+        self.reinserted = False
+        self.latency = None
+
+    def to_record(self):
+        """
+        Serialises the operation for the journal.
+        """
+        return {
+            'kind': self.kind,
+            'session_key': self.session_key,
+            'event_id': self.event_id,
+            'calendar_id': self.calendar_id,
+            'body': self.body,
+        }
+
+    @classmethod
+    def from_record(cls, record):
+        """
+        Rebuilds an operation from a journal record.
+        """
+        operation = cls(record['kind'], record['session_key'], record['body'],
+                        record.get('calendar_id', 'primary'), record.get('event_id'))
+        operation.journal_keys = [record['key']]
+        return operation
+
+    def absorb(self, other):
+        """
+        Folds a later operation for the same session into this queued one.
+
+        Args:
+            other (CalendarOperation): The newer operation.
+        """
+        if other.kind == self.PATCH:
+            self.body = merge_event_body(self.body, other.body)
+        else:
+            # A full update replaces the body; a queued insert stays an insert.
+            self.body = copy.deepcopy(other.body)
+            if self.kind == self.PATCH:
+                self.kind = other.kind
+        self.event_id = self.event_id or other.event_id
+        self.journal_keys.extend(other.journal_keys)
+        self.coalesced += 1 + other.coalesced
+
+    def absorb_earlier(self, other):
+        """
+        Folds an earlier operation for the same session into this queued one, so that this
+        one becomes what other would be with this one absorbed.
+
+        Args:
+            other (CalendarOperation): The older operation, e.g. one replayed from the journal.
+        """
+        merged = CalendarOperation(other.kind, other.session_key, copy.deepcopy(other.body),
+                                   other.calendar_id, other.event_id)
+        merged.journal_keys = list(other.journal_keys)
+        merged.coalesced = other.coalesced
+        merged.absorb(self)
+        self.kind, self.body, self.event_id = merged.kind, merged.body, merged.event_id
+        self.journal_keys = merged.journal_keys
+        self.coalesced = merged.coalesced
+        self.enqueued_at = min(self.enqueued_at, other.enqueued_at)
+
+    def __repr__(self):
+        return f"CalendarOperation({self.kind!r}, {self.session_key!r})"
+
+
+class CalendarSyncEngine:
+    """
+    Drains a bounded queue of calendar operations on a background thread.
+
+    At most one operation per session is queued at any time; newer operations for a
+    session are merged into the queued one, also when that one waits in a batch. The
+    operation currently being sent is never modified, so a patch that arrives while its
+    insert is in flight waits behind it and is sent once the event id is known.
+
+    When a journal is attached, operations submitted while there is no service are only
+    journaled, and retryable failures stay in the journal. Both are replayed in batches
+    whenever a service is (re)attached, and retryable failures also after a backoff of
+    REPLAY_RETRY_MIN to REPLAY_RETRY_MAX seconds. With replay off, the engine only sends
+    what is submitted to it and leaves the journal to another process.
+
+    When a mirror is attached, it is synced before the replay and whenever request_sync()
+    is called. Writes that would not change the mirrored event are not sent, an insert of
+    an event that already exists becomes a patch, and an update or patch of an event that
+    has gone missing either recreates it (404) or, if the mirror knew it, is dropped
+    (deleted by the user). A write to an event whose insert still waits in the journal
+    stays pending with it.
+
+    When a free/busy cache is attached, it is refreshed whenever it falls due and the queue
+    is empty, and made due once the queue drains after writes that changed the calendar.
+    """
+
+    def __init__(self, service=None, max_queue=64, on_result=None, on_error=None, journal=None, mirror=None,
+                 freebusy=None, replay=True):
+        """
+        Initializes the engine and starts its worker thread.
+
+        Args:
+            service (googleapiclient.discovery.Resource): The Calendar service, or None.
+            max_queue (int): Maximum number of queued operations.
+            on_result (callable): Called as on_result(operation, response) on success.
+            on_error (callable): Called as on_error(operation, exception) on failure.
+            journal (CalendarJournal): Durable log of pending operations, or None.
+            mirror (CalendarMirror): Local mirror of the app's events, or None.
+            freebusy (FreeBusyCache): Free/busy index to keep fresh, or None.
+            replay (bool): Send the operations pending in the journal, including ones
+                journaled by other processes.
+        """
+        self.max_queue = max_queue
+        self.on_result = on_result
+        self.on_error = on_error
+        self.journal = journal
+        self.mirror = mirror
+        self.freebusy = freebusy
+        self.replay = replay and journal is not None
+
+        self._service = service
+        self._replay_requested = service is not None and self.replay
+        self._replay_at = None
+        self._replay_backoff = 0.0
+        self._sync_requested = service is not None and mirror is not None
+        self._queue = collections.deque()
+        self._queued = {}
+        self._event_ids = {}
+        self._in_flight = None
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._completed = 0
+        self._failed = 0
+        self._coalesced = 0
+        self._rejected = 0
+        self._latencies = collections.deque(maxlen=512)
+        self._last_latency = None
+        self._skipped = 0
+        self._syncs = 0
+        self._last_sync = None
+        self._calendar_written = False
+
+        self._thread = threading.Thread(target=self._run, name='calendar-sync', daemon=True)
+        self._thread.start()
+
+    @property
+    def service(self):
+        return self._service
+
+    def set_service(self, service):
+        """
+        Replaces the Calendar service used for subsequent operations.
+
+        Attaching a service also syncs the mirror and, with replay on, sends whatever the
+        journal still holds.
+
+        Args:
+            service (googleapiclient.discovery.Resource): The new service, or None.
+        """
+        with self._cond:
+            self._service = service
+            if service is not None and self.replay:
+                self._replay_requested = True
+                self._replay_at = None
+            if service is not None and self.mirror is not None:
+                self._sync_requested = True
+            self._cond.notify_all()
+
+    def request_sync(self):
+        """
+        Asks the worker to fetch the calendar changes since the last sync before sending
+        anything else. Does nothing without a mirror.
+        """
+        with self._cond:
+            if self.mirror is not None and not self._closed:
+                self._sync_requested = True
+                self._cond.notify()
+
+    def request_freebusy(self):
+        """
+        Asks the worker to refresh the free/busy index once nothing else is waiting.
+        Does nothing without a free/busy cache.
+        """
+        with self._cond:
+            if self.freebusy is not None and not self._closed:
+                self.freebusy.invalidate()
+                self._cond.notify()
+
+    def event_id_for(self, session_key):
+        """
+        Returns the calendar event id created for a session, if known yet.
+        """
+        with self._cond:
+            return self._event_ids.get(session_key)
+
+    def forget(self, session_key):
+        """
+        Drops the remembered event id of a session that has no more pending writes.
+        """
+        with self._cond:
+            if session_key not in self._queued:
+                self._event_ids.pop(session_key, None)
+
+    def submit(self, operation):
+        """
+        Queues an operation, coalescing it with a queued one for the same session.
+
+        This never blocks on the network and is safe to call from the GUI thread.
+
+        Args:
+            operation (CalendarOperation): The operation to queue.
+
+        Returns:
+            bool: False if the queue was full or the engine is closed.
+        """
+        if self.journal is not None:
+            key = self.journal.new_key(operation.session_key)
+            self.journal.append(key, operation.to_record())
+            operation.journal_keys = [key]
+
+        with self._cond:
+            if self._closed:
+                return False
+
+            if self._service is None and self.journal is not None:
+                # Journaled only; sent by the replay once a service is attached.
+                return True
+
+            queued = self._queued.get(operation.session_key)
+            if queued is not None:
+                queued.absorb(operation)
+                self._coalesced += 1
+                return True
+
+            if len(self._queue) >= self.max_queue:
+                self._rejected += 1
+                rejected = True
+            else:
+                self._queue.append(operation)
+                self._queued[operation.session_key] = operation
+                self._cond.notify()
+                rejected = False
+
+        if rejected:
+            operation.deferred = self.journal is not None
+            if self.on_error:
+                self.on_error(operation, RuntimeError("Calendar sync queue is full"))
+        return not rejected
+
+    def submit_batch(self, operations):
+        """
+        Queues operations that are sent together, in batched HTTP requests of up to
+        REPLAY_BATCH_SIZE operations each, instead of one request per operation.
+
+        Operations for a session that already has one queued are coalesced into it, like
+        in submit(). The batch takes one slot of the queue. This never blocks on the network.
+
+        Args:
+            operations (list): The CalendarOperation objects to send.
+
+        Returns:
+            bool: False if the queue was full or the engine is closed.
+        """
+        if self.journal is not None:
+            for operation in operations:
+                key = self.journal.new_key(operation.session_key)
+                self.journal.append(key, operation.to_record())
+                operation.journal_keys = [key]
+
+        with self._cond:
+            if self._closed:
+                return False
+
+            if self._service is None and self.journal is not None:
+                return True
+
+            if len(self._queue) >= self.max_queue:
+                self._rejected += len(operations)
+                rejected = True
+            else:
+                batch = []
+                for operation in operations:
+                    queued = self._queued.get(operation.session_key)
+                    if queued is not None:
+                        queued.absorb(operation)
+                        self._coalesced += 1
+                    else:
+                        batch.append(operation)
+                        self._queued[operation.session_key] = operation
+                if batch:
+                    self._queue.append(batch)
+                    self._cond.notify()
+                rejected = False
+
+        if rejected:
+            for operation in operations:
+                operation.deferred = self.journal is not None
+                if self.on_error:
+                    self.on_error(operation, RuntimeError("Calendar sync queue is full"))
+        return not rejected
+
+    def depth(self):
+        """
+        Returns the number of queued operations, including the one in flight.
+
+        A batch counts as one.
+        """
+        with self._cond:
+            return len(self._queue) + (1 if self._in_flight else 0)
+
+    def stats(self):
+        """
+        Returns a snapshot of queue depth, counters and end-to-end latency.
+
+        Latency is measured from the first submit of an operation until its response
+        arrives, so it includes both queueing and network time.
+
+        Returns:
+            dict: The current statistics. Latencies are in seconds.
+        """
+        with self._cond:
+            latencies = sorted(self._latencies)
+            stats = {
+                'depth': len(self._queue) + (1 if self._in_flight else 0),
+                'completed': self._completed,
+                'failed': self._failed,
+                'coalesced': self._coalesced,
+                'rejected': self._rejected,
+                'skipped': self._skipped,
+                'syncs': self._syncs,
+                'last_sync': self._last_sync,
+                'last_latency': self._last_latency,
+            }
+
+        if latencies:
+            stats['p50_latency'] = latencies[len(latencies) // 2]
+            stats['p95_latency'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            stats['max_latency'] = latencies[-1]
+        else:
+            stats['p50_latency'] = stats['p95_latency'] = stats['max_latency'] = None
+        return stats
+
+    def shutdown(self, timeout=2.0):
+        """
+        Stops accepting work and waits up to timeout seconds for the queue to drain.
+
+        Args:
+            timeout (float): Maximum time to wait for pending operations.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        if self.journal is not None:
+            self.journal.sync()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._service is None or not (self._queue or self._replay_due() or self._sync_pending()
+                                                    or self._freebusy_due()):
+                    if self._closed:
+                        return
+                    self._cond.wait(self._wait_timeout() if self._service is not None else None)
+
+                sync = self._sync_pending()
+                refresh = False
+                if sync:
+                    self._sync_requested = False
+                    service = self._service
+                    operation = None
+                elif self._replay_requested:
+                    self._replay_requested = False
+                    service = self._service
+                    operation = None
+                elif not self._queue:
+                    refresh = True
+                    service = self._service
+                    operation = None
+                else:
+                    operation = self._queue.popleft()
+                    for member in operation if isinstance(operation, list) else [operation]:
+                        del self._queued[member.session_key]
+                    self._in_flight = operation
+                    service = self._service
+
+            try:
+                if sync:
+                    self._sync(service)
+                    continue
+                if refresh:
+                    self.freebusy.refresh(service)
+                    continue
+                if operation is None:
+                    self._replay(service)
+                    continue
+                if isinstance(operation, list):
+                    error = self._send_batch(service, operation)
+                    with self._cond:
+                        self._in_flight = None
+                    if error is not None:
+                        print(f"Calendar batch failed: {error}")
+                    continue
+
+                current = self._reconcile(operation)
+                if operation.skipped:
+                    self._finish(operation, response=current)
+                    continue
+                try:
+                    request = self._build_request(service, operation)
+                    response = request.execute()
+                except Exception as e:
+                    self._finish(operation, error=e)
+                else:
+                    self._finish(operation, response=response)
+            except Exception as e:
+                # Keep the worker alive; the journal still holds whatever was not finished.
+                print(f"Calendar sync error: {str(e)}")
+                with self._cond:
+                    if self._in_flight is operation:
+                        self._in_flight = None
+
+    def _sync_pending(self):
+        # A sync requested just before shutdown is not worth delaying the exit for.
+        return self._sync_requested and not self._closed
+
+    def _replay_due(self):
+        """
+        Returns True if a replay should run now, requesting one whose backoff has passed.
+        """
+        if self._replay_at is not None and time.monotonic() >= self._replay_at:
+            self._replay_at = None
+            self._replay_requested = True
+        return self._replay_requested
+
+    def _schedule_replay(self):
+        """
+        Schedules a replay of the journal after the next backoff. Called with the lock held.
+        """
+        if not self.replay or self._replay_at is not None or self._replay_requested or self._closed:
+            return
+        self._replay_backoff = min(REPLAY_RETRY_MAX, self._replay_backoff * 2 or REPLAY_RETRY_MIN)
+        self._replay_at = time.monotonic() + self._replay_backoff
+        self._cond.notify()
+
+    def _wait_timeout(self):
+        """
+        Returns the seconds until the worker has timed work to do, or None to wait for a notify.
+        """
+        delays = [self._freebusy_delay()]
+        if self._replay_at is not None:
+            delays.append(self._replay_at - time.monotonic())
+        delays = [delay for delay in delays if delay is not None]
+        return max(0.0, min(delays)) if delays else None
+
+    def _freebusy_delay(self):
+        """
+        Returns the seconds until the free/busy index is due for a refresh, or None if it never is.
+        """
+        if self.freebusy is None or self._closed:
+            return None
+        if self._calendar_written and not self._queue and self._in_flight is None:
+            self._calendar_written = False
+            self.freebusy.invalidate()
+        return self.freebusy.refresh_delay()
+
+    def _freebusy_due(self):
+        delay = self._freebusy_delay()
+        return delay is not None and delay <= 0
+
+    def _sync(self, service):
+        try:
+            result = self.mirror.sync(service)
+        except Exception as e:
+            print(f"Calendar mirror sync failed: {e}")
+            return
+        with self._cond:
+            self._syncs += 1
+            self._last_sync = result
+
+    def _reconcile(self, operation):
+        """
+        Checks an operation against the mirror before it is sent.
+
+        Sets operation.skipped when there is nothing to send, and narrows the operation to
+        the fields that actually change otherwise.
+
+        Returns:
+            dict: The mirrored event, or None if the mirror does not know it.
+        """
+        if self.mirror is None or operation.reinserted:
+            # A recreated event is known to be missing, whatever the mirror says.
+            return None
+        event_id = operation.event_id or operation.body.get('id') or self.event_id_for(operation.session_key)
+        current = self.mirror.get(event_id) if event_id else None
+        if current is None:
+            return None
+
+        if current['status'] == 'cancelled':
+            # Deleted in Google Calendar by the user; do not bring it back.
+            operation.skipped = 'deleted'
+            return current
+        changes = event_changes(current, operation.body)
+        if not changes:
+            operation.skipped = 'unchanged'
+        elif operation.kind != CalendarOperation.UPDATE:
+            # The event exists already, so an insert would only conflict: patch what differs.
+            operation.kind = CalendarOperation.PATCH
+            operation.body = changes
+            operation.event_id = event_id
+        return current
+
+    def _build_request(self, service, operation):
+        events = service.events()
+        if operation.kind == CalendarOperation.INSERT:
+            return events.insert(calendarId=operation.calendar_id, body=operation.body)
+
+        event_id = operation.event_id or self.event_id_for(operation.session_key)
+        if not event_id:
+            raise LookupError(f"No calendar event exists for session {operation.session_key}")
+        if operation.kind == CalendarOperation.UPDATE:
+            return events.update(calendarId=operation.calendar_id, eventId=event_id, body=operation.body)
+        return events.patch(calendarId=operation.calendar_id, eventId=event_id, body=operation.body)
+
+    def _replay(self, service):
+        """
+        Sends the journal's pending operations in batched HTTP requests.
+
+        Pending operations are coalesced per session first, so an insert and its patch
+        recorded while offline go out as one insert. For a session that already has an
+        operation in the live queue, the journaled ones are folded into that operation
+        instead, so e.g. an insert journaled before the service existed and the session's
+        later stop patch are sent as one insert.
+        """
+        operations = {}
+        with self._cond:
+            live_keys = {key for queued in self._queued.values() for key in queued.journal_keys}
+            for record in self.journal.pending():
+                if record['key'] in live_keys:
+                    continue
+                operation = CalendarOperation.from_record(record)
+                queued = operations.get(operation.session_key)
+                if queued is None:
+                    operations[operation.session_key] = operation
+                else:
+                    queued.absorb(operation)
+
+            for session_key in list(operations):
+                queued = self._queued.get(session_key)
+                if queued is not None:
+                    queued.absorb_earlier(operations.pop(session_key))
+
+        pending = list(operations.values())
+        error = self._send_batch(service, pending, fail_unanswered=False)
+        if error is not None:
+            # The round trip failed; everything left in the journal stays pending.
+            print(f"Calendar replay failed: {error}")
+            with self._cond:
+                self._schedule_replay()
+
+    def _send_batch(self, service, operations, fail_unanswered=True):
+        """
+        Sends operations in batched HTTP requests of up to REPLAY_BATCH_SIZE operations.
+
+        Args:
+            service (googleapiclient.discovery.Resource): The Calendar service.
+            operations (list): The CalendarOperation objects to send.
+            fail_unanswered (bool): When a whole round trip fails, finish the operations it
+                carried with that error; otherwise leave them unfinished (and journaled).
+
+        Returns:
+            Exception: The error that stopped the batches, or None.
+        """
+        for start in range(0, len(operations), REPLAY_BATCH_SIZE):
+            chunk = operations[start:start + REPLAY_BATCH_SIZE]
+            by_request_id = {}
+            for operation in chunk:
+                current = self._reconcile(operation)
+                if operation.skipped:
+                    self._finish(operation, response=current)
+                else:
+                    by_request_id[str(len(by_request_id))] = operation
+            if not by_request_id:
+                continue
+
+            answered = set()
+
+            def callback(request_id, response, exception, by_request_id=by_request_id, answered=answered):
+                answered.add(request_id)
+                operation = by_request_id[request_id]
+                if exception is None:
+                    self._finish(operation, response=response)
+                else:
+                    self._finish(operation, error=exception)
+
+            try:
+                batch = service.new_batch_http_request(callback=callback)
+                for request_id, operation in by_request_id.items():
+                    try:
+                        batch.add(self._build_request(service, operation), request_id=request_id)
+                    except LookupError as e:
+                        answered.add(request_id)
+                        self._finish(operation, error=e)
+                batch.execute()
+            except Exception as e:
+                if fail_unanswered:
+                    for request_id, operation in by_request_id.items():
+                        if request_id not in answered:
+                            self._finish(operation, error=e)
+                    for operation in operations[start + REPLAY_BATCH_SIZE:]:
+                        self._finish(operation, error=e)
+                return e
+        return None
+
+    def _finish(self, operation, response=None, error=None):
+        latency = operation.latency = time.monotonic() - operation.enqueued_at
+
+        status = http_status(error) if error is not None else None
+        keep_pending = False
+        if operation.kind == CalendarOperation.INSERT and status == 409:
+            # The event id is client-chosen, so a conflict means an earlier attempt landed.
+            response, error = {'id': operation.body.get('id')}, None
+        elif operation.kind != CalendarOperation.INSERT and status in (404, 410):
+            if status == 404 and self._reinsert(operation):
+                with self._cond:
+                    if self._in_flight is operation:
+                        self._in_flight = None
+                return
+            if status == 410 or self._mirrored(operation):
+                response, error = self._mark_deleted(operation), None
+            elif self._insert_pending(operation.session_key):
+                # The event was never created: its insert failed and waits in the journal. This
+                # write stays there too, so the next replay sends one insert with the final times.
+                keep_pending = True
+
+        if self.journal is not None:
+            if keep_pending or (error is not None and is_retryable(error)):
+                operation.deferred = True
+            else:
+                self.journal.mark_done(operation.journal_keys)
+
+        with self._cond:
+            if self._in_flight is operation:
+                self._in_flight = None
+            self._latencies.append(latency)
+            self._last_latency = latency
+            if operation.deferred:
+                self._schedule_replay()
+            elif error is None:
+                self._replay_backoff = 0.0
+            if error is None:
+                self._completed += 1
+                if operation.skipped:
+                    self._skipped += 1
+                else:
+                    self._calendar_written = True
+                if response and response.get('id'):
+                    self._event_ids[operation.session_key] = response.get('id')
+            else:
+                self._failed += 1
+
+        if self.mirror is not None and error is None and not operation.skipped and response and response.get('updated'):
+            self.mirror.store(response, owned=True)
+
+        if error is None:
+            if self.on_result:
+                self.on_result(operation, response)
+        elif self.on_error:
+            self.on_error(operation, error)
+
+    def _reinsert(self, operation):
+        """
+        Turns a write to an event that was never created into an insert of the whole event.
+
+        The full body comes from the mirror, or from the operation itself for an update.
+
+        Returns:
+            bool: True if the operation was queued again as an insert.
+        """
+        if operation.reinserted:
+            return False
+        event_id = operation.event_id or self.event_id_for(operation.session_key) or operation.session_key
+        current = self.mirror.get(event_id) if self.mirror is not None else None
+        if current is not None and current['status'] != 'cancelled':
+            base = current
+        elif operation.kind == CalendarOperation.UPDATE:
+            base = {}
+        else:
+            return False
+
+        body = merge_event_body(base, operation.body)
+        operation.kind = CalendarOperation.INSERT
+        operation.body = {key: value for key, value in body.items() if key in WRITABLE_FIELDS}
+        operation.body['id'] = event_id
+        operation.reinserted = True
+        with self._cond:
+            queued = self._queued.pop(operation.session_key, None)
+            if queued is not None:
+                self._unqueue(queued)
+                operation.absorb(queued)
+            self._queue.appendleft(operation)
+            self._queued[operation.session_key] = operation
+            self._cond.notify()
+        return True
+
+    def _unqueue(self, operation):
+        """
+        Removes a queued operation from the queue, on its own or out of its batch.
+        Called with the lock held.
+        """
+        for index, entry in enumerate(self._queue):
+            if entry is operation:
+                del self._queue[index]
+                return
+            if isinstance(entry, list) and any(member is operation for member in entry):
+                entry[:] = [member for member in entry if member is not operation]
+                if not entry:
+                    del self._queue[index]
+                return
+
+    def _mirrored(self, operation):
+        """
+        Tells whether the mirror has seen the operation's event, so a 404 means it was deleted.
+        """
+        event_id = operation.event_id or self.event_id_for(operation.session_key)
+        return self.mirror is not None and bool(event_id) and self.mirror.get(event_id) is not None
+
+    def _insert_pending(self, session_key):
+        """
+        Tells whether the journal still holds an unsent insert of the session's event.
+        """
+        if self.journal is None:
+            return False
+        return any(record['session_key'] == session_key and record['kind'] == CalendarOperation.INSERT
+                   for record in self.journal.pending())
+
+    def _mark_deleted(self, operation):
+        """
+        Completes a write to an event that no longer exists, without sending anything else.
+        """
+        operation.skipped = 'deleted'
+        event_id = operation.event_id or self.event_id_for(operation.session_key)
+        if self.mirror is None or not event_id:
+            return {}
+        self.mirror.mark_deleted(event_id)
+        return self.mirror.get(event_id) or {}
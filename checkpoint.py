@@ -0,0 +1,197 @@
+#@brief: Crash-safe checkpoint of the active focus session.
+# The state of the active session is written to ~/.mindapp/session_checkpoint.json once per
+# transition (start, pause, resume, end), never per tick: a running session's end is fully
+# described by its wall-clock deadline. Writes happen on a background thread, to a temporary
+# file that is synced and then renamed over the checkpoint, so a crash leaves either the old
+# or the new state on disk. Only the newest pending state is written; older ones are dropped.
+# While a session runs, the owner touches the file now and then, and a clean exit marks it
+# closed, so a launch after a crash can tell when the app was last alive.
+
+import json
+import os
+import threading
+import time
+
+CHECKPOINT_PATH = os.path.join(os.path.expanduser('~'), '.mindapp', 'session_checkpoint.json')
+
+# The running session plan's progress is kept the same way, in its own file.
+PLAN_CHECKPOINT_PATH = os.path.join(os.path.expanduser('~'), '.mindapp', 'plan_checkpoint.json')
+
+CHECKPOINT_VERSION = 1
+
+# Seconds between two touches of a running session's checkpoint: at most this much time
+# after a crash is counted as focus time.
+ALIVE_INTERVAL = 60
+
+
+class SessionCheckpoint:
+    """
+    Persists SessionEngine.snapshot() values and reads the last one back on launch.
+
+    save(), clear() and touch() only hand the work to the writer thread and return at once.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH):
+        """
+        Initializes the checkpoint. The writer thread is started on the first save or clear.
+
+        Args:
+            path (str): Location of the checkpoint file.
+        """
+        self.path = path
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pending = None
+        self._has_pending = False
+        self._touch = False
+        self._writing = False
+        self._closed = False
+        self._written = None
+
+        self._writes = 0
+        self._coalesced = 0
+
+    def load(self):
+        """
+        Returns the saved session snapshot, or None if there is none or it is unreadable.
+
+        If the process that saved it did not exit cleanly, the snapshot also carries
+        'alive_at': the Unix time the file was last written or touched.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as checkpoint:
+                data = json.load(checkpoint)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Session checkpoint unreadable, ignoring it: {str(e)}")
+            return None
+        if not isinstance(data, dict) or data.get('version') != CHECKPOINT_VERSION:
+            return None
+        session = data.get('session')
+        if isinstance(session, dict) and 'closed_at' not in data:
+            try:
+                session['alive_at'] = os.path.getmtime(self.path)
+            except OSError:
+                pass
+        return session
+
+    def save(self, snapshot):
+        """
+        Queues the active session's snapshot to be written.
+
+        Args:
+            snapshot (dict): The value of SessionEngine.snapshot().
+        """
+        self._submit(snapshot)
+
+    def clear(self):
+        """
+        Queues removal of the checkpoint, once no session is active.
+        """
+        self._submit(None)
+
+    def touch(self):
+        """
+        Records that the owner is still alive, by updating the checkpoint's modification time.
+        """
+        with self._cond:
+            if self._thread is None:
+                return
+            self._touch = True
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Waits until the newest state has been written.
+
+        Returns:
+            bool: False if the timeout expired first.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not (self._has_pending or self._touch or self._writing), timeout)
+
+    def close(self, timeout=2.0):
+        """
+        Writes the newest state, marked as closed cleanly, and stops the writer thread.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        """
+        Returns the number of writes and of states dropped in favour of a newer one.
+        """
+        with self._cond:
+            return {'writes': self._writes, 'coalesced': self._coalesced}
+
+    def _submit(self, snapshot):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='session-checkpoint', daemon=True)
+                self._thread.start()
+            if self._has_pending:
+                self._coalesced += 1
+            self._pending = snapshot
+            self._has_pending = True
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._has_pending and not self._touch and not self._closed:
+                    self._cond.wait()
+                touch = self._touch and not self._has_pending
+                self._touch = False
+                if not self._has_pending and not touch:
+                    break
+                snapshot = self._pending
+                self._pending = None
+                self._has_pending = False
+                self._writing = True
+
+            try:
+                if touch:
+                    if self._written is not None:
+                        os.utime(self.path)
+                elif snapshot is None:
+                    self._remove()
+                else:
+                    self._write(snapshot)
+            except OSError as e:
+                print(f"Session checkpoint error: {str(e)}")
+
+            with self._cond:
+                self._writing = False
+                if not touch:
+                    self._writes += 1
+                self._cond.notify_all()
+
+        if self._written is not None:
+            try:
+                self._write(self._written, closed_at=time.time())
+            except OSError as e:
+                print(f"Session checkpoint error: {str(e)}")
+
+    def _write(self, snapshot, closed_at=None):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {'version': CHECKPOINT_VERSION, 'session': snapshot}
+        if closed_at is not None:
+            data['closed_at'] = closed_at
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as checkpoint:
+            json.dump(data, checkpoint)
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+        os.replace(temporary, self.path)
+        self._written = snapshot
+
+    def _remove(self):
+        self._written = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,150 @@
+#@brief: Local control channel of the running Self Remembering App.
+# Listens on a QLocalServer (a Unix socket in ~/.mindapp, or a named pipe on Windows) for the
+# line-delimited JSON commands sent by srctl.py, and runs them against the app on the GUI
+# thread. A second launch of the app uses the same channel to bring the running window forward
+# instead of starting another instance.
+
+import json
+
+from PyQt6.QtCore import QObject
+from PyQt6.QtNetwork import QAbstractSocket, QLocalServer
+
+from srctl import MAX_LINE, server_name
+
+# Longest session that can be started remotely.
+MAX_DURATION_SECONDS = 24 * 60 * 60
+
+
+def session_status(engine, plan_runner=None):
+    """
+    Returns the state of the app's session in the same shape as the daemon's session status,
+    plus the running session plan's name and, between its sessions, the break time left.
+    """
+    plan = plan_runner.plan.name if plan_runner is not None and plan_runner.is_active else None
+    return {
+        'plan': plan,
+        'break_remaining_seconds': plan_runner.break_remaining() if plan else None,
+        'state': engine.state,
+        'aim': engine.aim,
+        'key': engine.key,
+        'total_seconds': engine.total_seconds,
+        'remaining_seconds': engine.timer.remaining(),
+        'paused_seconds': engine.pause_time(),
+    }
+
+
+class ControlServer(QObject):
+    """
+    Accepts control connections and answers each request line with a reply line.
+    """
+
+    def __init__(self, app, name=None, parent=None):
+        """
+        Initializes the server. Nothing listens until listen() is called.
+
+        Args:
+            app (FocusSessionApp): The application the commands act on.
+            name (str): The server name; defaults to srctl.server_name().
+            parent (QObject): The Qt parent.
+        """
+        super().__init__(parent)
+        self.app = app
+        self.name = name or server_name()
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self.server.newConnection.connect(self._on_new_connection)
+        self._commands = 0
+
+    def listen(self):
+        """
+        Starts listening, replacing a socket left behind by an instance that crashed.
+
+        Only call this while holding the single-instance lock, so no live instance is replaced.
+
+        Returns:
+            bool: False if the server could not listen.
+        """
+        if self.server.listen(self.name):
+            return True
+        if self.server.serverError() == QAbstractSocket.SocketError.AddressInUseError:
+            QLocalServer.removeServer(self.name)
+            if self.server.listen(self.name):
+                return True
+        print(f"Control channel error: {self.server.errorString()}")
+        return False
+
+    def close(self):
+        self.server.close()
+
+    def stats(self):
+        return {'commands': self._commands, 'listening': self.server.isListening()}
+
+    def handle(self, request):
+        """
+        Runs one request and returns the reply.
+
+        Args:
+            request (dict): The decoded request.
+
+        Returns:
+            dict: {'ok': True, 'status': ...} or {'ok': False, 'error': ...}.
+        """
+        engine = self.app.engine
+        plan_runner = self.app.plan_runner
+        command = request.get('command')
+        if command == 'start' and request.get('plan'):
+            if engine.is_active or plan_runner.is_active:
+                return {'ok': False, 'error': "A session is already running."}
+            if not self.app.begin_plan(str(request['plan']), str(request.get('aim') or '')):
+                return {'ok': False, 'error': f"Unknown session plan: {request['plan']!r}"}
+        elif command == 'start':
+            duration = request.get('duration_seconds')
+            if not isinstance(duration, (int, float)) or not 0 < duration <= MAX_DURATION_SECONDS:
+                return {'ok': False, 'error': "duration_seconds must be between 1 and 86400."}
+            if engine.is_active or plan_runner.is_active:
+                return {'ok': False, 'error': "A session is already running."}
+            self.app.begin_session(str(request.get('aim') or ''), int(duration))
+        elif command == 'pause':
+            if not engine.pause():
+                return {'ok': False, 'error': "No session is running."}
+        elif command == 'resume':
+            if not engine.resume():
+                return {'ok': False, 'error': "No session is paused."}
+        elif command == 'stop':
+            if not engine.is_active and not plan_runner.is_active:
+                return {'ok': False, 'error': "No session is active."}
+            self.app.stop_session()
+        elif command == 'show':
+            self.app.show_window()
+        elif command != 'status':
+            return {'ok': False, 'error': f"Unknown command: {command!r}"}
+        return {'ok': True, 'status': session_status(engine, plan_runner)}
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            connection.readyRead.connect(lambda connection=connection: self._on_ready_read(connection))
+            connection.disconnected.connect(connection.deleteLater)
+
+    def _on_ready_read(self, connection):
+        while connection.canReadLine():
+            line = bytes(connection.readLine()).strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request must be a JSON object")
+            except ValueError as e:
+                reply = {'ok': False, 'error': f"Malformed request: {e}"}
+            else:
+                self._commands += 1
+                try:
+                    reply = self.handle(request)
+                except Exception as e:
+                    print(f"Control command error: {str(e)}")
+                    reply = {'ok': False, 'error': str(e)}
+            connection.write(json.dumps(reply).encode('utf-8') + b'\n')
+            connection.flush()
+        if connection.bytesAvailable() > MAX_LINE:
+            connection.abort()
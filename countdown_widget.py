@@ -0,0 +1,106 @@
+#@brief: Countdown display that repaints only itself.
+# A QLabel whose text changes may recompute its size hint and relayout the whole window. This
+# widget has a constant size hint and paints its own text and optional progress ring, so a
+# new second only invalidates its own rectangle; nothing else in the window is laid out or
+# repainted. Setting a value that looks the same as the current one does not repaint at all.
+
+from PyQt6.QtCore import QRectF, QSize, Qt
+from PyQt6.QtGui import QFont, QFontMetrics, QPainter, QPen
+from PyQt6.QtWidgets import QSizePolicy, QWidget
+
+from session_engine import format_remaining
+
+# The widest text the widget reserves room for.
+WIDEST_TEXT = format_remaining(999 * 60 + 59)
+
+
+class CountdownWidget(QWidget):
+    """
+    Shows the remaining time of a session, optionally with a ring that fills as it elapses.
+    """
+
+    def __init__(self, show_ring=True, font=None, parent=None):
+        """
+        Initializes the widget showing no time remaining.
+
+        Args:
+            show_ring (bool): Draw a progress ring left of the text.
+            font (QFont): The text font; defaults to bold Arial 14.
+            parent (QWidget): The Qt parent.
+        """
+        super().__init__(parent)
+        self.show_ring = show_ring
+        self.setFont(font or QFont("Arial", 14, QFont.Weight.Bold))
+        # Everything is painted by paintEvent, so Qt need not clear the background first.
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        self.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Fixed)
+
+        metrics = QFontMetrics(self.font())
+        self._text_width = metrics.horizontalAdvance(WIDEST_TEXT)
+        self._height = metrics.height() + 16
+        self._ring_size = self._height - 8 if show_ring else 0
+
+        self.text = format_remaining(0)
+        self.progress = 0.0
+        self._ring_steps = 0
+        self._paints = 0
+
+    def sizeHint(self):
+        gap = 12 if self.show_ring else 0
+        return QSize(self._ring_size + gap + self._text_width + 8, self._height)
+
+    def minimumSizeHint(self):
+        return self.sizeHint()
+
+    def set_remaining(self, seconds, progress=0.0):
+        """
+        Shows a new remaining time. Repaints only if the visible result changes.
+
+        Args:
+            seconds (int): Whole seconds remaining.
+            progress (float): Fraction of the session elapsed, from 0 to 1.
+        """
+        text = format_remaining(seconds)
+        # The ring is drawn in 1/16 degree units; finer changes would not show.
+        ring_steps = round(max(0.0, min(1.0, progress)) * 360 * 16) if self.show_ring else 0
+        if text == self.text and ring_steps == self._ring_steps:
+            return
+        self.text = text
+        self.progress = progress
+        self._ring_steps = ring_steps
+        self.update()
+
+    def stats(self):
+        """
+        Returns the number of paints so far, to verify that hidden windows do not repaint.
+        """
+        return {'paints': self._paints}
+
+    def paintEvent(self, event):
+        self._paints += 1
+        painter = QPainter(self)
+        palette = self.palette()
+        painter.fillRect(event.rect(), palette.window())
+
+        content_width = self.sizeHint().width()
+        left = max(0, (self.width() - content_width) // 2) + 4
+        if self.show_ring:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            pen_width = max(3, self._ring_size // 8)
+            ring = QRectF(left, (self.height() - self._ring_size) / 2, self._ring_size, self._ring_size)
+            ring.adjust(pen_width / 2, pen_width / 2, -pen_width / 2, -pen_width / 2)
+            painter.setPen(QPen(palette.mid().color(), pen_width))
+            painter.drawEllipse(ring)
+            if self._ring_steps:
+                pen = QPen(palette.highlight().color(), pen_width)
+                pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+                painter.setPen(pen)
+                # Starts at twelve o'clock and fills clockwise.
+                painter.drawArc(ring, 90 * 16, -self._ring_steps)
+            left += self._ring_size + 12
+
+        painter.setPen(palette.windowText().color())
+        painter.setFont(self.font())
+        painter.drawText(QRectF(left, 0, self._text_width, self.height()),
+                         Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, self.text)
+        painter.end()
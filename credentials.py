@@ -0,0 +1,363 @@
+#@brief: Google credentials and the shared HTTP transport for Calendar calls.
+# OAuth tokens are stored as JSON in ~/.mindapp/token.json (readable by the user only); a
+# token.pickle left by older versions is migrated on first use. A background thread refreshes
+# the access token shortly before it expires, so calendar writes never wait for a refresh.
+# All Calendar calls share one keep-alive AuthorizedHttp, so the TLS handshake is paid once
+# per connection instead of once per service. Refresh and handshake latencies are recorded.
+# The google libraries are imported lazily, so importing this module costs nothing at startup.
+
+import collections
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+SCOPES = ['https://www.googleapis.com/auth/calendar.events']
+
+# Lets the app see when the user is busy, without reading any event details. Only requested
+# while the free_busy setting is on, so turning it off never forces a new sign-in.
+FREEBUSY_SCOPE = 'https://www.googleapis.com/auth/calendar.freebusy'
+
+TOKEN_PATH = os.path.join(os.path.expanduser('~'), '.mindapp', 'token.json')
+LEGACY_TOKEN_PATH = os.path.join(os.path.expanduser('~'), '.mindapp', 'token.pickle')
+
+
+class CredentialError(Exception):
+    """
+    Raised when no usable credentials can be obtained.
+    """
+
+
+def build_calendar_service(http, discovery_path=None, root_url=None):
+    """
+    Builds the Calendar service on an HTTP transport.
+
+    The service comes from a bundled discovery document if discovery_path exists,
+    otherwise from the static document shipped with googleapiclient; it is never fetched.
+
+    Args:
+        http (httplib2.Http): The transport every request is sent on.
+        discovery_path (str): A bundled calendar.v3.json, or None.
+        root_url (str): Another API root, e.g. a local fake_calendar_server.py, or None.
+
+    Returns:
+        googleapiclient.discovery.Resource: The Calendar service.
+    """
+    from googleapiclient.discovery import build, build_from_document
+
+    if discovery_path and os.path.exists(discovery_path):
+        with open(discovery_path, 'r', encoding='utf-8') as discovery:
+            document = json.load(discovery)
+    elif root_url:
+        from googleapiclient.discovery_cache import get_static_doc
+        document = json.loads(get_static_doc('calendar', 'v3'))
+    else:
+        return build('calendar', 'v3', http=http, static_discovery=True, cache_discovery=False)
+
+    if root_url:
+        # Batch requests are sent to rootUrl + batchPath, so the document itself is pointed
+        # at the other root; client_options would only move the per-method requests.
+        root_url = root_url.rstrip('/') + '/'
+        document['rootUrl'] = root_url
+        document['baseUrl'] = root_url + document['servicePath']
+    return build_from_document(document, http=http)
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class CredentialManager:
+    """
+    Owns the OAuth credentials and the one authorized HTTP transport built on them.
+
+    The transport is not thread-safe; it is meant for the calendar sync worker, which
+    sends every Calendar request. Refreshes are serialised by a lock and may happen on
+    the background refresh thread or, if a token still expired, inline on first use.
+    """
+
+    def __init__(self, client_secrets_path, token_path=TOKEN_PATH, legacy_token_path=LEGACY_TOKEN_PATH,
+                 scopes=SCOPES, refresh_margin=300, timeout=30):
+        """
+        Initializes the manager. Nothing is read until load() or authorize() is called.
+
+        Args:
+            client_secrets_path (str): The OAuth client_secret.json used for a new login.
+            token_path (str): Where the token is stored as JSON.
+            legacy_token_path (str): A pickled token to migrate from, if present.
+            scopes (list): The OAuth scopes to request.
+            refresh_margin (float): Seconds before expiry at which the token is refreshed.
+            timeout (float): Socket timeout of the shared transport, in seconds.
+        """
+        self.client_secrets_path = client_secrets_path
+        self.token_path = token_path
+        self.legacy_token_path = legacy_token_path
+        self.scopes = list(scopes)
+        self.refresh_margin = refresh_margin
+        self.timeout = timeout
+
+        self.credentials = None
+        self._http = None
+        self._token_request = None
+        self._refresh_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._retry_at = None
+        self._retry_backoff = 0
+
+        self._refreshes = 0
+        self._refresh_failures = 0
+        self._refresh_latencies = collections.deque(maxlen=128)
+        self._handshakes = 0
+        self._handshake_latencies = collections.deque(maxlen=128)
+
+    def load(self):
+        """
+        Reads the stored token, migrating a legacy pickled token to JSON if needed.
+
+        The credentials keep the scopes the token was granted, which may be fewer than
+        self.scopes for a token from an older version; authorize() deals with that.
+
+        Returns:
+            google.oauth2.credentials.Credentials: The stored credentials, or None.
+        """
+        from google.oauth2.credentials import Credentials
+
+        if os.path.exists(self.token_path):
+            try:
+                with open(self.token_path, encoding='utf-8') as token:
+                    info = json.load(token)
+                self.credentials = Credentials.from_authorized_user_info(info, info.get('scopes') or self.scopes)
+                return self.credentials
+            except (OSError, ValueError) as e:
+                print(f"Token file unreadable, ignoring it: {str(e)}")
+
+        if self.legacy_token_path and os.path.exists(self.legacy_token_path):
+            import pickle
+            try:
+                with open(self.legacy_token_path, 'rb') as token:
+                    credentials = pickle.load(token)
+            except Exception as e:
+                print(f"Legacy token unreadable, ignoring it: {str(e)}")
+            else:
+                self.credentials = credentials
+                self.save()
+                os.remove(self.legacy_token_path)
+                return self.credentials
+        return None
+
+    def save(self):
+        """
+        Writes the current credentials to the token file atomically, readable by the user only.
+        """
+        os.makedirs(os.path.dirname(self.token_path), exist_ok=True)
+        temporary = self.token_path + '.tmp'
+        descriptor = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as token:
+            token.write(self.credentials.to_json())
+        os.replace(temporary, self.token_path)
+
+    def authorize(self, interactive=True):
+        """
+        Makes sure valid credentials are available.
+
+        Stored credentials are loaded and refreshed if expired. Without usable stored
+        credentials, or with credentials missing some of the scopes, the browser login flow
+        is run if interactive is True. Without it, credentials missing scopes are still used
+        for what they allow. Call this off the GUI thread: both the refresh and the login
+        flow block.
+
+        Args:
+            interactive (bool): Whether a browser login may be started.
+
+        Returns:
+            google.oauth2.credentials.Credentials: Valid credentials.
+
+        Raises:
+            CredentialError: If no valid credentials could be obtained.
+        """
+        if self.credentials is None:
+            self.load()
+
+        credentials = self.credentials
+        if credentials is not None and not credentials.has_scopes(self.scopes):
+            missing = sorted(set(self.scopes) - set(credentials.scopes or ()))
+            if interactive:
+                print(f"Stored token lacks scopes {missing}, signing in again.")
+                credentials = self.credentials = None
+            else:
+                print(f"Stored token lacks scopes {missing}; sign in from the desktop app to grant them.")
+        if credentials is not None and not credentials.valid:
+            if credentials.refresh_token:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Token refresh failed: {str(e)}")
+                    self.credentials = None
+            else:
+                self.credentials = None
+
+        if self.credentials is None:
+            if not interactive:
+                raise CredentialError("No stored Google credentials; sign in from the desktop app first.")
+            from google_auth_oauthlib.flow import InstalledAppFlow
+            flow = InstalledAppFlow.from_client_secrets_file(self.client_secrets_path, self.scopes)
+            self.credentials = flow.run_local_server(port=0)
+            self.save()
+        return self.credentials
+
+    def refresh(self):
+        """
+        Refreshes the access token now and stores the new token.
+        """
+        with self._refresh_lock:
+            if self._token_request is None:
+                import google_auth_httplib2
+                import httplib2
+                # A dedicated keep-alive connection to the token endpoint.
+                self._token_request = google_auth_httplib2.Request(httplib2.Http(timeout=self.timeout))
+
+            begin = time.perf_counter()
+            try:
+                self.credentials.refresh(self._token_request)
+            except Exception:
+                self._refresh_failures += 1
+                raise
+            self._refreshes += 1
+            self._refresh_latencies.append(time.perf_counter() - begin)
+            self.save()
+        with self._cond:
+            # The background thread schedules its next refresh from the new expiry.
+            self._cond.notify_all()
+
+    def seconds_until_expiry(self):
+        """
+        Returns the seconds until the access token expires, or None if that is unknown.
+        """
+        expiry = getattr(self.credentials, 'expiry', None)
+        if expiry is None:
+            return None
+        # google-auth keeps expiry as a naive UTC datetime.
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (expiry - now).total_seconds()
+
+    def http(self):
+        """
+        Returns the shared keep-alive transport, authorized with the current credentials.
+
+        Returns:
+            google_auth_httplib2.AuthorizedHttp: The transport to pass to build(http=...).
+        """
+        if self._http is None:
+            import google_auth_httplib2
+            self._http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=self._pooled_http())
+        return self._http
+
+    def build_service(self, discovery_path=None, root_url=None):
+        """
+        Builds the Calendar service on the shared transport, see build_calendar_service().
+
+        Args:
+            discovery_path (str): A bundled calendar.v3.json, or None.
+            root_url (str): Another API root, or None for Google's.
+
+        Returns:
+            googleapiclient.discovery.Resource: The Calendar service.
+        """
+        return build_calendar_service(self.http(), discovery_path, root_url)
+
+    def start(self):
+        """
+        Starts the background thread that refreshes the token before it expires.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop, name='credential-refresh', daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """
+        Stops the background refresh thread.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        """
+        Returns refresh and handshake counts and latencies, in seconds.
+        """
+        return {
+            'expires_in': self.seconds_until_expiry(),
+            'refreshes': self._refreshes,
+            'refresh_failures': self._refresh_failures,
+            'p50_refresh_latency': _percentile(self._refresh_latencies, 0.5),
+            'max_refresh_latency': max(self._refresh_latencies, default=None),
+            'handshakes': self._handshakes,
+            'p50_handshake_latency': _percentile(self._handshake_latencies, 0.5),
+            'max_handshake_latency': max(self._handshake_latencies, default=None),
+        }
+
+    def _pooled_http(self):
+        import httplib2
+
+        manager = self
+
+        class TimedConnection(httplib2.HTTPSConnectionWithTimeout):
+            def connect(self):
+                begin = time.perf_counter()
+                super().connect()
+                manager._handshakes += 1
+                manager._handshake_latencies.append(time.perf_counter() - begin)
+
+        class PooledHttp(httplib2.Http):
+            # httplib2 keeps one open connection per host; this times each new one.
+            def request(self, uri, method='GET', body=None, headers=None,
+                        redirections=httplib2.DEFAULT_MAX_REDIRECTS, connection_type=None):
+                if connection_type is None and uri.startswith('https:'):
+                    connection_type = TimedConnection
+                return super().request(uri, method, body, headers, redirections, connection_type)
+
+        return PooledHttp(timeout=self.timeout)
+
+    def _refresh_loop(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                delay = self._next_refresh_delay()
+                if delay is None:
+                    # Nothing that could be refreshed; sleep until closed.
+                    self._cond.wait()
+                    continue
+                if delay > 0:
+                    # Sleeps through to the refresh margin. A suspend can make this wake up
+                    # late; a token that expired meanwhile is refreshed inline on first use.
+                    self._cond.wait(delay)
+                    continue
+
+            try:
+                self.refresh()
+                self._retry_at = None
+                self._retry_backoff = 0
+            except Exception as e:
+                print(f"Background token refresh failed: {str(e)}")
+                self._retry_backoff = min(300, self._retry_backoff * 2 or 30)
+                self._retry_at = time.monotonic() + self._retry_backoff
+
+    def _next_refresh_delay(self):
+        """
+        Returns the seconds until the next background refresh, or None if there is none to do.
+        """
+        if self._retry_at is not None:
+            return self._retry_at - time.monotonic()
+        if self.credentials is None or not getattr(self.credentials, 'refresh_token', None):
+            return None
+        remaining = self.seconds_until_expiry()
+        if remaining is None:
+            return None
+        return remaining - self.refresh_margin
@@ -0,0 +1,87 @@
+#@brief: In-app diagnostics panel for the Self Remembering App.
+# Shows the live metrics (timer jitter, calendar latency and errors, startup phases, audio
+# load times) and the most recent GUI stalls with their stacks. The text is refreshed once a
+# second, and only while the panel is on screen.
+
+import time
+
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QFont, QGuiApplication
+from PyQt6.QtWidgets import QHBoxLayout, QPlainTextEdit, QPushButton, QVBoxLayout, QWidget
+
+from metrics import format_summary
+
+
+class DiagnosticsPanel(QWidget):
+    """
+    A separate window listing the application's metrics and recent GUI stalls.
+    """
+
+    def __init__(self, registry, watchdog=None, exporter=None, parent=None):
+        """
+        Initializes the panel. It stays hidden until shown.
+
+        Args:
+            registry (MetricsRegistry): The metrics to show.
+            watchdog (StallWatchdog): Source of recent stalls, or None.
+            exporter (MetricsExporter): Used by the "Export now" button, or None.
+            parent (QWidget): The window the panel belongs to.
+        """
+        super().__init__(parent, Qt.WindowType.Window)
+        self.registry = registry
+        self.watchdog = watchdog
+        self.exporter = exporter
+
+        self.setWindowTitle("Diagnostics")
+        self.resize(640, 480)
+
+        layout = QVBoxLayout()
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setFont(QFont("Courier New", 9))
+        self.text.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        layout.addWidget(self.text)
+
+        button_layout = QHBoxLayout()
+        copy_button = QPushButton("Copy")
+        copy_button.clicked.connect(lambda: QGuiApplication.clipboard().setText(self.text.toPlainText()))
+        button_layout.addWidget(copy_button)
+        if exporter is not None:
+            export_button = QPushButton("Export now")
+            export_button.setToolTip(f"Write the metrics to {exporter.path}")
+            export_button.clicked.connect(exporter.export)
+            button_layout.addWidget(export_button)
+        button_layout.addStretch()
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.setTimerType(Qt.TimerType.CoarseTimer)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        """
+        Re-renders the metrics and stalls, keeping the scroll position.
+        """
+        sections = [format_summary(self.registry) or "No metrics recorded yet."]
+        if self.watchdog is not None:
+            stalls = self.watchdog.recent()
+            sections.append(f"Recent GUI stalls (over {self.watchdog.threshold * 1000:.0f} ms): {len(stalls)}")
+            for wall, seconds, stack in reversed(stalls):
+                sections.append(f"{time.strftime('%H:%M:%S', time.localtime(wall))}  "
+                                f"{seconds * 1000:.0f} ms\n{stack}")
+
+        scrollbar = self.text.verticalScrollBar()
+        position = scrollbar.value()
+        self.text.setPlainText('\n\n'.join(sections))
+        scrollbar.setValue(position)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh_timer.stop()
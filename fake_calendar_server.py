@@ -0,0 +1,541 @@
+#@brief: Local stand-in for the Google Calendar v3 events API, with fault injection.
+# Serves events insert/get/update/patch/delete/list (including sync tokens and pages),
+# freeBusy queries over the stored events, and batch requests from memory, so the calendar code can be exercised without a Google account.
+# Latency can follow a fixed, uniform or log-normal distribution, and a share of the requests
+# can be answered with 429, with 5xx errors (also in periodic bursts) or by dropping the
+# connection, either before the request is applied or after it (a lost response).
+# Point the app at it with the calendar_api_endpoint setting:
+#     python fake_calendar_server.py --port 8090 --latency lognormal:200:0.5 --error-429 0.05
+# It implements only what the app uses and performs no authentication.
+
+import argparse
+import copy
+import email
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+EVENTS_PATH = re.compile(r'^/calendar/v3/calendars/([^/]+)/events(?:/([^/]+))?$')
+BATCH_PATH = '/batch/calendar/v3'
+FREEBUSY_PATH = '/calendar/v3/freeBusy'
+
+REASONS = {
+    400: ('badRequest', "Bad Request"),
+    404: ('notFound', "Not Found"),
+    409: ('duplicate', "The requested identifier already exists."),
+    410: ('deleted', "Resource has been deleted"),
+    429: ('rateLimitExceeded', "Rate Limit Exceeded"),
+    500: ('backendError', "Backend Error"),
+    503: ('backendError', "Service Unavailable"),
+}
+
+
+def parse_latency(spec):
+    """
+    Turns a latency specification into a function returning a delay in seconds.
+
+    Specs are in milliseconds: '0', 'fixed:MS', 'uniform:LOW:HIGH' or 'lognormal:MEDIAN:SIGMA'.
+
+    Raises:
+        ValueError: If the spec is not understood.
+    """
+    parts = spec.split(':')
+    try:
+        if len(parts) == 1:
+            value = float(parts[0]) / 1000
+            return lambda rng: value
+        kind, numbers = parts[0], [float(part) for part in parts[1:]]
+        if kind == 'fixed' and len(numbers) == 1:
+            return lambda rng: numbers[0] / 1000
+        if kind == 'uniform' and len(numbers) == 2:
+            return lambda rng: rng.uniform(numbers[0], numbers[1]) / 1000
+        if kind == 'lognormal' and len(numbers) == 2:
+            mu = math.log(max(numbers[0], 1e-3))
+            return lambda rng: rng.lognormvariate(mu, numbers[1]) / 1000
+    except ValueError:
+        pass
+    raise ValueError(f"Unknown latency spec: {spec!r}")
+
+
+class FaultProfile:
+    """
+    Decides the latency and the fault, if any, of each request.
+    """
+
+    def __init__(self, latency='0', error_429=0.0, error_5xx=0.0, drop=0.0, drop_after=0.0, burst_period=0.0,
+                 burst_length=0.0, seed=None):
+        """
+        Initializes the profile.
+
+        Args:
+            latency (str): The latency spec, see parse_latency().
+            error_429 (float): Share of requests answered with 429.
+            error_5xx (float): Share of requests answered with 500 or 503.
+            drop (float): Share of requests whose connection is closed without an answer.
+            drop_after (float): Share of requests applied, but whose answer is never sent.
+            burst_period (float): Seconds between the starts of 503 bursts; 0 for none.
+            burst_length (float): Seconds each burst lasts.
+            seed (int): Seed for reproducible runs.
+        """
+        self.latency_spec = latency
+        self.latency = parse_latency(latency)
+        self.error_429 = error_429
+        self.error_5xx = error_5xx
+        self.drop = drop
+        self.drop_after = drop_after
+        self.burst_period = burst_period
+        self.burst_length = burst_length
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._origin = time.monotonic()
+
+    def delay(self):
+        with self._lock:
+            return max(0.0, self.latency(self._rng))
+
+    def connection_fault(self):
+        """
+        Returns 'drop', 'drop_after' or None for an incoming HTTP request.
+        """
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.drop:
+            return 'drop'
+        if roll < self.drop + self.drop_after:
+            return 'drop_after'
+        return None
+
+    def status_fault(self):
+        """
+        Returns the HTTP status to answer an API request with instead of running it, or None.
+        """
+        if self.burst_period and (time.monotonic() - self._origin) % self.burst_period < self.burst_length:
+            return 503
+        with self._lock:
+            roll = self._rng.random()
+            if roll < self.error_429:
+                return 429
+            roll -= self.error_429
+            if roll < self.error_5xx:
+                return self._rng.choice((500, 503))
+        return None
+
+    def to_dict(self):
+        return {'latency': self.latency_spec, 'error_429': self.error_429, 'error_5xx': self.error_5xx,
+                'drop': self.drop, 'drop_after': self.drop_after,
+                'burst_period': self.burst_period, 'burst_length': self.burst_length}
+
+
+def _now_rfc3339():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def _instant(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _rfc3339(instant):
+    return instant.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _merge(base, changes):
+    # Patch semantics: objects are merged field by field, everything else is replaced.
+    merged = dict(base)
+    for key, value in changes.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+class ApiError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or REASONS.get(status, ('error', "Error"))[1])
+        self.status = status
+
+
+class CalendarStore:
+    """
+    The events of all calendars, in memory. Every change gets a sequence number, which
+    doubles as the sync token of incremental lists.
+    """
+
+    def __init__(self, base_url='http://127.0.0.1/'):
+        self.base_url = base_url
+        self._events = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def insert(self, calendar_id, body):
+        with self._lock:
+            event_id = body.get('id') or uuid.uuid4().hex
+            if (calendar_id, event_id) in self._events:
+                raise ApiError(409)
+            now = _now_rfc3339()
+            return self._save(calendar_id, dict(body, id=event_id, status='confirmed', created=now))
+
+    def get(self, calendar_id, event_id):
+        with self._lock:
+            return copy.deepcopy(self._find(calendar_id, event_id, allow_cancelled=True)[1])
+
+    def update(self, calendar_id, event_id, body):
+        with self._lock:
+            _, event = self._find(calendar_id, event_id)
+            return self._save(calendar_id, dict(body, id=event_id, status='confirmed', created=event.get('created')))
+
+    def patch(self, calendar_id, event_id, body):
+        with self._lock:
+            _, event = self._find(calendar_id, event_id)
+            return self._save(calendar_id, _merge(event, dict(body, id=event_id)))
+
+    def delete(self, calendar_id, event_id):
+        with self._lock:
+            _, event = self._find(calendar_id, event_id)
+            self._save(calendar_id, {'id': event_id, 'status': 'cancelled', 'created': event.get('created')})
+
+    def list(self, calendar_id, sync_token=None, page_token=None, max_results=250, show_deleted=False):
+        """
+        Returns one page of events, oldest change first, like events().list.
+        """
+        with self._lock:
+            if page_token:
+                since, offset = (int(part) for part in page_token.split(':'))
+            else:
+                offset = 0
+                since = 0
+                if sync_token is not None:
+                    try:
+                        since = int(sync_token)
+                    except ValueError:
+                        raise ApiError(410, "Sync token is no longer valid, a full sync is required.")
+                    if since > self._sequence:
+                        raise ApiError(410, "Sync token is no longer valid, a full sync is required.")
+            incremental = sync_token is not None or since > 0
+            matching = sorted(
+                (sequence, event) for (calendar, _), (sequence, event) in self._events.items()
+                if calendar == calendar_id and sequence > since
+                and (incremental or show_deleted or event['status'] != 'cancelled'))
+            page = matching[offset:offset + max_results]
+            response = {'kind': 'calendar#events', 'items': [copy.deepcopy(event) for _, event in page]}
+            if offset + max_results < len(matching):
+                response['nextPageToken'] = f"{since}:{offset + max_results}"
+            else:
+                response['nextSyncToken'] = str(self._sequence)
+            return response
+
+    def freebusy(self, body):
+        """
+        Returns the busy windows of the requested calendars between timeMin and timeMax,
+        like freebusy().query. Every confirmed, opaque event with a dateTime start and end counts.
+        """
+        try:
+            time_min, time_max = _instant(body['timeMin']), _instant(body['timeMax'])
+            calendar_ids = [item['id'] for item in body.get('items', ())]
+        except (KeyError, TypeError, ValueError):
+            raise ApiError(400)
+        calendars = {calendar_id: {'busy': []} for calendar_id in calendar_ids}
+        with self._lock:
+            for (calendar_id, _), (_, event) in self._events.items():
+                if (calendar_id not in calendars or event['status'] == 'cancelled'
+                        or event.get('transparency') == 'transparent'):
+                    continue
+                try:
+                    start = _instant(event['start']['dateTime'])
+                    end = _instant(event['end']['dateTime'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if start < time_max and end > time_min:
+                    calendars[calendar_id]['busy'].append((max(start, time_min), min(end, time_max)))
+        for calendar in calendars.values():
+            calendar['busy'] = [{'start': _rfc3339(start), 'end': _rfc3339(end)}
+                                for start, end in sorted(calendar['busy'])]
+        return {'kind': 'calendar#freeBusy', 'timeMin': body['timeMin'], 'timeMax': body['timeMax'],
+                'calendars': calendars}
+
+    def __len__(self):
+        return len(self._events)
+
+    def _find(self, calendar_id, event_id, allow_cancelled=False):
+        entry = self._events.get((calendar_id, event_id))
+        if entry is None:
+            raise ApiError(404)
+        if entry[1]['status'] == 'cancelled' and not allow_cancelled:
+            raise ApiError(410)
+        return entry
+
+    def _save(self, calendar_id, event):
+        self._sequence += 1
+        event['updated'] = _now_rfc3339()
+        event['etag'] = f'"{self._sequence}"'
+        event['htmlLink'] = f"{self.base_url}event?eid={event['id']}"
+        self._events[(calendar_id, event['id'])] = (self._sequence, event)
+        return copy.deepcopy(event)
+
+
+class FakeCalendarHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle on, every answer on a
+    # keep-alive connection would wait for the client's delayed ACK.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def do_PUT(self):
+        self._handle()
+
+    def do_PATCH(self):
+        self._handle()
+
+    def do_DELETE(self):
+        self._handle()
+
+    def _handle(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        path = urlsplit(self.path).path
+
+        if path == '/fake/stats':
+            return self._send(200, 'application/json', json.dumps(server.stats()).encode('utf-8'))
+        if path == '/fake/faults' and self.command == 'POST':
+            server.faults = FaultProfile(**json.loads(body or b'{}'))
+            return self._send(200, 'application/json', json.dumps(server.faults.to_dict()).encode('utf-8'))
+
+        server.enter()
+        try:
+            time.sleep(server.faults.delay())
+            fault = server.faults.connection_fault()
+            if fault == 'drop':
+                server.count('dropped')
+                self.close_connection = True
+                return
+
+            if path == BATCH_PATH and self.command == 'POST':
+                boundary, data = server.batch(self.headers.get('Content-Type', ''), body)
+                content_type = f'multipart/mixed; boundary={boundary}'
+                status = 200
+            else:
+                status, response = server.dispatch(self.command, self.path, body)
+                data = json.dumps(response).encode('utf-8') if response is not None else b''
+                content_type = 'application/json; charset=UTF-8'
+
+            if fault == 'drop_after':
+                server.count('dropped_after')
+                self.close_connection = True
+                return
+            self._send(status, content_type, data)
+        finally:
+            server.leave()
+
+    def _send(self, status, content_type, data):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeCalendarServer(ThreadingHTTPServer):
+    """
+    The stand-in server. Call start() to serve on a background thread, or serve_forever().
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, faults=None, verbose=False):
+        super().__init__((host, port), FakeCalendarHandler)
+        self.faults = faults or FaultProfile()
+        self.verbose = verbose
+        self.store = CalendarStore(self.url)
+        self._counts = {}
+        self._counts_lock = threading.Lock()
+        self._in_flight = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        The root URL to use as calendar_api_endpoint.
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-calendar', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+    def count(self, name):
+        with self._counts_lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def enter(self):
+        with self._counts_lock:
+            self._in_flight += 1
+
+    def leave(self):
+        with self._counts_lock:
+            self._in_flight -= 1
+
+    @property
+    def in_flight(self):
+        """
+        The number of API requests being answered right now.
+        """
+        with self._counts_lock:
+            return self._in_flight
+
+    def stats(self):
+        with self._counts_lock:
+            counts = dict(self._counts)
+            in_flight = self._in_flight
+        return {'events': len(self.store), 'in_flight': in_flight, 'requests': counts, 'faults': self.faults.to_dict()}
+
+    def dispatch(self, method, target, body):
+        """
+        Answers one API request.
+
+        Returns:
+            tuple: (HTTP status, JSON-serialisable response or None).
+        """
+        fault = self.faults.status_fault()
+        if fault is not None:
+            self.count(f'fault_{fault}')
+            return fault, self._error(fault)
+
+        split = urlsplit(target)
+        if split.path == FREEBUSY_PATH and method == 'POST':
+            try:
+                response = self.store.freebusy(json.loads(body or b'{}'))
+            except (ApiError, ValueError) as e:
+                self.count('error_400')
+                return 400, self._error(400, str(e))
+            self.count('freebusy')
+            return 200, response
+        match = EVENTS_PATH.match(split.path)
+        if match is None:
+            return 404, self._error(404)
+        calendar_id = unquote(match.group(1))
+        event_id = unquote(match.group(2)) if match.group(2) else None
+        query = {key: values[-1] for key, values in parse_qs(split.query).items()}
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            return 400, self._error(400)
+
+        try:
+            store = self.store
+            if event_id is None and method == 'POST':
+                name, status, response = 'insert', 200, store.insert(calendar_id, payload)
+            elif event_id is None and method == 'GET':
+                name, status = 'list', 200
+                response = store.list(calendar_id, query.get('syncToken'), query.get('pageToken'),
+                                      int(query.get('maxResults', 250)), query.get('showDeleted') == 'true')
+            elif method == 'GET':
+                name, status, response = 'get', 200, store.get(calendar_id, event_id)
+            elif method == 'PUT':
+                name, status, response = 'update', 200, store.update(calendar_id, event_id, payload)
+            elif method == 'PATCH':
+                name, status, response = 'patch', 200, store.patch(calendar_id, event_id, payload)
+            elif method == 'DELETE':
+                store.delete(calendar_id, event_id)
+                name, status, response = 'delete', 204, None
+            else:
+                return 405, self._error(400, "Method not allowed")
+        except ApiError as e:
+            self.count(f'error_{e.status}')
+            return e.status, self._error(e.status, str(e))
+        self.count(name)
+        return status, response
+
+    def batch(self, content_type, body):
+        """
+        Answers a multipart/mixed batch request, running each part through dispatch().
+
+        Returns:
+            tuple: (response boundary, response body).
+        """
+        self.count('batch')
+        message = email.message_from_bytes(b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body)
+        boundary = f"batch_{uuid.uuid4().hex}"
+        output = []
+        for part in message.get_payload() if message.is_multipart() else []:
+            raw = part.get_payload(decode=True) or b''
+            # Each part is a serialised HTTP request: request line, headers, blank line, body.
+            head, inner_body = (re.split(rb'\r?\n\r?\n', raw, maxsplit=1) + [b''])[:2]
+            method, target = head.split(b'\n', 1)[0].decode('latin-1').split(' ')[:2]
+            status, response = self.dispatch(method, target, inner_body)
+            data = json.dumps(response) if response is not None else ''
+            content_id = (part.get('Content-ID') or '').strip('<>')
+            output.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {REASONS.get(status, ('', 'OK'))[1]}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\nContent-Length: {len(data.encode('utf-8'))}\r\n\r\n"
+                f"{data}\r\n")
+        output.append(f"--{boundary}--\r\n")
+        return boundary, ''.join(output).encode('utf-8')
+
+    def _error(self, status, message=None):
+        reason, default = REASONS.get(status, ('error', "Error"))
+        message = message or default
+        return {'error': {'code': status, 'message': message,
+                          'errors': [{'domain': 'global', 'reason': reason, 'message': message}]}}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Google Calendar API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', default='0',
+                        help="milliseconds: N, fixed:N, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA")
+    parser.add_argument('--error-429', type=float, default=0.0, help="share of requests rate limited")
+    parser.add_argument('--error-5xx', type=float, default=0.0, help="share of requests failing with 500/503")
+    parser.add_argument('--drop', type=float, default=0.0, help="share of connections dropped without an answer")
+    parser.add_argument('--drop-after', type=float, default=0.0,
+                        help="share of requests applied but whose answer is dropped")
+    parser.add_argument('--burst', default=None, metavar='PERIOD:LENGTH',
+                        help="answer everything with 503 for LENGTH seconds every PERIOD seconds")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    burst_period, burst_length = (float(part) for part in args.burst.split(':')) if args.burst else (0.0, 0.0)
+    faults = FaultProfile(args.latency, args.error_429, args.error_5xx, args.drop, args.drop_after,
+                          burst_period, burst_length, args.seed)
+    server = FakeCalendarServer(args.host, args.port, faults, verbose=args.verbose)
+    print(f"Fake Google Calendar listening on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+#@brief: Cached free/busy index of the user's Google Calendar.
+# The busy windows of the next hours are fetched with one freebusy().query per refresh and
+# kept as sorted, merged intervals, so "how long am I free from now?" is a bisect over a
+# couple of lists, answered in microseconds without touching the network. Refreshes run on
+# the calendar sync worker whenever the index gets older than its TTL, and after the app's
+# own writes have changed the calendar; lookups are made on the GUI thread when a session
+# is about to start.
+
+import bisect
+import threading
+import time
+from datetime import datetime, timezone
+
+from calendar_sync import is_retryable
+
+# Seconds an index is refreshed after; lookups still use it for up to twice as long.
+DEFAULT_TTL = 300
+
+# How far ahead of now the busy windows are fetched.
+DEFAULT_HORIZON = 12 * 60 * 60
+
+# Seconds to wait before trying again after a refresh failed with a retryable error; other
+# errors, such as a token without the free/busy scope, wait a whole TTL.
+RETRY_DELAY = 60
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def _rfc3339(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+class FreeBusyError(Exception):
+    """
+    Raised when Google Calendar reports an error for the queried calendar.
+    """
+
+
+class FreeBusyIndex:
+    """
+    Busy intervals of one calendar over a fixed window, merged and sorted for bisect lookups.
+
+    An index is never modified after it is built; a refresh builds a new one.
+    """
+
+    def __init__(self, intervals, window_start, window_end, fetched_at):
+        """
+        Initializes the index.
+
+        Args:
+            intervals (iterable): (start, end) Unix-time pairs, in any order and possibly overlapping.
+            window_start (float): Start of the queried window.
+            window_end (float): End of the queried window; nothing is known beyond it.
+            fetched_at (float): Unix time the intervals were fetched.
+        """
+        self.window_start = window_start
+        self.window_end = window_end
+        self.fetched_at = fetched_at
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if end <= start:
+                continue
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    @classmethod
+    def from_response(cls, response, calendar_id, window_start, window_end, fetched_at):
+        """
+        Builds an index from a freebusy().query response.
+
+        Raises:
+            FreeBusyError: If the calendar is missing from the response or reports errors.
+        """
+        calendar = (response.get('calendars') or {}).get(calendar_id)
+        if calendar is None:
+            raise FreeBusyError(f"No free/busy information for calendar {calendar_id!r}")
+        if calendar.get('errors'):
+            reasons = ', '.join(error.get('reason', 'unknown') for error in calendar['errors'])
+            raise FreeBusyError(f"Free/busy query for calendar {calendar_id!r} failed: {reasons}")
+        intervals = [(_timestamp(busy['start']), _timestamp(busy['end'])) for busy in calendar.get('busy', ())]
+        return cls(intervals, window_start, window_end, fetched_at)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def busy_at(self, ts):
+        """
+        Returns the (start, end) busy interval containing ts, or None if ts is free.
+        """
+        index = bisect.bisect_right(self.starts, ts) - 1
+        if index >= 0 and ts < self.ends[index]:
+            return self.starts[index], self.ends[index]
+        return None
+
+    def next_busy(self, ts):
+        """
+        Returns the first (start, end) busy interval that has not ended at ts, or None.
+        """
+        index = bisect.bisect_right(self.ends, ts)
+        if index < len(self.starts):
+            return self.starts[index], self.ends[index]
+        return None
+
+    def free_until(self, ts):
+        """
+        Returns the end of the free gap starting at ts.
+
+        Returns:
+            float: ts itself if ts is busy, the start of the next busy interval, or the end of
+            the window if nothing is busy until then.
+        """
+        busy = self.next_busy(ts)
+        if busy is None:
+            return max(ts, self.window_end)
+        return max(ts, busy[0])
+
+    def overlaps(self, start, end):
+        """
+        Returns the busy intervals overlapping [start, end), in order.
+        """
+        first = bisect.bisect_right(self.ends, start)
+        last = bisect.bisect_left(self.starts, end)
+        return list(zip(self.starts[first:last], self.ends[first:last]))
+
+
+class FreeBusyCache:
+    """
+    Holds the newest FreeBusyIndex of a calendar and knows when it is due for a refresh.
+
+    refresh() is called by the calendar sync worker with the service it owns; lookups run
+    on any thread and only read the current index, which is replaced as a whole.
+    """
+
+    def __init__(self, calendar_id='primary', ttl=DEFAULT_TTL, horizon=DEFAULT_HORIZON, on_update=None,
+                 clock=time.time):
+        """
+        Initializes an empty cache.
+
+        Args:
+            calendar_id (str): The calendar whose busy windows are fetched.
+            ttl (float): Seconds after which the index is refreshed.
+            horizon (float): Seconds ahead of now covered by each refresh.
+            on_update (callable): Called as on_update(index) after each successful refresh,
+                on the worker thread.
+            clock (callable): Returns the current Unix time.
+        """
+        self.calendar_id = calendar_id
+        self.ttl = ttl
+        self.horizon = horizon
+        self.on_update = on_update
+        self.clock = clock
+
+        self._index = None
+        self._refresh_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshes = 0
+        self._failures = 0
+        self._last_error = None
+        self._last_refresh_latency = None
+        self._lookups = 0
+
+    @property
+    def index(self):
+        """
+        Returns the current index, or None if none was fetched or it has expired.
+        """
+        index = self._index
+        if index is None or self.clock() - index.fetched_at > 2 * self.ttl:
+            return None
+        return index
+
+    def refresh_delay(self):
+        """
+        Returns the seconds until the next refresh is due; 0 or less means now.
+        """
+        return self._refresh_at - self.clock()
+
+    def invalidate(self):
+        """
+        Makes a refresh due now, e.g. after the app wrote to the calendar. The current index
+        stays in use until the refresh replaces it.
+        """
+        self._refresh_at = 0.0
+
+    def refresh(self, service):
+        """
+        Fetches the busy windows from now to now + horizon with a single freebusy().query.
+
+        Failures are not raised: the previous index stays in use until it expires and the
+        refresh is retried later.
+
+        Args:
+            service (googleapiclient.discovery.Resource): The Calendar service.
+
+        Returns:
+            bool: True if the index was replaced.
+        """
+        now = self.clock()
+        window_end = now + self.horizon
+        body = {
+            'timeMin': _rfc3339(now),
+            'timeMax': _rfc3339(window_end),
+            'items': [{'id': self.calendar_id}],
+        }
+        began = time.perf_counter()
+        try:
+            response = service.freebusy().query(body=body).execute()
+            index = FreeBusyIndex.from_response(response, self.calendar_id, now, window_end, now)
+        except Exception as e:
+            with self._lock:
+                self._failures += 1
+                self._last_error = str(e)
+            self._refresh_at = self.clock() + (RETRY_DELAY if is_retryable(e) else self.ttl)
+            print(f"Free/busy refresh error: {str(e)}")
+            return False
+
+        self._index = index
+        self._refresh_at = now + self.ttl
+        with self._lock:
+            self._refreshes += 1
+            self._last_error = None
+            self._last_refresh_latency = time.perf_counter() - began
+        if self.on_update is not None:
+            try:
+                self.on_update(index)
+            except Exception as e:
+                print(f"Free/busy update callback error: {str(e)}")
+        return True
+
+    def free_seconds(self, ts=None):
+        """
+        Returns how long the calendar is free from ts (default now), from the cached index only.
+
+        Returns:
+            tuple: (seconds, busy) where busy is the (start, end) interval the gap ends at, or
+            None if the calendar is free until the end of the index window. Returns (None, None)
+            if there is no usable index.
+        """
+        ts = self.clock() if ts is None else ts
+        index = self.index
+        self._lookups += 1
+        if index is None or not index.window_start <= ts < index.window_end:
+            return None, None
+        busy = index.next_busy(ts)
+        return index.free_until(ts) - ts, busy
+
+    def stats(self):
+        index = self._index
+        with self._lock:
+            return {
+                'refreshes': self._refreshes,
+                'failures': self._failures,
+                'last_error': self._last_error,
+                'last_refresh_latency': self._last_refresh_latency,
+                'lookups': self._lookups,
+                'busy_intervals': len(index) if index is not None else None,
+                'age': self.clock() - index.fetched_at if index is not None else None,
+            }
@@ -0,0 +1,635 @@
+#@brief: Streaming export and import of the session history as ICS or CSV.
+# Exports every recorded session to an iCalendar (.ics) or CSV file, and imports such files,
+# e.g. to move the history to another machine or to backfill focus logs kept elsewhere:
+#     python -m history_io export sessions.ics
+#     python -m history_io export sessions.csv --since 2024-01-01
+#     python -m history_io import old_log.csv --calendar
+# Both directions stream: sessions are read from the store in pages and written line by line,
+# and import files are parsed one line or row at a time and recorded in chunks, so memory stays
+# flat however long the history is. Imported sessions are deduplicated by their uid against the
+# history and the rest of the file. With --calendar, new sessions are also added to Google
+# Calendar through the sync engine, in batched requests; writes that fail for a retryable
+# reason stay in the calendar journal and are sent by the desktop app when it next connects.
+
+import argparse
+import csv
+import hashlib
+import os
+import re
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from calendar_sync import (REPLAY_BATCH_SIZE, CalendarOperation, merge_event_body, session_event_body,
+                           session_times_patch)
+from session_store import SessionRecord, SessionStore
+
+CSV_COLUMNS = ('uid', 'aim', 'start', 'end', 'planned_seconds', 'actual_seconds', 'paused_seconds',
+               'pause_count', 'auto_pause_count', 'end_reason', 'prompt', 'event_id', 'pauses')
+
+PRODID = '-//Self Remembering App//Session History//EN'
+# Prefix of the iCalendar properties that carry what a plain event cannot.
+ICS_PREFIX = 'X-SELFREMEMBERING-'
+
+# Google Calendar event ids: 5 to 1024 characters of base32hex.
+EVENT_ID = re.compile(r'^[a-v0-9]{5,1024}$')
+ICS_DURATION = re.compile(r'^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+ICS_UNESCAPE = re.compile(r'\\([\\;,nN])')
+
+# Time zones already reported as unknown, so a large file reports each only once.
+_unknown_zones = set()
+
+
+class HistoryFormatError(ValueError):
+    """
+    Raised when a file cannot be exported to or imported from.
+    """
+
+
+def detect_format(path, fmt=None):
+    """
+    Returns 'ics' or 'csv': fmt if given, else from the file's extension.
+
+    Raises:
+        HistoryFormatError: If neither tells the format.
+    """
+    fmt = fmt or {'.ics': 'ics', '.ical': 'ics', '.ifb': 'ics', '.csv': 'csv'}.get(os.path.splitext(path)[1].lower())
+    if fmt not in ('ics', 'csv'):
+        raise HistoryFormatError(f"Cannot tell the format of {path}; pass --format ics or --format csv")
+    return fmt
+
+
+def stable_uid(start_ts, end_ts, aim):
+    """
+    Derives a uid for an imported session that has none, the same on every import of it.
+    """
+    digest = hashlib.sha1(f"{round(start_ts)}|{round(end_ts)}|{aim}".encode('utf-8')).hexdigest()
+    return f"import-{digest[:32]}"
+
+
+def calendar_event_id(uid):
+    """
+    Returns the calendar event id for a session: its uid where that is a valid event id, as for
+    the app's own sessions, else one derived from it, so importing twice never adds two events.
+    """
+    if EVENT_ID.match(uid):
+        return uid
+    return hashlib.sha1(uid.encode('utf-8')).hexdigest()
+
+
+def ics_time(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def ics_escape(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def ics_unescape(text):
+    if '\\' not in text:
+        return text
+    return ICS_UNESCAPE.sub(lambda match: '\n' if match.group(1) in 'nN' else match.group(1), text)
+
+
+def ics_fold(line):
+    """
+    Folds a content line into lines of at most 75 octets, as RFC 5545 asks.
+    """
+    if len(line) <= 75 and line.isascii():
+        return line
+    parts = []
+    current = ''
+    size = 0
+    limit = 75
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > limit:
+            parts.append(current)
+            current, size, limit = '', 0, 74
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n '.join(parts)
+
+
+def iso_time(ts):
+    return datetime.fromtimestamp(ts).astimezone().isoformat(timespec='seconds')
+
+
+def parse_iso_time(value):
+    """
+    Parses an ISO 8601 time, local if it has no offset, or a Unix time.
+
+    Raises:
+        ValueError: If the value is neither.
+    """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    return datetime.fromisoformat(value.strip()).timestamp()
+
+
+def format_pauses(pauses, format_time):
+    """
+    Formats pauses as "paused_at/resumed_at/auto;...", with "manual" for pauses by hand.
+    """
+    return ';'.join(f"{format_time(paused)}/{format_time(resumed) if resumed else ''}/"
+                    f"{'auto' if automatic else 'manual'}" for paused, resumed, automatic in pauses)
+
+
+def parse_pauses_text(text, parse_time):
+    """
+    Parses the text written by format_pauses().
+
+    Raises:
+        ValueError: If the text is malformed.
+    """
+    pauses = []
+    for pause in (text or '').split(';'):
+        if pause:
+            paused, resumed, kind = pause.split('/')
+            pauses.append((parse_time(paused), parse_time(resumed) if resumed else None, kind == 'auto'))
+    return pauses
+
+
+def ics_lines(sessions):
+    """
+    Yields the lines of an iCalendar file with one event per session, without line endings.
+
+    Args:
+        sessions (iterable): SessionRecord objects.
+    """
+    yield 'BEGIN:VCALENDAR'
+    yield 'VERSION:2.0'
+    yield f'PRODID:{PRODID}'
+    yield 'CALSCALE:GREGORIAN'
+    for session in sessions:
+        yield 'BEGIN:VEVENT'
+        yield ics_fold(f'UID:{ics_escape(session.uid)}')
+        yield f'DTSTAMP:{ics_time(session.end_ts)}'
+        yield f'DTSTART:{ics_time(session.start_ts)}'
+        yield f'DTEND:{ics_time(session.end_ts)}'
+        yield ics_fold(f'SUMMARY:{ics_escape(session.aim)}')
+        yield f'{ICS_PREFIX}PLANNED-SECONDS:{session.planned_seconds}'
+        yield f'{ICS_PREFIX}FOCUSED-SECONDS:{session.actual_seconds:.3f}'
+        yield f'{ICS_PREFIX}END-REASON:{session.end_reason}'
+        if session.pauses:
+            yield ics_fold(f'{ICS_PREFIX}PAUSES:{format_pauses(session.pauses, ics_time)}')
+        if session.prompt:
+            yield ics_fold(f'{ICS_PREFIX}PROMPT:{ics_escape(session.prompt)}')
+        if session.event_id:
+            yield ics_fold(f'{ICS_PREFIX}EVENT-ID:{ics_escape(session.event_id)}')
+        yield 'END:VEVENT'
+    yield 'END:VCALENDAR'
+
+
+def csv_rows(sessions):
+    """
+    Yields the header and one row per session of the CSV export.
+
+    Args:
+        sessions (iterable): SessionRecord objects.
+    """
+    yield CSV_COLUMNS
+    for session in sessions:
+        yield (session.uid, session.aim, iso_time(session.start_ts), iso_time(session.end_ts),
+               session.planned_seconds, f'{session.actual_seconds:.3f}', f'{session.paused_seconds:.3f}',
+               len(session.pauses), session.auto_pause_count, session.end_reason, session.prompt or '',
+               session.event_id or '', format_pauses(session.pauses, iso_time))
+
+
+def write_sessions(sessions, stream, fmt):
+    """
+    Writes sessions to an open text stream, one line at a time.
+
+    Args:
+        sessions (iterable): SessionRecord objects, e.g. SessionStore.iter_sessions().
+        stream (file): Opened with newline='', since the formats choose their own line endings.
+        fmt (str): 'ics' or 'csv'.
+
+    Returns:
+        int: The number of sessions written.
+    """
+    count = 0
+
+    def counted():
+        nonlocal count
+        for session in sessions:
+            count += 1
+            yield session
+
+    if fmt == 'ics':
+        for line in ics_lines(counted()):
+            stream.write(line + '\r\n')
+    else:
+        csv.writer(stream).writerows(csv_rows(counted()))
+    return count
+
+
+def unfolded_lines(stream):
+    """
+    Yields the content lines of an iCalendar stream with folded lines joined again.
+    """
+    pending = None
+    for raw in stream:
+        line = raw.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and pending is not None:
+            pending += line[1:]
+            continue
+        if pending:
+            yield pending
+        pending = line
+    if pending:
+        yield pending
+
+
+def parse_content_line(line):
+    """
+    Splits an iCalendar content line into its upper-cased name, its parameters and its value.
+    """
+    head, _, value = line.partition(':')
+    if '"' in head:
+        # A quoted parameter value may itself contain a colon.
+        quoted = False
+        for index, char in enumerate(line):
+            if char == '"':
+                quoted = not quoted
+            elif char == ':' and not quoted:
+                head, value = line[:index], line[index + 1:]
+                break
+    name, *params = head.split(';')
+    return name.upper(), dict(param.partition('=')[::2] for param in params), value
+
+
+def parse_ics_time(value, params):
+    """
+    Returns the Unix time of an iCalendar DATE-TIME, or None for an all-day DATE.
+
+    Raises:
+        ValueError: If the value is not a date or date-time.
+    """
+    if params.get('VALUE', '').upper() == 'DATE' or len(value) == 8:
+        return None
+    if len(value) not in (15, 16) or value[8] != 'T':
+        raise ValueError(f"Invalid date-time {value!r}")
+    # Sliced by hand: strptime() would be most of the cost of reading a large file.
+    moment = datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                      int(value[9:11]), int(value[11:13]), int(value[13:15]))
+    if value.endswith('Z'):
+        return moment.replace(tzinfo=timezone.utc).timestamp()
+    tzid = params.get('TZID', '').strip('"')
+    if tzid:
+        try:
+            from zoneinfo import ZoneInfo
+            moment = moment.replace(tzinfo=ZoneInfo(tzid))
+        except (ImportError, ValueError, KeyError) as e:
+            # An unknown zone, e.g. one defined only in the file's VTIMEZONE; read it as local time.
+            if tzid not in _unknown_zones:
+                _unknown_zones.add(tzid)
+                print(f"Unknown time zone {tzid}, using local time: {str(e)}")
+    return moment.timestamp()
+
+
+def parse_ics_duration(value):
+    match = ICS_DURATION.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid duration {value!r}")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    total = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                      minutes=int(minutes or 0), seconds=int(seconds or 0)).total_seconds()
+    return -total if sign == '-' else total
+
+
+def event_to_session(properties):
+    """
+    Turns the properties of a VEVENT into a session.
+
+    Events exported by this app come back as they were; other events become completed
+    sessions that were focused for their whole length.
+
+    Args:
+        properties (dict): Property name -> (parameters, value), as parse_content_line() gives them.
+
+    Returns:
+        SessionRecord: The session, or None for a cancelled or all-day event or one without times.
+    """
+    def text(name, default=None):
+        return ics_unescape(properties[name][1]) if name in properties else default
+
+    if text('STATUS', '').upper() == 'CANCELLED' or 'DTSTART' not in properties:
+        return None
+    start = parse_ics_time(properties['DTSTART'][1], properties['DTSTART'][0])
+    if start is None:
+        return None
+    if 'DTEND' in properties:
+        end = parse_ics_time(properties['DTEND'][1], properties['DTEND'][0])
+    elif 'DURATION' in properties:
+        end = start + parse_ics_duration(properties['DURATION'][1])
+    else:
+        return None
+    if end is None or end <= start:
+        return None
+
+    aim = text('SUMMARY', '')
+    pauses = parse_pauses_text(text(ICS_PREFIX + 'PAUSES'), lambda value: parse_ics_time(value, {}))
+    focused = text(ICS_PREFIX + 'FOCUSED-SECONDS')
+    record = SessionRecord(
+        text('UID') or stable_uid(start, end, aim), aim, start, end,
+        int(text(ICS_PREFIX + 'PLANNED-SECONDS') or round(end - start)), 0.0, pauses,
+        text(ICS_PREFIX + 'END-REASON', SessionRecord.COMPLETED), text(ICS_PREFIX + 'PROMPT'),
+        text(ICS_PREFIX + 'EVENT-ID'))
+    record.actual_seconds = float(focused) if focused else end - start - record.paused_seconds
+    if record.end_reason not in (SessionRecord.COMPLETED, SessionRecord.STOPPED):
+        record.end_reason = SessionRecord.COMPLETED
+    return record
+
+
+def read_ics(stream):
+    """
+    Parses an iCalendar stream one line at a time.
+
+    Yields:
+        SessionRecord: One per VEVENT, or None for an event that is not a session.
+    """
+    properties = None
+    nested = 0
+    for line in unfolded_lines(stream):
+        upper = line.upper()
+        if upper == 'BEGIN:VEVENT':
+            properties, nested = {}, 0
+        elif properties is None:
+            continue
+        elif upper == 'END:VEVENT':
+            try:
+                yield event_to_session(properties)
+            except ValueError as e:
+                print(f"Skipping event {properties.get('UID', ({}, '?'))[1]}: {str(e)}")
+                yield None
+            properties = None
+        elif upper.startswith('BEGIN:'):
+            # An alarm or other component inside the event; its properties are not the event's.
+            nested += 1
+        elif upper.startswith('END:'):
+            nested -= 1
+        elif not nested:
+            name, params, value = parse_content_line(line)
+            properties.setdefault(name, (params, value))
+
+
+def read_csv(stream):
+    """
+    Parses a CSV stream one row at a time.
+
+    Only the start and end columns are required. Rows without a uid get a stable one, and
+    the other columns default as for an event from another calendar.
+
+    Yields:
+        SessionRecord: One per row, or None for a row that cannot be read.
+
+    Raises:
+        HistoryFormatError: If the header has no start or end column.
+    """
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames or not {'start', 'end'} <= set(reader.fieldnames):
+        raise HistoryFormatError("A CSV import needs at least a start and an end column")
+    for row in reader:
+        try:
+            start = parse_iso_time(row['start'])
+            end = parse_iso_time(row['end'])
+            aim = row.get('aim') or ''
+            pauses = parse_pauses_text(row.get('pauses'), parse_iso_time)
+            record = SessionRecord(
+                row.get('uid') or stable_uid(start, end, aim), aim, start, end,
+                int(float(row.get('planned_seconds') or round(end - start))), 0.0, pauses,
+                row.get('end_reason') or SessionRecord.COMPLETED, row.get('prompt') or None,
+                row.get('event_id') or None)
+            focused = row.get('actual_seconds')
+            record.actual_seconds = float(focused) if focused else end - start - record.paused_seconds
+        except ValueError as e:
+            print(f"Skipping CSV line {reader.line_num}: {str(e)}")
+            yield None
+            continue
+        if end <= start or record.end_reason not in (SessionRecord.COMPLETED, SessionRecord.STOPPED):
+            print(f"Skipping CSV line {reader.line_num}: not a valid session")
+            yield None
+            continue
+        yield record
+
+
+def read_sessions(stream, fmt):
+    return read_ics(stream) if fmt == 'ics' else read_csv(stream)
+
+
+def calendar_operation(session):
+    """
+    Builds the insert of an imported session's calendar event, at the times it actually ran.
+    """
+    event_id = calendar_event_id(session.uid)
+    body = session_event_body(event_id, session.aim, session.start_ts, session.planned_seconds)
+    body = merge_event_body(body, session_times_patch(session.start_ts, session.end_ts))
+    # Reminders for a session that is long over would only be noise.
+    body['reminders'] = {'useDefault': False, 'overrides': []}
+    return CalendarOperation(CalendarOperation.INSERT, session.uid, body)
+
+
+def wait_for_calendar(calendar, max_depth):
+    """
+    Waits until the sync engine has no more than max_depth batches queued or in flight.
+    """
+    while calendar.depth() > max_depth:
+        time.sleep(0.01)
+
+
+def import_sessions(sessions, store, calendar=None, chunk_size=1000, max_calendar_depth=4):
+    """
+    Records the sessions the store does not have yet, chunk by chunk.
+
+    Each chunk is checked against the store and committed before the next one is read, so
+    uids repeated anywhere in the input are imported once and memory holds one chunk.
+
+    Args:
+        sessions (iterable): SessionRecord objects, or None for unreadable entries.
+        store (SessionStore): The history to import into.
+        calendar (CalendarSyncEngine): Adds a calendar event for every new session that has
+            none yet, or None. Reading waits while it has more than max_calendar_depth batches.
+        chunk_size (int): Sessions checked and recorded together.
+        max_calendar_depth (int): Batches the calendar may have outstanding.
+
+    Returns:
+        dict: Counts of sessions 'read', 'imported', 'duplicates', 'skipped' and sent to the 'calendar'.
+    """
+    counts = {'read': 0, 'imported': 0, 'duplicates': 0, 'skipped': 0, 'calendar': 0}
+
+    def flush(chunk):
+        known = store.known_uids(session.uid for session in chunk)
+        new = []
+        for session in chunk:
+            if session.uid in known:
+                counts['duplicates'] += 1
+            else:
+                known.add(session.uid)
+                new.append(session)
+
+        if calendar is not None:
+            operations = []
+            for session in new:
+                if session.event_id is None:
+                    operation = calendar_operation(session)
+                    session.event_id = operation.body['id']
+                    operations.append(operation)
+            for start in range(0, len(operations), REPLAY_BATCH_SIZE):
+                wait_for_calendar(calendar, max_calendar_depth)
+                if calendar.submit_batch(operations[start:start + REPLAY_BATCH_SIZE]):
+                    counts['calendar'] += len(operations[start:start + REPLAY_BATCH_SIZE])
+
+        for session in new:
+            store.record(session)
+        store.flush()
+        counts['imported'] += len(new)
+
+    chunk = []
+    for session in sessions:
+        counts['read'] += 1
+        if session is None:
+            counts['skipped'] += 1
+            continue
+        chunk.append(session)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    return counts
+
+
+def connect_calendar(on_result=None, on_error=None):
+    """
+    Starts a calendar sync engine on the desktop app's calendar connection.
+
+    Uses calendar_api_endpoint if it is set, else the Google sign-in stored by the desktop
+    app; no browser login is started.
+
+    Returns:
+        tuple: (CalendarSyncEngine, CalendarJournal, CredentialManager or None).
+
+    Raises:
+        CredentialError: If there is no usable sign-in.
+    """
+    import httplib2
+
+    from app_settings import load_settings
+    from calendar_journal import CalendarJournal
+    from calendar_sync import CalendarSyncEngine
+    from credentials import CredentialManager, build_calendar_service
+    from resources import resource_path
+
+    discovery_path = resource_path('discovery', 'calendar.v3.json')
+    endpoint = load_settings()['calendar_api_endpoint']
+    credentials = None
+    if endpoint:
+        service = build_calendar_service(httplib2.Http(timeout=30), discovery_path, endpoint)
+    else:
+        credentials = CredentialManager(resource_path('client_secret.json'))
+        credentials.authorize(interactive=False)
+        service = credentials.build_service(discovery_path)
+        credentials.start()
+    # The import only sends its own events; the rest of the journal belongs to the desktop app.
+    journal = CalendarJournal()
+    calendar = CalendarSyncEngine(service, on_result=on_result, on_error=on_error, journal=journal, replay=False)
+    return calendar, journal, credentials
+
+
+def run_export(args):
+    fmt = detect_format(args.path, args.format) if args.path != '-' else args.format or 'csv'
+    since = datetime.combine(date.fromisoformat(args.since), datetime.min.time()).timestamp() if args.since else None
+    store = SessionStore(args.db) if args.db else SessionStore()
+    began = time.perf_counter()
+    try:
+        if args.path == '-':
+            sys.stdout.reconfigure(newline='')
+            count = write_sessions(store.iter_sessions(since), sys.stdout, fmt)
+        else:
+            with open(args.path, 'w', encoding='utf-8', newline='') as stream:
+                count = write_sessions(store.iter_sessions(since), stream, fmt)
+    finally:
+        store.close()
+    print(f"Exported {count} sessions in {time.perf_counter() - began:.1f} s", file=sys.stderr)
+    return 0
+
+
+def run_import(args):
+    fmt = detect_format(args.path, args.format)
+    results = {'ok': 0, 'deferred': 0, 'failed': 0}
+
+    # The engine remembers every event id it created; an import only needs them until sent.
+    def on_result(operation, response):
+        results['ok'] += 1
+        calendar.forget(operation.session_key)
+
+    def on_error(operation, error):
+        calendar.forget(operation.session_key)
+        if operation.deferred:
+            results['deferred'] += 1
+        else:
+            results['failed'] += 1
+            print(f"Calendar event for {operation.session_key} failed: {str(error)}")
+
+    calendar = journal = credentials = None
+    if args.calendar:
+        try:
+            calendar, journal, credentials = connect_calendar(on_result, on_error)
+        except Exception as e:
+            print(f"Calendar unavailable, nothing imported: {str(e)}")
+            return 1
+
+    store = SessionStore(args.db) if args.db else SessionStore()
+    began = time.perf_counter()
+    try:
+        with open(args.path, encoding='utf-8-sig', newline='') as stream:
+            counts = import_sessions(read_sessions(stream, fmt), store, calendar)
+        if calendar is not None:
+            wait_for_calendar(calendar, 0)
+    finally:
+        if calendar is not None:
+            calendar.shutdown()
+            journal.close()
+        if credentials is not None:
+            credentials.close()
+        store.close()
+
+    print(f"Imported {counts['imported']} of {counts['read']} sessions in {time.perf_counter() - began:.1f} s: "
+          f"{counts['duplicates']} already recorded, {counts['skipped']} skipped")
+    if args.calendar:
+        print(f"Calendar: {counts['calendar']} events sent, {results['ok']} added, {results['failed']} failed, "
+              f"{results['deferred']} left in the journal for the desktop app to send")
+    return 0
+
+
+def main(argv=None):
+    """
+    Entry point of python -m history_io.
+    """
+    parser = argparse.ArgumentParser(prog='python -m history_io', description="Export or import the session history.")
+    parser.add_argument('--db', help="the history database (default: ~/.mindapp/sessions.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="write every session to an .ics or .csv file")
+    export.add_argument('path', help="the file to write, or - for standard output")
+    export.add_argument('--format', choices=('ics', 'csv'), help="default: from the file's extension")
+    export.add_argument('--since', help="only sessions from this date (YYYY-MM-DD) on")
+    load = commands.add_parser('import', help="add the sessions of an .ics or .csv file to the history")
+    load.add_argument('path', help="the file to read")
+    load.add_argument('--format', choices=('ics', 'csv'), help="default: from the file's extension")
+    load.add_argument('--calendar', action='store_true',
+                      help="also add the new sessions to Google Calendar, using the desktop app's sign-in")
+    args = parser.parse_args(argv)
+
+    try:
+        return run_export(args) if args.command == 'export' else run_import(args)
+    except (ValueError, OSError) as e:
+        print(f"History {args.command} error: {str(e)}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#@brief: System-wide idle time sources for inactivity detection.
+# A backend reports how long the whole desktop session has been without input, so that
+# working in another application does not count as being away. Backends are optional;
+# detect_idle_backend() returns None where no system idle source is available.
+
+import ctypes
+import ctypes.util
+import os
+import sys
+
+
+class _XScreenSaverInfo(ctypes.Structure):
+    _fields_ = [
+        ('window', ctypes.c_ulong),
+        ('state', ctypes.c_int),
+        ('kind', ctypes.c_int),
+        ('til_or_since', ctypes.c_ulong),
+        ('idle', ctypes.c_ulong),
+        ('event_mask', ctypes.c_ulong),
+    ]
+
+
+class X11IdleBackend:
+    """
+    Reads the X server's idle time through the XScreenSaver extension (libXss).
+    """
+
+    def __init__(self):
+        """
+        Connects to the X display.
+
+        Raises:
+            OSError: If libX11/libXss or the display are not available.
+        """
+        x11_name = ctypes.util.find_library('X11')
+        xss_name = ctypes.util.find_library('Xss')
+        if not x11_name or not xss_name:
+            raise OSError("libX11 or libXss not found")
+
+        self._x11 = ctypes.cdll.LoadLibrary(x11_name)
+        self._xss = ctypes.cdll.LoadLibrary(xss_name)
+        self._x11.XOpenDisplay.restype = ctypes.c_void_p
+        self._x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self._x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        self._x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self._x11.XFree.argtypes = [ctypes.c_void_p]
+        self._xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(_XScreenSaverInfo)
+        self._xss.XScreenSaverQueryInfo.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XScreenSaverInfo)]
+
+        self._display = self._x11.XOpenDisplay(None)
+        if not self._display:
+            raise OSError("Cannot open X display")
+        self._root = self._x11.XDefaultRootWindow(self._display)
+        self._info = self._xss.XScreenSaverAllocInfo()
+
+    def idle_seconds(self):
+        """
+        Returns the seconds since the last input anywhere on the display, or None on failure.
+        """
+        if not self._xss.XScreenSaverQueryInfo(self._display, self._root, self._info):
+            return None
+        return self._info.contents.idle / 1000.0
+
+
+def detect_idle_backend():
+    """
+    Returns the best available system idle backend, or None if there is none.
+
+    Only X11 is supported; Wayland sessions and other platforms fall back to
+    in-app activity alone.
+    """
+    if not sys.platform.startswith('linux') or not os.environ.get('DISPLAY'):
+        return None
+    if os.environ.get('XDG_SESSION_TYPE') == 'wayland':
+        return None
+    try:
+        return X11IdleBackend()
+    except OSError:
+        return None
@@ -0,0 +1,301 @@
+#@brief: Rotating gallery of contemplative images.
+# Images come from a file or a directory of photos. They are decoded and scaled on a thread
+# pool with QImageReader, which can decode large JPEGs straight at the target size. Each
+# thumbnail is then cached on disk under ~/.mindapp/cache/thumbnails, keyed by path, mtime,
+# size and device pixel ratio. The GUI thread only turns the finished QImage into a QPixmap
+# and keeps recent pixmaps in an LRU cache within a byte budget. The next image is decoded
+# ahead of time, so switching images does not wait on the disk or a decoder.
+
+import collections
+import hashlib
+import os
+import random
+
+from PyQt6.QtCore import QObject, QRunnable, QSize, QThreadPool, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader, QPixmap
+
+THUMBNAIL_DIR = os.path.join(os.path.expanduser('~'), '.mindapp', 'cache', 'thumbnails')
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+
+
+def thumbnail_key(path, mtime_ns, size, device_pixel_ratio):
+    """
+    Returns the cache key of a thumbnail of path at the given logical size and pixel ratio.
+    """
+    text = f"{os.path.abspath(path)}|{mtime_ns}|{size.width()}x{size.height()}@{device_pixel_ratio:g}"
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def load_thumbnail(path, size, device_pixel_ratio, cache_dir=THUMBNAIL_DIR):
+    """
+    Returns the image scaled to fit size at the given pixel ratio, using the disk cache.
+
+    Safe to call from any thread: it only uses QImage and QImageReader.
+
+    Args:
+        path (str): The source image.
+        size (QSize): The logical size to fit, keeping the aspect ratio.
+        device_pixel_ratio (float): Physical pixels per logical pixel.
+        cache_dir (str): The thumbnail cache directory.
+
+    Returns:
+        QImage: The thumbnail.
+
+    Raises:
+        OSError: If the image cannot be read.
+    """
+    key = thumbnail_key(path, os.stat(path).st_mtime_ns, size, device_pixel_ratio)
+    for extension in ('.jpg', '.png'):
+        cached = os.path.join(cache_dir, key + extension)
+        if os.path.exists(cached):
+            image = QImage(cached)
+            if not image.isNull():
+                return image
+
+    box = QSize(round(size.width() * device_pixel_ratio), round(size.height() * device_pixel_ratio))
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    source_size = reader.size()
+    if source_size.isValid() and (source_size.width() > box.width() or source_size.height() > box.height()):
+        # Lets the JPEG decoder skip most of the work for large photos.
+        reader.setScaledSize(source_size.scaled(box, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        raise OSError(f"Cannot read image {path}: {reader.errorString()}")
+    if image.width() > box.width() or image.height() > box.height():
+        # Rotated photos, or formats that cannot decode at a scaled size.
+        image = image.scaled(box, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+
+    extension, image_format = ('.png', 'PNG') if image.hasAlphaChannel() else ('.jpg', 'JPG')
+    cached = os.path.join(cache_dir, key + extension)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        if image.save(cached + '.tmp', image_format, 90):
+            os.replace(cached + '.tmp', cached)
+    except OSError as e:
+        print(f"Thumbnail cache error: {str(e)}")
+    return image
+
+
+class GallerySignals(QObject):
+    """
+    Carries results from the thread pool back to the gallery on the GUI thread.
+    """
+
+    scanned = pyqtSignal(list)
+    decoded = pyqtSignal(str, float, QImage)
+    failed = pyqtSignal(str, float, str)
+
+
+class ScanTask(QRunnable):
+    """
+    Lists the images of the gallery's sources.
+    """
+
+    def __init__(self, sources, signals):
+        super().__init__()
+        self.sources = sources
+        self.signals = signals
+
+    def run(self):
+        paths = []
+        for source in self.sources:
+            if os.path.isdir(source):
+                for directory, _, names in os.walk(source):
+                    paths.extend(os.path.join(directory, name) for name in sorted(names)
+                                 if name.lower().endswith(IMAGE_EXTENSIONS))
+            elif os.path.isfile(source):
+                paths.append(source)
+        self.signals.scanned.emit(paths)
+
+
+class DecodeTask(QRunnable):
+    """
+    Produces one thumbnail off the GUI thread.
+    """
+
+    def __init__(self, path, size, device_pixel_ratio, cache_dir, signals):
+        super().__init__()
+        self.path = path
+        self.size = size
+        self.device_pixel_ratio = device_pixel_ratio
+        self.cache_dir = cache_dir
+        self.signals = signals
+
+    def run(self):
+        try:
+            image = load_thumbnail(self.path, self.size, self.device_pixel_ratio, self.cache_dir)
+        except OSError as e:
+            self.signals.failed.emit(self.path, self.device_pixel_ratio, str(e))
+        else:
+            self.signals.decoded.emit(self.path, self.device_pixel_ratio, image)
+
+
+class ImageGallery(QObject):
+    """
+    Shows the images of a file or directory one at a time, in shuffled order.
+
+    show_next() returns at once; image_changed is emitted with the pixmap when it is
+    ready, immediately if it is still in memory. unavailable is emitted when there is
+    no image that can be shown.
+    """
+
+    image_changed = pyqtSignal(QPixmap)
+    unavailable = pyqtSignal(str)
+
+    def __init__(self, sources, size=QSize(300, 150), memory_budget=32 * 1024 * 1024,
+                 cache_dir=THUMBNAIL_DIR, max_threads=2, parent=None):
+        """
+        Initializes the gallery. The sources are scanned on the first show_next().
+
+        Args:
+            sources (list): Image files and directories (searched recursively).
+            size (QSize): The logical size images are scaled to fit.
+            memory_budget (int): Maximum bytes of pixmaps kept in memory.
+            cache_dir (str): The thumbnail cache directory.
+            max_threads (int): Decoder threads.
+            parent (QObject): The Qt parent.
+        """
+        super().__init__(parent)
+        self.sources = list(sources)
+        self.size = size
+        self.memory_budget = memory_budget
+        self.cache_dir = cache_dir
+        self.device_pixel_ratio = 1.0
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.signals = GallerySignals(self)
+        self.signals.scanned.connect(self._on_scanned)
+        self.signals.decoded.connect(self._on_decoded)
+        self.signals.failed.connect(self._on_failed)
+
+        self.paths = None
+        self._scanning = False
+        self._bag = []
+        self._wanted = None
+        self._current = None
+        self._pending = set()
+        self._pixmaps = collections.OrderedDict()
+        self._memory = 0
+        self._hits = 0
+        self._misses = 0
+
+    def set_device_pixel_ratio(self, device_pixel_ratio):
+        self.device_pixel_ratio = float(device_pixel_ratio)
+
+    def show_next(self):
+        """
+        Switches to the next image and starts decoding the one after it.
+        """
+        if self.paths is None:
+            self._wanted = None
+            if not self._scanning:
+                self._scanning = True
+                self.pool.start(ScanTask(self.sources, self.signals))
+            return
+        if not self.paths:
+            self.unavailable.emit("Image not found.")
+            return
+        self.show(self._take())
+        self._decode(self._peek())
+
+    def show(self, path):
+        """
+        Switches to the given image.
+        """
+        key = (path, self.device_pixel_ratio)
+        self._wanted = key
+        self._current = path
+        entry = self._pixmaps.get(key)
+        if entry is not None:
+            self._hits += 1
+            self._pixmaps.move_to_end(key)
+            self.image_changed.emit(entry[0])
+        else:
+            self._misses += 1
+            self._decode(path)
+
+    def show_current(self):
+        """
+        Shows the current image again, e.g. after release(); the first image if there is none yet.
+        """
+        if self._current is None or (self.paths is not None and self._current not in self.paths):
+            self.show_next()
+        else:
+            self.show(self._current)
+
+    def release(self):
+        """
+        Drops the pixmaps kept in memory, e.g. while nothing is displayed. Thumbnails stay on disk.
+        """
+        self._pixmaps.clear()
+        self._memory = 0
+        self._wanted = None
+
+    def stats(self):
+        """
+        Returns the number of images, memory use and how often a switch found its pixmap ready.
+        """
+        return {
+            'images': len(self.paths) if self.paths is not None else None,
+            'pixmaps': len(self._pixmaps),
+            'memory_bytes': self._memory,
+            'hits': self._hits,
+            'misses': self._misses,
+        }
+
+    def _take(self):
+        if not self._bag:
+            self._refill()
+        return self._bag.pop()
+
+    def _peek(self):
+        if not self._bag:
+            self._refill()
+        return self._bag[-1]
+
+    def _refill(self):
+        last = self._wanted[0] if self._wanted else None
+        self._bag = list(self.paths)
+        random.shuffle(self._bag)
+        if len(self._bag) > 1 and self._bag[-1] == last:
+            # Never show the same image twice in a row across two rounds.
+            self._bag[0], self._bag[-1] = self._bag[-1], self._bag[0]
+
+    def _decode(self, path):
+        key = (path, self.device_pixel_ratio)
+        if key in self._pending or key in self._pixmaps:
+            return
+        self._pending.add(key)
+        self.pool.start(DecodeTask(path, self.size, self.device_pixel_ratio, self.cache_dir, self.signals))
+
+    def _on_scanned(self, paths):
+        self.paths = paths
+        self._scanning = False
+        self.show_next()
+
+    def _on_decoded(self, path, device_pixel_ratio, image):
+        key = (path, device_pixel_ratio)
+        self._pending.discard(key)
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(device_pixel_ratio)
+        cost = image.sizeInBytes()
+        self._pixmaps[key] = (pixmap, cost)
+        self._memory += cost
+        while self._memory > self.memory_budget and len(self._pixmaps) > 1:
+            _, (_, evicted) = self._pixmaps.popitem(last=False)
+            self._memory -= evicted
+        if key == self._wanted:
+            self.image_changed.emit(pixmap)
+
+    def _on_failed(self, path, device_pixel_ratio, message):
+        key = (path, device_pixel_ratio)
+        self._pending.discard(key)
+        print(f"Gallery error: {message}")
+        if path in self.paths:
+            self.paths.remove(path)
+        self._bag = [other for other in self._bag if other != path]
+        if key == self._wanted:
+            self.show_next()
@@ -0,0 +1,540 @@
+#@brief: In-process metrics for the Self Remembering App.
+# Counters, gauges and fixed-bucket histograms are cheap enough to update on hot paths: an
+# observation is a bisect and two additions under a lock. A background thread exports them
+# every minute to ~/.mindapp/metrics.prom in the Prometheus text format (written atomically,
+# so node_exporter's textfile collector can pick it up) or appends a snapshot to
+# ~/.mindapp/metrics.jsonl. The stall watchdog reports any stretch in which the GUI thread
+# stops processing events for longer than a threshold, together with the stack it was stuck in.
+
+import bisect
+import collections
+import json
+import math
+import os
+import sys
+import threading
+import time
+import traceback
+
+METRICS_DIR = os.path.join(os.path.expanduser('~'), '.mindapp')
+PROMETHEUS_PATH = os.path.join(METRICS_DIR, 'metrics.prom')
+JSONL_PATH = os.path.join(METRICS_DIR, 'metrics.jsonl')
+# A jsonl export larger than this is moved to metrics.jsonl.1, replacing the previous one.
+JSONL_MAX_BYTES = 5 * 1024 * 1024
+STALL_LOG_PATH = os.path.join(METRICS_DIR, 'logs', 'stalls.log')
+
+PREFIX = 'selfremembering_'
+
+# Upper bounds in seconds, from a fast local call to a slow network round trip.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# How late a timer wakeup may be, from scheduler noise to a blocked event loop.
+JITTER_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+# In-memory lookups made on the GUI thread, from a few microseconds to a stalled event loop.
+LOOKUP_BUCKETS = (0.000001, 0.000005, 0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.01)
+
+# Wall clock minus monotonic clock over a session; negative when the wall clock was set back.
+DRIFT_BUCKETS = (-60.0, -1.0, -0.1, -0.01, 0.01, 0.1, 1.0, 60.0, 3600.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Base of all metric types: a name, a help text and one series per label combination.
+    """
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def labels(self):
+        """
+        Returns the label values of every series recorded so far.
+        """
+        with self._lock:
+            return [dict(zip(self.labelnames, key)) for key in self._series]
+
+
+class Counter(Metric):
+    """
+    A count that only goes up, such as requests sent or errors seen.
+    """
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def _render(self, name):
+        with self._lock:
+            series = sorted(self._series.items())
+        return [f"{name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in series]
+
+    def _snapshot(self):
+        with self._lock:
+            return [{'labels': dict(zip(self.labelnames, key)), 'value': value}
+                    for key, value in sorted(self._series.items())]
+
+
+class Gauge(Metric):
+    """
+    A value that is set rather than counted, such as a queue depth or a phase duration.
+    """
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels))
+
+    def _render(self, name):
+        with self._lock:
+            series = sorted(self._series.items())
+        return [f"{name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in series if value is not None]
+
+    def _snapshot(self):
+        with self._lock:
+            return [{'labels': dict(zip(self.labelnames, key)), 'value': value}
+                    for key, value in sorted(self._series.items())]
+
+
+class Histogram(Metric):
+    """
+    Counts observations into fixed buckets, keeping their sum, count and maximum.
+
+    Quantiles are estimated from the buckets the way Prometheus does, by interpolating
+    within the bucket the quantile falls in, so they are only as precise as the buckets.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Bucket counts (the last one is +Inf), sum, count, max.
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, -math.inf]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+            if value > series[3]:
+                series[3] = value
+
+    def count(self, **labels):
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[2] if series else 0
+
+    def summary(self, **labels):
+        """
+        Returns count, sum, max, p50 and p95 of one series, or None if it has no observations.
+        """
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if series is None:
+                return None
+            counts, total, count, maximum = list(series[0]), series[1], series[2], series[3]
+        return {
+            'count': count,
+            'sum': total,
+            'max': maximum,
+            'p50': self._quantile(counts, count, maximum, 0.5),
+            'p95': self._quantile(counts, count, maximum, 0.95),
+        }
+
+    def _quantile(self, counts, count, maximum, q):
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= rank:
+                upper = self.buckets[index] if index < len(self.buckets) else maximum
+                lower = self.buckets[index - 1] if index > 0 else min(0.0, upper)
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(estimate, maximum)
+            seen += bucket_count
+        return maximum
+
+    def _render(self, name):
+        with self._lock:
+            series = sorted((key, (list(value[0]), value[1], value[2])) for key, value in self._series.items())
+        lines = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = (('le', _format_value(bound)),)
+                lines.append(f"{name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+    def _snapshot(self):
+        return [dict(labels=labels, **self.summary(**labels)) for labels in self.labels()]
+
+
+class MetricsRegistry:
+    """
+    Holds the application's metrics and renders them for export.
+
+    Collectors registered with add_collector() are called right before every export or
+    snapshot, so values that components already keep in their stats() only have to be
+    copied into gauges when someone looks at them.
+    """
+
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self._metrics = collections.OrderedDict()
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def get(self, name):
+        with self._lock:
+            return self._metrics.get(name)
+
+    def add_collector(self, collector):
+        """
+        Registers a callable run before every export, e.g. to refresh gauges from stats().
+        """
+        self._collectors.append(collector)
+
+    def collect(self):
+        """
+        Runs the collectors and returns the registered metrics.
+        """
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"Metrics collector error: {str(e)}")
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render_prometheus(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self.collect():
+            name = self.prefix + metric.name
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric._render(name))
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """
+        Returns all metrics as a JSON-serialisable dict, histograms summarised.
+        """
+        return {metric.name: {'type': metric.kind, 'series': metric._snapshot()} for metric in self.collect()}
+
+    def export(self, path, export_format='prometheus', max_bytes=JSONL_MAX_BYTES):
+        """
+        Writes the metrics to a local file.
+
+        Args:
+            path (str): The file to write.
+            export_format (str): 'prometheus' replaces the file atomically; 'jsonl' appends
+                one timestamped snapshot per line.
+            max_bytes (int): Size past which a jsonl file is rotated to path + '.1'.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if export_format == 'jsonl':
+            line = json.dumps({'ts': time.time(), 'metrics': self.snapshot()}, separators=(',', ':'))
+            if os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+                os.replace(path, path + '.1')
+            with open(path, 'a', encoding='utf-8') as output:
+                output.write(line + '\n')
+            return
+        temporary = path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as output:
+            output.write(self.render_prometheus())
+        os.replace(temporary, path)
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} is already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+
+class MetricsExporter:
+    """
+    Exports a registry to a local file on a background thread at a fixed interval.
+    """
+
+    def __init__(self, registry, path=None, export_format='prometheus', interval=60.0):
+        """
+        Initializes the exporter. Nothing is written until start() is called.
+
+        Args:
+            registry (MetricsRegistry): The metrics to export.
+            path (str): The output file; defaults to metrics.prom or metrics.jsonl in ~/.mindapp.
+            export_format (str): 'prometheus' or 'jsonl'.
+            interval (float): Seconds between exports.
+        """
+        if export_format not in ('prometheus', 'jsonl'):
+            raise ValueError(f"Unknown metrics export format: {export_format}")
+        self.registry = registry
+        self.export_format = export_format
+        self.path = path or (JSONL_PATH if export_format == 'jsonl' else PROMETHEUS_PATH)
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='metrics-export', daemon=True)
+            self._thread.start()
+
+    def export(self):
+        """
+        Writes the metrics now. Errors are printed, never raised.
+        """
+        try:
+            self.registry.export(self.path, self.export_format)
+        except OSError as e:
+            print(f"Metrics export error: {str(e)}")
+
+    def close(self):
+        """
+        Stops the export thread and writes the final values.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(2.0)
+        self.export()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait(self.interval)
+                if self._closed:
+                    return
+            self.export()
+
+
+class StallWatchdog:
+    """
+    Detects stretches in which the GUI thread stops running its event loop.
+
+    The GUI thread calls beat() from a repeating timer. A watchdog thread checks that
+    the beats keep coming; when the last one is older than the threshold it samples the
+    GUI thread's stack with sys._current_frames(), which shows the code that is blocking
+    the event loop right now. When the beats resume, the stall's full duration is
+    reported through on_stall and appended to the stall log.
+    """
+
+    def __init__(self, threshold=0.2, on_stall=None, log_path=STALL_LOG_PATH, history=20):
+        """
+        Initializes the watchdog. Nothing runs until start() is called.
+
+        Args:
+            threshold (float): Seconds without a beat that count as a stall.
+            on_stall (callable): Called as on_stall(seconds, stack) on the GUI thread once a
+                stall is over.
+            log_path (str): File that stalls are appended to, or None.
+            history (int): Number of recent stalls kept for recent().
+        """
+        self.threshold = threshold
+        self.on_stall = on_stall
+        self.log_path = log_path
+        self.beat_interval = threshold / 2
+
+        self._cond = threading.Condition()
+        self._thread = None
+        self._gui_thread = None
+        self._closed = False
+        self._last_beat = None
+        self._stack = None
+        self._recent = collections.deque(maxlen=history)
+
+    def start(self, gui_thread=None):
+        """
+        Starts watching the calling thread, or the given thread ident.
+        """
+        self._gui_thread = gui_thread or threading.get_ident()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='stall-watchdog', daemon=True)
+            self._thread.start()
+
+    def beat(self):
+        """
+        Records that the GUI thread is alive. Called from the GUI thread's heartbeat timer.
+        """
+        now = time.monotonic()
+        with self._cond:
+            last, stack = self._last_beat, self._stack
+            self._last_beat = now
+            self._stack = None
+            if last is None:
+                # The first beat: the watchdog thread is waiting for it.
+                self._cond.notify()
+        if stack is not None:
+            self._report(now - last, stack)
+
+    def recent(self):
+        """
+        Returns the recent stalls as (wall time, seconds, stack) tuples, newest last.
+        """
+        with self._cond:
+            return list(self._recent)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _run(self):
+        with self._cond:
+            while not self._closed:
+                if self._last_beat is None:
+                    self._cond.wait()
+                    continue
+                overdue = time.monotonic() - self._last_beat
+                if overdue > self.threshold and self._stack is None:
+                    self._stack = self._sample_stack()
+                    print(f"GUI thread blocked for over {self.threshold * 1000:.0f} ms", file=sys.stderr)
+                # Waking at the threshold catches a stall within 1.5 thresholds of its start.
+                self._cond.wait(self.threshold)
+
+    def _sample_stack(self):
+        frame = sys._current_frames().get(self._gui_thread)
+        if frame is None:
+            return ''
+        return ''.join(traceback.format_stack(frame))
+
+    def _report(self, seconds, stack):
+        wall = time.time()
+        with self._cond:
+            self._recent.append((wall, seconds, stack))
+        if self.log_path:
+            try:
+                os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+                with open(self.log_path, 'a', encoding='utf-8') as log:
+                    log.write(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(wall))} "
+                              f"GUI thread blocked for {seconds * 1000:.0f} ms\n{stack}\n")
+            except OSError as e:
+                print(f"Stall log error: {str(e)}")
+        if self.on_stall:
+            self.on_stall(seconds, stack)
+
+
+def resident_memory():
+    """
+    Returns the current resident set size in bytes, or None where it cannot be read.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return None
+
+
+def wakeup_count():
+    """
+    Returns how many times the process has been switched out (voluntary plus involuntary
+    context switches over all threads), or None where it cannot be read.
+
+    Every wakeup from a timer or a blocking call ends in a voluntary switch, so the rate at
+    which this grows while the app is idle is its wakeup rate.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_nvcsw + usage.ru_nivcsw
+
+
+def format_summary(registry):
+    """
+    Renders the registry as readable text, one line per series, for the diagnostics panel.
+    """
+    def seconds(value):
+        if value is None or value == -math.inf:
+            return 'n/a'
+        return f"{value * 1000:.1f} ms" if abs(value) < 1 else f"{value:.2f} s"
+
+    lines = []
+    for metric in registry.collect():
+        for labels in metric.labels():
+            label_text = ' '.join(f"{name}={value}" for name, value in labels.items())
+            title = f"{metric.name} {label_text}".rstrip()
+            if isinstance(metric, Histogram):
+                summary = metric.summary(**labels)
+                lines.append(f"{title}: n={summary['count']} p50={seconds(summary['p50'])} "
+                             f"p95={seconds(summary['p95'])} max={seconds(summary['max'])}")
+            elif isinstance(metric, Counter):
+                lines.append(f"{title}: {metric.value(**labels)}")
+            else:
+                value = metric.value(**labels)
+                if value is not None:
+                    lines.append(f"{title}: {seconds(value) if metric.name.endswith('_seconds') else value}")
+    return '\n'.join(lines)
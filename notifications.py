@@ -0,0 +1,334 @@
+#@brief: Non-blocking notification dispatcher of the Self Remembering App.
+# notify() only queues a notification and returns, so the session timer never waits on a
+# message being read. A worker thread drains a bounded queue and hands each notification to
+# its sinks: an in-window toast, a desktop notification over D-Bus (org.freedesktop.Notifications),
+# a sound cue and the log. Notifications repeated within a short window are dropped, and no
+# more than a set number are delivered per minute, so messages do not pile up while the user
+# is away. The dispatcher is Qt-free; a sink that touches widgets posts to the GUI thread itself.
+
+import collections
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+INFO = 'info'
+WARNING = 'warning'
+ERROR = 'error'
+
+# org.freedesktop.Notifications urgency hint per level.
+URGENCY = {INFO: 1, WARNING: 1, ERROR: 2}
+
+APP_NAME = "Self Remembering"
+
+
+class Notification:
+    """
+    A message for the user.
+    """
+
+    def __init__(self, title, message, level=INFO, key=None, actions=()):
+        """
+        Initializes the notification.
+
+        Args:
+            title (str): The summary line.
+            message (str): The body text.
+            level (str): INFO, WARNING or ERROR.
+            key (str): Identifies repeats of the same notification; defaults to title and message.
+            actions (list): (label, callback) pairs the in-window toast offers as links; the
+                callback runs on the GUI thread when its link is clicked.
+        """
+        self.title = title
+        self.message = message
+        self.level = level
+        self.key = key or f"{title}\n{message}"
+        self.actions = list(actions)
+        self.created_at = time.monotonic()
+
+    def __repr__(self):
+        return f"Notification({self.level}, {self.title!r})"
+
+
+class NotificationDispatcher:
+    """
+    Delivers notifications to a list of sinks on a background thread.
+
+    A sink is a callable taking a Notification. Sinks are called in order; one that raises
+    is reported and does not stop the others.
+    """
+
+    def __init__(self, sinks=(), max_queue=32, dedup_seconds=60.0, max_per_minute=6, clock=time.monotonic):
+        """
+        Initializes the dispatcher. Its thread is started by the first notification.
+
+        Args:
+            sinks (iterable): The callables every notification is delivered to.
+            max_queue (int): Notifications that may wait before new ones are dropped.
+            dedup_seconds (float): A notification with the same key as one accepted this
+                many seconds before is dropped.
+            max_per_minute (int): Notifications delivered in any 60 seconds; later ones are dropped.
+            clock (callable): Returns monotonic time in seconds.
+        """
+        self.sinks = list(sinks)
+        self.dedup_seconds = dedup_seconds
+        self.max_per_minute = max_per_minute
+        self.clock = clock
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._last_seen = {}
+        self._delivered_at = collections.deque()
+
+        self._accepted = 0
+        self._delivered = 0
+        self._duplicates = 0
+        self._rate_limited = 0
+        self._dropped = 0
+        self._sink_errors = 0
+        self._latencies = collections.deque(maxlen=128)
+
+    def notify(self, title, message, level=INFO, key=None):
+        """
+        Queues a notification for delivery. Never blocks.
+
+        Returns:
+            bool: False if it repeats a recent notification or the queue is full.
+        """
+        notification = Notification(title, message, level, key)
+        now = self.clock()
+        with self._lock:
+            if self._closed:
+                return False
+            seen = self._last_seen.get(notification.key)
+            if seen is not None and now - seen < self.dedup_seconds:
+                self._duplicates += 1
+                return False
+            if len(self._last_seen) > 256:
+                self._last_seen = {key: at for key, at in self._last_seen.items()
+                                   if now - at < self.dedup_seconds}
+            self._last_seen[notification.key] = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='notifications', daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(notification)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+        with self._lock:
+            self._accepted += 1
+        return True
+
+    def close(self, timeout=1.0):
+        """
+        Delivers what is queued, for up to timeout seconds, and stops the thread.
+        """
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'accepted': self._accepted,
+                'delivered': self._delivered,
+                'duplicates': self._duplicates,
+                'rate_limited': self._rate_limited,
+                'dropped': self._dropped,
+                'sink_errors': self._sink_errors,
+                'queued': self._queue.qsize(),
+                'p50_latency': latencies[len(latencies) // 2] if latencies else None,
+                'max_latency': latencies[-1] if latencies else None,
+            }
+
+    def _run(self):
+        while True:
+            notification = self._queue.get()
+            if notification is None:
+                return
+            now = self.clock()
+            while self._delivered_at and now - self._delivered_at[0] >= 60:
+                self._delivered_at.popleft()
+            if len(self._delivered_at) >= self.max_per_minute:
+                print(f"Notification dropped by the rate limit: {notification.title}")
+                with self._lock:
+                    self._rate_limited += 1
+                continue
+            self._delivered_at.append(now)
+
+            errors = 0
+            for sink in self.sinks:
+                try:
+                    sink(notification)
+                except Exception as e:
+                    errors += 1
+                    print(f"Notification sink error ({type(sink).__name__}): {str(e)}")
+            with self._lock:
+                self._delivered += 1
+                self._sink_errors += errors
+                self._latencies.append(time.monotonic() - notification.created_at)
+
+
+class LogSink:
+    """
+    Prints every notification.
+    """
+
+    def __call__(self, notification):
+        print(f"{notification.title}: {notification.message}")
+
+
+class SoundSink:
+    """
+    Plays a sound cue for notifications of the levels it has a cue for.
+    """
+
+    def __init__(self, audio, cues=None):
+        """
+        Args:
+            audio (AudioEngine): Plays the cues; its play() does not block.
+            cues (dict): Level -> cue name. By default warnings and errors play 'alert'.
+        """
+        self.audio = audio
+        self.cues = cues if cues is not None else {WARNING: 'alert', ERROR: 'alert'}
+
+    def __call__(self, notification):
+        cue = self.cues.get(notification.level)
+        if cue:
+            self.audio.play(cue)
+
+
+def gdbus_notify(summary, body, urgency=1, replaces_id=0, timeout_ms=10000, app_name=APP_NAME, icon=''):
+    """
+    Calls org.freedesktop.Notifications.Notify on the session bus with the gdbus tool.
+
+    Returns:
+        int: The id of the notification, which a later call can replace.
+
+    Raises:
+        OSError: If gdbus cannot be run.
+        subprocess.SubprocessError: If the call fails or times out.
+    """
+    def text(value):
+        # A GVariant string literal, so gdbus never reads the text as another type.
+        escaped = value.replace('\\', '\\\\').replace("'", "\\'").replace('\n', '\\n')
+        return f"'{escaped}'"
+
+    result = subprocess.run(
+        ['gdbus', 'call', '--session',
+         '--dest', 'org.freedesktop.Notifications',
+         '--object-path', '/org/freedesktop/Notifications',
+         '--method', 'org.freedesktop.Notifications.Notify',
+         text(app_name), f'uint32 {int(replaces_id)}', text(icon), text(summary), text(body),
+         '@as []', f"{{'urgency': <byte {int(urgency)}>}}", f'int32 {int(timeout_ms)}'],
+        capture_output=True, text=True, timeout=5, check=True)
+    # The reply looks like "(uint32 42,)".
+    return int(result.stdout.strip().strip('(),').split()[-1])
+
+
+class LocalNotificationService:
+    """
+    Stand-in for the desktop's notification daemon, with the signature of gdbus_notify.
+
+    Records every notification in memory and answers after an optional delay, so the
+    dispatcher and the desktop sink can be exercised without a session bus.
+    """
+
+    def __init__(self, latency=0.0, fail=False):
+        """
+        Args:
+            latency (float): Seconds each call takes.
+            fail (bool): Whether calls raise, like an unreachable daemon.
+        """
+        self.latency = latency
+        self.fail = fail
+        self.notifications = []
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, summary, body, urgency=1, replaces_id=0, timeout_ms=10000, app_name=APP_NAME, icon=''):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail:
+            raise OSError("Notification service unreachable")
+        with self._lock:
+            if not replaces_id:
+                self._next_id += 1
+                replaces_id = self._next_id
+            self.notifications.append({'id': replaces_id, 'summary': summary, 'body': body, 'urgency': urgency})
+            return replaces_id
+
+
+class DesktopSink:
+    """
+    Shows notifications through the desktop's notification daemon.
+
+    A notification with the key of an earlier one replaces it on screen instead of stacking.
+    When sending fails, e.g. while the notification daemon restarts, the sink backs off
+    and tries again later, doubling the wait after every further failure.
+    """
+
+    def __init__(self, transport=None, icon='', timeout_ms=10000, enabled=None, retry_interval=30.0,
+                 max_retry_interval=900.0):
+        """
+        Args:
+            transport (callable): Sends one notification, like gdbus_notify (the default)
+                or a LocalNotificationService.
+            icon (str): Icon path or name shown with the notifications.
+            timeout_ms (int): How long the desktop shows a notification.
+            enabled (callable): Tells whether to show a notification now, e.g. only while the
+                app's window is not on screen. Called on the dispatcher thread.
+            retry_interval (float): Seconds to wait after a first failure before trying again.
+            max_retry_interval (float): Longest wait between two attempts.
+        """
+        self.transport = transport or gdbus_notify
+        self.enabled = enabled
+        self.icon = icon
+        self.timeout_ms = timeout_ms
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.supported = transport is not None or (sys.platform.startswith('linux') and bool(shutil.which('gdbus')))
+        self._failures = 0
+        self._retry_at = 0.0
+        self._ids = collections.OrderedDict()
+
+    @property
+    def available(self):
+        """
+        True if notifications can be sent now: there is a transport and no back-off is running.
+        """
+        return self.supported and time.monotonic() >= self._retry_at
+
+    def __call__(self, notification):
+        if not self.available or (self.enabled is not None and not self.enabled()):
+            return
+        try:
+            notification_id = self.transport(
+                notification.title, notification.message, urgency=URGENCY.get(notification.level, 1),
+                replaces_id=self._ids.get(notification.key, 0), timeout_ms=self.timeout_ms, icon=self.icon)
+        except (OSError, subprocess.SubprocessError, ValueError) as e:
+            # No notification daemon right now; the other sinks still deliver.
+            delay = min(self.retry_interval * 2 ** self._failures, self.max_retry_interval)
+            self._failures += 1
+            self._retry_at = time.monotonic() + delay
+            print(f"Desktop notifications unavailable, retrying in {delay:.0f} s: {str(e)}")
+            return
+        self._failures = 0
+        self._ids[notification.key] = notification_id
+        self._ids.move_to_end(notification.key)
+        while len(self._ids) > 64:
+            self._ids.popitem(last=False)
@@ -0,0 +1,128 @@
+#@brief: Event-driven presence detection for focus sessions.
+# An application-wide event filter notes user input, and a single timer is armed for the
+# exact moment the inactivity threshold would be crossed. Nothing polls: while no session
+# is running the filter is removed and the timer is stopped.
+
+import time
+
+from PyQt6.QtCore import QEvent, QObject, QTimer, Qt, pyqtSignal
+from PyQt6.QtWidgets import QApplication
+
+
+class PresenceMonitor(QObject):
+    """
+    Emits inactive when no input has been seen for the configured threshold.
+
+    Input anywhere in the application counts, including typing into child widgets.
+    Input events are coalesced: the first one takes an activity timestamp and closes a
+    gate that a single-shot timer reopens after coalesce_interval, so the mouse moves in
+    between cost an attribute check, not a clock read each. The price is one coarse timer
+    wakeup per coalesce_interval while input keeps coming, and none while the user is away.
+    An optional system idle backend makes activity in other applications count too.
+    """
+
+    inactive = pyqtSignal(float)
+
+    INPUT_EVENTS = frozenset({
+        QEvent.Type.MouseButtonPress,
+        QEvent.Type.MouseMove,
+        QEvent.Type.KeyPress,
+        QEvent.Type.Wheel,
+        QEvent.Type.TouchBegin,
+        QEvent.Type.TabletPress,
+    })
+
+    def __init__(self, threshold=300, idle_backend=None, coalesce_interval=1.0, clock=time.monotonic, parent=None):
+        """
+        Initializes the monitor in the stopped state.
+
+        Args:
+            threshold (float): Seconds of inactivity before inactive is emitted.
+            idle_backend (object): System idle source with an idle_seconds() method, or None.
+            coalesce_interval (float): Minimum seconds between two recorded activities.
+            clock (callable): Monotonic time source.
+            parent (QObject): The Qt parent.
+        """
+        super().__init__(parent)
+        self.threshold = threshold
+        self.idle_backend = idle_backend
+        self.coalesce_interval = coalesce_interval
+        self.clock = clock
+
+        self.last_active = clock()
+        self.monitoring = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.VeryCoarseTimer)
+        self._timer.timeout.connect(self._check)
+        self._gate_open = True
+        self._gate = QTimer(self)
+        self._gate.setSingleShot(True)
+        self._gate.setTimerType(Qt.TimerType.CoarseTimer)
+        self._gate.setInterval(max(0, int(coalesce_interval * 1000)))
+        self._gate.timeout.connect(self._open_gate)
+
+    def start(self):
+        """
+        Starts watching for input, counting from now.
+        """
+        self.last_active = self.clock()
+        if not self.monitoring:
+            self.monitoring = True
+            QApplication.instance().installEventFilter(self)
+        self._arm(self.threshold)
+
+    def stop(self):
+        """
+        Stops watching. The monitor costs nothing until started again.
+        """
+        if self.monitoring:
+            self.monitoring = False
+            QApplication.instance().removeEventFilter(self)
+        self._timer.stop()
+        self._gate.stop()
+        self._gate_open = True
+
+    def record_activity(self):
+        """
+        Records user activity explicitly, e.g. from a command that did not come from input.
+        """
+        self.last_active = self.clock()
+
+    def idle_seconds(self):
+        """
+        Returns how long the user has been idle, taking the system backend into account.
+        """
+        idle = self.clock() - self.last_active
+        if self.idle_backend is not None:
+            system_idle = self.idle_backend.idle_seconds()
+            if system_idle is not None:
+                idle = min(idle, system_idle)
+        return idle
+
+    def eventFilter(self, watched, event):
+        """
+        Notes input events without consuming them.
+        """
+        if self._gate_open and event.type() in self.INPUT_EVENTS:
+            self._gate_open = False
+            self.last_active = self.clock()
+            self._gate.start()
+        return False
+
+    def _open_gate(self):
+        self._gate_open = True
+
+    def _arm(self, delay):
+        self._timer.start(max(0, int(delay * 1000)))
+
+    def _check(self):
+        if not self.monitoring:
+            return
+        idle = self.idle_seconds()
+        if idle >= self.threshold:
+            self.stop()
+            self.inactive.emit(idle)
+        else:
+            # There was activity since the timer was armed; wake up when it would expire.
+            self._arm(self.threshold - idle)
@@ -0,0 +1,448 @@
+#@brief: Remembrance prompt library.
+# Prompts are read from quotes.json next to the application and from any *.json file in
+# ~/.mindapp/quotes. Each file holds a list of {"text", "author", "tradition", "tags"} objects.
+# The corpus is compiled once into a binary index (~/.mindapp/cache/prompts.idx) that is
+# memory-mapped, so startup reads a small header and individual quotes are decoded on demand.
+# Prompts are drawn from a persisted shuffle bag: no quote repeats until every quote in the
+# pool has been shown, across restarts too. Authors can be weighted and the pool can be
+# filtered by author, tradition and tag. Every draw is O(1).
+
+import array
+import bisect
+import collections
+import glob
+import hashlib
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+
+USER_QUOTES_DIR = os.path.join(os.path.expanduser('~'), '.mindapp', 'quotes')
+INDEX_PATH = os.path.join(os.path.expanduser('~'), '.mindapp', 'cache', 'prompts.idx')
+BAG_PATH = os.path.join(os.path.expanduser('~'), '.mindapp', 'prompt_bag.bin')
+
+INDEX_MAGIC = b'SRQIDX01'
+BAG_MAGIC = b'SRQBAG01'
+
+# magic, signature, meta offset, meta length, quote count
+INDEX_HEADER = struct.Struct('<8s40sQII')
+# magic, signature, group count, id count
+BAG_HEADER = struct.Struct('<8s40sII')
+# author, first id slot, length, cursor
+BAG_GROUP = struct.Struct('<IIII')
+
+
+class Prompt(collections.namedtuple('Prompt', 'text author tradition')):
+    """
+    One remembrance prompt. str() gives the "text - author" form shown in the window.
+    """
+
+    def __str__(self):
+        return f"{self.text} - {self.author}" if self.author else self.text
+
+
+def quote_sources(bundled_path):
+    """
+    Returns the corpus files: the bundled quotes.json and the user's own quote files.
+    """
+    return [bundled_path] + sorted(glob.glob(os.path.join(USER_QUOTES_DIR, '*.json')))
+
+
+def corpus_signature(paths):
+    """
+    Returns a digest of the corpus files' paths, sizes and modification times.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        digest.update(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _ids(values):
+    ids = array.array('I', values)
+    if sys.byteorder == 'big':
+        ids.byteswap()
+    return ids
+
+
+def build_index(paths, index_path, signature):
+    """
+    Compiles the corpus files into a binary index.
+
+    Quotes are deduplicated by text and sorted by author, so each author's quotes
+    occupy one contiguous range of ids.
+
+    Layout: header, a (offset, length) table of quote texts, the UTF-8 texts, the tag
+    posting lists (sorted quote ids) and a JSON trailer with the author ranges and tags.
+    """
+    quotes = {}
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as source:
+                entries = json.load(source)
+        except (OSError, ValueError) as e:
+            print(f"Quote file skipped ({path}): {str(e)}")
+            continue
+        for entry in entries:
+            if isinstance(entry, str):
+                text, _, author = entry.rpartition(' - ') if ' - ' in entry else (entry, '', '')
+                entry = {'text': text, 'author': author}
+            text = (entry.get('text') or '').strip()
+            if text and text not in quotes:
+                quotes[text] = ((entry.get('author') or '').strip(), (entry.get('tradition') or '').strip(),
+                                [tag.strip().lower() for tag in entry.get('tags') or []])
+
+    ordered = sorted(quotes.items(), key=lambda item: (item[1][0].casefold(), item[0]))
+    table = array.array('I')
+    strings = bytearray()
+    authors = []
+    postings = collections.defaultdict(list)
+    for quote_id, (text, (author, tradition, tags)) in enumerate(ordered):
+        if not authors or authors[-1][0] != author:
+            authors.append([author, tradition, quote_id, quote_id])
+        authors[-1][3] = quote_id + 1
+        encoded = text.encode('utf-8')
+        table.extend((len(strings), len(encoded)))
+        strings += encoded
+        for tag in tags:
+            postings[tag].append(quote_id)
+
+    posting_ids = array.array('I')
+    tags = {}
+    for tag, ids in sorted(postings.items()):
+        tags[tag] = [len(posting_ids), len(ids)]
+        posting_ids.extend(ids)
+    if sys.byteorder == 'big':
+        table.byteswap()
+        posting_ids.byteswap()
+
+    strings_offset = INDEX_HEADER.size + len(table) * table.itemsize
+    postings_offset = strings_offset + len(strings)
+    meta_offset = postings_offset + len(posting_ids) * posting_ids.itemsize
+    meta = json.dumps({'authors': authors, 'tags': tags, 'strings_offset': strings_offset,
+                       'postings_offset': postings_offset}).encode('utf-8')
+
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    temporary = index_path + '.tmp'
+    with open(temporary, 'wb') as index:
+        index.write(INDEX_HEADER.pack(INDEX_MAGIC, signature.encode('ascii'), meta_offset, len(meta), len(ordered)))
+        index.write(table.tobytes())
+        index.write(strings)
+        index.write(posting_ids.tobytes())
+        index.write(meta)
+    os.replace(temporary, index_path)
+
+
+class PromptIndex:
+    """
+    Read-only, memory-mapped access to a compiled corpus.
+    """
+
+    def __init__(self, index_path):
+        """
+        Maps the index and reads its header and trailer.
+
+        Raises:
+            ValueError: If the file is not a valid index.
+        """
+        self._file = open(index_path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, signature, meta_offset, meta_length, self.count = INDEX_HEADER.unpack_from(self._map, 0)
+            if magic != INDEX_MAGIC:
+                raise ValueError("Not a prompt index")
+            meta = json.loads(self._map[meta_offset:meta_offset + meta_length])
+        except (ValueError, struct.error, OSError):
+            self.close()
+            raise ValueError("Corrupt prompt index")
+
+        self.signature = signature.decode('ascii')
+        self.authors = meta['authors']
+        self.tags = meta['tags']
+        self._strings_offset = meta['strings_offset']
+        self._postings_offset = meta['postings_offset']
+        self._author_starts = [start for _, _, start, _ in self.authors]
+
+    def text(self, quote_id):
+        offset, length = struct.unpack_from('<II', self._map, INDEX_HEADER.size + 8 * quote_id)
+        start = self._strings_offset + offset
+        return self._map[start:start + length].decode('utf-8')
+
+    def prompt(self, quote_id, author_index=None):
+        """
+        Returns the quote with the given id. Passing its author index saves a lookup.
+        """
+        if author_index is None:
+            author_index = bisect.bisect_right(self._author_starts, quote_id) - 1
+        author, tradition, _, _ = self.authors[author_index]
+        return Prompt(self.text(quote_id), author, tradition)
+
+    def tag_ids(self, tag):
+        """
+        Returns the sorted ids of the quotes carrying a tag.
+        """
+        start, count = self.tags.get(tag.lower(), (0, 0))
+        offset = self._postings_offset + 4 * start
+        ids = array.array('I')
+        ids.frombytes(self._map[offset:offset + 4 * count])
+        if sys.byteorder == 'big':
+            ids.byteswap()
+        return ids
+
+    def close(self):
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class AliasTable:
+    """
+    Draws an index with probability proportional to its weight in O(1) (Vose's alias method).
+    """
+
+    def __init__(self, weights):
+        count = len(weights)
+        total = float(sum(weights))
+        self.probability = [0.0] * count
+        self.alias = list(range(count))
+        scaled = [weight * count / total for weight in weights]
+        small = [index for index, value in enumerate(scaled) if value < 1.0]
+        large = [index for index, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        for index in small + large:
+            self.probability[index] = 1.0
+
+    def draw(self, rng):
+        index = int(rng.random() * len(self.probability))
+        return index if rng.random() < self.probability[index] else self.alias[index]
+
+
+class ShuffleBag:
+    """
+    A persisted, weighted shuffle bag over groups of quote ids, one group per author.
+
+    The bag file holds each group's ids and a cursor; ids before the cursor have been
+    drawn this round. A draw picks a group with the alias table, swaps a random undrawn
+    id of that group to the cursor and advances it, which is an incremental Fisher-Yates
+    shuffle: two slots and a cursor change in the memory-mapped file, nothing else.
+    Exhausted groups are skipped until every group is exhausted, then a new round begins.
+    """
+
+    def __init__(self, path, signature, groups, weights, rng=random):
+        """
+        Opens the bag, starting a new one if the file belongs to another pool.
+
+        Args:
+            path (str): The bag file.
+            signature (str): Identifies the pool (corpus, filters and weights).
+            groups (list): (author index, ids) per group.
+            weights (list): Per-quote weight of each group.
+            rng (random.Random): Source of randomness.
+        """
+        self.path = path
+        self.rng = rng
+        self.weights = weights
+        self._open(signature, groups)
+        self.size = sum(self.lengths)
+        self._rebuild()
+
+    def _open(self, signature, groups):
+        size = BAG_HEADER.size + BAG_GROUP.size * len(groups) + 4 * sum(len(ids) for _, ids in groups)
+        existing = None
+        try:
+            with open(self.path, 'rb') as bag:
+                existing = bag.read(BAG_HEADER.size)
+        except OSError:
+            pass
+        valid = (existing is not None and len(existing) == BAG_HEADER.size
+                 and BAG_HEADER.unpack(existing)[:2] == (BAG_MAGIC, signature.encode('ascii'))
+                 and os.path.getsize(self.path) == size)
+
+        if not valid:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary = self.path + '.tmp'
+            with open(temporary, 'wb') as bag:
+                total = sum(len(ids) for _, ids in groups)
+                bag.write(BAG_HEADER.pack(BAG_MAGIC, signature.encode('ascii'), len(groups), total))
+                slot = 0
+                for author, ids in groups:
+                    bag.write(BAG_GROUP.pack(author, slot, len(ids), 0))
+                    slot += len(ids)
+                for _, ids in groups:
+                    bag.write(_ids(ids).tobytes())
+            os.replace(temporary, self.path)
+
+        self._file = open(self.path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self.authors, self.starts, self.lengths, self.cursors = [], [], [], []
+        for index in range(len(groups)):
+            author, start, length, cursor = BAG_GROUP.unpack_from(self._map, BAG_HEADER.size + BAG_GROUP.size * index)
+            self.authors.append(author)
+            self.starts.append(start)
+            self.lengths.append(length)
+            self.cursors.append(min(cursor, length))
+        self._ids_offset = BAG_HEADER.size + BAG_GROUP.size * len(groups)
+
+    def _rebuild(self):
+        """
+        Builds the alias table over the groups that still have undrawn ids.
+
+        Starts a new round first if every group is exhausted.
+        """
+        if self.size and all(cursor >= length for cursor, length in zip(self.cursors, self.lengths)):
+            for group in range(len(self.cursors)):
+                self._set_cursor(group, 0)
+        live = [group for group, (cursor, length) in enumerate(zip(self.cursors, self.lengths)) if cursor < length]
+        masses = [self.weights[group] * (self.lengths[group] - self.cursors[group]) for group in live]
+        self._live = live
+        self._masses = masses
+        self._table = AliasTable(masses) if live else None
+        self._table_mass = sum(masses)
+        self._live_mass = self._table_mass
+
+    def draw(self):
+        """
+        Draws the next quote.
+
+        Returns:
+            tuple: (quote id, author index), or None if the pool is empty.
+        """
+        if self._table is None:
+            return None
+        while True:
+            slot = self._table.draw(self.rng)
+            group = self._live[slot]
+            cursor, length = self.cursors[group], self.lengths[group]
+            if cursor < length:
+                break
+            # An exhausted group stays in the table until enough mass is gone to rebuild it.
+
+        start = self._ids_offset + 4 * self.starts[group]
+        chosen = self.rng.randrange(cursor, length)
+        first = struct.unpack_from('<I', self._map, start + 4 * cursor)[0]
+        quote_id = struct.unpack_from('<I', self._map, start + 4 * chosen)[0]
+        struct.pack_into('<I', self._map, start + 4 * chosen, first)
+        struct.pack_into('<I', self._map, start + 4 * cursor, quote_id)
+        self._set_cursor(group, cursor + 1)
+
+        if cursor + 1 == length:
+            self._live_mass -= self._masses[slot]
+            if self._live_mass <= self._table_mass / 2:
+                # Keeps rejected draws rare; amortised over the draws that emptied the groups.
+                self._rebuild()
+        return quote_id, self.authors[group]
+
+    def close(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._map = None
+            self._file.close()
+
+    def _set_cursor(self, group, cursor):
+        self.cursors[group] = cursor
+        struct.pack_into('<I', self._map, BAG_HEADER.size + BAG_GROUP.size * group + 12, cursor)
+
+
+class PromptLibrary:
+    """
+    The prompts available to the app, drawn without repeats from a filtered, weighted pool.
+
+    Nothing is read until the first prompt is requested.
+    """
+
+    def __init__(self, sources, authors=(), traditions=(), tags=(), author_weights=None,
+                 index_path=INDEX_PATH, bag_path=BAG_PATH, rng=None):
+        """
+        Initializes the library.
+
+        Args:
+            sources (list): The corpus files.
+            authors (list): Only use quotes by these authors; empty for all.
+            traditions (list): Only use quotes from these traditions; empty for all.
+            tags (list): Only use quotes with at least one of these tags; empty for all.
+            author_weights (dict): Author -> relative weight of each of their quotes (default 1).
+            index_path (str): Where the compiled index is kept.
+            bag_path (str): Where the shuffle bag is kept.
+            rng (random.Random): Source of randomness.
+        """
+        self.sources = list(sources)
+        self.authors = set(authors)
+        self.traditions = {tradition.casefold() for tradition in traditions}
+        self.tags = [tag.lower() for tag in tags]
+        self.author_weights = dict(author_weights or {})
+        self.index_path = index_path
+        self.bag_path = bag_path
+        self.rng = rng or random.Random()
+        self.index = None
+        self.bag = None
+
+    def __len__(self):
+        self._open()
+        return self.bag.size
+
+    def next_prompt(self):
+        """
+        Returns the next prompt, or None if the pool is empty.
+        """
+        self._open()
+        drawn = self.bag.draw()
+        if drawn is None:
+            return None
+        quote_id, author_index = drawn
+        return self.index.prompt(quote_id, author_index)
+
+    def close(self):
+        if self.bag is not None:
+            self.bag.close()
+        if self.index is not None:
+            self.index.close()
+
+    def _open(self):
+        if self.bag is not None:
+            return
+        signature = corpus_signature(self.sources)
+        try:
+            self.index = PromptIndex(self.index_path)
+        except (OSError, ValueError):
+            self.index = None
+        if self.index is None or self.index.signature != signature:
+            if self.index is not None:
+                self.index.close()
+            build_index(self.sources, self.index_path, signature)
+            self.index = PromptIndex(self.index_path)
+
+        tagged = None
+        if self.tags:
+            tagged = set()
+            for tag in self.tags:
+                tagged.update(self.index.tag_ids(tag))
+
+        groups = []
+        weights = []
+        for author_index, (author, tradition, start, end) in enumerate(self.index.authors):
+            if self.authors and author not in self.authors:
+                continue
+            if self.traditions and tradition.casefold() not in self.traditions:
+                continue
+            weight = float(self.author_weights.get(author, 1.0))
+            ids = range(start, end) if tagged is None else [i for i in range(start, end) if i in tagged]
+            if ids and weight > 0:
+                groups.append((author_index, ids))
+                weights.append(weight)
+
+        pool = json.dumps([signature, sorted(self.authors), sorted(self.traditions), sorted(self.tags),
+                           sorted(self.author_weights.items())])
+        self.bag = ShuffleBag(self.bag_path, hashlib.sha1(pool.encode('utf-8')).hexdigest(), groups, weights, self.rng)
@@ -0,0 +1,42 @@
+#@brief: Locates the files shipped with the Self Remembering App, once per process.
+# Run from source, the bundled files (icons, sounds, quotes.json, client_secret.json and the
+# Calendar discovery document) sit next to the modules. In a PyInstaller build they sit in
+# sys._MEIPASS: the _internal folder of the fast-start one-folder build, which stays where it
+# was installed, or the temporary folder a one-file build unpacks itself into on every launch.
+# The folder is resolved when this module is imported; everything else asks resource_path().
+
+import os
+import sys
+
+BUNDLE_DIR = getattr(sys, '_MEIPASS', None) or os.path.dirname(os.path.abspath(__file__))
+
+
+def resource_path(*parts):
+    """
+    Returns the path of a file shipped with the app.
+
+    Args:
+        *parts (str): The path below the bundle folder, e.g. ('icons', 'picture.jpg').
+
+    Returns:
+        str: The absolute path; the file may not exist, e.g. an optional client_secret.json.
+    """
+    return os.path.join(BUNDLE_DIR, *parts)
+
+
+def bundle_kind():
+    """
+    Tells how the app is being run.
+
+    Returns:
+        str: 'source', 'onedir' for the fast-start one-folder build, or 'onefile'.
+    """
+    if not getattr(sys, 'frozen', False):
+        return 'source'
+    executable_dir = os.path.dirname(os.path.abspath(sys.executable))
+    try:
+        inside = os.path.commonpath([executable_dir, BUNDLE_DIR]) == executable_dir
+    except ValueError:
+        # On another drive, so it was unpacked elsewhere.
+        inside = False
+    return 'onedir' if inside else 'onefile'
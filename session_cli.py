@@ -0,0 +1,176 @@
+#@brief: Headless command-line front end for focus sessions.
+# Runs one focus session in a terminal using the Qt-free SessionEngine:
+#     python -m session_cli --aim "Write report" --duration 25
+# Keys while running: p = pause, r = resume, s = stop, q = stop and quit.
+# Finished sessions go to the same local history as the desktop app, and the calendar
+# insert/patch are journaled so the desktop app uploads them on its next calendar sync.
+
+import argparse
+import os
+import select
+import sys
+import time
+
+from app_settings import load_settings
+from calendar_journal import CalendarJournal
+from calendar_sync import CalendarOperation, CalendarSyncEngine, session_end_patch, session_event_body
+from idle_backends import detect_idle_backend
+from session_engine import SessionEngine, format_remaining
+from session_store import SessionRecord, SessionStore
+
+
+class KeyReader:
+    """
+    Reads single key presses from the terminal without blocking the countdown.
+
+    On a POSIX terminal the tty is switched to cbreak mode, so keys arrive without Enter.
+    When stdin is not a terminal, one command per line is read instead.
+    """
+
+    def __init__(self, stream=sys.stdin):
+        self.stream = stream
+        self._saved_mode = None
+        self._msvcrt = None
+        self._eof = False
+        if os.name == 'nt':
+            import msvcrt
+            self._msvcrt = msvcrt
+        elif stream.isatty():
+            import termios
+            import tty
+            self._termios = termios
+            self._saved_mode = termios.tcgetattr(stream)
+            tty.setcbreak(stream.fileno())
+
+    def read(self, timeout):
+        """
+        Waits up to timeout seconds for a key.
+
+        Returns:
+            str: The key pressed (lower case), '' on timeout, or None if input has ended
+            and nothing could ever resume a paused session.
+        """
+        if self._eof:
+            if timeout is None:
+                return None
+            time.sleep(timeout)
+            return ''
+
+        if self._msvcrt is not None:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while deadline is None or time.monotonic() < deadline:
+                if self._msvcrt.kbhit():
+                    return self._msvcrt.getwch().lower()
+                time.sleep(0.05)
+            return ''
+
+        ready, _, _ = select.select([self.stream], [], [], timeout)
+        if not ready:
+            return ''
+        data = self.stream.read(1) if self._saved_mode is not None else self.stream.readline()
+        if not data:
+            # Piped input ran out; keep counting down without it.
+            self._eof = True
+            return ''
+        return data.strip().lower()[:1]
+
+    def close(self):
+        if self._saved_mode is not None:
+            self._termios.tcsetattr(self.stream, self._termios.TCSADRAIN, self._saved_mode)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m session_cli', description="Run a focus session in the terminal.")
+    parser.add_argument('--aim', default='', help="the aim of the session")
+    parser.add_argument('--duration', type=float, default=25, help="session length in minutes (default: 25)")
+    parser.add_argument('--no-history', action='store_true', help="do not record the session in the local history")
+    parser.add_argument('--no-calendar', action='store_true', help="do not journal a calendar event for the session")
+    parser.add_argument('--inactivity', type=float, default=None,
+                        help="seconds of system-wide inactivity before pausing (X11 only; default from settings)")
+    return parser.parse_args(argv)
+
+
+def run_session(args, out=sys.stdout):
+    """
+    Runs one session to completion in the terminal.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line options.
+        out (file): Where the countdown is written.
+
+    Returns:
+        SessionRecord: The finished session.
+    """
+    settings = load_settings()
+    threshold = args.inactivity if args.inactivity is not None else settings['inactivity_threshold_seconds']
+    idle_backend = detect_idle_backend() if settings['system_idle_detection'] else None
+
+    store = None if args.no_history else SessionStore()
+    journal = None if args.no_calendar else CalendarJournal()
+    calendar = CalendarSyncEngine(journal=journal) if journal is not None else None
+
+    engine = SessionEngine()
+
+    def on_event(event, engine):
+        if event == SessionEngine.STARTED:
+            out.write(f"Session started: {engine.aim}\n")
+            if calendar is not None:
+                body = session_event_body(engine.key, engine.aim, engine.start_time, engine.total_seconds)
+                calendar.submit(CalendarOperation(CalendarOperation.INSERT, engine.key, body))
+        elif event == SessionEngine.PAUSED:
+            automatic = engine.pauses[-1][2]
+            out.write("\nSession paused" + (" (inactive for too long)" if automatic else "") + ". Press r to resume.\n")
+        elif event == SessionEngine.RESUMED:
+            out.write("Session resumed.\n")
+        elif event == SessionEngine.ENDED:
+            record = engine.last_record
+            out.write("\a\nSession " + ("completed" if record.end_reason == SessionRecord.COMPLETED else "stopped")
+                      + f" after {record.actual_seconds / 60:.1f} focused minutes.\n")
+            if calendar is not None:
+                patch = session_end_patch(record.end_ts)
+                calendar.submit(CalendarOperation(CalendarOperation.PATCH, record.uid, patch, event_id=record.uid))
+            if store is not None:
+                store.record(record)
+        out.flush()
+
+    engine.add_listener(on_event)
+    keys = KeyReader()
+    try:
+        engine.start(args.aim, int(args.duration * 60))
+        while engine.is_active:
+            if engine.is_running:
+                out.write(f"\r{format_remaining(engine.remaining_whole_seconds())}   ")
+                out.flush()
+            key = keys.read(engine.next_wakeup(True))
+            if key in (None, 'q', 's'):
+                engine.stop(SessionRecord.STOPPED)
+            elif key == 'p':
+                engine.pause()
+            elif key == 'r':
+                engine.resume()
+            elif engine.is_running and idle_backend is not None:
+                idle = idle_backend.idle_seconds()
+                if idle is not None and idle >= threshold:
+                    engine.pause(automatic=True)
+            engine.tick()
+    except KeyboardInterrupt:
+        engine.stop(SessionRecord.STOPPED)
+    finally:
+        keys.close()
+        if calendar is not None:
+            calendar.shutdown()
+            journal.close()
+        if store is not None:
+            store.close()
+    return engine.last_record
+
+
+def main(argv=None):
+    """
+    Entry point of python -m session_cli.
+    """
+    run_session(parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+#@brief: Multi-session daemon for team rooms and kiosks.
+# Runs many concurrent, named focus sessions in one asyncio process and exposes them over a
+# small local HTTP API (TCP on localhost or a Unix socket):
+#     python -m session_daemon --port 8765
+#     python -m session_daemon --unix /tmp/selfremembering.sock
+# Each session is a Qt-free SessionEngine. All deadlines are multiplexed through a single
+# heap and one loop timer, so there is no per-session timer, thread or presence poller.
+#
+# API (JSON bodies and responses):
+#     GET    /sessions                      list active sessions
+#     GET    /sessions/<name>               one session
+#     POST   /sessions/<name>/start         {"aim": "...", "duration": minutes} or {"duration_seconds": n}
+#     POST   /sessions/<name>/pause | resume | stop
+#     GET    /stats                         session counts, heap size, memory use, request handling time
+#                                            and calendar latency
+
+import argparse
+import asyncio
+import collections
+import functools
+import heapq
+import json
+import time
+from urllib.parse import unquote
+
+from calendar_sync import CalendarOperation, session_end_patch, session_event_body
+from metrics import resident_memory
+from resources import resource_path
+from session_engine import SessionEngine, SessionError
+from session_store import SessionRecord, SessionStore
+
+# Recent request handling times kept per route for /stats.
+HANDLING_SAMPLES = 4096
+
+
+class HttpError(Exception):
+    """
+    An error answered with the given HTTP status.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class SessionDaemon:
+    """
+    Owns the named sessions and the shared deadline heap.
+
+    Heap entries are (deadline, sequence, engine). Entries are never removed when a
+    session is paused or stopped; a stale entry simply finds nothing to do when it is
+    popped. The heap is rebuilt when stale entries outnumber live ones, which keeps
+    memory bounded under churn.
+    """
+
+    def __init__(self, max_sessions=20000, store=None, calendar=None, clock=time.monotonic):
+        """
+        Initializes the daemon.
+
+        Args:
+            max_sessions (int): Maximum number of concurrently active sessions.
+            store (SessionStore): Where finished sessions are recorded, or None.
+            calendar (CalendarSyncEngine): Receives calendar operations, or None.
+            clock (callable): Monotonic time source shared by all sessions.
+        """
+        self.max_sessions = max_sessions
+        self.store = store
+        self.calendar = calendar
+        self.clock = clock
+        self.credentials = None
+
+        self.sessions = {}
+        self.running = set()
+        self.heap = []
+        self._sequence = 0
+        self._timer_handle = None
+        self._timer_deadline = None
+        self.completed = 0
+        self.stopped = 0
+
+    # Session operations
+
+    def start(self, name, aim, duration_seconds):
+        if name in self.sessions:
+            raise HttpError(409, f"Session {name!r} is already active")
+        if len(self.sessions) >= self.max_sessions:
+            raise HttpError(503, "Too many active sessions")
+        if duration_seconds <= 0:
+            raise HttpError(400, "Duration must be positive")
+
+        engine = SessionEngine(clock=self.clock)
+        engine.add_listener(functools.partial(self._on_session_event, name))
+        self.sessions[name] = engine
+        try:
+            engine.start(aim, duration_seconds)
+        except SessionError as e:
+            raise HttpError(409, str(e))
+        return self.describe(name, engine)
+
+    def pause(self, name):
+        engine = self._get(name)
+        if not engine.pause():
+            raise HttpError(409, f"Session {name!r} is not running")
+        return self.describe(name, engine)
+
+    def resume(self, name):
+        engine = self._get(name)
+        if not engine.resume():
+            raise HttpError(409, f"Session {name!r} is not paused")
+        return self.describe(name, engine)
+
+    def stop(self, name):
+        engine = self._get(name)
+        record = engine.stop(SessionRecord.STOPPED)
+        return self.describe_record(name, record)
+
+    def get(self, name):
+        return self.describe(name, self._get(name))
+
+    def list(self):
+        return [self.describe(name, engine) for name, engine in self.sessions.items()]
+
+    def stats(self):
+        return {
+            'active': len(self.sessions),
+            'running': len(self.running),
+            'paused': len(self.sessions) - len(self.running),
+            'completed': self.completed,
+            'stopped': self.stopped,
+            'heap_entries': len(self.heap),
+            'rss_bytes': resident_memory(),
+            'calendar': self.calendar.stats() if self.calendar is not None else None,
+            'credentials': self.credentials.stats() if self.credentials is not None else None,
+        }
+
+    def _get(self, name):
+        engine = self.sessions.get(name)
+        if engine is None:
+            raise HttpError(404, f"No active session {name!r}")
+        return engine
+
+    def describe(self, name, engine):
+        return {
+            'name': name,
+            'state': engine.state,
+            'aim': engine.aim,
+            'key': engine.key,
+            'total_seconds': engine.total_seconds,
+            'remaining_seconds': engine.timer.remaining(),
+            'paused_seconds': engine.pause_time(),
+        }
+
+    def describe_record(self, name, record):
+        return {
+            'name': name,
+            'state': SessionEngine.IDLE,
+            'aim': record.aim,
+            'key': record.uid,
+            'end_reason': record.end_reason,
+            'actual_seconds': record.actual_seconds,
+            'paused_seconds': record.paused_seconds,
+        }
+
+    # Engine events and the deadline heap
+
+    def _on_session_event(self, name, event, engine):
+        if event in (SessionEngine.STARTED, SessionEngine.RESUMED):
+            self.running.add(name)
+            self._push(engine)
+            if event == SessionEngine.STARTED and self.calendar is not None:
+                body = session_event_body(engine.key, engine.aim, engine.start_time, engine.total_seconds)
+                self.calendar.submit(CalendarOperation(CalendarOperation.INSERT, engine.key, body))
+        elif event == SessionEngine.PAUSED:
+            self.running.discard(name)
+        elif event == SessionEngine.ENDED:
+            record = engine.last_record
+            self.running.discard(name)
+            del self.sessions[name]
+            if record.end_reason == SessionRecord.COMPLETED:
+                self.completed += 1
+            else:
+                self.stopped += 1
+            if self.store is not None:
+                self.store.record(record)
+            if self.calendar is not None:
+                self.calendar.submit(CalendarOperation(CalendarOperation.PATCH, record.uid,
+                                                       session_end_patch(record.end_ts), event_id=record.uid))
+
+    def _push(self, engine):
+        deadline = engine.timer.deadline()
+        self._sequence += 1
+        heapq.heappush(self.heap, (deadline, self._sequence, engine))
+        if len(self.heap) > 2 * len(self.running) + 1024:
+            self._compact()
+        self._arm()
+
+    def _compact(self):
+        self.heap = [(engine.timer.deadline(), index, engine)
+                     for index, engine in enumerate(self.sessions.values()) if engine.is_running]
+        heapq.heapify(self.heap)
+        self._sequence = len(self.heap)
+
+    def _arm(self):
+        if not self.heap:
+            return
+        deadline = self.heap[0][0]
+        if self._timer_handle is not None and self._timer_deadline <= deadline:
+            return
+        if self._timer_handle is not None:
+            self._timer_handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._timer_deadline = deadline
+        self._timer_handle = loop.call_later(max(0.0, deadline - self.clock()), self._fire)
+
+    def _fire(self):
+        self._timer_handle = None
+        self._timer_deadline = None
+        now = self.clock()
+        while self.heap and self.heap[0][0] <= now:
+            _, _, engine = heapq.heappop(self.heap)
+            # Stale entries (paused, resumed with a later deadline, or stopped) do nothing.
+            engine.tick()
+        self._arm()
+
+
+class HttpApi:
+    """
+    A minimal HTTP/1.1 front end with keep-alive, enough for local scripts and load tests.
+
+    The time from a parsed request to its encoded response is kept per route, so /stats
+    shows the daemon's own handling latency apart from network and client queueing.
+    """
+
+    def __init__(self, daemon):
+        self.daemon = daemon
+        self.handling = collections.defaultdict(lambda: collections.deque(maxlen=HANDLING_SAMPLES))
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, _ = lines[0].split(' ', 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        key, value = line.split(':', 1)
+                        headers[key.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                body = await reader.readexactly(length) if length else b''
+
+                begin = time.perf_counter()
+                status, payload = self.dispatch(method, target, body)
+                data = json.dumps(payload).encode('utf-8')
+                self.handling[route_name(method, target)].append(time.perf_counter() - begin)
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        finally:
+            writer.close()
+
+    def dispatch(self, method, target, body):
+        """
+        Routes one request.
+
+        Returns:
+            tuple: (status, JSON-serialisable payload).
+        """
+        path = [unquote(part) for part in target.split('?', 1)[0].strip('/').split('/') if part]
+        try:
+            options = json.loads(body) if body else {}
+        except ValueError:
+            return 400, {'error': "Body is not valid JSON"}
+
+        daemon = self.daemon
+        try:
+            if path == ['stats'] and method == 'GET':
+                return 200, dict(daemon.stats(), handling=self.handling_stats())
+            if path == ['sessions'] and method == 'GET':
+                return 200, daemon.list()
+            if len(path) == 2 and path[0] == 'sessions' and method == 'GET':
+                return 200, daemon.get(path[1])
+            if len(path) == 3 and path[0] == 'sessions' and method == 'POST':
+                name, action = path[1], path[2]
+                if action == 'start':
+                    if 'duration_seconds' in options:
+                        seconds = float(options['duration_seconds'])
+                    else:
+                        seconds = float(options.get('duration', 25)) * 60
+                    return 200, daemon.start(name, options.get('aim', ''), seconds)
+                if action == 'pause':
+                    return 200, daemon.pause(name)
+                if action == 'resume':
+                    return 200, daemon.resume(name)
+                if action == 'stop':
+                    return 200, daemon.stop(name)
+            return 404, {'error': f"No route for {method} {target}"}
+        except HttpError as e:
+            return e.status, {'error': str(e)}
+        except (TypeError, ValueError) as e:
+            return 400, {'error': str(e)}
+
+    def handling_stats(self):
+        """
+        Returns the median and 99th percentile handling time of each route's recent requests.
+        """
+        result = {}
+        for route, samples in self.handling.items():
+            ordered = sorted(samples)
+            pick = lambda fraction: ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+            result[route] = {'samples': len(ordered), 'p50_ms': pick(0.50), 'p99_ms': pick(0.99)}
+        return result
+
+
+def route_name(method, target):
+    """
+    Names a request's route for the handling statistics, e.g. 'start' or 'status'.
+    """
+    path = target.split('?', 1)[0].strip('/').split('/')
+    if method == 'POST' and len(path) == 3:
+        return path[2]
+    if method == 'GET' and len(path) == 2:
+        return 'status'
+    return path[0] or 'root'
+
+
+def connect_calendar(calendar):
+    """
+    Attaches Google Calendar to the sync engine using the desktop app's stored token.
+
+    Runs on a worker thread; until it succeeds, calendar operations are only journaled.
+
+    Returns:
+        CredentialManager: The manager keeping the token fresh, or None on failure.
+    """
+    from credentials import CredentialManager
+
+    credentials = CredentialManager(resource_path('client_secret.json'))
+    try:
+        credentials.authorize(interactive=False)
+        service = credentials.build_service(resource_path('discovery', 'calendar.v3.json'))
+    except Exception as e:
+        print(f"Calendar unavailable, journaling only: {str(e)}", flush=True)
+        return None
+    credentials.start()
+    calendar.set_service(service)
+    return credentials
+
+
+async def serve(args):
+    store = SessionStore() if args.history else None
+    calendar = journal = mirror = None
+    if args.calendar_journal or args.calendar:
+        from calendar_journal import CalendarJournal
+        from calendar_sync import CalendarSyncEngine
+        journal = CalendarJournal()
+        if args.calendar:
+            from calendar_mirror import CalendarMirror
+            mirror = CalendarMirror()
+        calendar = CalendarSyncEngine(journal=journal, mirror=mirror, max_queue=args.max_sessions * 2)
+
+    daemon = SessionDaemon(max_sessions=args.max_sessions, store=store, calendar=calendar)
+    if args.calendar:
+        # Connect in the background; sessions started meanwhile are journaled and replayed.
+        connecting = asyncio.get_running_loop().run_in_executor(None, connect_calendar, calendar)
+        connecting.add_done_callback(lambda future: setattr(daemon, 'credentials', future.result()))
+    api = HttpApi(daemon)
+    if args.unix:
+        server = await asyncio.start_unix_server(api.handle, path=args.unix)
+        where = args.unix
+    else:
+        server = await asyncio.start_server(api.handle, host=args.host, port=args.port)
+        where = '%s:%d' % server.sockets[0].getsockname()[:2]
+    print(f"Session daemon listening on {where}", flush=True)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if calendar is not None:
+            calendar.shutdown()
+            journal.close()
+            if mirror is not None:
+                mirror.close()
+        if daemon.credentials is not None:
+            daemon.credentials.close()
+        if store is not None:
+            store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m session_daemon', description="Run many focus sessions as a service.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="listen on this Unix socket path instead of TCP")
+    parser.add_argument('--max-sessions', type=int, default=20000)
+    parser.add_argument('--history', action='store_true', help="record finished sessions in the local history")
+    parser.add_argument('--calendar-journal', action='store_true',
+                        help="journal calendar events for upload by the desktop app")
+    parser.add_argument('--calendar', action='store_true',
+                        help="send calendar events directly, using the token stored by the desktop app")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#@brief: Qt-free focus session engine.
+# Holds the state machine of one focus session (idle -> running <-> paused -> idle) and
+# the bookkeeping that goes with it: deadline countdown, pauses, end reason and the
+# SessionRecord written to history. It has no UI and no network code; the window, the
+# headless CLI and the benchmarks drive it and react to its events through listeners.
+# Clocks are injectable, so the engine can run against a fake clock.
+
+import time
+import uuid
+
+from session_store import SessionRecord
+from session_timer import DeadlineTimer
+
+DEFAULT_AIM = "Engaged in activity"
+
+DURATION_CHOICES = {
+    "5 min": 5 * 60,
+    "15 min": 15 * 60,
+    "25 min": 25 * 60,
+    "30 min": 30 * 60,
+    "45 min": 45 * 60,
+    "1 hour": 60 * 60
+}
+
+
+class SessionError(Exception):
+    """
+    Raised when a transition is not allowed in the current state.
+    """
+
+
+class SessionEngine:
+    """
+    The state machine of a single focus session.
+
+    Listeners are called synchronously after each transition as
+    listener(event, engine), where event is one of STARTED, PAUSED, RESUMED, RESTORED or ENDED.
+    When ENDED fires, engine.last_record holds the finished session.
+    """
+
+    IDLE = 'idle'
+    RUNNING = 'running'
+    PAUSED = 'paused'
+
+    STARTED = 'started'
+    ENDED = 'ended'
+    RESUMED = 'resumed'
+    RESTORED = 'restored'
+
+    def __init__(self, clock=time.monotonic, wall_clock=time.time, key_factory=None):
+        """
+        Initializes an idle engine.
+
+        Args:
+            clock (callable): Monotonic time source for the countdown.
+            wall_clock (callable): Unix time source for recorded timestamps.
+            key_factory (callable): Returns a new unique session key; defaults to uuid4 hex.
+        """
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.key_factory = key_factory or (lambda: uuid.uuid4().hex)
+        self.timer = DeadlineTimer(clock)
+        self.listeners = []
+
+        self.state = self.IDLE
+        self.last_record = None
+        self._reset()
+
+    def _reset(self):
+        self.key = None
+        self.aim = None
+        self.prompt = None
+        self.total_seconds = 0
+        self.start_time = None
+        self.pauses = []
+        self.restored_end = None
+
+    def add_listener(self, listener):
+        """
+        Registers a callable invoked as listener(event, engine) after every transition.
+        """
+        self.listeners.append(listener)
+
+    def _emit(self, event):
+        for listener in self.listeners:
+            listener(event, self)
+
+    @property
+    def is_running(self):
+        return self.state == self.RUNNING
+
+    @property
+    def is_paused(self):
+        return self.state == self.PAUSED
+
+    @property
+    def is_active(self):
+        return self.state != self.IDLE
+
+    def start(self, aim, duration_seconds, prompt=None, key=None):
+        """
+        Starts a new session.
+
+        Args:
+            aim (str): The session's aim; blank aims get DEFAULT_AIM.
+            duration_seconds (int): Planned length of the session.
+            prompt (str): The remembrance prompt shown for this session.
+            key (str): Session key to use instead of a fresh one.
+
+        Raises:
+            SessionError: If a session is already active.
+        """
+        if self.is_active:
+            raise SessionError("A session is already running.")
+
+        self.key = key or self.key_factory()
+        self.aim = (aim or '').strip() or DEFAULT_AIM
+        self.prompt = prompt
+        self.total_seconds = duration_seconds
+        self.start_time = self.wall_clock()
+        self.pauses = []
+        self.timer.start(duration_seconds)
+        self.state = self.RUNNING
+        self._emit(self.STARTED)
+
+    def pause(self, automatic=False):
+        """
+        Pauses the running session.
+
+        Args:
+            automatic (bool): True when paused because of inactivity.
+
+        Returns:
+            bool: False if there was no running session to pause.
+        """
+        if not self.is_running:
+            return False
+        self.timer.pause()
+        self.pauses.append([self.wall_clock(), None, automatic])
+        self.state = self.PAUSED
+        self._emit(self.PAUSED)
+        return True
+
+    def resume(self):
+        """
+        Resumes the paused session.
+
+        Returns:
+            bool: False if there was no paused session to resume.
+        """
+        if not self.is_paused:
+            return False
+        self.timer.resume()
+        self.pauses[-1][1] = self.wall_clock()
+        self.state = self.RUNNING
+        self._emit(self.RESUMED)
+        return True
+
+    def stop(self, end_reason=SessionRecord.STOPPED, end_ts=None):
+        """
+        Ends the active session.
+
+        Args:
+            end_reason (str): SessionRecord.STOPPED or SessionRecord.COMPLETED.
+            end_ts (float): Unix time the session ended, if not now. The timer must already
+                account for the time until then, as restore() arranges.
+
+        Returns:
+            SessionRecord: The finished session, or None if no session was active.
+        """
+        if not self.is_active:
+            return None
+
+        if end_ts is None:
+            end_ts = self.wall_clock()
+            if end_reason == SessionRecord.COMPLETED:
+                # A late wakeup must not lengthen the session: it ended at its deadline.
+                end_ts -= max(0.0, self.clock() - self.timer.deadline())
+        if self.is_paused:
+            self.pauses[-1][1] = end_ts
+
+        self.last_record = SessionRecord(
+            uid=self.key,
+            aim=self.aim,
+            start_ts=self.start_time,
+            end_ts=end_ts,
+            planned_seconds=self.total_seconds,
+            actual_seconds=self.timer.elapsed(),
+            pauses=[tuple(pause) for pause in self.pauses],
+            end_reason=end_reason,
+            prompt=self.prompt,
+            # The session key is the client-chosen id of the session's calendar event.
+            event_id=self.key,
+        )
+        self.timer.stop()
+        self.state = self.IDLE
+        self._emit(self.ENDED)
+        self._reset()
+        return self.last_record
+
+    def snapshot(self):
+        """
+        Returns the active session as a JSON-serialisable dict for restore(), or None when idle.
+
+        A running session is saved with its deadline in wall-clock time, so a restore in
+        another process knows when it ends; a paused one with its frozen remaining time.
+        """
+        if not self.is_active:
+            return None
+        now = self.wall_clock()
+        remaining = self.timer.remaining()
+        return {
+            'key': self.key,
+            'aim': self.aim,
+            'prompt': self.prompt,
+            'total_seconds': self.total_seconds,
+            'start_time': self.start_time,
+            'pauses': [list(pause) for pause in self.pauses],
+            'state': self.state,
+            'remaining': remaining,
+            'paused_total': self.timer.pause_time(),
+            'deadline': now + remaining if self.is_running else None,
+            'saved_at': now,
+        }
+
+    def restore(self, snapshot):
+        """
+        Continues a session saved by snapshot(), possibly in an earlier process.
+
+        A running session keeps its wall-clock deadline, so the time the app was not
+        running counts as session time. If that deadline has already passed, the restored
+        session is expired and the next tick() completes it with the deadline as its end.
+        If the snapshot has an 'alive_at' before the deadline, the saving process died
+        without exiting cleanly; the next tick() then stops the session at that time, so
+        the time after the crash is not counted as focus time.
+
+        Args:
+            snapshot (dict): A value returned by snapshot().
+
+        Raises:
+            SessionError: If a session is already active.
+        """
+        if self.is_active:
+            raise SessionError("A session is already running.")
+
+        paused = snapshot['state'] == self.PAUSED
+        restored_end = None
+        if paused:
+            remaining = snapshot['remaining']
+        else:
+            now = self.wall_clock()
+            remaining = snapshot['deadline'] - now
+            alive_at = snapshot.get('alive_at')
+            if remaining <= 0 and alive_at is not None and alive_at < snapshot['deadline']:
+                # The countdown stopped when the app died: keep the remaining time of then.
+                restored_end = max(alive_at, snapshot.get('saved_at', alive_at))
+                remaining = snapshot['deadline'] - restored_end
+        self.key = snapshot['key']
+        self.aim = snapshot['aim']
+        self.prompt = snapshot.get('prompt')
+        self.total_seconds = snapshot['total_seconds']
+        self.start_time = snapshot['start_time']
+        self.pauses = [list(pause) for pause in snapshot.get('pauses', [])]
+        self.timer.restore(self.total_seconds, remaining, paused, snapshot.get('paused_total', 0.0))
+        self.restored_end = restored_end
+        self.state = self.PAUSED if paused else self.RUNNING
+        self._emit(self.RESTORED)
+
+    def tick(self):
+        """
+        Completes the session if its deadline has passed, or stops a restored session
+        that ended with a crash at the time the app was last alive.
+
+        Returns:
+            bool: True if this call ended the session.
+        """
+        if self.is_running and self.restored_end is not None:
+            self.stop(SessionRecord.STOPPED, end_ts=self.restored_end)
+            return True
+        if self.is_running and self.timer.is_expired():
+            self.stop(SessionRecord.COMPLETED)
+            return True
+        return False
+
+    def remaining_whole_seconds(self):
+        return self.timer.remaining_whole_seconds()
+
+    def elapsed(self):
+        return self.timer.elapsed()
+
+    def pause_time(self):
+        return self.timer.pause_time()
+
+    def next_wakeup(self, visible):
+        """
+        Returns the seconds until the owner next needs to call tick(), or None.
+        """
+        return self.timer.next_wakeup(visible)
+
+
+def format_remaining(seconds):
+    """
+    Formats a number of seconds as the countdown text, e.g. "4:05 remaining".
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d} remaining"
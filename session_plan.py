@@ -0,0 +1,465 @@
+#@brief: Planned sequences of focus sessions.
+# A plan is a list of focus and break steps, e.g. four 25-minute sessions with 5-minute
+# breaks, defined in the session_plans setting. A plan with a start time recurs, daily or on
+# the listed week days. PlanRunner runs a plan on a SessionEngine, each session starting when
+# the previous one (or the break after it) ends, and keeps the planned and the actual times of
+# every session. That lets the app create all planned calendar events in one batch when the
+# plan starts, and patch only the events of sessions that did not run as planned, again in one
+# batch, when it ends. Like the engine, this module is Qt-free and its clock is injectable.
+
+import math
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from session_engine import DEFAULT_AIM
+from session_store import SessionRecord
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+
+class PlanError(ValueError):
+    """
+    Raised when a plan template is invalid.
+    """
+
+
+class PlanStep:
+    """
+    One step of a plan: a focus session or a break.
+    """
+
+    FOCUS = 'focus'
+    BREAK = 'break'
+
+    def __init__(self, kind, seconds, aim=None):
+        self.kind = kind
+        self.seconds = seconds
+        self.aim = aim
+
+    def __repr__(self):
+        return f"PlanStep({self.kind!r}, {self.seconds!r}, {self.aim!r})"
+
+
+def _minutes(template, key, default=None):
+    value = template.get(key, default)
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+        raise PlanError(f"'{key}' must be a number of minutes")
+    return int(round(value * 60))
+
+
+class SessionPlan:
+    """
+    A named sequence of steps, optionally recurring at a time of day.
+    """
+
+    def __init__(self, name, steps, at=None, days=None, template=None):
+        """
+        Initializes the plan.
+
+        Args:
+            name (str): The plan's name.
+            steps (list): The PlanStep objects, in order; at least one must be a focus step.
+            at (tuple): (hour, minute) the plan starts on its own, or None.
+            days (set): Week days (0 is Monday) it recurs on; None for every day.
+            template (dict): The template the plan was read from, kept for checkpoints.
+
+        Raises:
+            PlanError: If the plan has no focus step.
+        """
+        if not any(step.kind == PlanStep.FOCUS and step.seconds > 0 for step in steps):
+            raise PlanError(f"Plan {name!r} has no focus session")
+        self.name = name
+        self.steps = list(steps)
+        self.at = at
+        self.days = days
+        self.template = template
+
+    @classmethod
+    def from_template(cls, name, template):
+        """
+        Reads a plan from its settings template.
+
+        A template either repeats one session, as
+        {"aim": "...", "focus_minutes": 25, "break_minutes": 5, "count": 4, "long_break_minutes": 15},
+        where the long break replaces every fourth break, or lists the steps, as
+        {"steps": [{"aim": "...", "minutes": 50}, {"break_minutes": 10}, ...]}.
+        Either may add "at": "07:30" and "days": ["mon", "tue", ...] to recur.
+
+        Raises:
+            PlanError: If the template is invalid.
+        """
+        if not isinstance(template, dict):
+            raise PlanError(f"Plan {name!r} must be a JSON object")
+        steps = []
+        if 'steps' in template:
+            if not isinstance(template['steps'], list):
+                raise PlanError(f"Plan {name!r}: 'steps' must be a list")
+            for item in template['steps']:
+                if not isinstance(item, dict):
+                    raise PlanError(f"Plan {name!r}: every step must be a JSON object")
+                if 'break_minutes' in item:
+                    steps.append(PlanStep(PlanStep.BREAK, _minutes(item, 'break_minutes')))
+                else:
+                    steps.append(PlanStep(PlanStep.FOCUS, _minutes(item, 'minutes'), item.get('aim')))
+        else:
+            count = template.get('count', 1)
+            if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+                raise PlanError(f"Plan {name!r}: 'count' must be a positive whole number")
+            focus = _minutes(template, 'focus_minutes', 25)
+            pause = _minutes(template, 'break_minutes', 5)
+            long_pause = _minutes(template, 'long_break_minutes', template.get('break_minutes', 5))
+            for index in range(count):
+                if index:
+                    steps.append(PlanStep(PlanStep.BREAK, long_pause if index % 4 == 0 else pause))
+                steps.append(PlanStep(PlanStep.FOCUS, focus, template.get('aim')))
+
+        at = None
+        if template.get('at') is not None:
+            try:
+                hour, minute = (int(part) for part in str(template['at']).split(':'))
+                if not (0 <= hour < 24 and 0 <= minute < 60):
+                    raise ValueError
+            except ValueError:
+                raise PlanError(f"Plan {name!r}: 'at' must be a time such as \"07:30\"")
+            at = (hour, minute)
+        days = None
+        if template.get('days') is not None:
+            try:
+                days = {WEEKDAYS.index(str(day).lower()[:3]) for day in template['days']}
+            except ValueError:
+                raise PlanError(f"Plan {name!r}: 'days' must list week days such as \"mon\"")
+        return cls(name, [step for step in steps if step.seconds > 0], at, days, template)
+
+    @property
+    def total_seconds(self):
+        return sum(step.seconds for step in self.steps)
+
+    @property
+    def recurring(self):
+        return self.at is not None
+
+    def next_occurrence(self, after):
+        """
+        Returns the Unix time of the first start of a recurring plan after a moment, or None.
+
+        Args:
+            after (float): Unix time to search from.
+        """
+        if self.at is None:
+            return None
+        day = datetime.fromtimestamp(after).date()
+        for offset in range(8):
+            date = day + timedelta(days=offset)
+            if self.days is not None and date.weekday() not in self.days:
+                continue
+            start = datetime(date.year, date.month, date.day, *self.at).timestamp()
+            if start > after:
+                return start
+        return None
+
+
+def load_plans(templates):
+    """
+    Reads the session_plans setting.
+
+    Args:
+        templates (dict): Plan name -> template.
+
+    Returns:
+        dict: Plan name -> SessionPlan; invalid templates are reported and left out.
+    """
+    plans = {}
+    for name, template in (templates or {}).items():
+        try:
+            plans[name] = SessionPlan.from_template(name, template)
+        except PlanError as e:
+            print(f"Session plan error: {str(e)}")
+    return plans
+
+
+def plan_deviations(entries, tolerance):
+    """
+    Returns the focus entries whose session did not run as planned.
+
+    Args:
+        entries (list): The entries of a finished plan run (PlanRunner.last_entries).
+        tolerance (float): Seconds by which actual times may differ from planned ones.
+
+    Returns:
+        list: The entries whose calendar event must change. An entry without
+        actual_start was never run; its event should be removed.
+    """
+    changed = []
+    for entry in entries:
+        if entry['kind'] != PlanStep.FOCUS:
+            continue
+        if entry['actual_start'] is None or entry['actual_end'] is None:
+            changed.append(entry)
+        elif (abs(entry['actual_start'] - entry['planned_start']) > tolerance
+              or abs(entry['actual_end'] - entry['planned_end']) > tolerance):
+            changed.append(entry)
+    return changed
+
+
+class PlanRunner:
+    """
+    Runs a SessionPlan on a SessionEngine, one step after the other.
+
+    Register the runner before any other engine listener, so the others already see the
+    plan's next step when a session ends. The owner calls tick() when next_wakeup() says so,
+    which starts the step after a finished session or a break. Listeners are called as
+    listener(event, runner), where event is STARTED, STEP, BREAK or ENDED. When ENDED fires,
+    the runner is idle again; last_plan and last_entries hold the finished run and
+    end_reason says why it ended.
+
+    Each entry is a dict with the step's kind, aim, seconds and session key, its planned and
+    actual start and end (Unix times), and its status: 'planned', 'running', 'done' or 'stopped'.
+    """
+
+    STARTED = 'plan_started'
+    STEP = 'plan_step'
+    BREAK = 'plan_break'
+    ENDED = 'plan_ended'
+
+    COMPLETED = 'completed'
+    STOPPED = 'stopped'
+    INTERRUPTED = 'interrupted'
+
+    def __init__(self, engine, start_session=None, wall_clock=time.time, key_factory=None, max_gap=15 * 60):
+        """
+        Initializes an idle runner and registers it as a listener of the engine.
+
+        Args:
+            engine (SessionEngine): The engine that runs the plan's sessions.
+            start_session (callable): Called as start_session(aim, seconds, key) to start
+                a focus step; defaults to engine.start.
+            wall_clock (callable): Unix time source.
+            key_factory (callable): Returns a new session key; defaults to uuid4 hex.
+            max_gap (float): Seconds a step may start late, e.g. after the app was closed,
+                before the plan is ended as interrupted instead.
+        """
+        self.engine = engine
+        self.start_session = start_session or (lambda aim, seconds, key: engine.start(aim, seconds, key=key))
+        self.wall_clock = wall_clock
+        self.key_factory = key_factory or (lambda: uuid.uuid4().hex)
+        self.max_gap = max_gap
+        self.listeners = []
+        self.last_plan = None
+        self.last_entries = None
+        self.end_reason = None
+        self._reset()
+        engine.add_listener(self._on_engine_event)
+
+    def _reset(self):
+        self.plan = None
+        self.entries = []
+        self.index = -1
+        self.break_until = None
+        self.advance_due = None
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def _emit(self, event):
+        for listener in self.listeners:
+            listener(event, self)
+
+    @property
+    def is_active(self):
+        return self.plan is not None
+
+    @property
+    def in_break(self):
+        return self.break_until is not None
+
+    @property
+    def current(self):
+        return self.entries[self.index] if 0 <= self.index < len(self.entries) else None
+
+    def owns(self, session_key):
+        """
+        Tells whether a session belongs to the running or the last finished plan.
+        """
+        return any(entry['key'] == session_key for entry in self.entries + (self.last_entries or []))
+
+    def focus_entries(self):
+        return [entry for entry in self.entries if entry['kind'] == PlanStep.FOCUS]
+
+    def start(self, plan, aim=None):
+        """
+        Plans every step from now on, emits STARTED and starts the first step.
+
+        Args:
+            plan (SessionPlan): The plan to run.
+            aim (str): The aim of focus steps that have none of their own.
+
+        Raises:
+            PlanError: If a session or another plan is already running.
+        """
+        if self.is_active or self.engine.is_active:
+            raise PlanError("A session is already running.")
+        now = self.wall_clock()
+        self.plan = plan
+        self.entries = []
+        for step in plan.steps:
+            self.entries.append({
+                'kind': step.kind,
+                'aim': (step.aim or aim or '').strip() or DEFAULT_AIM,
+                'seconds': step.seconds,
+                'key': self.key_factory() if step.kind == PlanStep.FOCUS else None,
+                'planned_start': now,
+                'planned_end': now + step.seconds,
+                'actual_start': None,
+                'actual_end': None,
+                'status': 'planned',
+            })
+            now += step.seconds
+        self._emit(self.STARTED)
+        self._next_step(self.wall_clock())
+
+    def stop(self):
+        """
+        Ends the plan by hand; a running session of the plan is stopped as well.
+        """
+        if not self.is_active:
+            return
+        current = self.current
+        if current is not None and current['kind'] == PlanStep.FOCUS and self.engine.key == current['key']:
+            # The engine's ENDED event ends the plan.
+            self.engine.stop(SessionRecord.STOPPED)
+        else:
+            self._finish(self.STOPPED)
+
+    def tick(self):
+        """
+        Starts the next step if the previous one is over.
+
+        Returns:
+            bool: True if this call moved the plan on.
+        """
+        if not self.is_active:
+            return False
+        now = self.wall_clock()
+        if self.advance_due is not None:
+            due, self.advance_due = self.advance_due, None
+        elif self.break_until is not None and now >= self.break_until:
+            due, self.break_until = self.break_until, None
+            self.current['actual_end'] = due
+            self.current['status'] = 'done'
+        else:
+            return False
+        if now - due > self.max_gap:
+            self._finish(self.INTERRUPTED)
+        else:
+            self._next_step(now)
+        return True
+
+    def next_wakeup(self, visible):
+        """
+        Returns the seconds until the owner next needs to call tick(), or None.
+
+        During a visible break that is the next change of the displayed second.
+        """
+        if self.advance_due is not None:
+            return 0.0
+        if self.break_until is None:
+            return None
+        remaining = max(0.0, self.break_until - self.wall_clock())
+        if remaining <= 0.0 or not visible:
+            return remaining
+        fraction = remaining - math.floor(remaining)
+        return fraction if fraction > 0.0 else min(1.0, remaining)
+
+    def break_remaining(self):
+        """
+        Returns the seconds left in the current break, or None outside a break.
+        """
+        if self.break_until is None:
+            return None
+        return max(0.0, self.break_until - self.wall_clock())
+
+    def snapshot(self):
+        """
+        Returns the run as a JSON-serialisable dict for restore(), or None when idle.
+        """
+        if not self.is_active:
+            return None
+        return {
+            'name': self.plan.name,
+            'template': self.plan.template,
+            'entries': [dict(entry) for entry in self.entries],
+            'index': self.index,
+            'break_until': self.break_until,
+            'advance_due': self.advance_due,
+        }
+
+    def restore(self, snapshot):
+        """
+        Continues a run saved by snapshot(). Restore it before the engine's session, so the
+        runner sees that session end if it completed while the app was closed, and call
+        settle() after the engine's session was restored.
+
+        Raises:
+            PlanError: If the snapshot's template is no longer valid.
+        """
+        self.plan = SessionPlan.from_template(snapshot['name'], snapshot['template'])
+        self.entries = [dict(entry) for entry in snapshot['entries']]
+        self.index = snapshot['index']
+        self.break_until = snapshot.get('break_until')
+        self.advance_due = snapshot.get('advance_due')
+
+    def settle(self):
+        """
+        Ends a restored run as interrupted if its running session was not restored with it.
+        """
+        current = self.current
+        if (current is not None and current['kind'] == PlanStep.FOCUS and current['status'] == 'running'
+                and self.engine.key != current['key']):
+            current['status'] = 'stopped'
+            self._finish(self.INTERRUPTED)
+
+    def _next_step(self, now):
+        self.index += 1
+        current = self.current
+        if current is None:
+            self._finish(self.COMPLETED)
+            return
+        if current['kind'] == PlanStep.BREAK:
+            current['actual_start'] = now
+            current['status'] = 'running'
+            self.break_until = now + current['seconds']
+            self._emit(self.BREAK)
+            return
+        if self.engine.is_active:
+            self._finish(self.INTERRUPTED)
+            return
+        self.start_session(current['aim'], current['seconds'], current['key'])
+
+    def _on_engine_event(self, event, engine):
+        current = self.current
+        if current is None or current['kind'] != PlanStep.FOCUS or engine.key != current['key']:
+            return
+        if event in (engine.STARTED, engine.RESTORED):
+            current['actual_start'] = engine.start_time
+            current['status'] = 'running'
+            self._emit(self.STEP)
+        elif event == engine.ENDED:
+            record = engine.last_record
+            current['actual_start'] = record.start_ts
+            current['actual_end'] = record.end_ts
+            if record.end_reason == SessionRecord.COMPLETED:
+                current['status'] = 'done'
+                # The engine is still ending this session; tick() starts the next step.
+                self.advance_due = record.end_ts
+                self._emit(self.STEP)
+            else:
+                current['status'] = 'stopped'
+                self._finish(self.STOPPED)
+
+    def _finish(self, reason):
+        self.last_plan = self.plan
+        self.last_entries = self.entries
+        self.end_reason = reason
+        self._reset()
+        self._emit(self.ENDED)
@@ -0,0 +1,606 @@
+#@brief: Local SQLite history of focus sessions.
+# Every finished session is recorded in ~/.mindapp/sessions.db with its aim, planned and
+# actual duration, pauses, the prompt shown and its calendar event id.
+# Writes are queued and committed in batches by a writer thread, so the UI never waits on disk.
+# Aggregate queries are answered from covering indexes and stay fast on years of history.
+# Per-day, per-week and per-aim totals and the focus streak are kept in small rollup tables that
+# the writer updates in the same transaction as each new session, so the statistics panel reads
+# a few dozen rows however long the history is. A database written before the rollups existed
+# has them built once, on the writer thread.
+# iter_sessions() pages through the whole history for exports without holding it in memory.
+
+import os
+import queue
+import sqlite3
+import threading
+from datetime import date, datetime
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser('~'), '.mindapp', 'sessions.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    uid TEXT NOT NULL UNIQUE,
+    aim TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    day INTEGER NOT NULL,
+    planned_seconds INTEGER NOT NULL,
+    actual_seconds REAL NOT NULL,
+    paused_seconds REAL NOT NULL,
+    pause_count INTEGER NOT NULL,
+    auto_pause_count INTEGER NOT NULL,
+    end_reason TEXT NOT NULL,
+    prompt TEXT,
+    event_id TEXT
+);
+CREATE TABLE IF NOT EXISTS session_pauses (
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    paused_at REAL NOT NULL,
+    resumed_at REAL,
+    automatic INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_start ON sessions(start_ts);
+CREATE INDEX IF NOT EXISTS sessions_day_aim ON sessions(day, aim, actual_seconds);
+CREATE INDEX IF NOT EXISTS sessions_aim_start ON sessions(aim, start_ts);
+CREATE INDEX IF NOT EXISTS session_pauses_session ON session_pauses(session_id);
+CREATE TABLE IF NOT EXISTS daily_rollup (
+    day INTEGER PRIMARY KEY,
+    sessions INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    focus_seconds REAL NOT NULL,
+    pauses INTEGER NOT NULL,
+    auto_pauses INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS weekly_rollup (
+    week INTEGER PRIMARY KEY,
+    sessions INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    focus_seconds REAL NOT NULL,
+    pauses INTEGER NOT NULL,
+    auto_pauses INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aim_rollup (
+    aim TEXT PRIMARY KEY,
+    sessions INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    focus_seconds REAL NOT NULL,
+    last_ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS aim_rollup_focus ON aim_rollup(focus_seconds);
+CREATE TABLE IF NOT EXISTS rollup_state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Bumped when the rollup tables change; the writer then rebuilds them from the sessions.
+ROLLUP_VERSION = 1
+
+ROLLUP_UPSERT = """
+INSERT INTO {table} ({key}, sessions, completed, focus_seconds, pauses, auto_pauses) VALUES (?, 1, ?, ?, ?, ?)
+ON CONFLICT({key}) DO UPDATE SET
+    sessions = sessions + 1,
+    completed = completed + excluded.completed,
+    focus_seconds = focus_seconds + excluded.focus_seconds,
+    pauses = pauses + excluded.pauses,
+    auto_pauses = auto_pauses + excluded.auto_pauses
+"""
+
+
+class SessionRecord:
+    """
+    One finished focus session.
+    """
+
+    COMPLETED = 'completed'
+    STOPPED = 'stopped'
+
+    def __init__(self, uid, aim, start_ts, end_ts, planned_seconds, actual_seconds,
+                 pauses=(), end_reason=STOPPED, prompt=None, event_id=None):
+        """
+        Initializes the record.
+
+        Args:
+            uid (str): Stable unique id of the session (its session key).
+            aim (str): The session's aim.
+            start_ts (float): Unix time the session started.
+            end_ts (float): Unix time the session ended.
+            planned_seconds (int): The duration that was chosen.
+            actual_seconds (float): Focused time, excluding pauses.
+            pauses (list): (paused_at, resumed_at, automatic) tuples; resumed_at may be None.
+            end_reason (str): COMPLETED if the timer ran out, STOPPED if ended by hand.
+            prompt (str): The remembrance prompt shown during the session.
+            event_id (str): The Google Calendar event id, if any.
+        """
+        self.uid = uid
+        self.aim = aim
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.planned_seconds = planned_seconds
+        self.actual_seconds = actual_seconds
+        self.pauses = list(pauses)
+        self.end_reason = end_reason
+        self.prompt = prompt
+        self.event_id = event_id
+
+    @property
+    def day(self):
+        """
+        The local calendar day the session started on, as a proleptic Gregorian ordinal.
+        """
+        return datetime.fromtimestamp(self.start_ts).date().toordinal()
+
+    @property
+    def paused_seconds(self):
+        return sum((resumed or self.end_ts) - paused for paused, resumed, _ in self.pauses)
+
+    @property
+    def auto_pause_count(self):
+        return sum(1 for _, _, automatic in self.pauses if automatic)
+
+
+def months_ago(today, months):
+    """
+    Returns the date the given number of calendar months before today.
+
+    The day of month is clamped, so three months before May 31st is February 28th/29th.
+    """
+    month_index = today.year * 12 + today.month - 1 - months
+    year, month = divmod(month_index, 12)
+    month += 1
+    for day in (today.day, 30, 29, 28):
+        try:
+            return date(year, month, day)
+        except ValueError:
+            continue
+
+
+def parse_pauses(text):
+    """
+    Parses the pauses of a session from "paused_at/resumed_at/automatic;..." text.
+
+    Returns:
+        list: (paused_at, resumed_at, automatic) tuples; resumed_at may be None.
+    """
+    pauses = []
+    for pause in (text or '').split(';'):
+        if pause:
+            paused, resumed, automatic = pause.split('/')
+            pauses.append((float(paused), float(resumed) if resumed else None, automatic == '1'))
+    return pauses
+
+
+def week_of(day):
+    """
+    Returns the Monday of the week a day falls in, both as proleptic Gregorian ordinals.
+    """
+    # Ordinal 1 (January 1st of year 1) was a Monday.
+    return day - (day - 1) % 7
+
+
+class FocusStats:
+    """
+    A snapshot of the rollups: recent days and weeks, the streak, totals and the top aims.
+    """
+
+    def __init__(self, today, days, weeks, aims, totals, current_streak, longest_streak):
+        """
+        Initializes the snapshot.
+
+        Args:
+            today (datetime.date): The day the snapshot was taken for.
+            days (list): (datetime.date, minutes, sessions) for each recent day, oldest first.
+            weeks (list): (Monday as datetime.date, minutes, sessions) for each recent week, oldest first.
+            aims (list): (aim, minutes, sessions) tuples, most focused first.
+            totals (dict): All-time 'sessions', 'completed', 'focus_seconds', 'pauses' and 'auto_pauses'.
+            current_streak (int): Consecutive days with a session, ending today or yesterday.
+            longest_streak (int): The longest such run ever.
+        """
+        self.today = today
+        self.days = days
+        self.weeks = weeks
+        self.aims = aims
+        self.totals = totals
+        self.current_streak = current_streak
+        self.longest_streak = longest_streak
+
+    @property
+    def today_minutes(self):
+        return self.days[-1][1] if self.days else 0.0
+
+    @property
+    def week_minutes(self):
+        return self.weeks[-1][1] if self.weeks else 0.0
+
+    @property
+    def completion_rate(self):
+        """
+        The share of sessions that ran to the end of their timer rather than being stopped, or None.
+        """
+        sessions = self.totals['sessions']
+        return self.totals['completed'] / sessions if sessions else None
+
+    @property
+    def auto_pauses_per_session(self):
+        sessions = self.totals['sessions']
+        return self.totals['auto_pauses'] / sessions if sessions else None
+
+
+class SessionStore:
+    """
+    Records sessions on a background writer thread and answers history queries.
+
+    Queries may be issued from any thread; each thread uses its own read connection.
+    The database runs in WAL mode, so reads never wait for the writer.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, batch_size=500, on_write=None):
+        """
+        Opens (and if needed creates) the database and starts the writer thread.
+
+        Args:
+            path (str): Location of the SQLite database.
+            batch_size (int): Maximum number of records committed in one transaction.
+            on_write (callable): Called on the writer thread with the number of new sessions
+                after each commit that added any, e.g. to refresh a statistics view.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.on_write = on_write
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        connection.commit()
+        connection.close()
+
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name='session-store', daemon=True)
+        self._writer.start()
+
+    def record(self, session):
+        """
+        Queues a finished session for writing. Never blocks on disk.
+
+        Args:
+            session (SessionRecord): The session to record.
+        """
+        self._queue.put(session)
+
+    def flush(self):
+        """
+        Waits until every queued session has been committed.
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Commits outstanding writes and stops the writer thread.
+        """
+        self._queue.put(None)
+        self._writer.join()
+
+    def focus_minutes_by_day(self, months=3, today=None):
+        """
+        Returns the total focused minutes per day over the last months.
+
+        Args:
+            months (int): How many calendar months to look back.
+            today (datetime.date): The reference day; defaults to today.
+
+        Returns:
+            list: (datetime.date, minutes) tuples in date order; days without sessions are omitted.
+        """
+        since = months_ago(today or date.today(), months).toordinal()
+        rows = self._read().execute(
+            "SELECT day, SUM(actual_seconds) FROM sessions WHERE day >= ? GROUP BY day ORDER BY day",
+            (since,))
+        return [(date.fromordinal(day), seconds / 60.0) for day, seconds in rows]
+
+    def focus_minutes_by_aim(self, months=3, today=None, limit=None):
+        """
+        Returns the total focused minutes per aim over the last months, largest first.
+
+        Args:
+            months (int): How many calendar months to look back.
+            today (datetime.date): The reference day; defaults to today.
+            limit (int): Maximum number of aims to return.
+
+        Returns:
+            list: (aim, minutes) tuples.
+        """
+        since = months_ago(today or date.today(), months).toordinal()
+        # Summing per (day, aim) first walks the covering index in order; the outer
+        # grouping then only sees one row per day and aim.
+        sql = ("SELECT aim, SUM(total) AS total FROM ("
+               "SELECT day, aim, SUM(actual_seconds) AS total FROM sessions WHERE day >= ? GROUP BY day, aim"
+               ") GROUP BY aim ORDER BY total DESC")
+        params = [since]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [(aim, seconds / 60.0) for aim, seconds in self._read().execute(sql, params)]
+
+    def focus_minutes_by_day_and_aim(self, months=3, today=None, aim=None):
+        """
+        Returns the total focused minutes per day and aim over the last months.
+
+        Args:
+            months (int): How many calendar months to look back.
+            today (datetime.date): The reference day; defaults to today.
+            aim (str): Restrict the result to one aim.
+
+        Returns:
+            list: (datetime.date, aim, minutes) tuples in date order.
+        """
+        since = months_ago(today or date.today(), months).toordinal()
+        sql = "SELECT day, aim, SUM(actual_seconds) FROM sessions WHERE day >= ?"
+        params = [since]
+        if aim is not None:
+            sql += " AND aim = ?"
+            params.append(aim)
+        sql += " GROUP BY day, aim ORDER BY day"
+        return [(date.fromordinal(day), name, seconds / 60.0) for day, name, seconds in self._read().execute(sql, params)]
+
+    def focus_stats(self, today=None, days=30, weeks=12, aims=5):
+        """
+        Returns the statistics shown by the statistics panel, read from the rollups only.
+
+        Args:
+            today (datetime.date): The reference day; defaults to today.
+            days (int): How many days, ending today, the daily series covers.
+            weeks (int): How many weeks, ending with the current one, the weekly series covers.
+            aims (int): How many aims to list.
+
+        Returns:
+            FocusStats: Days and weeks without sessions are included with zero minutes.
+        """
+        today = today or date.today()
+        last_day = today.toordinal()
+        first_day = last_day - days + 1
+        last_week = week_of(last_day)
+        first_week = last_week - 7 * (weeks - 1)
+
+        connection = self._read()
+        # One read transaction, so the series, totals and streak all come from the same commit.
+        with connection:
+            connection.execute("BEGIN")
+            by_day = {day: (seconds, sessions) for day, seconds, sessions in connection.execute(
+                "SELECT day, focus_seconds, sessions FROM daily_rollup WHERE day BETWEEN ? AND ?",
+                (first_day, last_day))}
+            by_week = {week: (seconds, sessions) for week, seconds, sessions in connection.execute(
+                "SELECT week, focus_seconds, sessions FROM weekly_rollup WHERE week BETWEEN ? AND ?",
+                (first_week, last_week))}
+            top_aims = [(aim, seconds / 60.0, sessions) for aim, seconds, sessions in connection.execute(
+                "SELECT aim, focus_seconds, sessions FROM aim_rollup ORDER BY focus_seconds DESC LIMIT ?",
+                (aims,))]
+            row = connection.execute(
+                "SELECT COUNT(*), SUM(sessions), SUM(completed), SUM(focus_seconds), SUM(pauses), SUM(auto_pauses) "
+                "FROM weekly_rollup").fetchone()
+            state = dict(connection.execute("SELECT key, value FROM rollup_state").fetchall())
+
+        totals = {'sessions': row[1] or 0, 'completed': row[2] or 0, 'focus_seconds': row[3] or 0.0,
+                  'pauses': row[4] or 0, 'auto_pauses': row[5] or 0}
+        streak_end = state.get('streak_end', 0)
+        current_streak = state.get('streak_length', 0) if last_day - streak_end <= 1 else 0
+
+        def series(first, count, step, rows):
+            points = []
+            for index in range(count):
+                key = first + index * step
+                seconds, sessions = rows.get(key, (0.0, 0))
+                points.append((date.fromordinal(key), seconds / 60.0, sessions))
+            return points
+
+        return FocusStats(today, series(first_day, days, 1, by_day), series(first_week, weeks, 7, by_week),
+                          top_aims, totals, current_streak, state.get('longest_streak', 0))
+
+    def recent_sessions(self, limit=20):
+        """
+        Returns the most recent sessions, newest first.
+
+        Returns:
+            list: sqlite3.Row objects with the columns of the sessions table.
+        """
+        return self._read().execute("SELECT * FROM sessions ORDER BY start_ts DESC LIMIT ?", (limit,)).fetchall()
+
+    def iter_sessions(self, since=None, page_size=1000):
+        """
+        Yields every recorded session, oldest first, without loading the history into memory.
+
+        The sessions are read in pages on a connection of their own, so a slow consumer such as
+        an export holds no more than one page and never blocks other queries or the writer.
+
+        Args:
+            since (float): Only sessions that started at or after this Unix time.
+            page_size (int): Sessions fetched per round trip.
+
+        Yields:
+            SessionRecord: The session, with its pauses.
+        """
+        connection = self._connect()
+        try:
+            cursor = connection.execute(
+                "SELECT uid, aim, start_ts, end_ts, planned_seconds, actual_seconds, end_reason, prompt, event_id, "
+                "(SELECT group_concat(paused_at || '/' || IFNULL(resumed_at, '') || '/' || automatic, ';') "
+                "FROM session_pauses WHERE session_id = sessions.id) "
+                "FROM sessions WHERE start_ts >= ? ORDER BY start_ts, id", (since or 0,))
+            while True:
+                rows = cursor.fetchmany(page_size)
+                if not rows:
+                    return
+                for uid, aim, start_ts, end_ts, planned, actual, end_reason, prompt, event_id, pauses in rows:
+                    yield SessionRecord(uid, aim, start_ts, end_ts, planned, actual, parse_pauses(pauses),
+                                        end_reason, prompt, event_id)
+        finally:
+            connection.close()
+
+    def known_uids(self, uids):
+        """
+        Returns which of the given session uids are already recorded.
+
+        Args:
+            uids (iterable): Session uids, e.g. of one chunk of an import.
+
+        Returns:
+            set: The uids that are in the store.
+        """
+        uids = list(uids)
+        known = set()
+        connection = self._read()
+        # Well below SQLite's limit on bound parameters.
+        for start in range(0, len(uids), 500):
+            chunk = uids[start:start + 500]
+            known.update(uid for uid, in connection.execute(
+                f"SELECT uid FROM sessions WHERE uid IN ({', '.join('?' * len(chunk))})", chunk))
+        return known
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _read(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _write_loop(self):
+        connection = self._connect()
+        try:
+            version = connection.execute("SELECT value FROM rollup_state WHERE key = 'version'").fetchone()
+            if version is None or version[0] != ROLLUP_VERSION:
+                with connection:
+                    self._build_rollups(connection)
+        except sqlite3.Error as e:
+            print(f"Session store error: {str(e)}")
+
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            sessions = [session for session in batch if session is not None]
+            added = 0
+            try:
+                if sessions:
+                    with connection:
+                        added = self._insert(connection, sessions)
+            except sqlite3.Error as e:
+                print(f"Session store error: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if added and self.on_write is not None:
+                try:
+                    self.on_write(added)
+                except Exception as e:
+                    print(f"Session store listener error: {str(e)}")
+
+            if len(sessions) != len(batch):
+                connection.close()
+                return
+
+    def _insert(self, connection, sessions):
+        """
+        Inserts new sessions and adds them to the rollups. Sessions already recorded are skipped.
+
+        Returns:
+            int: The number of sessions that were new.
+        """
+        added = 0
+        earlier_day = False
+        for session in sessions:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO sessions (uid, aim, start_ts, end_ts, day, planned_seconds, actual_seconds, "
+                "paused_seconds, pause_count, auto_pause_count, end_reason, prompt, event_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (session.uid, session.aim, session.start_ts, session.end_ts, session.day,
+                 session.planned_seconds, session.actual_seconds, session.paused_seconds,
+                 len(session.pauses), session.auto_pause_count, session.end_reason,
+                 session.prompt, session.event_id))
+            if cursor.rowcount and session.pauses:
+                connection.executemany(
+                    "INSERT INTO session_pauses (session_id, paused_at, resumed_at, automatic) VALUES (?, ?, ?, ?)",
+                    [(cursor.lastrowid, paused, resumed, int(automatic)) for paused, resumed, automatic in session.pauses])
+            if cursor.rowcount:
+                added += 1
+                earlier_day |= self._add_to_rollups(connection, session)
+        if earlier_day:
+            self._rebuild_streaks(connection)
+        return added
+
+    def _add_to_rollups(self, connection, session):
+        """
+        Adds one new session to the day, week and aim rollups and extends the streak.
+
+        Returns:
+            bool: True if the session's day is before the current streak's last day and was not
+            in the rollups yet, e.g. from an import, so the streaks have to be recomputed.
+        """
+        day = session.day
+        completed = int(session.end_reason == SessionRecord.COMPLETED)
+        values = (completed, session.actual_seconds, len(session.pauses), session.auto_pause_count)
+        new_day = connection.execute("SELECT 1 FROM daily_rollup WHERE day = ?", (day,)).fetchone() is None
+        connection.execute(ROLLUP_UPSERT.format(table='daily_rollup', key='day'), (day,) + values)
+        connection.execute(ROLLUP_UPSERT.format(table='weekly_rollup', key='week'), (week_of(day),) + values)
+        connection.execute(
+            "INSERT INTO aim_rollup (aim, sessions, completed, focus_seconds, last_ts) VALUES (?, 1, ?, ?, ?) "
+            "ON CONFLICT(aim) DO UPDATE SET sessions = sessions + 1, completed = completed + excluded.completed, "
+            "focus_seconds = focus_seconds + excluded.focus_seconds, last_ts = MAX(last_ts, excluded.last_ts)",
+            (session.aim, completed, session.actual_seconds, session.end_ts))
+        if not new_day:
+            return False
+
+        state = dict(connection.execute("SELECT key, value FROM rollup_state").fetchall())
+        streak_end = state.get('streak_end', 0)
+        if day < streak_end:
+            return True
+        length = state.get('streak_length', 0) + 1 if day == streak_end + 1 else 1
+        self._set_state(connection, streak_end=day, streak_length=length,
+                        longest_streak=max(length, state.get('longest_streak', 0)))
+        return False
+
+    def _rebuild_streaks(self, connection):
+        """
+        Recomputes the streaks from the days in the daily rollup.
+        """
+        streak_end = length = longest = 0
+        for day, in connection.execute("SELECT day FROM daily_rollup ORDER BY day"):
+            length = length + 1 if day == streak_end + 1 else 1
+            streak_end = day
+            longest = max(longest, length)
+        self._set_state(connection, streak_end=streak_end, streak_length=length, longest_streak=longest)
+
+    def _build_rollups(self, connection):
+        """
+        Rebuilds every rollup from the sessions table.
+        """
+        connection.execute("DELETE FROM daily_rollup")
+        connection.execute("DELETE FROM weekly_rollup")
+        connection.execute("DELETE FROM aim_rollup")
+        connection.execute(
+            "INSERT INTO daily_rollup (day, sessions, completed, focus_seconds, pauses, auto_pauses) "
+            "SELECT day, COUNT(*), SUM(end_reason = ?), SUM(actual_seconds), SUM(pause_count), SUM(auto_pause_count) "
+            "FROM sessions GROUP BY day", (SessionRecord.COMPLETED,))
+        connection.execute(
+            "INSERT INTO weekly_rollup (week, sessions, completed, focus_seconds, pauses, auto_pauses) "
+            "SELECT day - (day - 1) % 7 AS week, SUM(sessions), SUM(completed), SUM(focus_seconds), SUM(pauses), "
+            "SUM(auto_pauses) FROM daily_rollup GROUP BY week")
+        connection.execute(
+            "INSERT INTO aim_rollup (aim, sessions, completed, focus_seconds, last_ts) "
+            "SELECT aim, COUNT(*), SUM(end_reason = ?), SUM(actual_seconds), MAX(end_ts) FROM sessions GROUP BY aim",
+            (SessionRecord.COMPLETED,))
+        self._rebuild_streaks(connection)
+        self._set_state(connection, version=ROLLUP_VERSION)
+
+    def _set_state(self, connection, **values):
+        connection.executemany("INSERT OR REPLACE INTO rollup_state (key, value) VALUES (?, ?)", values.items())
@@ -0,0 +1,147 @@
+#@brief: Drift-free countdown timer for focus sessions.
+# Remaining time is always derived from a monotonic deadline minus the time spent paused,
+# never from counting ticks, so late or missed wakeups cannot make a session run long.
+# The timer also tells the UI when the next wakeup is actually needed.
+
+import math
+import time
+
+
+class DeadlineTimer:
+    """
+    A pausable countdown based on a monotonic deadline.
+
+    The clock is injectable so the timer can be driven by a fake clock.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        """
+        Initializes an idle timer.
+
+        Args:
+            clock (callable): Returns the current time in seconds; must never go backwards.
+        """
+        self.clock = clock
+        self.duration = 0.0
+        self.started_at = None
+        self.paused_at = None
+        self.paused_total = 0.0
+
+    @property
+    def is_active(self):
+        return self.started_at is not None
+
+    @property
+    def is_paused(self):
+        return self.paused_at is not None
+
+    def start(self, duration):
+        """
+        Starts counting down from duration seconds.
+        """
+        self.duration = float(duration)
+        self.started_at = self.clock()
+        self.paused_at = None
+        self.paused_total = 0.0
+
+    def pause(self):
+        """
+        Freezes the countdown. Does nothing if already paused or not started.
+        """
+        if self.is_active and not self.is_paused:
+            self.paused_at = self.clock()
+
+    def resume(self):
+        """
+        Continues the countdown, pushing the deadline back by the time spent paused.
+        """
+        if self.is_paused:
+            self.paused_total += self.clock() - self.paused_at
+            self.paused_at = None
+
+    def restore(self, duration, remaining, paused=False, paused_total=0.0):
+        """
+        Continues a countdown saved earlier, e.g. by a process that has since exited.
+
+        Args:
+            duration (float): The countdown's full length.
+            remaining (float): Seconds left as of now; negative if the deadline has passed.
+            paused (bool): Restore it paused, with the remaining time frozen.
+            paused_total (float): Seconds already spent paused, kept for pause_time().
+        """
+        now = self.clock()
+        self.duration = float(duration)
+        self.paused_total = float(paused_total)
+        self.started_at = now - (self.duration - remaining) - self.paused_total
+        self.paused_at = now if paused else None
+
+    def stop(self):
+        """
+        Returns the timer to idle.
+        """
+        self.started_at = None
+        self.paused_at = None
+
+    def deadline(self):
+        """
+        Returns the clock value at which the countdown reaches zero, or None when idle.
+
+        While paused, the deadline keeps moving, so it is computed as of now.
+        """
+        if not self.is_active:
+            return None
+        return self.started_at + self.duration + self.pause_time()
+
+    def pause_time(self):
+        """
+        Returns the total seconds spent paused, including a pause in progress.
+        """
+        current = self.clock() - self.paused_at if self.is_paused else 0.0
+        return self.paused_total + current
+
+    def remaining(self):
+        """
+        Returns the seconds left, never negative.
+        """
+        if not self.is_active:
+            return 0.0
+        now = self.paused_at if self.is_paused else self.clock()
+        return max(0.0, self.started_at + self.duration + self.paused_total - now)
+
+    def elapsed(self):
+        """
+        Returns the seconds of unpaused time since the start, capped at the duration.
+        """
+        if not self.is_active:
+            return 0.0
+        return self.duration - self.remaining()
+
+    def is_expired(self):
+        return self.is_active and not self.is_paused and self.remaining() <= 0.0
+
+    def remaining_whole_seconds(self):
+        """
+        Returns the remaining time rounded up, as shown on a countdown display.
+        """
+        return int(math.ceil(self.remaining()))
+
+    def next_wakeup(self, visible):
+        """
+        Returns how many seconds from now the owner next needs to wake up.
+
+        While visible, that is the moment the displayed whole second changes. While hidden
+        nothing needs redrawing, so the only wakeup is the deadline itself.
+
+        Args:
+            visible (bool): Whether the countdown is currently on screen.
+
+        Returns:
+            float: Seconds until the next wakeup, or None if no wakeup is needed.
+        """
+        if not self.is_active or self.is_paused:
+            return None
+        remaining = self.remaining()
+        if remaining <= 0.0 or not visible:
+            return remaining
+        fraction = remaining - math.floor(remaining)
+        return fraction if fraction > 0.0 else min(1.0, remaining)
@@ -0,0 +1,165 @@
+#@brief: Command-line control of the running Self Remembering App.
+# Sends one command to the running instance over a local socket and prints the reply, so
+# shell scripts, editor hooks and git hooks can start and stop sessions without launching a
+# second app. It imports only the standard library; a round trip takes a few milliseconds.
+#     python srctl.py start --aim "Write the report" --duration 25
+#     python srctl.py start --plan Pomodoro
+#     python srctl.py pause | resume | stop | show
+#     python srctl.py status --json
+# The protocol is one JSON object per line in each direction: a request such as
+# {"command": "start", "aim": "...", "duration_seconds": 1500} is answered with
+# {"ok": true, "status": {...}} or {"ok": false, "error": "..."}.
+
+import argparse
+import json
+import os
+import socket
+import sys
+
+COMMANDS = ('start', 'pause', 'resume', 'stop', 'status', 'show')
+
+# Longest request or reply line either side accepts.
+MAX_LINE = 64 * 1024
+
+EXIT_ERROR = 1
+EXIT_NOT_RUNNING = 3
+
+
+class ControlError(Exception):
+    """
+    Raised when the running app cannot be reached or rejects a command.
+    """
+
+
+class NotRunningError(ControlError):
+    """
+    Raised when no instance of the app is listening.
+    """
+
+
+def server_name():
+    """
+    Returns the name the app's QLocalServer listens on: a socket path in ~/.mindapp on
+    Unix, a per-user pipe name on Windows.
+    """
+    if sys.platform == 'win32':
+        return f"selfremembering-{os.environ.get('USERNAME', 'user')}"
+    return os.path.join(os.path.expanduser('~'), '.mindapp', 'control.sock')
+
+
+def send_command(request, timeout=2.0):
+    """
+    Sends one request to the running app and returns its reply.
+
+    Args:
+        request (dict): The request, with at least a 'command' key.
+        timeout (float): Seconds to wait for the connection and the reply.
+
+    Returns:
+        dict: The reply; reply['ok'] tells whether the command succeeded.
+
+    Raises:
+        NotRunningError: If the app is not running.
+        ControlError: If the connection fails or the reply is malformed.
+    """
+    data = json.dumps(request).encode('utf-8') + b'\n'
+    try:
+        if sys.platform == 'win32':
+            with open(r'\\.\pipe' + '\\' + server_name(), 'r+b', buffering=0) as pipe:
+                pipe.write(data)
+                line = _read_line(pipe.read)
+        else:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.settimeout(timeout)
+                connection.connect(server_name())
+                connection.sendall(data)
+                line = _read_line(lambda size: connection.recv(size))
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise NotRunningError("The Self Remembering App is not running.") from e
+    except OSError as e:
+        raise ControlError(f"Cannot talk to the Self Remembering App: {e}") from e
+
+    try:
+        reply = json.loads(line)
+    except ValueError as e:
+        raise ControlError(f"Malformed reply: {line[:200]!r}") from e
+    if not isinstance(reply, dict):
+        raise ControlError(f"Malformed reply: {line[:200]!r}")
+    return reply
+
+
+def _read_line(read):
+    buffer = b''
+    while b'\n' not in buffer:
+        chunk = read(4096)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > MAX_LINE:
+            raise ControlError("Reply too long")
+    if b'\n' not in buffer:
+        raise ControlError("Connection closed before a reply was received")
+    return buffer.split(b'\n', 1)[0].decode('utf-8')
+
+
+def format_status(status):
+    """
+    Returns a one-line human-readable form of a status reply.
+    """
+    if status['state'] == 'idle' and status.get('break_remaining_seconds') is not None:
+        minutes, seconds = divmod(int(-(-status['break_remaining_seconds'] // 1)), 60)
+        return f"Break: {minutes}:{seconds:02d} remaining - {status['plan']}"
+    if status['state'] == 'idle':
+        return "No session running."
+    minutes, seconds = divmod(int(-(-status['remaining_seconds'] // 1)), 60)
+    return f"{status['state'].capitalize()}: {minutes}:{seconds:02d} remaining - {status['aim']}"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='srctl', description="Control the running Self Remembering App.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    start = commands.add_parser('start', help="start a session")
+    start.add_argument('--aim', default='', help="the session's aim")
+    start.add_argument('--duration', type=float, default=25, help="length in minutes (default 25)")
+    start.add_argument('--plan', help="run the named session plan instead of one session")
+    commands.add_parser('pause', help="pause the running session")
+    commands.add_parser('resume', help="resume the paused session")
+    commands.add_parser('stop', help="stop the session")
+    commands.add_parser('show', help="open the app's window")
+    status = commands.add_parser('status', help="show the session state")
+    status.add_argument('--json', action='store_true', help="print the state as JSON")
+    args = parser.parse_args(argv)
+    if args.command == 'start' and args.duration <= 0:
+        parser.error("--duration must be positive")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    request = {'command': args.command}
+    if args.command == 'start':
+        request['aim'] = args.aim
+        if args.plan:
+            request['plan'] = args.plan
+        else:
+            request['duration_seconds'] = round(args.duration * 60)
+
+    try:
+        reply = send_command(request)
+    except NotRunningError as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_NOT_RUNNING
+    except ControlError as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_ERROR
+
+    if not reply.get('ok'):
+        print(reply.get('error', "Command failed."), file=sys.stderr)
+        return EXIT_ERROR
+    if args.command == 'status':
+        print(json.dumps(reply['status']) if args.json else format_status(reply['status']))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
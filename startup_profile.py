@@ -0,0 +1,98 @@
+#@brief: Startup phase timing for the Self Remembering App.
+# Records how long each startup phase takes, on the GUI thread and on the background
+# threads that initialise audio and Google Calendar, and prints a breakdown when
+# the app is launched with --profile-startup.
+
+import contextlib
+import sys
+import threading
+import time
+
+
+class StartupProfiler:
+    """
+    Collects named startup phases relative to a common origin.
+
+    Sequential phases on the GUI thread are recorded with mark(), which closes the phase
+    that started at the previous mark. Background work is timed with the phase() context
+    manager, so phases running in parallel are kept apart.
+    """
+
+    def __init__(self, enabled=False, origin=None):
+        """
+        Initializes the profiler.
+
+        Args:
+            enabled (bool): Whether to print the report once startup completes.
+            origin (float): time.perf_counter() value that counts as time zero.
+        """
+        self.enabled = enabled
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.phases = []
+        self._last_mark = self.origin
+        self._lock = threading.Lock()
+        self._reported = False
+
+    def mark(self, name):
+        """
+        Records the GUI-thread phase that ends now and started at the previous mark.
+
+        Args:
+            name (str): Name of the phase that just finished.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            self.phases.append((name, self._last_mark, now, threading.current_thread().name))
+            self._last_mark = now
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Times the enclosed block as a phase of its own.
+
+        Args:
+            name (str): Name of the phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.phases.append((name, start, end, threading.current_thread().name))
+
+    def elapsed(self):
+        """
+        Returns the seconds since the origin.
+        """
+        return time.perf_counter() - self.origin
+
+    def durations(self):
+        """
+        Returns the recorded phases as a list of (name, duration) in seconds.
+        """
+        with self._lock:
+            return [(name, end - start) for name, start, end, _ in self.phases]
+
+    def report(self, stream=None):
+        """
+        Prints the startup breakdown once, if profiling is enabled.
+
+        Args:
+            stream (file): Where to print; defaults to stderr.
+        """
+        with self._lock:
+            if not self.enabled or self._reported:
+                return
+            self._reported = True
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+
+        stream = stream or sys.stderr
+        print("Startup profile (ms since launch):", file=stream)
+        print(f"  {'phase':<32} {'start':>8} {'end':>8} {'took':>8}  thread", file=stream)
+        for name, start, end, thread in phases:
+            print(f"  {name:<32} {(start - self.origin) * 1000:8.1f} {(end - self.origin) * 1000:8.1f} "
+                  f"{(end - start) * 1000:8.1f}  {thread}", file=stream)
+        if phases:
+            total = max(end for _, _, end, _ in phases) - self.origin
+            print(f"  {'total':<32} {'':>8} {total * 1000:8.1f}", file=stream)
@@ -0,0 +1,195 @@
+#@brief: Focus statistics panel of the Self Remembering App.
+# Shows today's and this week's focused minutes, the current and longest streak, how many
+# sessions ran to the end of their timer, how often sessions were paused for inactivity, the
+# top aims, and bar charts of the last 30 days and 12 weeks. Everything comes from the session
+# store's rollups, read on a short-lived thread, so opening the panel never waits on the disk
+# and never scans the session history. The charts only paint the series they are given.
+
+import threading
+import time
+
+from PyQt6.QtCore import QObject, QRectF, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QPainter
+from PyQt6.QtWidgets import QGridLayout, QLabel, QToolTip, QVBoxLayout, QWidget
+
+
+class BarChart(QWidget):
+    """
+    A minimal bar chart of (label, value, tooltip) points.
+    """
+
+    def __init__(self, title, parent=None):
+        """
+        Args:
+            title (str): Drawn above the bars.
+            parent (QWidget): The Qt parent.
+        """
+        super().__init__(parent)
+        self.title = title
+        self.points = []
+        self.setMinimumHeight(120)
+        self.setMouseTracking(True)
+
+    def set_points(self, points):
+        """
+        Replaces the series and repaints.
+
+        Args:
+            points (list): (label, value, tooltip) tuples; a label of '' is not drawn.
+        """
+        self.points = list(points)
+        self.update()
+
+    def bar_rects(self):
+        """
+        Returns the rectangle of every bar, in the order of the points.
+        """
+        if not self.points:
+            return []
+        top, bottom = 20.0, self.height() - 18.0
+        width = self.width() / len(self.points)
+        peak = max(value for _, value, _ in self.points) or 1.0
+        rects = []
+        for index, (_, value, _) in enumerate(self.points):
+            height = (bottom - top) * value / peak
+            rects.append(QRectF(index * width + 1, bottom - height, max(width - 2, 1.0), height))
+        return rects
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setPen(self.palette().windowText().color())
+        painter.drawText(0, 0, self.width(), 18, Qt.AlignmentFlag.AlignLeft, self.title)
+        bar_color = QColor(70, 130, 180)
+        for (label, _, _), rect in zip(self.points, self.bar_rects()):
+            painter.fillRect(rect, bar_color)
+            if label:
+                # Centred under its bar, but kept inside the widget.
+                left = min(max(rect.center().x() - 30, 0.0), self.width() - 60.0)
+                painter.drawText(QRectF(left, self.height() - 16, 60, 16), Qt.AlignmentFlag.AlignCenter, label)
+        painter.end()
+
+    def mouseMoveEvent(self, event):
+        position = event.position()
+        for (_, _, tooltip), rect in zip(self.points, self.bar_rects()):
+            if rect.left() <= position.x() <= rect.right():
+                QToolTip.showText(event.globalPosition().toPoint(), tooltip, self)
+                return
+        QToolTip.hideText()
+
+
+class StatsSignals(QObject):
+    """
+    Carries a loaded FocusStats from the loading thread to the GUI thread.
+    """
+
+    loaded = pyqtSignal(object, float)
+
+
+class StatsPanel(QWidget):
+    """
+    A separate window with the focus statistics.
+    """
+
+    def __init__(self, store, load_seconds=None, parent=None):
+        """
+        Initializes the panel. It stays hidden until shown.
+
+        Args:
+            store (SessionStore): Source of the rollups.
+            load_seconds (Histogram): Records how long each load took, or None.
+            parent (QWidget): The window the panel belongs to.
+        """
+        super().__init__(parent, Qt.WindowType.Window)
+        self.store = store
+        self.load_seconds = load_seconds
+        self.loading = False
+        self.stale = False
+        self.signals = StatsSignals()
+        self.signals.loaded.connect(self.show_stats)
+
+        self.setWindowTitle("Statistics")
+        self.resize(560, 520)
+
+        layout = QVBoxLayout()
+        grid = QGridLayout()
+        self.values = {}
+        for index, name in enumerate(("Today", "This week", "Current streak", "Longest streak",
+                                      "Completed", "Auto-pauses")):
+            row, column = divmod(index, 2)
+            value = QLabel("-")
+            value.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+            grid.addWidget(QLabel(f"{name}:"), row, column * 2)
+            grid.addWidget(value, row, column * 2 + 1)
+            self.values[name] = value
+        layout.addLayout(grid)
+
+        self.daily_chart = BarChart("Focused minutes, last 30 days")
+        layout.addWidget(self.daily_chart, 1)
+        self.weekly_chart = BarChart("Focused minutes, last 12 weeks")
+        layout.addWidget(self.weekly_chart, 1)
+        layout.addWidget(QLabel("Top aims:"))
+        self.aims_label = QLabel("")
+        self.aims_label.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
+        layout.addWidget(self.aims_label)
+        self.setLayout(layout)
+
+    def refresh(self):
+        """
+        Reloads the statistics in the background. Does nothing while the panel is hidden.
+        """
+        if not self.isVisible():
+            return
+        if self.loading:
+            # Reload once the current load has finished, so its data is not shown as final.
+            self.stale = True
+            return
+        self.loading = True
+        self.stale = False
+        threading.Thread(target=self._load, name='stats-load', daemon=True).start()
+
+    def _load(self):
+        began = time.perf_counter()
+        try:
+            stats = self.store.focus_stats()
+        except Exception as e:
+            print(f"Statistics error: {str(e)}")
+            stats = None
+        self.signals.loaded.emit(stats, time.perf_counter() - began)
+
+    def show_stats(self, stats, seconds):
+        """
+        Shows a loaded FocusStats. Runs on the GUI thread.
+        """
+        self.loading = False
+        if self.load_seconds is not None:
+            self.load_seconds.observe(seconds)
+        if self.stale:
+            self.refresh()
+        if stats is None:
+            return
+
+        rate = stats.completion_rate
+        auto_pauses = stats.auto_pauses_per_session
+        self.values["Today"].setText(f"{stats.today_minutes:.0f} min")
+        self.values["This week"].setText(f"{stats.week_minutes:.0f} min")
+        self.values["Current streak"].setText(f"{stats.current_streak} days")
+        self.values["Longest streak"].setText(f"{stats.longest_streak} days")
+        self.values["Completed"].setText(
+            f"{rate:.0%} of {stats.totals['sessions']} sessions" if rate is not None else "-")
+        self.values["Auto-pauses"].setText(f"{auto_pauses:.2f} per session" if auto_pauses is not None else "-")
+
+        self.daily_chart.set_points(
+            (day.strftime('%d %b') if index % 7 == (len(stats.days) - 1) % 7 else '', minutes,
+             f"{day.strftime('%a %d %b')}: {minutes:.0f} min, {sessions} sessions")
+            for index, (day, minutes, sessions) in enumerate(stats.days))
+        self.weekly_chart.set_points(
+            (monday.strftime('%d %b') if index % 3 == (len(stats.weeks) - 1) % 3 else '', minutes,
+             f"Week of {monday.strftime('%d %b %Y')}: {minutes:.0f} min, {sessions} sessions")
+            for index, (monday, minutes, sessions) in enumerate(stats.weeks))
+        self.aims_label.setText('\n'.join(
+            f"{aim or '(no aim)'}: {minutes:.0f} min in {sessions} sessions" for aim, minutes, sessions in stats.aims)
+            or "No sessions recorded yet.")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
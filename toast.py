@@ -0,0 +1,109 @@
+#@brief: In-window toast messages.
+# A toast is a small label laid over the bottom of the window that hides itself after a few
+# seconds or when clicked. Unlike a message box it runs no nested event loop and waits for
+# nobody, so the countdown keeps ticking while it is shown. The newest few messages are
+# shown together, newest last. A notification with actions shows them as links and stays
+# until one is clicked or the toast is dismissed.
+
+import html
+
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import QLabel
+
+from notifications import ERROR, WARNING
+
+STYLES = {
+    WARNING: "background: #fff4e0; color: #5a3800; border: 1px solid #e0a040;",
+    ERROR: "background: #fde8e8; color: #6a1010; border: 1px solid #d06060;",
+}
+DEFAULT_STYLE = "background: #f0f0f0; color: #202020; border: 1px solid #b0b0b0;"
+
+
+class Toast(QLabel):
+    """
+    Shows notifications over the bottom of its parent widget for a few seconds.
+    """
+
+    def __init__(self, parent, duration_ms=6000, max_messages=3):
+        """
+        Initializes a hidden toast.
+
+        Args:
+            parent (QWidget): The window the toast is laid over.
+            duration_ms (int): How long a message stays after the last one arrived.
+            max_messages (int): Messages shown at once; older ones are dropped.
+        """
+        super().__init__(parent)
+        self.max_messages = max_messages
+        self.messages = []
+        self.hovered_link = ''
+        self.setWordWrap(True)
+        self.setTextFormat(Qt.TextFormat.RichText)
+        self.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.hide_timer = QTimer(self)
+        self.hide_timer.setSingleShot(True)
+        self.hide_timer.setInterval(duration_ms)
+        self.hide_timer.timeout.connect(self.dismiss)
+        self.setTextInteractionFlags(Qt.TextInteractionFlag.LinksAccessibleByMouse)
+        self.linkHovered.connect(self.set_hovered_link)
+        self.linkActivated.connect(self.run_action)
+        self.hide()
+
+    def show_notification(self, notification):
+        """
+        Adds a notification to the toast and shows it, restarting the hide timer.
+
+        Args:
+            notification (Notification): The message to show.
+        """
+        self.messages = (self.messages + [notification])[-self.max_messages:]
+        self.setText('<br><br>'.join(
+            f"<b>{html.escape(message.title)}</b><br>{html.escape(message.message).replace(chr(10), '<br>')}"
+            + ''.join(f"<br><a href='{index}:{number}'>{html.escape(label)}</a>"
+                      for number, (label, _) in enumerate(message.actions))
+            for index, message in enumerate(self.messages)))
+        worst = ERROR if any(m.level == ERROR for m in self.messages) else (
+            WARNING if any(m.level == WARNING for m in self.messages) else None)
+        self.setStyleSheet(f"QLabel {{ {STYLES.get(worst, DEFAULT_STYLE)} border-radius: 6px; padding: 8px; }}")
+        self.place()
+        self.show()
+        self.raise_()
+        if any(message.actions for message in self.messages):
+            self.hide_timer.stop()
+        else:
+            self.hide_timer.start()
+
+    def place(self):
+        """
+        Sizes the toast to its text and moves it to the bottom of the parent.
+        """
+        parent = self.parentWidget()
+        width = max(120, parent.width() - 20)
+        self.setFixedWidth(width)
+        self.setFixedHeight(self.heightForWidth(width))
+        self.move(10, parent.height() - self.height() - 10)
+
+    def dismiss(self):
+        self.hide_timer.stop()
+        self.messages = []
+        self.hovered_link = ''
+        self.hide()
+
+    def set_hovered_link(self, link):
+        self.hovered_link = link
+
+    def run_action(self, link):
+        """
+        Dismisses the toast and runs the clicked action's callback.
+        """
+        index, number = (int(part) for part in link.split(':'))
+        callback = self.messages[index].actions[number][1]
+        self.dismiss()
+        callback()
+
+    def mousePressEvent(self, event):
+        if self.hovered_link:
+            super().mousePressEvent(event)
+        else:
+            self.dismiss()
@@ -0,0 +1,135 @@
+#@brief: System tray icon for running the Self Remembering App in the background.
+# In tray mode the window is not built until it is opened, and closing it only hides it and
+# releases its images. Sessions are started, paused, resumed and stopped from the tray menu.
+# Session plans are started from the menu as well; their breaks count down in the tooltip.
+# The tooltip shows the remaining time to the minute and is refreshed only when that minute
+# changes; the menu's status line is refreshed when the menu opens, so an idle tray icon
+# causes no wakeups at all.
+
+from PyQt6.QtCore import QObject, QTimer, Qt
+from PyQt6.QtWidgets import QMenu, QSystemTrayIcon
+
+from session_engine import DURATION_CHOICES
+
+
+def describe_session(engine, plan_runner=None):
+    """
+    Returns a one-line description of the session state, e.g. "Running, 12 min left".
+    """
+    if plan_runner is not None and not engine.is_active and plan_runner.in_break:
+        return f"Break, {-(-int(plan_runner.break_remaining()) // 60)} min left"
+    if not engine.is_active:
+        return "No session running"
+    minutes = -(-engine.remaining_whole_seconds() // 60)
+    state = "Paused" if engine.is_paused else "Running"
+    return f"{state}, {minutes} min left"
+
+
+class SessionTray(QObject):
+    """
+    The tray icon and its menu, driving the session methods of a FocusSessionApp.
+    """
+
+    def __init__(self, app, icon, parent=None):
+        """
+        Initializes the tray icon. It is not visible until show() is called.
+
+        Args:
+            app (FocusSessionApp): The application whose sessions the menu controls.
+            icon (QIcon): The tray icon.
+            parent (QObject): The Qt parent.
+        """
+        super().__init__(parent)
+        self.app = app
+        self.icon = QSystemTrayIcon(icon, self)
+
+        self.menu = QMenu()
+        self.status_action = self.menu.addAction(describe_session(app.engine, app.plan_runner))
+        self.status_action.setEnabled(False)
+        self.menu.addSeparator()
+        self.open_action = self.menu.addAction("Open Window")
+        self.open_action.triggered.connect(app.show_window)
+        self.stats_action = self.menu.addAction("Statistics")
+        self.stats_action.triggered.connect(app.show_stats)
+        self.start_menu = self.menu.addMenu("Start")
+        for label, seconds in DURATION_CHOICES.items():
+            action = self.start_menu.addAction(label)
+            action.triggered.connect(lambda checked=False, seconds=seconds: app.begin_session('', seconds))
+        self.plan_menu = self.menu.addMenu("Start Plan")
+        for name in app.plans:
+            action = self.plan_menu.addAction(name)
+            action.triggered.connect(lambda checked=False, name=name: app.begin_plan(name))
+        self.plan_menu.menuAction().setVisible(bool(app.plans))
+        self.pause_action = self.menu.addAction("Pause")
+        self.pause_action.triggered.connect(app.pause_session)
+        self.resume_action = self.menu.addAction("Resume")
+        self.resume_action.triggered.connect(app.resume_session)
+        self.stop_action = self.menu.addAction("Stop")
+        self.stop_action.triggered.connect(app.stop_session)
+        self.menu.addSeparator()
+        self.quit_action = self.menu.addAction("Quit")
+        self.quit_action.triggered.connect(app.quit_app)
+        self.menu.aboutToShow.connect(self.refresh)
+        self.icon.setContextMenu(self.menu)
+        self.icon.activated.connect(self.on_activated)
+
+        self.tooltip_timer = QTimer(self)
+        self.tooltip_timer.setSingleShot(True)
+        self.tooltip_timer.setTimerType(Qt.TimerType.VeryCoarseTimer)
+        self.tooltip_timer.timeout.connect(self.refresh)
+
+    def show(self):
+        self.refresh()
+        self.icon.show()
+
+    def hide(self):
+        self.tooltip_timer.stop()
+        self.icon.hide()
+
+    def refresh(self):
+        """
+        Updates the tooltip, the status line and which actions are enabled.
+
+        While a session runs, the next refresh is scheduled for when the displayed minute changes.
+        """
+        engine = self.app.engine
+        plan_runner = self.app.plan_runner
+        status = describe_session(engine, plan_runner)
+        aim = f"\n{engine.aim}" if engine.is_active else ''
+        plan = f"\nPlan: {plan_runner.plan.name}" if plan_runner.is_active else ''
+        self.icon.setToolTip(f"Self Remembering App\n{status}{aim}{plan}")
+        self.status_action.setText(status)
+        idle = not engine.is_active and not plan_runner.is_active
+        self.start_menu.setEnabled(idle)
+        self.plan_menu.setEnabled(idle)
+        self.pause_action.setEnabled(engine.is_running)
+        self.resume_action.setEnabled(engine.is_paused)
+        self.stop_action.setEnabled(not idle)
+
+        remaining = None
+        if engine.is_running:
+            remaining = engine.remaining_whole_seconds()
+        elif not engine.is_active and plan_runner.in_break:
+            remaining = int(plan_runner.break_remaining()) + 1
+        if remaining is not None and remaining > 0:
+            # The minute shown is rounded up, so it changes just after a whole minute is left.
+            self.tooltip_timer.start(((remaining - 1) % 60 + 1) * 1000)
+        else:
+            self.tooltip_timer.stop()
+
+    def notify(self, title, message):
+        """
+        Shows a balloon message from the tray icon.
+        """
+        self.icon.showMessage(title, message, QSystemTrayIcon.MessageIcon.Information, 10000)
+
+    def on_activated(self, reason):
+        """
+        Opens the window on a click of the tray icon, or hides it if it is open.
+        """
+        if reason != QSystemTrayIcon.ActivationReason.Trigger:
+            return
+        if self.app.isVisible():
+            self.app.dismiss_window()
+        else:
+            self.app.show_window()